@@ -147,6 +147,7 @@ class Assimulo_prepare(object):
         self.thirdparty_methods  = thirdparty_methods
         self.with_openmp = args[0].with_openmp
         self.sundials_with_msvc = False
+        self.sundials_nvectors = []
 
         if self.sundials_with_superlu is not None:
             L.warning("The option 'sundials_with_superlu' has been deprecated and has no effect. Support for SuperLU using Sundials is automatically checked.")
@@ -382,6 +383,7 @@ class Assimulo_prepare(object):
             sundials_vector_type_size = None
             sundials_with_superlu = False
             sundials_with_msvc = False
+            sundials_nvectors = []
             try:
                 if os.path.exists(os.path.join(os.path.join(self.incdirs,'sundials'), 'sundials_config.h')):
                     with open(os.path.join(os.path.join(self.incdirs,'sundials'), 'sundials_config.h')) as f:
@@ -411,6 +413,10 @@ class Assimulo_prepare(object):
                                 break
                     if os.path.exists(os.path.join(self.libdirs,'sundials_nvecserial.lib')) and not os.path.exists(os.path.join(self.libdirs,'libsundials_nvecserial.a')):
                         sundials_with_msvc = True
+                    for nvector in ["openmp", "pthreads"]: #The multithreaded N_Vectors are only installed if enabled
+                        if os.path.exists(os.path.join(os.path.join(self.incdirs,'nvector'), 'nvector_%s.h'%nvector)):
+                            sundials_nvectors.append(nvector)
+                            L.debug('SUNDIALS found to be compiled with the %s N_Vector.'%nvector)
             except Exception as e:
                 if os.path.exists(os.path.join(os.path.join(self.incdirs,'arkode'), 'arkode.h')): #This was added in 2.6
                     sundials_version = (2,6,0)
@@ -423,6 +429,7 @@ class Assimulo_prepare(object):
             self.SUNDIALS_vector_size = sundials_vector_type_size
             self.sundials_with_superlu = sundials_with_superlu
             self.sundials_with_msvc = sundials_with_msvc
+            self.sundials_nvectors = sundials_nvectors
             if not self.sundials_with_superlu:
                 L.debug("Could not detect SuperLU support with Sundials, disabling support for SuperLU.")
         else:    
@@ -474,7 +481,10 @@ class Assimulo_prepare(object):
         if self.with_SUNDIALS:
             compile_time_env = {'SUNDIALS_VERSION': self.SUNDIALS_version,
                                 'SUNDIALS_WITH_SUPERLU': self.sundials_with_superlu and self.with_SLU,
-                                'SUNDIALS_VECTOR_SIZE': self.SUNDIALS_vector_size}
+                                'SUNDIALS_VECTOR_SIZE': self.SUNDIALS_vector_size,
+                                'SUNDIALS_WITH_OPENMP': "openmp" in self.sundials_nvectors,
+                                'SUNDIALS_WITH_PTHREADS': "pthreads" in self.sundials_nvectors}
+            nvector_libraries = ["sundials_nvec%s"%nvector for nvector in self.sundials_nvectors]
             #CVode and IDA
             ext_list += cythonize(["assimulo" + os.path.sep + "solvers" + os.path.sep + "sundials.pyx"], 
                                  include_path=[".","assimulo","assimulo" + os.sep + "lib"],
@@ -483,9 +493,10 @@ class Assimulo_prepare(object):
             ext_list[-1].library_dirs = [self.libdirs]
             
             if self.SUNDIALS_version >= (3,0,0):
-                ext_list[-1].libraries = ["sundials_cvodes", "sundials_nvecserial", "sundials_idas", "sundials_sunlinsoldense", "sundials_sunlinsolspgmr", "sundials_sunmatrixdense", "sundials_sunmatrixsparse"]
+                ext_list[-1].libraries = ["sundials_cvodes", "sundials_nvecserial", "sundials_idas", "sundials_sunlinsoldense", "sundials_sunlinsolspgmr", "sundials_sunlinsolspfgmr", "sundials_sunlinsolspbcgs", "sundials_sunlinsolsptfqmr", "sundials_sunlinsolband", "sundials_sunmatrixdense", "sundials_sunmatrixsparse", "sundials_sunmatrixband"]
             else:
                 ext_list[-1].libraries = ["sundials_cvodes", "sundials_nvecserial", "sundials_idas"]
+            ext_list[-1].libraries.extend(nvector_libraries)
             if self.sundials_with_superlu and self.with_SLU: #If SUNDIALS is compiled with support for SuperLU
                 if self.SUNDIALS_version >= (3,0,0):
                     ext_list[-1].libraries.extend(["sundials_sunlinsolsuperlumt"])
@@ -501,7 +512,7 @@ class Assimulo_prepare(object):
                         compile_time_env=compile_time_env, force=True)
             ext_list[-1].include_dirs = [np.get_include(), "assimulo","assimulo"+os.sep+"lib", self.incdirs]
             ext_list[-1].library_dirs = [self.libdirs]
-            ext_list[-1].libraries = ["sundials_kinsol", "sundials_nvecserial"]
+            ext_list[-1].libraries = ["sundials_kinsol", "sundials_nvecserial"] + nvector_libraries
             
             if self.sundials_with_superlu and self.with_SLU: #If SUNDIALS is compiled with support for SuperLU
                 ext_list[-1].include_dirs.append(self.SLUincdir)
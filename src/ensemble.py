@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010 Modelon AB
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import multiprocessing
+import numpy as N
+from timeit import default_timer as timer
+
+from assimulo.exception import AssimuloException
+from assimulo.implicit_ode import Implicit_ODE
+
+VARIANT_KEYS = ("t0", "y0", "yd0", "p0", "sw0", "attributes")
+
+_MISSING = object() #Marks attributes that the problem did not have
+
+class _EnsembleWorker(object):
+    """
+    Simulates variants using a single solver which is created once
+    and then reinitialized for each variant.
+    """
+    def __init__(self, factory):
+        self.solver = factory()
+        self.t0 = self.solver.t0
+        self.y0 = self.solver.y0.copy()
+        self.yd0 = self.solver.yd0.copy() if isinstance(self.solver, Implicit_ODE) else None
+        self.p0 = self.solver.p0.copy() if self.solver.problem_info["dimSens"] > 0 else None
+        self.sw0 = list(self.solver.sw0) if self.solver.problem_info["switches"] else None
+        self.attributes = {} #The original values of the attributes set by the variants
+
+    def _set_attributes(self, attributes):
+        """
+        Sets the attributes of a variant on the problem. The attributes
+        set by previous variants are first restored to their original
+        values, so that the result of a variant does not depend on which
+        variants were simulated before it by the same worker.
+        """
+        problem = self.solver.problem
+        for name, value in self.attributes.items():
+            if value is _MISSING:
+                if name in getattr(problem, "__dict__", {}):
+                    delattr(problem, name)
+            else:
+                setattr(problem, name, value)
+
+        for name, value in attributes.items():
+            if name not in self.attributes:
+                self.attributes[name] = getattr(problem, name, _MISSING)
+            setattr(problem, name, value)
+
+    def __call__(self, args):
+        variant, tfinal, ncp, ncp_list = args
+        solver = self.solver
+
+        if "p0" in variant and self.p0 is None:
+            raise AssimuloException("The variant specifies 'p0' but the problem has no parameters (p0) for sensitivities.")
+
+        self._set_attributes(variant.get("attributes", {}))
+
+        t0 = variant.get("t0", self.t0)
+        y0 = N.array(variant.get("y0", self.y0), dtype=float, ndmin=1)
+        sw0 = variant.get("sw0", self.sw0)
+        if self.yd0 is not None:
+            yd0 = N.array(variant.get("yd0", self.yd0), dtype=float, ndmin=1)
+            solver.re_init(t0, y0, yd0, sw0)
+        else:
+            solver.re_init(t0, y0, sw0)
+        if self.p0 is not None:
+            solver.p = N.array(variant.get("p0", self.p0), dtype=float, ndmin=1)
+
+        time_start = timer()
+        result = solver.simulate(tfinal, ncp, ncp_list)
+        time_stop = timer()
+
+        statistics = dict((k, solver.statistics[k]) for k in solver.statistics.keys()
+                                                     if solver.statistics.statistics[k] != -1)
+        statistics["elapsed_time"] = time_stop - time_start
+
+        return tuple(N.array(r) for r in result), statistics
+
+_worker = None
+
+def _initialize_worker(factory):
+    global _worker
+    _worker = _EnsembleWorker(factory)
+
+def _simulate_variant(args):
+    return _worker(args)
+
+class Ensemble(object):
+    """
+    Simulates several variants (initial values, parameters, ...) of a
+    problem in parallel using a pool of processes. Each process creates
+    a solver once using the factory and then reuses it for its share of
+    the variants by reinitializing it (re_init) between the simulations.
+
+        Parameters::
+
+            factory
+                    - A function, without arguments, that returns a
+                      solver (with its problem). As the solvers cannot
+                      be pickled, the solvers are created in the worker
+                      processes. Note that on platforms where processes
+                      are spawned and not forked, the factory needs to
+                      be a module level function.
+
+            variants
+                    - A list of dictionaries, one for each simulation.
+                      The following keys are recognized:
+
+                        't0', 'y0', 'yd0' - The initial values. If not
+                                            given, the values of the
+                                            solver created by the factory
+                                            are used.
+                        'p0'              - The parameters for which
+                                            sensitivities are calculated.
+                        'sw0'             - The initial switches.
+                        'attributes'      - A dictionary of attributes
+                                            that are set on the problem,
+                                            e.g. model parameters.
+
+        Example::
+
+            def factory():
+                return CVode(Explicit_Problem(rhs, [1.0, 0.0]))
+
+            ens = Ensemble(factory, [{'y0':[1.0, x]} for x in N.linspace(0, 1, 100)])
+            t, y = ens.simulate(10.0, 100)
+
+            t.shape  -> (100, 101)
+            y.shape  -> (100, 101, 2)
+    """
+    def __init__(self, factory, variants):
+        self.factory = factory
+        self.variants = [dict(v) for v in variants]
+        for v in self.variants:
+            for k in v:
+                if k not in VARIANT_KEYS:
+                    raise AssimuloException("Unknown key '%s' in variant, should be one of %s."%(k, VARIANT_KEYS))
+
+        self.options = {"num_threads": multiprocessing.cpu_count()}
+        self.statistics = []
+
+    def _set_number_threads(self, num_threads):
+        num_threads = int(num_threads)
+        if num_threads < 1:
+            raise AssimuloException("The number of threads must be positive.")
+        self.options["num_threads"] = num_threads
+
+    def _get_number_threads(self):
+        """
+        This options specifies the number of processes used for the
+        simulations. If one, the variants are simulated in the calling
+        process.
+
+            Parameters::
+
+                num_threads
+
+                        - Default is the number of cores
+
+                        - Should be a integer.
+        """
+        return self.options["num_threads"]
+
+    num_threads = property(_get_number_threads, _set_number_threads)
+
+    def simulate(self, tfinal, ncp=0, ncp_list=None):
+        """
+        Simulates all variants over the time-interval [t0, tfinal]. See
+        ODE.simulate for information about the parameters.
+
+            Returns::
+
+                The results of the simulations, (t, y) or (t, y, yd)
+                depending on the problem. If all the simulations return
+                the same number of points (for instance when ncp is
+                used and there are no events) the results are stacked
+                into arrays of shape (nvariants, npoints) and
+                (nvariants, npoints, dim). Otherwise lists of the
+                results of the simulations are returned.
+
+                The statistics of each simulation are stored in the
+                list self.statistics.
+        """
+        args = [(v, tfinal, ncp, ncp_list) for v in self.variants]
+
+        if self.options["num_threads"] == 1:
+            results = list(map(_EnsembleWorker(self.factory), args))
+        else:
+            num_threads = min(self.options["num_threads"], max(len(args), 1))
+            chunksize = max(1, len(args)//(4*num_threads))
+            pool = multiprocessing.Pool(num_threads, _initialize_worker, (self.factory,))
+            try:
+                results = pool.map(_simulate_variant, args, chunksize)
+            finally:
+                pool.close()
+                pool.join()
+
+        self.statistics = [r[1] for r in results]
+
+        solutions = list(zip(*[r[0] for r in results]))
+        if len(solutions) > 0 and len(set(len(t) for t in solutions[0])) == 1:
+            return tuple(N.array(s) for s in solutions)
+        return tuple(list(s) for s in solutions)
@@ -22,6 +22,7 @@ cimport numpy as N
 
 
 cdef class Explicit_ODE(ODE):
+    cdef public object batch_statistics
 
     cpdef _simulate(self, double t0, double tfinal,N.ndarray output_list,int COMPLETE_STEP, int INTERPOLATE_OUTPUT,int TIME_EVENT)
     cpdef report_solution(self, double t, N.ndarray y, opts)
@@ -15,7 +15,9 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from ode cimport ODE     
+from ode cimport ODE
+from support cimport EventLocator     
+from support import Statistics
 from problem import Explicit_Problem, Delay_Explicit_Problem, SingPerturbed_Problem, cExplicit_Problem
 
 import itertools
@@ -25,6 +27,7 @@ cimport numpy as N
 
 from exception import *
 from timeit import default_timer as timer
+from assimulo.lib.inplace import returning_rhs
 
 include "constants.pxi" #Includes the constants (textual include)
 
@@ -295,97 +298,235 @@ cdef class Explicit_ODE(ODE):
             
         return flag_initialize
         
+    def _get_rhs(self):
+        """
+        Returns the right-hand-side of the problem as a function returning
+        the derivatives, rhs(t, y[, sw]). For in-place problems (the problem
+        attribute rhs_inplace) the derivatives are written into an array
+        allocated once, which is returned and overwritten by the next call.
+        """
+        if not self.problem_info["rhs_inplace"]:
+            return self.problem.rhs
+        return returning_rhs(self.problem.rhs, self.problem_info["dim"])
+    
     def event_locator(self, t_low, t_high, y_high):
         '''Checks if an event occurs in [t_low, t_high], if that is the case event 
         localization is started. Event localization finds the earliest small interval 
         that contains a change in domain. The right endpoint of this interval is then 
-        returned as the time to restart the integration at.
+        returned as the time to restart the integration at. See support.EventLocator.
         '''
-        
-        g_high = N.array(self.event_func(t_high, y_high)).copy()
-        g_low = self.g_old
+        g_high = self.event_func(t_high, y_high)
         self.statistics["nstatefcns"] += 1
-        n_g = self.problem_info["dimRoot"]
-        TOL = max(abs(t_low), abs(t_high)) * 1e-13
-        #Check for events in [t_low, t_high].
-        for i in xrange(n_g):
-            if (g_low[i] > 0) != (g_high[i] > 0):
-                break
-        else:
-            self.g_old = g_high
+        if self._locator is None or self._locator.n_g != self.problem_info["dimRoot"]:
+            self._locator = EventLocator(self.problem_info["dimRoot"])
+        
+        event_info = self._locator.locate(lambda t: self.event_func(t, self.interpolate(t)),
+                                          t_low, t_high, self.g_old, g_high)
+        self.statistics["nstatefcns"] += self._locator.nevals
+        self.g_old = self._locator.g_event
+        if event_info is None:
             return (ID_PY_OK, t_high, y_high)
         
-        side = 0
-        sideprev = -1
-        
-        while abs(t_high - t_low) > TOL:
-            #Adjust alpha if the same side is choosen more than once in a row.
-            if (sideprev == side):
-                if side == 2:
-                    alpha = alpha * 2.0
-                else:
-                    alpha = alpha / 2.0
-            #Otherwise alpha = 1 and the secant rule is used.
-            else:
-                alpha = 1
+        self.set_event_info(event_info)
+        self.statistics["nstateevents"] += 1
+        t_high = self._locator.t_event
+        return (ID_PY_EVENT, t_high, self.interpolate(t_high))
+    
+    def simulate_batch(self, y0, tfinal, ncp=0, ncp_list=None):
+        """
+        Simulates a batch of independent trajectories of the problem,
+        all starting at the current time of the solver, in a single
+        (vectorized) integration. Intended for Monte Carlo studies of
+        small systems where the overhead of calling the right-hand side
+        once per trajectory dominates.
+        
+        In batched mode, the right-hand side of the problem is called
+        once per stage for all the active trajectories as,
+        
+            rhs(t, y)
             
-            #Decide which event function to iterate with.
-            maxfrac = 0
-            imax = 0 #Avoid compilation problem
-            for i in xrange(n_g):
-                if ((g_low[i] > 0) != (g_high[i] > 0)):
-                    gfrac = abs(g_high[i]/(g_low[i] - g_high[i]))
-                    if gfrac >= maxfrac:
-                        maxfrac = gfrac
-                        imax = i
+        where t is an array of shape (m,), the times of the m active
+        trajectories, and y is an array of shape (dim, m) holding the
+        states of the trajectories as columns, i.e. y[i] is the i:th
+        state of all the trajectories. The rhs should return an array of
+        shape (dim, m). A rhs written using componentwise indexing and
+        NumPy operations, e.g. N.array([y[1], -y[0]]), can thus be used
+        unchanged. The error estimates and the step-size control are
+        done per trajectory and trajectories that have reached tfinal are
+        masked out of the following evaluations.
+        
+        The state of the solver (solver.t, solver.y, the statistics and
+        the stored solution) is not changed by a batched simulation.
+        
+            Parameters::
+            
+                y0
+                        - The initial values of the trajectories.
+                        
+                        - Should be an array of shape (M, dim).
+                        
+                tfinal
+                        - Final time for the simulation.
+                        
+                ncp
+                        - Number of communication points where the
+                          solution is returned. The communication
+                          points are shared by all the trajectories.
+                          
+                ncp_list
+                        - A list of time points where the solution
+                          should be returned. Note, requires that ncp == 0.
+                          
+                    Example:
+                    
+                        t, y = solver.simulate_batch(N.random.rand(1000, 2), 10.0, 100)
+                        
+                        t.shape  -> (101,)
+                        y.shape  -> (1000, 101, 2)
+                        
+            Returns::
             
-            #Hack for solving the slow converging case when g is zero for a large part of [t_low, t_high].
-            if g_high[imax] == 0 or g_low[imax] == 0:
-                t_mid = (t_low + t_high)/2
+                The communication points (including the initial time)
+                and the solution, an array of shape (M, len(t), dim).
+                
+                The statistics of the batched simulation are stored
+                separately in solver.batch_statistics. The statistics
+                nsteps and nerrfails are summed over the trajectories
+                while nfcns is the number of (batched) evaluations of
+                the right-hand side.
+        """
+        if not self.supports.get("batch_simulation", False):
+            raise Explicit_ODE_Exception("The current solver does not support batched simulations.")
+        if self.problem_info["state_events"] or self.problem_info["time_events"] or self.problem_info["step_events"]:
+            raise Explicit_ODE_Exception("Batched simulations do not support problems with events.")
+        if self.problem_info["switches"] or self.problem_info["dimSens"] > 0:
+            raise Explicit_ODE_Exception("Batched simulations do not support problems with switches or sensitivities.")
+        if self.options["backward"]:
+            raise Explicit_ODE_Exception("Batched simulations do not support backward integration.")
+        
+        y0 = N.array(y0, dtype=realtype, ndmin=2)
+        if y0.ndim != 2 or y0.shape[1] != self.problem_info["dim"]:
+            raise Explicit_ODE_Exception("y0 must be an array of shape (M, {}).".format(self.problem_info["dim"]))
+        
+        t0 = self.t
+        tfinal = float(tfinal)
+        if tfinal <= t0:
+            raise Explicit_ODE_Exception('Final time {} must be greater than start time {}.'.format(tfinal, t0))
+        
+        if ncp > 0:
+            output_list = N.linspace(t0, tfinal, int(ncp)+1)[1:]
+        elif ncp_list is not None:
+            output_list = N.array(ncp_list, dtype=realtype, ndmin=1)
+            output_list = N.sort(output_list[N.logical_and(output_list > t0, output_list <= tfinal)])
+            if len(output_list) == 0 or output_list[-1] < tfinal:
+                output_list = N.append(output_list, tfinal)
+        else:
+            raise Explicit_ODE_Exception("Batched simulations require communication points, specify either ncp or ncp_list.")
+        
+        nbatch, dim = y0.shape
+        nout = len(output_list)
+        maxsteps = self.options.get("maxsteps", 0)
+        eps = N.finfo(float).eps
+        
+        stats = Statistics()
+        for k in ["nsteps", "nfcns", "nerrfails"]:
+            stats.add_key(k, self.statistics.statistics_msg[k])
+        self.batch_statistics = stats
+        
+        rhs = self.problem.rhs
+        rhs_inplace = self.problem_info["rhs_inplace"]
+        def f(t, y):
+            stats["nfcns"] += 1
+            if rhs_inplace:
+                dy = N.empty(y.shape)
+                rhs(t, y, dy)
             else:
-                t_mid = t_high - (t_high - t_low)*g_high[imax]/ \
-                                 (g_high[imax] - alpha*g_low[imax])
-        
-            #Check if t_mid is to close to current brackets and adjust inwards if so is the case.
-            if (abs(t_mid - t_low) < TOL/2):
-                fracint = abs(t_low - t_high)/TOL
-                if fracint > 5:
-                    delta = (t_high - t_low) / 10.0
-                else:
-                    delta = (t_high - t_low) / (2.0 * fracint)
-                t_mid = t_low + delta
-        
-            if (abs(t_mid - t_high) < TOL/2):
-                fracint = abs(t_low - t_high)/TOL
-                if fracint > 5:
-                    delta = (t_high - t_low) / 10.0
-                else:
-                    delta = (t_high - t_low) / (2.0 * fracint)
-                t_mid = t_high - delta
+                dy = N.asarray(rhs(t, y), dtype=realtype)
+            if dy.shape != y.shape:
+                raise Explicit_ODE_Exception("In batched mode the rhs should return an array of shape (dim, m) = {}, got {}.".format(y.shape, dy.shape))
+            return dy
+        
+        t_sol = N.append(t0, output_list)
+        y_sol = N.empty((nbatch, nout+1, dim))
+        y_sol[:,0,:] = y0
+        
+        t = N.repeat(t0, nbatch)
+        y = y0.T.copy()
+        h = N.repeat(float(self._batch_initial_step()), nbatch)
+        fy = f(t, y)
+        index = N.zeros(nbatch, dtype=int) #Index of the next communication point
+        nsteps = N.zeros(nbatch, dtype=int)
+        active = N.ones(nbatch, dtype=bool)
+        
+        while active.any():
+            act = N.flatnonzero(active)
+            t_act = t[act]
+            last = t_act + h[act] >= tfinal - 100*eps*max(abs(tfinal), 1.0)
+            h_act = N.where(last, tfinal - t_act, h[act])
+            if (h_act <= 4*eps*N.maximum(abs(t_act), 1.0)).any():
+                raise Explicit_ODE_Exception('The step-size became too small in a batched simulation at t = {}.'.format(t_act[h_act <= 4*eps*N.maximum(abs(t_act), 1.0)].min()))
             
-            #Calculate g at t_mid and check for events in [t_low, t_mid].
-            g_mid = N.array(self.event_func(t_mid, self.interpolate(t_mid))).copy()
-            self.statistics["nstatefcns"] += 1
-            sideprev = side
-            for i in xrange(n_g):
-                if (g_low[i] > 0) != (g_mid[i] > 0):
-                    (t_high, g_high) = (t_mid, g_mid[0:n_g])
-                    side = 1
-                    break
-            #If there are no events in [t_low, t_mid] there must be some event in [t_mid, t_high].
+            y_act = y[:,act]
+            y_next, error = self._batch_step(f, t_act, y_act, h_act, fy[:,act]) #Provided by the solvers supporting batched simulations
+            
+            nsteps[act] += 1
+            if maxsteps > 0 and (nsteps[act] > maxsteps).any():
+                raise Explicit_ODE_Exception('Final time not reached within maximum number of steps')
+            
+            if error is None:
+                accepted = N.ones(len(act), dtype=bool)
             else:
-                (t_low, g_low) = (t_mid, g_mid[0:n_g])
-                side = 2
+                accepted = error <= 1.0
+                h[act] = self._batch_adjust_stepsize(h_act, error)
+                stats["nerrfails"] += int(len(act) - accepted.sum())
+            stats["nsteps"] += int(accepted.sum())
+            
+            if not accepted.any():
+                continue
+            
+            acc = act[accepted]
+            t_low = t_act[accepted]
+            h_acc = h_act[accepted]
+            t_next = N.where(last[accepted], tfinal, t_low + h_acc)
+            y_low = y_act[:,accepted]
+            y_high = y_next[:,accepted]
+            f_low = fy[:,acc]
+            f_high = f(t_next, y_high)
+            
+            #Hermite interpolation of the communication points in [t_low, t_next]
+            pending = N.flatnonzero(index[acc] < nout)
+            pending = pending[output_list[index[acc[pending]]] <= t_next[pending]]
+            while len(pending) > 0:
+                rows = acc[pending]
+                theta = (output_list[index[rows]] - t_low[pending]) / h_acc[pending]
+                yl = y_low[:,pending]
+                yh = y_high[:,pending]
+                y_sol[rows, index[rows]+1, :] = ((1 - theta) * yl + theta * yh + theta * (theta - 1) * 
+                    ((1 - 2*theta) * (yh - yl) + (theta - 1) * h_acc[pending] * f_low[:,pending] 
+                     + theta * h_acc[pending] * f_high[:,pending])).T
+                index[rows] += 1
+                pending = pending[index[rows] < nout]
+                pending = pending[output_list[index[acc[pending]]] <= t_next[pending]]
+            
+            t[acc] = t_next
+            y[:,acc] = y_high
+            fy[:,acc] = f_high
+            active[acc[last[accepted]]] = False
         
-        event_info = N.array([0] * n_g)
-        for i in xrange(n_g):
-            if (g_low[i] > 0) != (g_high[i] > 0):
-                event_info[i] = 1 if g_high[i] > 0 else -1
-                
-        self.set_event_info(event_info)
-        self.statistics["nstateevents"] += 1
-        self.g_old = g_high
-        return (ID_PY_EVENT, t_high, self.interpolate(t_high))
+        return t_sol, y_sol
+    
+    def _batch_initial_step(self):
+        """
+        The initial step-size used in batched simulations.
+        """
+        return self.options["h"]
+    
+    def _batch_adjust_stepsize(self, h, error):
+        """
+        Returns the new step-sizes given the normalized errors of a batched
+        step.
+        """
+        return h
     
     def plot(self, mask=None, **kwargs):
         """
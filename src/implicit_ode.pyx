@@ -16,6 +16,7 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 from ode cimport ODE
+from support cimport EventLocator
 from problem import Implicit_Problem, cImplicit_Problem, Overdetermined_Problem
 from problem import cExplicit_Problem
 
@@ -26,6 +27,7 @@ cimport numpy as N
 
 from exception import *
 from timeit import default_timer as timer
+from assimulo.lib.inplace import returning_res
 import warnings
 
 realtype = N.float
@@ -64,7 +66,13 @@ cdef class Implicit_ODE(ODE):
         else:
             if isinstance(self.problem, cExplicit_Problem): #The problem is an explicit, get the yd0 values from the right-hand-side
                 self.problem_info["type"] = 0 #Change to explicit problem
-                if self.problem_info["state_events"]:
+                if self.problem_info["rhs_inplace"]:
+                    self.yd0 = N.empty(len(self.y0))
+                    if self.problem_info["state_events"]:
+                        problem.rhs(self.t0, self.y0, self.yd0, self.sw0)
+                    else:
+                        problem.rhs(self.t0, self.y0, self.yd0)
+                elif self.problem_info["state_events"]:
                     self.yd0 = problem.rhs(self.t0, self.y0, self.sw0)
                 else:
                     self.yd0 = problem.rhs(self.t0, self.y0)
@@ -327,96 +335,38 @@ cdef class Implicit_ODE(ODE):
              
         return flag_initialize
         
+    def _get_res(self):
+        """
+        Returns the residual of the problem as a function returning the
+        residual, res(t, y, yd[, sw]). For in-place problems (the problem
+        attribute res_inplace) the residual is written into an array
+        allocated once, which is returned and overwritten by the next call.
+        """
+        if not self.problem_info["res_inplace"]:
+            return self.problem.res
+        return returning_res(self.problem.res, self.problem_info["dim"])
+    
     def event_locator(self, t_low, t_high, y_high, yd_high):
         '''Checks if an event occurs in [t_low, t_high], if that is the case event 
         localization is started. Event localization finds the earliest small interval 
         that contains a change in domain. The right endpoint of this interval is then 
-        returned as the time to restart the integration at.
+        returned as the time to restart the integration at. See support.EventLocator.
         '''
-        
         g_high = self.event_func(t_high, y_high, yd_high)
-        g_low = self.g_old
         self.statistics["nstatefcns"] += 1
-        n_g = self.problem_info["dimRoot"]
-        TOL = max(t_low, t_high) * 1e-13
-        #Check for events in [t_low, t_high].
-        for i in xrange(n_g):
-            if (g_low[i] > 0) != (g_high[i] > 0):
-                break
-        else:
-            self.g_old = g_high
+        if self._locator is None or self._locator.n_g != self.problem_info["dimRoot"]:
+            self._locator = EventLocator(self.problem_info["dimRoot"])
+        
+        event_info = self._locator.locate(lambda t: self.event_func(t, self.interpolate(t), self.interpolate(t, 1)),
+                                          t_low, t_high, self.g_old, g_high)
+        self.statistics["nstatefcns"] += self._locator.nevals
+        self.g_old = self._locator.g_event
+        if event_info is None:
             return (ID_PY_OK, t_high, y_high, yd_high)
         
-        side = 0
-        sideprev = -1
-        
-        while abs(t_high - t_low) > TOL:
-            #Adjust alpha if the same side is choosen more than once in a row.
-            if (sideprev == side):
-                if side == 2:
-                    alpha = alpha * 2.0
-                else:
-                    alpha = alpha / 2.0
-            #Otherwise alpha = 1 and the secant rule is used.
-            else:
-                alpha = 1
-            
-            #Decide which event function to iterate with.
-            maxfrac = 0
-            imax = 0 #Avoid compilation problem
-            for i in xrange(n_g):
-                if ((g_low[i] > 0) != (g_high[i] > 0)):
-                    gfrac = abs(g_high[i]/(g_low[i] - g_high[i]))
-                    if gfrac >= maxfrac:
-                        maxfrac = gfrac
-                        imax = i
-            
-            #Hack for solving the slow converging case when g is zero for a large part of [t_low, t_high].
-            if g_high[imax] == 0 or g_low[imax] == 0:
-                t_mid = (t_low + t_high)/2
-            else:
-                t_mid = t_high - (t_high - t_low)*g_high[imax]/ \
-                                 (g_high[imax] - alpha*g_low[imax])
-        
-            #Check if t_mid is to close to current brackets and adjust inwards if so is the case.
-            if (abs(t_mid - t_low) < TOL/2):
-                fracint = abs(t_low - t_high)/TOL
-                if fracint > 5:
-                    delta = (t_high - t_low) / 10.0
-                else:
-                    delta = (t_high - t_low) / (2.0 * fracint)
-                t_mid = t_low + delta
-        
-            if (abs(t_mid - t_high) < TOL/2):
-                fracint = abs(t_low - t_high)/TOL
-                if fracint > 5:
-                    delta = (t_high - t_low) / 10.0
-                else:
-                    delta = (t_high - t_low) / (2.0 * fracint)
-                t_mid = t_high - delta
-            
-            #Calculate g at t_mid and check for events in [t_low, t_mid].
-            g_mid = self.event_func(t_mid, self.interpolate(t_mid), self.interpolate(t_mid, 1))
-            self.statistics["nstatefcns"] += 1
-            sideprev = side
-            for i in xrange(n_g):
-                if (g_low[i] > 0) != (g_mid[i] > 0):
-                    (t_high, g_high) = (t_mid, g_mid[0:n_g])
-                    side = 1
-                    break
-            #If there are no events in [t_low, t_mid] there must be some event in [t_mid, t_high].
-            else:
-                (t_low, g_low) = (t_mid, g_mid[0:n_g])
-                side = 2
-        
-        event_info = N.array([0] * n_g)
-        for i in xrange(n_g):
-            if (g_low[i] > 0) != (g_high[i] > 0):
-                event_info[i] = 1 if g_high[i] > 0 else -1
-                
         self.set_event_info(event_info)
         self.statistics["nstateevents"] += 1
-        self.g_old = g_high
+        t_high = self._locator.t_event
         return (ID_PY_EVENT, t_high, self.interpolate(t_high), self.interpolate(t_high, 1))
         
     def plot(self, mask=None, der=False, **kwargs):
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010 Modelon AB
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as N
+
+from assimulo.exception import AssimuloException
+from assimulo.lib.jacobian import FDJacobian
+
+def fd_jacobian(f, x, f0=None):
+    """
+    Approximates the Jacobian, df/dx, of a function f(x) by forward
+    differences, one evaluation of f per element of x (plus one if f0
+    is not given). The Jacobian is returned as an array of shape
+    (len(f(x)), len(x)), where a scalar f is taken to be of length one.
+    """
+    x = N.array(x, dtype=float, ndmin=1)
+    if f0 is None:
+        f0 = f(x)
+    f0 = N.array(f0, dtype=float, ndmin=1).ravel()
+
+    delta = N.sqrt(N.finfo(float).eps*N.maximum(N.abs(x), 1.e-5))
+    jac = N.empty((len(f0), len(x)))
+    for i in range(len(x)):
+        xp = x.copy()
+        xp[i] += delta[i]
+        jac[:,i] = (N.array(f(xp), dtype=float, ndmin=1).ravel() - f0)/delta[i]
+
+    return jac
+
+class _Adjoint(object):
+    """
+    Common parts of the adjoint (backward) problems for the gradient,
+    dG/dp, of a cost functional
+
+        G(p) = int_{t0}^{tf} g(t, y, p) dt
+
+    with respect to the parameters p of the problem. The gradient is
+    obtained as a quadrature, integrated backwards together with the
+    adjoint variables, yB. The last component of the quadrature is the
+    cost, G, itself.
+    """
+    def __init__(self, cost, np, cost_grad=None):
+        self.cost = cost
+        self.cost_grad = cost_grad
+        self.np = int(np)
+        if self.np < 1:
+            raise AssimuloException("Adjoint sensitivities require parameters (p0) to be set in the problem.")
+        self._key = None
+
+    def _cost_gradients(self, t, y, p):
+        """
+        Returns dg/dy and dg/dp, from cost_grad if given and otherwise
+        by finite differences of cost.
+        """
+        if self.cost_grad is not None:
+            g_y, g_p = self.cost_grad(t, y, p)
+            return N.asarray(g_y, dtype=float).ravel(), N.asarray(g_p, dtype=float).ravel()
+
+        g0 = self.cost(t, y, p)
+        return fd_jacobian(lambda x: self.cost(t, x, p), y, g0).ravel(), fd_jacobian(lambda x: self.cost(t, y, x), p, g0).ravel()
+
+    def _cached(self, key, evaluate):
+        """
+        Returns the Jacobians evaluated at the forward solution, key,
+        reusing the last ones if the forward solution is unchanged (the
+        backward functions are evaluated many times at the same point).
+        """
+        if self._key is None or self._key[0] != key[0] or any(not N.array_equal(a, b) for a, b in zip(self._key[1:], key[1:])):
+            self._jacs = evaluate()
+            self._key = (key[0],) + tuple(N.array(k, copy=True) for k in key[1:])
+        return self._jacs
+
+class ExplicitAdjoint(_Adjoint):
+    """
+    The adjoint problem of an explicit problem, y' = f(t, y, p),
+    y(t0) = y0(p). The adjoint variables satisfy
+
+        yB' = -(df/dy)^T yB - (dg/dy)^T,    yB(tf) = 0
+
+    and the gradient is
+
+        dG/dp = int_{t0}^{tf} dg/dp + yB^T df/dp dt + yB(t0)^T dy0/dp
+
+        Parameters::
+
+            rhs
+                    - The right-hand-side, rhs(t, y, p).
+
+            cost
+                    - The integrand of the cost functional, cost(t, y, p),
+                      returning a scalar.
+
+            np
+                    - The number of parameters.
+
+            cost_grad
+                    - The gradients of the integrand, cost_grad(t, y, p),
+                      returning dg/dy and dg/dp. Default None (finite
+                      differences of cost).
+
+            rhs_adjoint
+                    - The products of the Jacobians of the right-hand-side
+                      with the adjoint variables, rhs_adjoint(t, y, yB, p),
+                      returning (df/dy)^T yB and (df/dp)^T yB. Default None
+                      (finite difference Jacobians of rhs).
+
+            jac
+                    - The Jacobian df/dy, jac(t, y, p), used when
+                      rhs_adjoint is not given. Default None (finite
+                      differences).
+
+            sparsity
+                    - The sparsity pattern of df/dy used by the finite
+                      differences, see FDJacobian. Default None (dense).
+    """
+    def __init__(self, rhs, cost, np, cost_grad=None, rhs_adjoint=None, jac=None, sparsity=None):
+        _Adjoint.__init__(self, cost, np, cost_grad)
+        self.f = rhs
+        self.rhs_adjoint = rhs_adjoint
+        self.jac = jac
+        self.sparsity = sparsity
+        self._fd_jac = None
+
+    def _jacobians(self, t, y, p):
+        def evaluate():
+            f0 = N.array(self.f(t, y, p), dtype=float).ravel()
+            if self.jac is not None:
+                J_y = N.asarray(self.jac(t, y, p), dtype=float)
+            else:
+                if self._fd_jac is None:
+                    self._fd_jac = FDJacobian(len(y), self.sparsity)
+                J_y = self._fd_jac(lambda t, x: self.f(t, x, p), t, y, f0)
+            J_p = fd_jacobian(lambda x: self.f(t, y, x), p, f0)
+            return J_y, J_p, self._cost_gradients(t, y, p)
+        return self._cached((t, y, p), evaluate)
+
+    def _products(self, t, y, yB, p):
+        """
+        Returns (df/dy)^T yB, (df/dp)^T yB, dg/dy and dg/dp.
+        """
+        if self.rhs_adjoint is not None:
+            fy_yB, fp_yB = self.rhs_adjoint(t, y, yB, p)
+            g_y, g_p = self._cost_gradients(t, y, p)
+            return N.asarray(fy_yB, dtype=float).ravel(), N.asarray(fp_yB, dtype=float).ravel(), g_y, g_p
+
+        J_y, J_p, (g_y, g_p) = self._jacobians(t, y, p)
+        return J_y.T.dot(yB), J_p.T.dot(yB), g_y, g_p
+
+    def rhs(self, t, y, yB, p):
+        """
+        The right-hand-side of the adjoint variables, yB'.
+        """
+        fy_yB, fp_yB, g_y, g_p = self._products(t, y, yB, p)
+        return -fy_yB - g_y
+
+    def rhs_quad(self, t, y, yB, p):
+        """
+        The right-hand-side of the backward quadrature, (dG/dp, G).
+        """
+        fy_yB, fp_yB, g_y, g_p = self._products(t, y, yB, p)
+        return N.append(-fp_yB - g_p, -self.cost(t, y, p))
+
+    def gradient(self, yB0, qB0, yS0=None):
+        """
+        Returns the cost, G, and its gradient, dG/dp, given the adjoint
+        variables, yB0, and the quadrature, qB0, at t0 and the
+        sensitivities of the initial values, yS0 (shape (np, dim)).
+        """
+        grad = N.array(qB0[:self.np], dtype=float)
+        if yS0 is not None:
+            grad += N.asarray(yS0, dtype=float).dot(yB0)
+        return qB0[self.np], grad
+
+class ImplicitAdjoint(_Adjoint):
+    """
+    The adjoint problem of an implicit problem, F(t, y, yd, p) = 0,
+    y(t0) = y0(p). The adjoint variables satisfy
+
+        (dF/dyd)^T yB' - (dF/dy)^T yB - (dg/dy)^T = 0,    (dF/dyd)^T yB(tf) = 0
+
+    and the gradient is
+
+        dG/dp = int_{t0}^{tf} dg/dp + yB^T dF/dp dt - yB(t0)^T dF/dyd dy0/dp
+
+    The formulation assumes that dF/dyd is constant along the solution,
+    which is the case for instance for semi-explicit problems.
+
+        Parameters::
+
+            res
+                    - The residual, res(t, y, yd, p).
+
+            cost
+                    - The integrand of the cost functional, cost(t, y, p),
+                      returning a scalar.
+
+            np
+                    - The number of parameters.
+
+            cost_grad
+                    - The gradients of the integrand, cost_grad(t, y, p),
+                      returning dg/dy and dg/dp. Default None (finite
+                      differences of cost).
+
+            res_adjoint
+                    - The products of the Jacobians of the residual with
+                      the adjoint variables, res_adjoint(t, y, yd, yB, p),
+                      returning (dF/dy)^T yB, (dF/dyd)^T yB and
+                      (dF/dp)^T yB. Default None (finite difference
+                      Jacobians of res).
+    """
+    def __init__(self, res, cost, np, cost_grad=None, res_adjoint=None):
+        _Adjoint.__init__(self, cost, np, cost_grad)
+        self.F = res
+        self.res_adjoint = res_adjoint
+
+    def _jacobians(self, t, y, yd, p):
+        def evaluate():
+            F0 = N.array(self.F(t, y, yd, p), dtype=float).ravel()
+            J_y = fd_jacobian(lambda x: self.F(t, x, yd, p), y, F0)
+            J_yd = fd_jacobian(lambda x: self.F(t, y, x, p), yd, F0)
+            J_p = fd_jacobian(lambda x: self.F(t, y, yd, x), p, F0)
+            return J_y, J_yd, J_p, self._cost_gradients(t, y, p)
+        return self._cached((t, y, yd, p), evaluate)
+
+    def _products(self, t, y, yd, yB, p):
+        """
+        Returns (dF/dy)^T yB, (dF/dyd)^T yB, (dF/dp)^T yB, dg/dy and dg/dp.
+        """
+        if self.res_adjoint is not None:
+            Fy_yB, Fyd_yB, Fp_yB = self.res_adjoint(t, y, yd, yB, p)
+            g_y, g_p = self._cost_gradients(t, y, p)
+            return N.asarray(Fy_yB, dtype=float).ravel(), N.asarray(Fyd_yB, dtype=float).ravel(), N.asarray(Fp_yB, dtype=float).ravel(), g_y, g_p
+
+        J_y, J_yd, J_p, (g_y, g_p) = self._jacobians(t, y, yd, p)
+        return J_y.T.dot(yB), J_yd.T.dot(yB), J_p.T.dot(yB), g_y, g_p
+
+    def res(self, t, y, yd, yB, ydB, p):
+        """
+        The residual of the adjoint variables.
+        """
+        if self.res_adjoint is not None:
+            Fy_yB = N.asarray(self.res_adjoint(t, y, yd, yB, p)[0], dtype=float).ravel()
+            Fyd_ydB = N.asarray(self.res_adjoint(t, y, yd, ydB, p)[1], dtype=float).ravel()
+            g_y = self._cost_gradients(t, y, p)[0]
+        else:
+            J_y, J_yd, J_p, (g_y, g_p) = self._jacobians(t, y, yd, p)
+            Fy_yB, Fyd_ydB = J_y.T.dot(yB), J_yd.T.dot(ydB)
+        return Fyd_ydB - Fy_yB - g_y
+
+    def rhs_quad(self, t, y, yd, yB, p):
+        """
+        The right-hand-side of the backward quadrature, (dG/dp, G).
+        """
+        Fy_yB, Fyd_yB, Fp_yB, g_y, g_p = self._products(t, y, yd, yB, p)
+        return N.append(-Fp_yB - g_p, -self.cost(t, y, p))
+
+    def gradient(self, yB0, qB0, yS0=None, t0=None, y0=None, yd0=None, p=None):
+        """
+        Returns the cost, G, and its gradient, dG/dp, given the adjoint
+        variables, yB0, and the quadrature, qB0, at t0 and the
+        sensitivities of the initial values, yS0 (shape (np, dim)). If
+        yS0 is given, so must the initial values t0, y0, yd0 and the
+        parameters p.
+        """
+        grad = N.array(qB0[:self.np], dtype=float)
+        if yS0 is not None:
+            Fyd_yB = self._products(t0, y0, yd0, yB0, p)[1]
+            grad -= N.asarray(yS0, dtype=float).dot(Fyd_yB)
+        return qB0[self.np], grad
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010 Modelon AB
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as N
+
+# Note, the functions are kept in a (pure) Python module as the wrappers
+# are passed on as callbacks to the f2py wrapped solvers, which only
+# recognize Python functions.
+
+def returning_rhs(rhs, dim):
+    """
+    Wraps an in-place right-hand-side, rhs(t, y, ydot[, ...]), as a
+    function returning the derivatives, f(t, y[, ...]). The derivatives
+    are written into an array allocated once, which is returned and
+    overwritten by the next call.
+    """
+    ydot = N.empty(dim)
+    def f(t, y, *args, **kwargs):
+        rhs(t, y, ydot, *args, **kwargs)
+        return ydot
+    return f
+
+def returning_res(res, dim):
+    """
+    Wraps an in-place residual, res(t, y, yd, r[, ...]), as a function
+    returning the residual, f(t, y, yd[, ...]). The residual is written
+    into an array allocated once, which is returned and overwritten by
+    the next call.
+    """
+    r = N.empty(dim)
+    def f(t, y, yd, *args, **kwargs):
+        res(t, y, yd, r, *args, **kwargs)
+        return r
+    return f
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010 Modelon AB
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as N
+import scipy.sparse as sp
+
+from assimulo.exception import AssimuloException
+
+def color_columns(sparsity):
+    """
+    Groups the columns of a sparsity pattern so that no two columns in
+    the same group have a nonzero element in the same row (a coloring of
+    the column intersection graph). The columns are colored greedily,
+    starting with the column with the most nonzero elements.
+
+        Parameters::
+
+            sparsity
+                    - The sparsity pattern, a scipy sparse matrix or a
+                      dense array where the nonzero elements mark the
+                      structurally nonzero elements.
+
+        Returns::
+
+            The color of each column (an integer array) and the number
+            of colors.
+    """
+    pattern = sp.csc_matrix(sparsity, dtype=bool, copy=True) #Copy, the indices may be shared with sparsity
+    pattern.eliminate_zeros()
+    rows = pattern.tocsr()
+    n = pattern.shape[1]
+
+    colors = -N.ones(n, dtype=int)
+    mark = -N.ones(n+1, dtype=int)
+    ncolors = 0
+    for j in N.argsort(-N.diff(pattern.indptr), kind="stable"):
+        for i in pattern.indices[pattern.indptr[j]:pattern.indptr[j+1]]:
+            mark[colors[rows.indices[rows.indptr[i]:rows.indptr[i+1]]]] = j
+        color = 0
+        while mark[color] == j:
+            color += 1
+        colors[j] = color
+        ncolors = max(ncolors, color+1)
+
+    return colors, ncolors
+
+class FDJacobian(object):
+    """
+    Approximates the Jacobian, df/dy, of a function f(t, y) by forward
+    differences. If a sparsity pattern is given, the columns are colored
+    (see color_columns) once and all columns of the same color are
+    perturbed together, so that the Jacobian is obtained using one
+    evaluation of f per color instead of one per column. Without a
+    sparsity pattern, the columns are perturbed one at a time.
+
+        Parameters::
+
+            n
+                    - The number of variables.
+
+            sparsity
+                    - The sparsity pattern of the Jacobian, a scipy
+                      sparse matrix or a dense array of shape (n, n)
+                      where the nonzero elements mark the structurally
+                      nonzero elements of the Jacobian.
+                      Default None (a dense Jacobian).
+
+            output
+                    - The format of the Jacobian, 'DENSE' (a numpy
+                      array) or 'CSC' (a scipy.sparse.csc_matrix).
+                      Default 'DENSE'.
+
+        Example::
+
+            jac = FDJacobian(3, N.eye(3), output='CSC')
+            J = jac(f, t, y)
+
+            jac.ncolors  -> 1
+    """
+    def __init__(self, n, sparsity=None, output="DENSE"):
+        self.n = int(n)
+        if output.upper() not in ["DENSE", "CSC"]:
+            raise AssimuloException("The output of the Jacobian must be either 'DENSE' or 'CSC'.")
+        self.output = output.upper()
+
+        self._eps = N.finfo(float).eps
+
+        if sparsity is None: #Dense, no index arrays are needed
+            self.colors = N.arange(self.n)
+            self.ncolors = self.n
+            self.nnz = self.n*self.n
+            self._groups = None
+            return
+
+        pattern = sp.csc_matrix(sparsity, dtype=bool, copy=True) #Copy, the indices may be shared with sparsity
+        pattern.eliminate_zeros()
+        pattern.sort_indices()
+        if pattern.shape != (self.n, self.n):
+            raise AssimuloException("The sparsity pattern of the Jacobian must be of shape (%d, %d)."%(self.n, self.n))
+        colors, ncolors = color_columns(pattern)
+
+        self.colors = colors
+        self.ncolors = ncolors
+        self.nnz = pattern.nnz
+        self._indptr = pattern.indptr
+        self._rows = pattern.indices
+        self._cols = N.repeat(N.arange(self.n), N.diff(pattern.indptr))
+        self._groups = [N.flatnonzero(colors == c) for c in range(ncolors)]
+
+    def __call__(self, f, t, y, f0=None):
+        """
+        Evaluates the Jacobian of f at (t, y). The number of evaluations
+        of f is the number of colors (plus one if f0 is not given).
+
+            Parameters::
+
+                f
+                    - The function, f(t, y).
+
+                t, y
+                    - The point of the evaluation.
+
+                f0
+                    - The value of f(t, y), if known.
+        """
+        y = N.array(y, dtype=float)
+        if f0 is None:
+            f0 = f(t, y)
+        f0 = N.array(f0, dtype=float).ravel() #Copy, f may reuse its output array
+
+        delta = N.sqrt(self._eps*N.maximum(N.abs(y), 1.e-5))
+
+        if self._groups is None:
+            jac = N.empty((self.n, self.n))
+            for j in range(self.n):
+                yp = y.copy()
+                yp[j] += delta[j]
+                jac[:,j] = (N.asarray(f(t, yp), dtype=float).ravel() - f0)/delta[j]
+            return sp.csc_matrix(jac) if self.output == "CSC" else jac
+
+        diff = N.empty((self.n, self.ncolors))
+        for c, group in enumerate(self._groups):
+            yp = y.copy()
+            yp[group] += delta[group]
+            diff[:,c] = N.asarray(f(t, yp), dtype=float).ravel() - f0
+
+        data = diff[self._rows, self.colors[self._cols]]/delta[self._cols]
+
+        if self.output == "CSC":
+            return sp.csc_matrix((data, self._rows.copy(), self._indptr.copy()), shape=(self.n, self.n))
+        jac = N.zeros((self.n, self.n))
+        jac[self._rows, self._cols] = data
+        return jac
+
+def band_storage(jac, ml, mu):
+    """
+    Returns a banded Jacobian in compact band storage, i.e. as an array
+    of shape (ml+mu+1, n) where the elements are stored diagonal-wise as
+
+        band[mu+i-j, j] = jac[i, j]
+
+    This is the storage used by LAPACK (and scipy.linalg.solve_banded)
+    and by the Fortran codes of Hairer. Elements outside the band are
+    ignored.
+
+        Parameters::
+
+            jac
+                    - The Jacobian, either a dense array of shape (n, n),
+                      a scipy sparse matrix or an array already in
+                      compact band storage, shape (ml+mu+1, n). If
+                      ml+mu+1 equals n, a dense array is taken as full.
+
+            ml, mu
+                    - The lower and upper bandwidth of the Jacobian.
+    """
+    if sp.issparse(jac):
+        jac = sp.coo_matrix(jac)
+        n = jac.shape[1]
+        band = N.zeros((ml+mu+1, n))
+        inband = N.logical_and(jac.row-jac.col <= ml, jac.col-jac.row <= mu)
+        N.add.at(band, (mu+jac.row[inband]-jac.col[inband], jac.col[inband]), jac.data[inband])
+        return band
+
+    jac = N.asarray(jac, dtype=float)
+    if jac.ndim != 2 or (jac.shape[0] != jac.shape[1] and jac.shape[0] != ml+mu+1):
+        raise AssimuloException("The banded Jacobian must either be of shape (n, n) or stored in compact band storage, shape (ml+mu+1, n) = (%d, n)."%(ml+mu+1))
+    if jac.shape[0] != jac.shape[1]:
+        return jac
+
+    n = jac.shape[1]
+    band = N.zeros((ml+mu+1, n))
+    for k in range(-ml, mu+1):
+        band[mu-k, max(k,0):n+min(k,0)] = N.diagonal(jac, k)
+    return band
+
+def mass_storage(mass, n, bandwidth=None):
+    """
+    Returns a constant mass matrix in the storage used by the Fortran
+    codes of Hairer (MAS), together with its lower and upper bandwidth
+    (MLMAS and MUMAS). A full mass matrix is returned as a dense array
+    with the bandwidths n.
+
+        Parameters::
+
+            mass
+                    - The mass matrix, either a dense array of shape
+                      (n, n), a scipy sparse matrix or, if bandwidth is
+                      given, an array in compact band storage.
+
+            n
+                    - The dimension of the problem.
+
+            bandwidth
+                    - The lower and upper bandwidth, (ml, mu), of the mass
+                      matrix. Default None (full).
+    """
+    if bandwidth is not None:
+        ml, mu = bandwidth
+        band = band_storage(mass, ml, mu)
+        if band.shape[1] != n:
+            raise AssimuloException("The mass matrix must be of shape (%d, %d)."%(n, n))
+        return band, ml, mu
+
+    mass = mass.toarray() if sp.issparse(mass) else N.array(mass, dtype=float)
+    if mass.shape != (n, n):
+        raise AssimuloException("The mass matrix must be of shape (%d, %d)."%(n, n))
+    return mass, n, n
@@ -16,8 +16,92 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import numpy as N
+import scipy.linalg as LIN
+import scipy.linalg.lapack as LAPACK
+import scipy.sparse as sp
+import scipy.sparse.linalg as SPLIN
 
 from assimulo.ode import *
+from assimulo.lib.jacobian import band_storage
+
+class Radau_LU(object):
+    """
+    LU factorization of the iteration matrix, shift*M - J, used in the
+    simplified Newton iterations of the Python Radau5 implementations.
+    The factorization is computed once and is then reused for all the
+    right-hand sides until the step-size or the Jacobian changes.
+    
+        Parameters::
+        
+            jac
+                    - The Jacobian, J, either as a dense array or as a
+                      scipy.sparse matrix. With the 'BAND' linear solver
+                      also in compact band storage (see
+                      assimulo.lib.jacobian.band_storage).
+            
+            shift
+                    - The (real or complex) scalar multiplying M.
+            
+            mass
+                    - The diagonal of M as a vector.
+            
+            linear_solver
+                    - 'DENSE', 'SPARSE' (SuperLU via scipy.sparse) or
+                      'BAND' (LAPACK band LU).
+            
+            bandwidth
+                    - The lower and upper bandwidth, (ml, mu), of J.
+                      Only used with the 'BAND' linear solver.
+    """
+    def __init__(self, jac, shift, mass, linear_solver="DENSE", bandwidth=None):
+        if not sp.issparse(jac):
+            jac = N.asarray(jac, dtype=float)
+        dtype = N.result_type(jac.dtype, type(shift))
+        n = jac.shape[1] #The Jacobian can be in compact band storage
+        
+        self._dtype = dtype
+        
+        self.linear_solver = linear_solver
+        self.singular = False
+        
+        if linear_solver == "SPARSE":
+            A = (sp.diags(shift*mass) - sp.csc_matrix(jac, dtype=dtype)).tocsc()
+            try:
+                self._lu = SPLIN.splu(A)
+            except RuntimeError: #The matrix is singular
+                self.singular = True
+        elif linear_solver == "BAND":
+            ml, mu = bandwidth
+            ab = N.zeros((2*ml+mu+1, n), dtype=dtype)
+            ab[ml:] = -band_storage(jac, ml, mu) #The first ml rows are used by the LU factors
+            ab[ml+mu] += shift*mass
+            gbtrf, self._gbtrs = LAPACK.get_lapack_funcs(("gbtrf","gbtrs"), (ab,))
+            self._lu, self._piv, info = gbtrf(ab, ml, mu, overwrite_ab=1)
+            self._band = (ml, mu)
+            self.singular = info > 0
+        else:
+            A = -(jac.toarray() if sp.issparse(jac) else jac).astype(dtype)
+            A[N.diag_indices(n)] += shift*mass
+            self._lu = LIN.lu_factor(A, overwrite_a=True, check_finite=False)
+            self.singular = N.min(N.abs(N.diag(self._lu[0]))) < N.finfo(float).eps
+    
+    def solve(self, b):
+        """
+        Solves (shift*M - J) x = b using the factorization.
+        """
+        if N.iscomplexobj(b) and not N.issubdtype(self._dtype, N.complexfloating):
+            x = self._solve(N.column_stack((b.real, b.imag)))
+            return x[:,0] + 1j*x[:,1]
+        return self._solve(b)
+    
+    def _solve(self, b):
+        if self.linear_solver == "SPARSE":
+            return self._lu.solve(N.asarray(b, dtype=self._dtype))
+        elif self.linear_solver == "BAND":
+            x, info = self._gbtrs(self._lu, self._band[0], self._band[1], N.asarray(b, dtype=self._dtype), self._piv)
+            return x.reshape(N.shape(b))
+        else:
+            return LIN.lu_solve(self._lu, b, check_finite=False)
 
 class Radau_Exception(Exception):
     pass
@@ -17,6 +17,9 @@
 
 import cython
 
+cdef extern from "numpy/arrayobject.h":
+    void PyArray_CLEARFLAGS(N.ndarray arr, int flags)
+
 #=================
 # Module functions
 #=================
@@ -62,6 +65,52 @@ cdef inline void nv2arr_inplace(N_Vector v, N.ndarray o):
     cdef long int n = (<N_VectorContent_Serial>v.content).length
     cdef realtype* v_data = (<N_VectorContent_Serial>v.content).data
     memcpy(o.data, v_data, n*sizeof(realtype))
+
+cdef inline N.ndarray nv2arr_view(N_Vector v, bint readonly = False):
+    """Create a numpy array sharing the data of the N_Vector (no copy)."""
+    cdef N.npy_intp n = (<N_VectorContent_Serial>v.content).length
+    cdef N.ndarray x = N.PyArray_SimpleNewFromData(1, &n, N.NPY_DOUBLE, (<N_VectorContent_Serial>v.content).data)
+    if readonly:
+        PyArray_CLEARFLAGS(x, N.NPY_ARRAY_WRITEABLE)
+    return x
+
+cdef inline N.ndarray nv2arr_arg(N_Vector v, N.ndarray work, bint view):
+    """
+    The array of an N_Vector given as argument to the user functions. For
+    in-place problems (rhs_inplace or res_inplace) a read-only view of the
+    N_Vector (no copy), otherwise a writable copy, in work if given.
+    """
+    if view:
+        return nv2arr_view(v, readonly=True)
+    if work is None:
+        return nv2arr(v)
+    nv2arr_inplace(v, work)
+    return work
+
+cdef inline N.ndarray nv_set_output(N_Vector v, out, long int n):
+    """
+    Points the data of the (empty) N_Vector v to the array out, or to a
+    new array if out is None, so that Sundials writes directly into the
+    array. Returns the array.
+    """
+    cdef N.ndarray[realtype, ndim=1, mode='c'] x
+    if out is None:
+        x = N.empty(n)
+    else:
+        x = out
+        if x.shape[0] != n:
+            raise ValueError("The output array must be of length %d."%n)
+    SUNDIALS.N_VSetArrayPointer(<realtype*>x.data, v)
+    return x
+
+cdef inline int arr2realtype_inplace(x, realtype *out, long int n) except -1:
+    """Copy the first n elements of an array (like) into realtype*."""
+    cdef realtype[::1] data = N.ascontiguousarray(x, dtype=N.double).reshape(-1)
+    if data.shape[0] < n:
+        raise AssimuloException("The returned array has %d elements, expected %d."%(data.shape[0], n))
+    if n > 0:
+        memcpy(out, &data[0], n*sizeof(realtype))
+    return 0
     
 cdef inline void nv2mat_inplace(int Ns, N_Vector *v, N.ndarray o):
     cdef long int i,j, Nf
@@ -75,3 +124,60 @@ cdef inline realtype2arr(realtype *data, int n):
     cdef N.ndarray[realtype, ndim=1, mode='c'] x=N.empty(n)
     memcpy(x.data, data, n*sizeof(realtype))
     return x
+
+#The N_Vector implementations
+NVECTORS = ("SERIAL", "OPENMP", "PTHREADS")
+
+cdef N_Vector new_nvector(long int n, str nvector, int num_threads) except NULL:
+    """
+    Creates an N_Vector of length n of the given implementation, see
+    NVECTORS. The vector operations of the OpenMP and Pthreads vectors
+    are executed on num_threads threads. All implementations store the
+    data contiguously and share the layout of N_VectorContent_Serial,
+    so the conversion functions above (and the views) apply to all.
+    """
+    cdef N_Vector v
+    if nvector == "OPENMP":
+        IF SUNDIALS_WITH_OPENMP:
+            v = SUNDIALS.N_VNew_OpenMP(n, num_threads)
+        ELSE:
+            raise AssimuloException("The OpenMP N_Vector is not available, Assimulo was not compiled with it.")
+    elif nvector == "PTHREADS":
+        IF SUNDIALS_WITH_PTHREADS:
+            v = SUNDIALS.N_VNew_Pthreads(n, num_threads)
+        ELSE:
+            raise AssimuloException("The Pthreads N_Vector is not available, Assimulo was not compiled with it.")
+    else:
+        v = N_VNew_Serial(n)
+    if v == NULL:
+        raise MemoryError("Could not allocate an N_Vector of length %d."%n)
+    return v
+
+#The iterative (Krylov) linear solvers
+SPILS_SOLVERS = ("SPGMR", "SPFGMR", "SPBCGS", "SPTFQMR")
+
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef SUNDIALS.SUNLinearSolver create_spils_solver(str lsolver, N_Vector y, int pretype, int maxl, int gstype, int maxrs):
+        """
+        Creates one of the iterative (Krylov) Sundials linear solvers
+        'SPGMR', 'SPFGMR', 'SPBCGS' or 'SPTFQMR'. The Gram-Schmidt type and
+        the maximum number of restarts are only used by the GMRES solvers.
+        """
+        cdef SUNDIALS.SUNLinearSolver LS = NULL
+        
+        if lsolver == "SPGMR":
+            LS = SUNDIALS.SUNSPGMR(y, pretype, maxl)
+            if LS != NULL:
+                SUNDIALS.SUNSPGMRSetGSType(LS, gstype)
+                SUNDIALS.SUNSPGMRSetMaxRestarts(LS, maxrs)
+        elif lsolver == "SPFGMR":
+            LS = SUNDIALS.SUNSPFGMR(y, pretype, maxl)
+            if LS != NULL:
+                SUNDIALS.SUNSPFGMRSetGSType(LS, gstype)
+                SUNDIALS.SUNSPFGMRSetMaxRestarts(LS, maxrs)
+        elif lsolver == "SPBCGS":
+            LS = SUNDIALS.SUNSPBCGS(y, pretype, maxl)
+        elif lsolver == "SPTFQMR":
+            LS = SUNDIALS.SUNSPTFQMR(y, pretype, maxl)
+        
+        return LS
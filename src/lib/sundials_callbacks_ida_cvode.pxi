@@ -21,14 +21,34 @@ import cython
 cdef int cv_rhs(realtype t, N_Vector yv, N_Vector yvdot, void* problem_data):
     """
     This method is used to connect the Assimulo.Problem.f to the Sundials
-    right-hand-side function.
+    right-hand-side function. If the problem is in-place (rhs_inplace),
+    the states are passed as a (read-only) view of the Sundials vector and
+    the derivatives are written directly into the Sundials vector.
+    Otherwise the states are passed as a (writable) copy.
     """
     cdef ProblemData pData = <ProblemData>problem_data
-    cdef N.ndarray y = pData.work_y
+    cdef N.ndarray y = nv2arr_arg(yv, pData.work_y, pData.rhs_inplace)
+    cdef N.ndarray ydot
     cdef realtype* resptr=(<N_VectorContent_Serial>yvdot.content).data
-    cdef int i
     
-    nv2arr_inplace(yv, y)
+    if pData.rhs_inplace:
+        ydot = nv2arr_view(yvdot)
+        try:
+            if pData.dimSens>0: #Sensitivity activated
+                p = realtype2arr(pData.p,pData.dimSens)
+                if pData.sw != NULL:
+                    (<object>pData.RHS)(t,y,ydot,sw=<list>pData.sw, p=p)
+                else:
+                    (<object>pData.RHS)(t,y,ydot,p)
+            else:
+                if pData.sw != NULL:
+                    (<object>pData.RHS)(t,y,ydot,<list>pData.sw)
+                else:
+                    (<object>pData.RHS)(t,y,ydot)
+        except:
+            return CV_REC_ERR #Recoverable Error (See Sundials description)
+        
+        return CV_SUCCESS
     
     if pData.dimSens>0: #Sensitivity activated
         p = realtype2arr(pData.p,pData.dimSens)
@@ -49,8 +69,11 @@ cdef int cv_rhs(realtype t, N_Vector yv, N_Vector yvdot, void* problem_data):
         except:
             return CV_REC_ERR #Recoverable Error (See Sundials description)
     
-    for i in range(pData.dim):
-        resptr[i] = rhs[i]
+    try:
+        arr2realtype_inplace(rhs, resptr, pData.dim)
+    except:
+        traceback.print_exc()
+        return CV_UNREC_RHSFUNC_ERR
     
     return CV_SUCCESS
             
@@ -313,6 +336,74 @@ ELSE:
         return CVDLS_SUCCESS
         
         
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int band2cols(object jac, realtype** cols, long int s_mu, long int n, long int mu, long int ml) except -1:
+    """
+    Copies a banded Jacobian, given as a full matrix, a sparse matrix or
+    in compact band storage (see assimulo.lib.jacobian.band_storage), into
+    the columns of a Sundials band matrix with storage upper bandwidth s_mu.
+    """
+    cdef N.ndarray[realtype, ndim=2] band = N.asarray(band_storage(jac, ml, mu), dtype=N.float64)
+    cdef long int i, j
+    cdef realtype* col_j
+    
+    if band.shape[1] != n:
+        raise AssimuloException("The Jacobian must have %d columns."%n)
+    
+    for j in range(n):
+        col_j = cols[j] + s_mu
+        for i in range(max(0, j-mu), min(n, j+ml+1)):
+            col_j[i-j] = band[mu+i-j, j]
+    return 0
+
+cdef int cv_jac_band_common(realtype t, N_Vector yv, realtype** cols, long int s_mu, long int n, 
+                        long int mu, long int ml, ProblemData pData):
+    cdef N.ndarray y = pData.work_y
+    
+    nv2arr_inplace(yv, y)
+    
+    try:
+        if pData.dimSens>0: #Sensitivity activated
+            p = realtype2arr(pData.p,pData.dimSens)
+            if pData.sw != NULL:
+                jac=(<object>pData.JAC)(t,y,sw=<list>pData.sw,p=p)
+            else:
+                jac=(<object>pData.JAC)(t,y,p)
+        else:
+            if pData.sw != NULL:
+                jac=(<object>pData.JAC)(t,y,sw=<list>pData.sw)
+            else:
+                jac=(<object>pData.JAC)(t,y)
+        
+        band2cols(jac, cols, s_mu, n, mu, ml)
+        
+        return CVDLS_SUCCESS
+    except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+        return CVDLS_JACFUNC_RECVR #Recoverable Error (See Sundials description)
+    except:
+        traceback.print_exc()
+        return CVDLS_JACFUNC_UNRECVR
+
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef int cv_jac_band(realtype t, N_Vector yv, N_Vector fy, SUNMatrix Jac, 
+                void *problem_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3):
+        """
+        This method is used to connect the Assimulo.Problem.jac to the Sundials
+        Band Jacobian function.
+        """
+        cdef SUNMatrixContent_Band Jacobian = <SUNMatrixContent_Band>Jac.content
+        
+        return cv_jac_band_common(t, yv, Jacobian.cols, Jacobian.s_mu, Jacobian.N, Jacobian.mu, Jacobian.ml, <ProblemData>problem_data)
+ELSE:
+    cdef int cv_jac_band(long int Neq, long int mupper, long int mlower, realtype t, N_Vector yv, N_Vector fy, 
+                DlsMat Jacobian, void *problem_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3):
+        """
+        This method is used to connect the Assimulo.Problem.jac to the Sundials
+        Band Jacobian function.
+        """
+        return cv_jac_band_common(t, yv, Jacobian.cols, Jacobian.s_mu, Neq, mupper, mlower, <ProblemData>problem_data)
+
 cdef int cv_jacv(N_Vector vv, N_Vector Jv, realtype t, N_Vector yv, N_Vector fyv,
 				    void *problem_data, N_Vector tmp):
     """
@@ -320,10 +411,9 @@ cdef int cv_jacv(N_Vector vv, N_Vector Jv, realtype t, N_Vector yv, N_Vector fyv
     Jacobian times vector function.
     """
     cdef ProblemData pData = <ProblemData>problem_data
-    cdef N.ndarray y  = nv2arr(yv)
-    cdef N.ndarray v  = nv2arr(vv)
-    cdef N.ndarray fy = nv2arr(fyv)
-    cdef int i
+    cdef N.ndarray y  = nv2arr_arg(yv, pData.work_y, pData.rhs_inplace)
+    cdef N.ndarray v  = nv2arr_arg(vv, pData.work_v, pData.rhs_inplace)
+    cdef N.ndarray fy = nv2arr_arg(fyv, pData.work_fy, pData.rhs_inplace)
     
     cdef realtype* jacvptr=(<N_VectorContent_Serial>Jv.content).data
     
@@ -335,8 +425,7 @@ cdef int cv_jacv(N_Vector vv, N_Vector Jv, realtype t, N_Vector yv, N_Vector fyv
             else:
                 jacv = (<object>pData.JACV)(t,y,fy,v,p=p)
             
-            for i in range(pData.dim):
-                jacvptr[i] = jacv[i]
+            arr2realtype_inplace(jacv, jacvptr, pData.dim)
             
             return SPGMR_SUCCESS
         except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
@@ -351,8 +440,7 @@ cdef int cv_jacv(N_Vector vv, N_Vector Jv, realtype t, N_Vector yv, N_Vector fyv
             else:
                 jacv = (<object>pData.JACV)(t,y,fy,v)
             
-            for i in range(pData.dim):
-                jacvptr[i] = jacv[i]
+            arr2realtype_inplace(jacv, jacvptr, pData.dim)
             
             return SPGMR_SUCCESS
         except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
@@ -369,8 +457,8 @@ IF SUNDIALS_VERSION >= (3,0,0):
         For information see CVODES documentation 4.6.9
         """
         cdef ProblemData pData = <ProblemData>problem_data
-        cdef N.ndarray y   = nv2arr(yy)
-        cdef N.ndarray fy  = nv2arr(fyy)
+        cdef N.ndarray y   = nv2arr_arg(yy, pData.work_y, pData.rhs_inplace)
+        cdef N.ndarray fy  = nv2arr_arg(fyy, pData.work_fy, pData.rhs_inplace)
         cdef object ret
         
         try:
@@ -391,19 +479,16 @@ IF SUNDIALS_VERSION >= (3,0,0):
         For information see CVODES documentation 4.6.8
         """
         cdef ProblemData pData = <ProblemData>problem_data
-        cdef N.ndarray y   = nv2arr(yy)
-        cdef N.ndarray r   = nv2arr(rr)
-        cdef N.ndarray fy  = nv2arr(fyy)
+        cdef N.ndarray y   = nv2arr_arg(yy, pData.work_y, pData.rhs_inplace)
+        cdef N.ndarray r   = nv2arr_arg(rr, pData.work_r, pData.rhs_inplace)
+        cdef N.ndarray fy  = nv2arr_arg(fyy, pData.work_fy, pData.rhs_inplace)
         cdef realtype* zptr=(<N_VectorContent_Serial>z.content).data
-        cdef int i
 
         try:
             zres = (<object>pData.PREC_SOLVE)(t,y,fy,r,gamma,delta,pData.PREC_DATA)
+            arr2realtype_inplace(zres, zptr, pData.dim)
         except:
             return CV_REC_ERR #Recoverable Error (See Sundials description)
-                    
-        for i in range(pData.dim):
-            zptr[i] = zres[i]
         
         return CVSPILS_SUCCESS
 ELSE:
@@ -416,8 +501,8 @@ ELSE:
         For information see CVODES documentation 4.6.9
         """
         cdef ProblemData pData = <ProblemData>problem_data
-        cdef N.ndarray y   = nv2arr(yy)
-        cdef N.ndarray fy  = nv2arr(fyy)
+        cdef N.ndarray y   = nv2arr_arg(yy, pData.work_y, pData.rhs_inplace)
+        cdef N.ndarray fy  = nv2arr_arg(fyy, pData.work_fy, pData.rhs_inplace)
         cdef object ret
         
         try:
@@ -438,19 +523,16 @@ ELSE:
         For information see CVODES documentation 4.6.8
         """
         cdef ProblemData pData = <ProblemData>problem_data
-        cdef N.ndarray y   = nv2arr(yy)
-        cdef N.ndarray r   = nv2arr(rr)
-        cdef N.ndarray fy  = nv2arr(fyy)
+        cdef N.ndarray y   = nv2arr_arg(yy, pData.work_y, pData.rhs_inplace)
+        cdef N.ndarray r   = nv2arr_arg(rr, pData.work_r, pData.rhs_inplace)
+        cdef N.ndarray fy  = nv2arr_arg(fyy, pData.work_fy, pData.rhs_inplace)
         cdef realtype* zptr=(<N_VectorContent_Serial>z.content).data
-        cdef int i
 
         try:
             zres = (<object>pData.PREC_SOLVE)(t,y,fy,r,gamma,delta,pData.PREC_DATA)
+            arr2realtype_inplace(zres, zptr, pData.dim)
         except:
             return CV_REC_ERR #Recoverable Error (See Sundials description)
-                    
-        for i in range(pData.dim):
-            zptr[i] = zres[i]
         
         return CVSPILS_SUCCESS
 
@@ -507,17 +589,38 @@ cdef int cv_root(realtype t, N_Vector yv, realtype *gout,  void* problem_data):
 cdef int ida_res(realtype t, N_Vector yv, N_Vector yvdot, N_Vector residual, void* problem_data):
     """
     This method is used to connect the Assimulo.Problem.f to the Sundials
-    residual function.
+    residual function. If the problem is in-place (res_inplace), the
+    states are passed as (read-only) views of the Sundials vectors and the
+    residual is written directly into the Sundials vector. Otherwise the
+    states are passed as (writable) copies.
     """
     cdef ProblemData pData = <ProblemData>problem_data
-    cdef N.ndarray[realtype, ndim=1, mode='c'] res #Used for return from the user function
-    cdef N.ndarray y = pData.work_y
-    cdef N.ndarray yd = pData.work_yd
+    cdef N.ndarray y = nv2arr_arg(yv, pData.work_y, pData.rhs_inplace)
+    cdef N.ndarray yd = nv2arr_arg(yvdot, pData.work_yd, pData.rhs_inplace)
+    cdef N.ndarray r
     cdef realtype* resptr=(<N_VectorContent_Serial>residual.content).data
-    cdef int i
     
-    nv2arr_inplace(yv, y)
-    nv2arr_inplace(yvdot, yd)
+    if pData.rhs_inplace:
+        r = nv2arr_view(residual)
+        try:
+            if pData.dimSens!=0: #SENSITIVITY
+                p = realtype2arr(pData.p,pData.dimSens)
+                if pData.sw != NULL:
+                    (<object>pData.RHS)(t,y,yd,r,sw=<list>pData.sw,p=p)
+                else:
+                    (<object>pData.RHS)(t,y,yd,r,p)
+            else:
+                if pData.sw != NULL:
+                    (<object>pData.RHS)(t,y,yd,r,<list>pData.sw)
+                else:
+                    (<object>pData.RHS)(t,y,yd,r)
+            
+            return IDA_SUCCESS
+        except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+            return IDA_REC_ERR # recoverable error (see Sundials description)
+        except:
+            traceback.print_exc()
+            return IDA_RES_FAIL
     
     if pData.dimSens!=0: #SENSITIVITY 
         p = realtype2arr(pData.p,pData.dimSens)
@@ -527,9 +630,7 @@ cdef int ida_res(realtype t, N_Vector yv, N_Vector yvdot, N_Vector residual, voi
             else:
                 res=(<object>pData.RHS)(t,y,yd,p)
             
-            #memcpy((<N_VectorContent_Serial>residual.content).data,<realtype*>res.data,pData.memSize)
-            for i in range(pData.dim):
-                resptr[i] = res[i]
+            arr2realtype_inplace(res, resptr, pData.dim)
 
             return IDA_SUCCESS
         except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
@@ -545,9 +646,7 @@ cdef int ida_res(realtype t, N_Vector yv, N_Vector yvdot, N_Vector residual, voi
                 res=(<object>pData.RHS)(t,y,yd)
                 #res = (<object>pData.RHS)(t,y,yd)
             
-            #memcpy((<N_VectorContent_Serial>residual.content).data,<realtype*>res.data,pData.memSize)
-            for i in range(pData.dim):
-                resptr[i] = res[i]
+            arr2realtype_inplace(res, resptr, pData.dim)
             
             return IDA_SUCCESS
         except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
@@ -663,6 +762,177 @@ ELSE:
                 return IDADLS_JACFUNC_UNRECVR
             
 
+IF SUNDIALS_VERSION >= (3,0,0):
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef int ida_jac_sparse(realtype t, realtype c, N_Vector yv, N_Vector yvdot, N_Vector residual, SUNMatrix Jac,
+                 void *problem_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3):
+        """
+        This method is used to connect the Assimulo.Problem.jac to the Sundials
+        Sparse Jacobian function. The Jacobian, dF/dy + c*dF/dyd, should be
+        stored on Scipy's CSC format.
+        """
+        cdef ProblemData pData = <ProblemData>problem_data
+        cdef SUNMatrixContent_Sparse Jacobian = <SUNMatrixContent_Sparse>Jac.content
+        cdef N.ndarray y = pData.work_y
+        cdef N.ndarray yd = pData.work_yd
+        cdef int i
+        cdef sunindextype nnz = Jacobian.NNZ
+        cdef int ret_nnz
+        cdef sunindextype dim = Jacobian.N
+        cdef realtype* data = Jacobian.data
+        cdef sunindextype* rowvals = Jacobian.rowvals[0]
+        cdef sunindextype* colptrs = Jacobian.colptrs[0]
+        
+        nv2arr_inplace(yv, y)
+        nv2arr_inplace(yvdot, yd)
+        
+        try:
+            if pData.dimSens > 0: #Sensitivity activated
+                p = realtype2arr(pData.p,pData.dimSens)
+                if pData.sw != NULL:
+                    jac=(<object>pData.JAC)(c,t,y,yd,sw=<list>pData.sw,p=p)
+                else:
+                    jac=(<object>pData.JAC)(c,t,y,yd,p=p)
+            else:
+                if pData.sw != NULL:
+                    jac=(<object>pData.JAC)(c,t,y,yd,sw=<list>pData.sw)
+                else:
+                    jac=(<object>pData.JAC)(c,t,y,yd)
+            
+            if not isinstance(jac, sparse.csc.csc_matrix):
+                raise AssimuloException("The Jacobian must be stored on Scipy's CSC format.")
+            ret_nnz = jac.nnz
+            if ret_nnz > nnz:
+                raise AssimuloException("The Jacobian has more entries than supplied to the problem class via 'jac_nnz'")
+            
+            for i in range(ret_nnz):
+                data[i]    = jac.data[i]
+                rowvals[i] = jac.indices[i]
+            for i in range(dim+1):
+                colptrs[i] = jac.indptr[i]
+            
+            return IDADLS_SUCCESS
+        except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+            return IDADLS_JACFUNC_RECVR #Recoverable Error
+        except:
+            traceback.print_exc()
+            return IDADLS_JACFUNC_UNRECVR
+ELSE:
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef int ida_jac_sparse(realtype t, realtype c, N_Vector yv, N_Vector yvdot, N_Vector residual, SlsMat Jacobian,
+                 void *problem_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3):
+        """
+        This method is used to connect the Assimulo.Problem.jac to the Sundials
+        Sparse Jacobian function. The Jacobian, dF/dy + c*dF/dyd, should be
+        stored on Scipy's CSC format.
+        """
+        cdef ProblemData pData = <ProblemData>problem_data
+        cdef N.ndarray y = pData.work_y
+        cdef N.ndarray yd = pData.work_yd
+        cdef int nnz = Jacobian.NNZ
+        cdef int ret_nnz
+        cdef int dim = Jacobian.N
+        cdef realtype* data = Jacobian.data
+        cdef N.ndarray[realtype, ndim=1, mode='c'] jdata
+        cdef N.ndarray[int, ndim=1, mode='c'] jindices
+        cdef N.ndarray[int, ndim=1, mode='c'] jindptr
+        
+        IF SUNDIALS_VERSION >= (2,6,3):
+            cdef int* rowvals = Jacobian.rowvals[0]
+            cdef int* colptrs = Jacobian.colptrs[0]
+        ELSE:
+            cdef int* rowvals = Jacobian.rowvals
+            cdef int* colptrs = Jacobian.colptrs
+        
+        nv2arr_inplace(yv, y)
+        nv2arr_inplace(yvdot, yd)
+        
+        try:
+            if pData.dimSens > 0: #Sensitivity activated
+                p = realtype2arr(pData.p,pData.dimSens)
+                if pData.sw != NULL:
+                    jac=(<object>pData.JAC)(c,t,y,yd,sw=<list>pData.sw,p=p)
+                else:
+                    jac=(<object>pData.JAC)(c,t,y,yd,p=p)
+            else:
+                if pData.sw != NULL:
+                    jac=(<object>pData.JAC)(c,t,y,yd,sw=<list>pData.sw)
+                else:
+                    jac=(<object>pData.JAC)(c,t,y,yd)
+            
+            if not isinstance(jac, sparse.csc.csc_matrix):
+                raise AssimuloException("The Jacobian must be stored on Scipy's CSC format.")
+            ret_nnz = jac.nnz
+            if ret_nnz > nnz:
+                raise AssimuloException("The Jacobian has more entries than supplied to the problem class via 'jac_nnz'")
+            
+            jdata = jac.data
+            jindices = jac.indices
+            jindptr = jac.indptr
+            
+            memcpy(data, jdata.data, ret_nnz*sizeof(realtype))
+            memcpy(rowvals, jindices.data, ret_nnz*sizeof(int))
+            memcpy(colptrs, jindptr.data, (dim+1)*sizeof(int))
+            
+            return IDADLS_SUCCESS
+        except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+            return IDADLS_JACFUNC_RECVR #Recoverable Error
+        except:
+            traceback.print_exc()
+            return IDADLS_JACFUNC_UNRECVR
+
+
+cdef int ida_jac_band_common(realtype t, realtype c, N_Vector yv, N_Vector yvdot, realtype** cols, long int s_mu, 
+                        long int n, long int mu, long int ml, ProblemData pData):
+    cdef N.ndarray y = pData.work_y
+    cdef N.ndarray yd = pData.work_yd
+    
+    nv2arr_inplace(yv, y)
+    nv2arr_inplace(yvdot, yd)
+    
+    try:
+        if pData.dimSens!=0: #SENSITIVITY 
+            p = realtype2arr(pData.p,pData.dimSens)
+            if pData.sw != NULL:
+                jac=(<object>pData.JAC)(c,t,y,yd,sw=<list>pData.sw,p=p)
+            else:
+                jac=(<object>pData.JAC)(c,t,y,yd,p=p)
+        else:
+            if pData.sw != NULL:
+                jac=(<object>pData.JAC)(c,t,y,yd,<list>pData.sw)
+            else:
+                jac=(<object>pData.JAC)(c,t,y,yd)
+        
+        band2cols(jac, cols, s_mu, n, mu, ml)
+        
+        return IDADLS_SUCCESS
+    except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+        return IDADLS_JACFUNC_RECVR #Recoverable Error
+    except:
+        traceback.print_exc()
+        return IDADLS_JACFUNC_UNRECVR
+
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef int ida_jac_band(realtype t, realtype c, N_Vector yv, N_Vector yvdot, N_Vector residual, SUNMatrix Jac,
+                 void *problem_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3):
+        """
+        This method is used to connect the Assimulo.Problem.jac to the Sundials
+        Band Jacobian function.
+        """
+        cdef SUNMatrixContent_Band Jacobian = <SUNMatrixContent_Band>Jac.content
+        
+        return ida_jac_band_common(t, c, yv, yvdot, Jacobian.cols, Jacobian.s_mu, Jacobian.N, Jacobian.mu, Jacobian.ml, <ProblemData>problem_data)
+ELSE:
+    cdef int ida_jac_band(long int Neq, long int mupper, long int mlower, realtype t, realtype c, N_Vector yv, N_Vector yvdot, 
+                 N_Vector residual, DlsMat Jacobian, void* problem_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3):
+        """
+        This method is used to connect the Assimulo.Problem.jac to the Sundials
+        Band Jacobian function.
+        """
+        return ida_jac_band_common(t, c, yv, yvdot, Jacobian.cols, Jacobian.s_mu, Neq, mupper, mlower, <ProblemData>problem_data)
+
 cdef int ida_root(realtype t, N_Vector yv, N_Vector yvdot, realtype *gout,  void* problem_data):
     """
     This method is used to connect the Assimulo.Problem.state_events to the Sundials
@@ -698,10 +968,10 @@ cdef int ida_jacv(realtype t, N_Vector yy, N_Vector yp, N_Vector rr, N_Vector vv
     Jacobian times vector function.
     """
     cdef ProblemData pData = <ProblemData>problem_data
-    cdef N.ndarray y  = nv2arr(yy)
-    cdef N.ndarray yd = nv2arr(yp)
-    cdef N.ndarray v  = nv2arr(vv)
-    cdef N.ndarray res = nv2arr(rr)
+    cdef N.ndarray y  = nv2arr_arg(yy, pData.work_y, pData.rhs_inplace)
+    cdef N.ndarray yd = nv2arr_arg(yp, pData.work_yd, pData.rhs_inplace)
+    cdef N.ndarray v  = nv2arr_arg(vv, pData.work_v, pData.rhs_inplace)
+    cdef N.ndarray res = nv2arr_arg(rr, pData.work_r, pData.rhs_inplace)
     cdef int i
     
     cdef realtype* jacvptr=(<N_VectorContent_Serial>Jv.content).data
@@ -740,6 +1010,169 @@ cdef int ida_jacv(realtype t, N_Vector yy, N_Vector yp, N_Vector rr, N_Vector vv
             traceback.print_exc()
             return SPGMR_PSOLVE_FAIL_UNREC
 
+# Quadrature callback functions
+# =============================
+
+cdef int cv_rhsQ(realtype t, N_Vector yv, N_Vector yQdot, void* problem_data):
+    """
+    This method is used to connect the right-hand-side of the quadratures,
+    problem.rhsQ, to Sundials.
+    """
+    cdef ProblemData pData = <ProblemData>problem_data
+    cdef N.ndarray y = nv2arr_arg(yv, pData.work_y, pData.rhs_inplace)
+    cdef realtype* resptr=(<N_VectorContent_Serial>yQdot.content).data
+    
+    try:
+        if pData.dimSens>0: #Sensitivity activated
+            p = realtype2arr(pData.p,pData.dimSens)
+            if pData.sw != NULL:
+                rhs = (<object>pData.QUAD)(t,y,sw=<list>pData.sw,p=p)
+            else:
+                rhs = (<object>pData.QUAD)(t,y,p)
+        else:
+            if pData.sw != NULL:
+                rhs = (<object>pData.QUAD)(t,y,<list>pData.sw)
+            else:
+                rhs = (<object>pData.QUAD)(t,y)
+    except:
+        return CV_REC_ERR #Recoverable Error (See Sundials description)
+    
+    try:
+        arr2realtype_inplace(rhs, resptr, pData.dimQ)
+    except:
+        traceback.print_exc()
+        return CV_QRHSFUNC_FAIL
+    
+    return CV_SUCCESS
+
+cdef int ida_rhsQ(realtype t, N_Vector yv, N_Vector yvdot, N_Vector rhsvalQ, void* problem_data):
+    """
+    This method is used to connect the right-hand-side of the quadratures,
+    problem.resQ, to Sundials.
+    """
+    cdef ProblemData pData = <ProblemData>problem_data
+    cdef N.ndarray y = nv2arr_arg(yv, pData.work_y, pData.rhs_inplace)
+    cdef N.ndarray yd = nv2arr_arg(yvdot, pData.work_yd, pData.rhs_inplace)
+    cdef realtype* resptr=(<N_VectorContent_Serial>rhsvalQ.content).data
+    
+    try:
+        if pData.dimSens!=0: #SENSITIVITY
+            p = realtype2arr(pData.p,pData.dimSens)
+            if pData.sw != NULL:
+                rhs = (<object>pData.QUAD)(t,y,yd,sw=<list>pData.sw,p=p)
+            else:
+                rhs = (<object>pData.QUAD)(t,y,yd,p)
+        else:
+            if pData.sw != NULL:
+                rhs = (<object>pData.QUAD)(t,y,yd,<list>pData.sw)
+            else:
+                rhs = (<object>pData.QUAD)(t,y,yd)
+        
+        arr2realtype_inplace(rhs, resptr, pData.dimQ)
+        
+        return IDA_SUCCESS
+    except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+        return IDA_REC_ERR # recoverable error (see Sundials description)
+    except:
+        traceback.print_exc()
+        return IDA_QRHS_FAIL
+
+# Adjoint sensitivity callback functions
+# ======================================
+
+cdef int cv_rhsB(realtype t, N_Vector yv, N_Vector yBv, N_Vector yBdot, void* problem_data):
+    """
+    This method is used to connect the right-hand-side of the adjoint
+    (backward) problem, see CVode.solve_adjoint, to Sundials.
+    """
+    cdef ProblemData pData = <ProblemData>problem_data
+    cdef N.ndarray y = nv2arr_arg(yv, pData.work_y, pData.rhs_inplace)
+    cdef N.ndarray yB = nv2arr_arg(yBv, pData.work_yB, pData.rhs_inplace)
+    cdef realtype* resptr=(<N_VectorContent_Serial>yBdot.content).data
+    
+    p = realtype2arr(pData.p,pData.dimSens)
+    try:
+        rhs = (<object>pData.RHS_B)(t,y,yB,p)
+    except:
+        return CV_REC_ERR #Recoverable Error (See Sundials description)
+    
+    try:
+        arr2realtype_inplace(rhs, resptr, pData.dim)
+    except:
+        traceback.print_exc()
+        return CV_UNREC_RHSFUNC_ERR
+    
+    return CV_SUCCESS
+
+cdef int cv_rhsQB(realtype t, N_Vector yv, N_Vector yBv, N_Vector qBdot, void* problem_data):
+    """
+    This method is used to connect the right-hand-side of the backward
+    quadrature (the gradient of the cost and the cost) to Sundials.
+    """
+    cdef ProblemData pData = <ProblemData>problem_data
+    cdef N.ndarray y = nv2arr_arg(yv, pData.work_y, pData.rhs_inplace)
+    cdef N.ndarray yB = nv2arr_arg(yBv, pData.work_yB, pData.rhs_inplace)
+    cdef realtype* resptr=(<N_VectorContent_Serial>qBdot.content).data
+    
+    p = realtype2arr(pData.p,pData.dimSens)
+    try:
+        rhs = (<object>pData.QUAD_B)(t,y,yB,p)
+    except:
+        return CV_REC_ERR #Recoverable Error (See Sundials description)
+    
+    try:
+        arr2realtype_inplace(rhs, resptr, pData.dimSens+1)
+    except:
+        traceback.print_exc()
+        return CV_UNREC_RHSFUNC_ERR
+    
+    return CV_SUCCESS
+
+cdef int ida_resB(realtype t, N_Vector yy, N_Vector yp, N_Vector yyB, N_Vector ypB, N_Vector rrB, void* problem_data):
+    """
+    This method is used to connect the residual of the adjoint (backward)
+    problem, see IDA.solve_adjoint, to Sundials.
+    """
+    cdef ProblemData pData = <ProblemData>problem_data
+    cdef N.ndarray y = nv2arr_arg(yy, pData.work_y, pData.rhs_inplace)
+    cdef N.ndarray yd = nv2arr_arg(yp, pData.work_yd, pData.rhs_inplace)
+    cdef N.ndarray yB = nv2arr_arg(yyB, pData.work_yB, pData.rhs_inplace)
+    cdef N.ndarray ydB = nv2arr_arg(ypB, pData.work_ydB, pData.rhs_inplace)
+    cdef realtype* resptr=(<N_VectorContent_Serial>rrB.content).data
+    
+    p = realtype2arr(pData.p,pData.dimSens)
+    try:
+        res = (<object>pData.RHS_B)(t,y,yd,yB,ydB,p)
+        arr2realtype_inplace(res, resptr, pData.dim)
+        return IDA_SUCCESS
+    except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+        return IDA_REC_ERR # recoverable error (see Sundials description)
+    except:
+        traceback.print_exc()
+        return IDA_RES_FAIL
+
+cdef int ida_rhsQB(realtype t, N_Vector yy, N_Vector yp, N_Vector yyB, N_Vector ypB, N_Vector rhsvalBQ, void* problem_data):
+    """
+    This method is used to connect the right-hand-side of the backward
+    quadrature (the gradient of the cost and the cost) to Sundials.
+    """
+    cdef ProblemData pData = <ProblemData>problem_data
+    cdef N.ndarray y = nv2arr_arg(yy, pData.work_y, pData.rhs_inplace)
+    cdef N.ndarray yd = nv2arr_arg(yp, pData.work_yd, pData.rhs_inplace)
+    cdef N.ndarray yB = nv2arr_arg(yyB, pData.work_yB, pData.rhs_inplace)
+    cdef realtype* resptr=(<N_VectorContent_Serial>rhsvalBQ.content).data
+    
+    p = realtype2arr(pData.p,pData.dimSens)
+    try:
+        rhs = (<object>pData.QUAD_B)(t,y,yd,yB,p)
+        arr2realtype_inplace(rhs, resptr, pData.dimSens+1)
+        return IDA_SUCCESS
+    except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+        return IDA_REC_ERR # recoverable error (see Sundials description)
+    except:
+        traceback.print_exc()
+        return IDA_QRHS_FAIL
+
 # Error handling callback functions
 # =================================
 
@@ -780,6 +1213,9 @@ cdef class ProblemData:
         void *SENS         #Should store the sensitivity function
         void *PREC_SOLVE   #Should store the preconditioner solve function
         void *PREC_SETUP   #Should store the preconditioner setup function
+        void *RHS_B        #Should store the right-hand-side (residual) of the adjoint problem
+        void *QUAD_B       #Should store the right-hand-side of the backward quadrature
+        void *QUAD         #Should store the right-hand-side of the quadratures
         void *y            #Temporary storage for the states
         void *yd           #Temporary storage for the derivatives
         void *sw           #Storage for the switches
@@ -788,6 +1224,7 @@ cdef class ProblemData:
         int dim            #Dimension of the problem
         int dimRoot        #Dimension of the roots
         int dimSens        #Dimension of the parameters (For sensitivity)
+        int dimQ           #Dimension of the quadratures
         int memSize        #dim*sizeof(realtype) used when copying memory
         int memSizeRoot    #dimRoot*sizeof(realtype) used when copying memory
         int memSizeJac     #dim*dim*sizeof(realtype) used when copying memory
@@ -796,9 +1233,20 @@ cdef class ProblemData:
         N.ndarray work_y
         N.ndarray work_yd
         N.ndarray work_ys
+        N.ndarray work_v   #Work arrays for the Jacobian times vector and preconditioner callbacks
+        N.ndarray work_fy
+        N.ndarray work_r
+        N.ndarray work_yB  #Work arrays for the backward (adjoint) callbacks
+        N.ndarray work_ydB
+        int rhs_inplace    #Is the right-hand-side (residual) evaluated in-place?
         
     cdef create_work_arrays(self):
         self.work_y = N.empty(self.dim)
         self.work_yd = N.empty(self.dim)
         self.work_ys = N.empty((self.dim, self.dimSens))
+        self.work_v = N.empty(self.dim)
+        self.work_fy = N.empty(self.dim)
+        self.work_r = N.empty(self.dim)
+        self.work_yB = N.empty(self.dim)
+        self.work_ydB = N.empty(self.dim)
         
@@ -89,7 +89,8 @@ cdef int kin_jacv(N_Vector vv, N_Vector Jv, N_Vector vx, int* new_u,
     
 cdef int kin_res(N_Vector xv, N_Vector fval, void *problem_data):
     """
-    Residual fct called by KINSOL
+    Residual fct called by KINSOL. For the fixed-point iteration the
+    function is G(x) = x - res(x), with the fixed point at res(x) = 0.
     """
     cdef ProblemDataEquationSolver pData = <ProblemDataEquationSolver>problem_data
     cdef N.ndarray x = nv2arr(xv)
@@ -99,8 +100,12 @@ cdef int kin_res(N_Vector xv, N_Vector fval, void *problem_data):
     try:
         res = (<object>pData.RES)(x)
 
-        for i in range(pData.dim):
-            resptr[i] = res[i]
+        if pData.fixed_point:
+            for i in range(pData.dim):
+                resptr[i] = x[i] - res[i]
+        else:
+            for i in range(pData.dim):
+                resptr[i] = res[i]
 
         return KIN_SUCCESS
     except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
@@ -279,6 +284,7 @@ cdef class ProblemDataEquationSolver:
         void *PREC_SOLVE
         void *PREC_SETUP
         int dim            # Dimension of the problem
+        bint fixed_point   # Is the fixed-point iteration used, see kin_res
         void *KIN_MEM      # Kinsol memory
         list nl_fnorm      # The norm of the residual at each nonlinear iteration (if the verbosity is set high enough)
         list l_fnorm
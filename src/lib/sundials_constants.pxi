@@ -95,6 +95,23 @@ DEF CV_REPTD_SRHSFUNC_ERR = -43   #Covergence tests occurred too many times.
 DEF CV_UNREC_SRHSFUNC_ERR = -44   #The sensitivity right-hand side function had a recoverable error but was unable to recover
 DEF CV_BAD_IS             = -45
 
+# Quadrature constants
+DEF CV_NO_QUAD            = -30   #Quadrature integration was not activated
+DEF CV_QRHSFUNC_FAIL      = -31   #The quadrature right-hand side function failed unrecoverable
+DEF CV_FIRST_QRHSFUNC_ERR = -32   #The quadrature right-hand side function failed at first call
+DEF CV_REPTD_QRHSFUNC_ERR = -33   #The quadrature right-hand side function had repeated recoverable errors
+
+# Adjoint sensitivity constants
+DEF CV_HERMITE            = 1     #Hermite interpolation between the checkpoints
+DEF CV_POLYNOMIAL         = 2     #Variable-degree polynomial interpolation between the checkpoints
+DEF CV_NO_ADJ             = -101  #The adjoint memory was not allocated
+DEF CV_NO_FWD             = -102  #The forward integration was not performed with CVodeF
+DEF CV_NO_BCK             = -103  #No backward problem was created
+DEF CV_BAD_TB0            = -104  #The final time of the backward problem is outside the forward interval
+DEF CV_REIFWD_FAIL        = -105
+DEF CV_FWD_FAIL           = -106
+DEF CV_GETY_BADT          = -107
+
 
 DEF CSC_MAT = 0
 DEF CSR_MAT = 1
@@ -114,6 +131,8 @@ DEF IDA_CENTERED          = 1   # Central difference quotient approximation (2nd
 DEF IDA_FORWARD           = 2   # Forward difference quotient approximation (1st order) of the sensitivity RHS.
 DEF IDA_YA_YDP_INIT       = 1   # See IDA Documentation 4.5.4
 DEF IDA_Y_INIT            = 2   # See IDA Documentation 4.5.4
+DEF IDA_HERMITE           = 1   # Hermite interpolation between the checkpoints (adjoint sensitivities).
+DEF IDA_POLYNOMIAL        = 2   # Variable-degree polynomial interpolation between the checkpoints.
 # Iterative solver module
 DEF PREC_NONE             = 0
 DEF PREC_LEFT             = 1
@@ -162,6 +181,13 @@ DEF IDA_NO_QUADSENS       = -50
 DEF IDA_QSRHS_FAIL        = -51
 DEF IDA_FIRST_QSRHS_ERR   = -52
 DEF IDA_REP_QSRHS_ERR     = -53
+DEF IDA_NO_ADJ            = -101
+DEF IDA_NO_FWD            = -102
+DEF IDA_NO_BCK            = -103
+DEF IDA_BAD_TB0           = -104
+DEF IDA_REIFWD_FAIL       = -105
+DEF IDA_FWD_FAIL          = -106
+DEF IDA_GETY_BADT         = -107
 # Linear solver module
 DEF IDADLS_SUCCESS         = 0
 DEF IDADLS_MEM_NULL        = -1
@@ -207,6 +233,8 @@ DEF KIN_REPTD_SYSFUNC_ERR   =-15
 
 DEF KIN_NONE       =0
 DEF KIN_LINESEARCH =1
+DEF KIN_PICARD     =2
+DEF KIN_FP         =3
 
 # -----------------------------------------------------------------
 # KINDirect constants
@@ -48,6 +48,15 @@ cdef extern from "sundials/sundials_nvector.h":
     cdef struct _generic_N_Vector:
         void* content
         N_Vector_Ops ops
+    
+    #Generic operations, dispatched to the implementation of the vector
+    N_Vector N_VClone(N_Vector w)
+    N_Vector N_VCloneEmpty(N_Vector w)
+    void N_VDestroy(N_Vector v)
+    void N_VSetArrayPointer(realtype *v_data, N_Vector v)
+    void N_VConst(realtype c, N_Vector z)
+    N_Vector *N_VCloneVectorArray(int count, N_Vector w)
+    void N_VDestroyVectorArray(N_Vector *vs, int count)
 
 cdef extern from "nvector/nvector_serial.h":
     cdef struct _N_VectorContent_Serial:
@@ -61,9 +70,26 @@ cdef extern from "nvector/nvector_serial.h":
     void N_VSetArrayPointer_Serial(realtype *v_data, N_Vector v)
     void N_VConst_Serial(realtype c, N_Vector z)
     N_Vector N_VNew_Serial(long int vec_length)
+    N_Vector N_VNewEmpty_Serial(long int vec_length)
     void N_VDestroy_Serial(N_Vector v)
+    void N_VDestroyVectorArray_Serial(N_Vector *vs, int count)
+    realtype N_VWrmsNorm_Serial(N_Vector x, N_Vector w)
     void N_VPrint_Serial(N_Vector v)
 
+#The multithreaded vectors. Their content starts with the same fields
+#(length, own_data, data) as N_VectorContent_Serial.
+IF SUNDIALS_WITH_OPENMP:
+    cdef extern from "nvector/nvector_openmp.h":
+        N_Vector N_VNew_OpenMP(long int vec_length, int num_threads)
+ELSE:
+    cdef inline N_Vector N_VNew_OpenMP(long int vec_length, int num_threads): return NULL
+
+IF SUNDIALS_WITH_PTHREADS:
+    cdef extern from "nvector/nvector_pthreads.h":
+        N_Vector N_VNew_Pthreads(long int vec_length, int num_threads)
+ELSE:
+    cdef inline N_Vector N_VNew_Pthreads(long int vec_length, int num_threads): return NULL
+
 IF SUNDIALS_VERSION >= (4,0,0):
     cdef extern from "sundials/sundials_nonlinearsolver.h":
         ctypedef _generic_SUNNonlinearSolver *SUNNonlinearSolver
@@ -161,10 +187,40 @@ IF SUNDIALS_VERSION >= (3,0,0):
             sunindextype **colvals
             sunindextype **rowptrs
         SUNMatrix SUNSparseMatrix(sunindextype M, sunindextype N, sunindextype NNZ, int sparsetype)
+    cdef extern from "sunmatrix/sunmatrix_band.h":
+        ctypedef _SUNMatrixContent_Band *SUNMatrixContent_Band
+        cdef struct _SUNMatrixContent_Band:
+            sunindextype M
+            sunindextype N
+            sunindextype ldim
+            sunindextype mu
+            sunindextype ml
+            sunindextype s_mu
+            realtype *data
+            sunindextype ldata
+            realtype **cols
+    IF SUNDIALS_VERSION >= (4,0,0):
+        cdef extern from "sunmatrix/sunmatrix_band.h":
+            SUNMatrix SUNBandMatrixStorage(sunindextype N, sunindextype mu, sunindextype ml, sunindextype smu)
+    ELSE:
+        cdef extern from "sunmatrix/sunmatrix_band.h":
+            SUNMatrix SUNBandMatrixStorage "SUNBandMatrix"(sunindextype N, sunindextype mu, sunindextype ml, sunindextype smu)
+    cdef extern from "sunlinsol/sunlinsol_band.h":
+        SUNLinearSolver SUNBandLinearSolver(N_Vector y, SUNMatrix A)
     cdef extern from "sunlinsol/sunlinsol_dense.h":
         SUNLinearSolver SUNDenseLinearSolver(N_Vector y, SUNMatrix A)
     cdef extern from "sunlinsol/sunlinsol_spgmr.h":
         SUNLinearSolver SUNSPGMR(N_Vector y, int pretype, int maxl)
+        int SUNSPGMRSetGSType(SUNLinearSolver S, int gstype)
+        int SUNSPGMRSetMaxRestarts(SUNLinearSolver S, int maxrs)
+    cdef extern from "sunlinsol/sunlinsol_spfgmr.h":
+        SUNLinearSolver SUNSPFGMR(N_Vector y, int pretype, int maxl)
+        int SUNSPFGMRSetGSType(SUNLinearSolver S, int gstype)
+        int SUNSPFGMRSetMaxRestarts(SUNLinearSolver S, int maxrs)
+    cdef extern from "sunlinsol/sunlinsol_spbcgs.h":
+        SUNLinearSolver SUNSPBCGS(N_Vector y, int pretype, int maxl)
+    cdef extern from "sunlinsol/sunlinsol_sptfqmr.h":
+        SUNLinearSolver SUNSPTFQMR(N_Vector y, int pretype, int maxl)
         
 ELSE: 
     #Dummy defines
@@ -172,6 +228,7 @@ ELSE:
     ctypedef void *SUNMatrix
     ctypedef void *SUNMatrixContent_Dense
     ctypedef void *SUNMatrixContent_Sparse
+    ctypedef void *SUNMatrixContent_Band
     ctypedef int sunindextype
 
 
@@ -252,6 +309,7 @@ IF SUNDIALS_VERSION >= (4,0,0):
         int CVodeSetNonlinearSolver(void *cvode_mem, SUNNonlinearSolver NLS)
         int CVodeSetNonlinearSolverSensSim(void *cvode_mem, SUNNonlinearSolver NLS)
         int CVodeSetNonlinearSolverSensStg(void *cvode_mem, SUNNonlinearSolver NLS)
+        int CVodeCreateB(void *cvode_mem, int lmmB, int *which)
     
     cdef extern from "sunnonlinsol/sunnonlinsol_newton.h":
         SUNNonlinearSolver SUNNonlinSol_Newton(N_Vector y)
@@ -262,6 +320,7 @@ IF SUNDIALS_VERSION >= (4,0,0):
 ELSE:
     cdef extern from "cvodes/cvodes.h":
         void* CVodeCreate(int lmm, int iter)
+        int CVodeCreateB(void *cvode_mem, int lmmB, int iterB, int *which)
         
 cdef extern from "cvodes/cvodes.h":
     ctypedef int (*CVRhsFn)(realtype t, N_Vector y, N_Vector ydot, void *f_data)
@@ -341,6 +400,15 @@ cdef extern from "cvodes/cvodes.h":
     int CVodeSetSensMaxNonlinIters(void *cvode_mem, int maxcorS)
     int CVodeSetStabLimDet(void *cvode_mem, booleantype stldet)
     
+    #Quadrature methods
+    ctypedef int (*CVQuadRhsFn)(realtype t, N_Vector y, N_Vector yQdot, void *user_data)
+    int CVodeQuadInit(void *cvode_mem, CVQuadRhsFn fQ, N_Vector yQ0)
+    int CVodeQuadReInit(void *cvode_mem, N_Vector yQ0)
+    int CVodeQuadSStolerances(void *cvode_mem, realtype reltolQ, realtype abstolQ)
+    int CVodeSetQuadErrCon(void *cvode_mem, booleantype errconQ)
+    int CVodeGetQuadDky(void *cvode_mem, realtype t, int k, N_Vector dky)
+    int CVodeGetQuadNumRhsEvals(void *cvode_mem, long int *nfQevals)
+    
     
     
     #Statistics
@@ -358,6 +426,25 @@ cdef extern from "cvodes/cvodes.h":
     int CVodeGetSensNonlinSolvStats(void *cvode_mem, long int *nSniters, long int *nSncfails)
     int CVodeGetStgrSensNumNonlinSolvIters(void *cvode_mem, long int *nSTGR1niters)
     int CVodeGetStgrSensNumNonlinSolvConvFails(void *cvode_mem, long int *nSTGR1ncfails)
+    
+    #Adjoint sensitivity methods
+    ctypedef int (*CVRhsFnB)(realtype t, N_Vector y, N_Vector yB, N_Vector yBdot, void *user_dataB)
+    ctypedef int (*CVQuadRhsFnB)(realtype t, N_Vector y, N_Vector yB, N_Vector qBdot, void *user_dataB)
+    int CVodeAdjInit(void *cvode_mem, long int steps, int interp)
+    void CVodeAdjFree(void *cvode_mem)
+    int CVodeF(void *cvode_mem, realtype tout, N_Vector yout, realtype *tret, int itask, int *ncheckPtr)
+    int CVodeInitB(void *cvode_mem, int which, CVRhsFnB fB, realtype tB0, N_Vector yB0)
+    int CVodeReInitB(void *cvode_mem, int which, realtype tB0, N_Vector yB0)
+    int CVodeSVtolerancesB(void *cvode_mem, int which, realtype reltolB, N_Vector abstolB)
+    int CVodeSetUserDataB(void *cvode_mem, int which, void *user_dataB)
+    int CVodeSetMaxNumStepsB(void *cvode_mem, int which, long int mxstepsB)
+    int CVodeQuadInitB(void *cvode_mem, int which, CVQuadRhsFnB fQB, N_Vector yQB0)
+    int CVodeQuadReInitB(void *cvode_mem, int which, N_Vector yQB0)
+    int CVodeQuadSStolerancesB(void *cvode_mem, int which, realtype reltolQB, realtype abstolQB)
+    int CVodeSetQuadErrConB(void *cvode_mem, int which, booleantype errconQB)
+    int CVodeB(void *cvode_mem, realtype tBout, int itaskB)
+    int CVodeGetB(void *cvode_mem, int which, realtype *tBret, N_Vector yB)
+    int CVodeGetQuadB(void *cvode_mem, int which, realtype *tBret, N_Vector qB)
 
 cdef extern from "cvodes/cvodes_spils.h":
     ctypedef int (*CVSpilsJacTimesVecFn)(N_Vector v, N_Vector Jv, realtype t,
@@ -368,6 +455,7 @@ IF SUNDIALS_VERSION >= (3,0,0):
         ctypedef int (*CVDlsDenseJacFn)(realtype t, N_Vector y, N_Vector fy, 
                        SUNMatrix Jac, void *user_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3)
         int CVDlsSetLinearSolver(void *cvode_mem, SUNLinearSolver LS, SUNMatrix A)
+        int CVDlsSetLinearSolverB(void *cvode_mem, int which, SUNLinearSolver LS, SUNMatrix A)
         int CVDlsSetJacFn(void *cvode_mem, CVDlsDenseJacFn djac)
     cdef extern from "cvodes/cvodes_spils.h":
         int CVSpilsSetLinearSolver(void *cvode_mem, SUNLinearSolver LS)
@@ -392,15 +480,29 @@ IF SUNDIALS_VERSION >= (3,0,0):
 ELSE:
     cdef extern from "cvodes/cvodes_dense.h":
         int CVDense(void *cvode_mem, long int n)
+        int CVDenseB(void *cvode_mem, int which, long int nB)
         ctypedef int (*CVDlsDenseJacFn)(long int n, realtype t, N_Vector y, N_Vector fy, 
                        DlsMat Jac, void *user_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3)
         int CVDlsSetDenseJacFn(void *cvode_mem, CVDlsDenseJacFn djac)
 
+    cdef extern from "cvodes/cvodes_band.h":
+        int CVBand(void *cvode_mem, long int n, long int mupper, long int mlower)
+        ctypedef int (*CVDlsBandJacFn)(long int n, long int mupper, long int mlower, realtype t, N_Vector y, 
+                       N_Vector fy, DlsMat Jac, void *user_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3)
+        int CVDlsSetBandJacFn(void *cvode_mem, CVDlsBandJacFn bjac)
+
     cdef extern from "cvodes/cvodes_spgmr.h":
         int CVSpgmr(void *cvode_mem, int pretype, int max1)
     
+    cdef extern from "cvodes/cvodes_spbcgs.h":
+        int CVSpbcg(void *cvode_mem, int pretype, int maxl)
+    
+    cdef extern from "cvodes/cvodes_sptfqmr.h":
+        int CVSptfqmr(void *cvode_mem, int pretype, int maxl)
+    
     cdef extern from "cvodes/cvodes_spils.h":
         int CVSpilsSetJacTimesVecFn(void *cvode_mem,  CVSpilsJacTimesVecFn jtv)
+        int CVSpilsSetGSType(void *cvode_mem, int gstype)
         ctypedef int (*CVSpilsPrecSetupFn)(realtype t, N_Vector y, N_Vector fy,
 				  booleantype jok, booleantype *jcurPtr,
 				  realtype gamma, void *user_data,
@@ -439,6 +541,9 @@ cdef extern from "cvodes/cvodes_spils.h":
     int CVSpilsGetNumRhsEvals(void *cvode_mem, long int *nfevalsLS) #Number of res evals due to jacÄvector evals
     int CVSpilsGetNumPrecEvals(void *cvode_mem, long int *npevals)
     int CVSpilsGetNumPrecSolves(void *cvode_mem, long int *npsolves)
+    int CVSpilsGetNumLinIters(void *cvode_mem, long int *nliters)
+    int CVSpilsGetNumConvFails(void *cvode_mem, long int *nlcfails)
+    int CVSpilsSetEpsLin(void *cvode_mem, realtype eplifac)
 
 cdef extern from "idas/idas.h":
     ctypedef int (*IDAResFn)(realtype tt, N_Vector yy, N_Vector yp, N_Vector rr, void *user_data)
@@ -540,6 +645,40 @@ cdef extern from "idas/idas.h":
     #End Sensitivities
     #=================
     
+    #Quadratures
+    ctypedef int (*IDAQuadRhsFn)(realtype tres, N_Vector yy, N_Vector yp, N_Vector rrQ, void *user_data)
+    int IDAQuadInit(void *ida_mem, IDAQuadRhsFn rhsQ, N_Vector yQ0)
+    int IDAQuadReInit(void *ida_mem, N_Vector yQ0)
+    int IDAQuadSStolerances(void *ida_mem, realtype reltolQ, realtype abstolQ)
+    int IDASetQuadErrCon(void *ida_mem, booleantype errconQ)
+    int IDAGetQuadDky(void *ida_mem, realtype t, int k, N_Vector dky)
+    int IDAGetQuadNumRhsEvals(void *ida_mem, long int *nrhsQevals)
+    
+    #Adjoint sensitivities
+    ctypedef int (*IDAResFnB)(realtype tt, N_Vector yy, N_Vector yp, N_Vector yyB, N_Vector ypB,
+                              N_Vector rrB, void *user_dataB)
+    ctypedef int (*IDAQuadRhsFnB)(realtype tt, N_Vector yy, N_Vector yp, N_Vector yyB, N_Vector ypB,
+                                  N_Vector rhsvalBQ, void *user_dataB)
+    int IDAAdjInit(void *ida_mem, long int steps, int interp)
+    void IDAAdjFree(void *ida_mem)
+    int IDASolveF(void *ida_mem, realtype tout, realtype *tret, N_Vector yret, N_Vector ypret, 
+                  int itask, int *ncheckPtr)
+    int IDACreateB(void *ida_mem, int *which)
+    int IDAInitB(void *ida_mem, int which, IDAResFnB resB, realtype tB0, N_Vector yyB0, N_Vector ypB0)
+    int IDAReInitB(void *ida_mem, int which, realtype tB0, N_Vector yyB0, N_Vector ypB0)
+    int IDASVtolerancesB(void *ida_mem, int which, realtype relTolB, N_Vector absTolB)
+    int IDASetUserDataB(void *ida_mem, int which, void *user_dataB)
+    int IDASetMaxNumStepsB(void *ida_mem, int which, long int mxstepsB)
+    int IDASetIdB(void *ida_mem, int which, N_Vector idB)
+    int IDACalcICB(void *ida_mem, int which, realtype tout1, N_Vector yy0, N_Vector yp0)
+    int IDAQuadInitB(void *ida_mem, int which, IDAQuadRhsFnB rhsQB, N_Vector yQB0)
+    int IDAQuadReInitB(void *ida_mem, int which, N_Vector yQB0)
+    int IDAQuadSStolerancesB(void *ida_mem, int which, realtype reltolQB, realtype abstolQB)
+    int IDASetQuadErrConB(void *ida_mem, int which, booleantype errconQB)
+    int IDASolveB(void *ida_mem, realtype tBout, int itaskB)
+    int IDAGetB(void *ida_mem, int which, realtype *tret, N_Vector yy, N_Vector yp)
+    int IDAGetQuadB(void *ida_mem, int which, realtype *tret, N_Vector qB)
+    
 cdef extern from "idas/idas_spils.h":
     ctypedef int (*IDASpilsJacTimesVecFn)(realtype tt, N_Vector yy, N_Vector yp, N_Vector rr, 
             N_Vector v, N_Vector Jv, realtype cj, void *user_data,N_Vector tmp1, N_Vector tmp2)
@@ -551,6 +690,7 @@ IF SUNDIALS_VERSION >= (3,0,0):
                        N_Vector tmp1, N_Vector tmp2, N_Vector tmp3)
         int IDADlsSetJacFn(void *ida_mem, IDADlsDenseJacFn djac)
         int IDADlsSetLinearSolver(void *ida_mem, SUNLinearSolver LS, SUNMatrix A)
+        int IDADlsSetLinearSolverB(void *ida_mem, int which, SUNLinearSolver LS, SUNMatrix A)
     
     cdef extern from "idas/idas_spils.h":
         int IDASpilsSetLinearSolver(void *ida_mem, SUNLinearSolver LS)
@@ -563,20 +703,59 @@ IF SUNDIALS_VERSION >= (3,0,0):
 ELSE:
     cdef extern from "idas/idas_dense.h":
         int IDADense(void *ida_mem, long int n)
+        int IDADenseB(void *ida_mem, int which, long int NeqB)
         ctypedef int (*IDADlsDenseJacFn)(long int Neq, realtype tt, realtype cj, N_Vector yy, 
                        N_Vector yp, N_Vector rr, DlsMat Jac, void *user_data, 
                        N_Vector tmp1, N_Vector tmp2, N_Vector tmp3)
         int IDADlsSetDenseJacFn(void *ida_mem, IDADlsDenseJacFn djac)
     
+    cdef extern from "idas/idas_band.h":
+        int IDABand(void *ida_mem, long int n, long int mupper, long int mlower)
+        ctypedef int (*IDADlsBandJacFn)(long int Neq, long int mupper, long int mlower, realtype tt, realtype cj, 
+                       N_Vector yy, N_Vector yp, N_Vector rr, DlsMat Jac, void *user_data, 
+                       N_Vector tmp1, N_Vector tmp2, N_Vector tmp3)
+        int IDADlsSetBandJacFn(void *ida_mem, IDADlsBandJacFn bjac)
+    
     cdef extern from "idas/idas_spgmr.h":
         int IDASpgmr(void *ida_mem, int max1)
+    
+    cdef extern from "idas/idas_spbcgs.h":
+        int IDASpbcg(void *ida_mem, int maxl)
+    
+    cdef extern from "idas/idas_sptfqmr.h":
+        int IDASptfqmr(void *ida_mem, int maxl)
         
     cdef extern from "idas/idas_spils.h":
         int IDASpilsSetJacTimesVecFn(void *ida_mem, IDASpilsJacTimesVecFn ida_jacv)
+        int IDASpilsSetGSType(void *ida_mem, int gstype)
+        int IDASpilsSetMaxRestarts(void *ida_mem, int maxrs)
+    
+    IF SUNDIALS_VERSION >= (2,6,0):
+        cdef extern from "idas/idas_sparse.h":
+            ctypedef int (*IDASlsSparseJacFn)(realtype t, realtype c_j, N_Vector y, N_Vector yp,
+                                      N_Vector r, SlsMat Jac, void *user_data, N_Vector tmp1,
+                                        N_Vector tmp2, N_Vector tmp3)
+            int IDASlsSetSparseJacFn(void *ida_mem, IDASlsSparseJacFn jac)
+            int IDASlsGetNumJacEvals(void *ida_mem, long int *njevals)
+        IF SUNDIALS_WITH_SUPERLU:
+            cdef extern from "idas/idas_superlumt.h":
+                int IDASuperLUMT(void *ida_mem, int numthreads, int n, int nnz)
+        ELSE:
+            cdef inline int IDASuperLUMT(void *ida_mem, int numthreads, int n, int nnz): return -1
+    ELSE:
+        cdef inline int IDASuperLUMT(void *ida_mem, int numthreads, int n, int nnz): return -1
+        ctypedef int (*IDASlsSparseJacFn)(realtype t, realtype c_j, N_Vector y, N_Vector yp,
+                                  N_Vector r, SlsMat Jac, void *user_data, N_Vector tmp1,
+                                    N_Vector tmp2, N_Vector tmp3)
+        cdef inline int IDASlsSetSparseJacFn(void *ida_mem, IDASlsSparseJacFn jac): return -1
+        cdef inline int IDASlsGetNumJacEvals(void *ida_mem, long int *njevals): return -1
 
 cdef extern from "idas/idas_spils.h":
     int IDASpilsGetNumJtimesEvals(void *ida_mem, long int *njvevals) #Number of jac*vector
     int IDASpilsGetNumResEvals(void *ida_mem, long int *nfevalsLS) #Number of rhs due to jac*vector
+    int IDASpilsGetNumLinIters(void *ida_mem, long int *nliters)
+    int IDASpilsGetNumConvFails(void *ida_mem, long int *nlcfails)
+    int IDASpilsSetEpsLin(void *ida_mem, realtype eplifac)
 
 
 ####################
@@ -618,6 +797,7 @@ cdef extern from "kinsol/kinsol.h":
     int KINSetScaledStepTol(void *kinmem, realtype scsteptol)
     int KINSetConstraints(void *kinmem, N_Vector constraints)
     int KINSetSysFunc(void *kinmem, KINSysFn func)
+    int KINSetMAA(void *kinmem, long int maa)
 
     # solver routine
     int KINSol(void *kinmem, N_Vector uu, int strategy, N_Vector u_scale, N_Vector f_scale)
@@ -636,6 +816,9 @@ cdef extern from "kinsol/kinsol.h":
     # fuction used to deallocate memory used by KINSOL
     void KINFree(void **kinmem)
 
+IF SUNDIALS_VERSION >= (5,0,0):
+    cdef extern from "kinsol/kinsol.h":
+        int KINSetDampingAA(void *kinmem, realtype beta)
 
 IF SUNDIALS_VERSION >= (3,0,0):
     cdef extern from "kinsol/kinsol_direct.h":
@@ -664,8 +847,18 @@ ELSE:
     
     cdef extern from "kinsol/kinsol_spgmr.h":
         int KINSpgmr(void *kinmem, int maxl)
+    
+    cdef extern from "kinsol/kinsol_spfgmr.h":
+        int KINSpfgmr(void *kinmem, int maxl)
+    
+    cdef extern from "kinsol/kinsol_spbcgs.h":
+        int KINSpbcg(void *kinmem, int maxl)
+    
+    cdef extern from "kinsol/kinsol_sptfqmr.h":
+        int KINSptfqmr(void *kinmem, int maxl)
         
     cdef extern from "kinsol/kinsol_spils.h":
+        int KINSpilsSetMaxRestarts(void *kinmem, int maxrs)
         ctypedef int (*KINSpilsPrecSolveFn)(N_Vector u, N_Vector uscale,
                     N_Vector fval, N_Vector fscale, N_Vector v, void *problem_data, N_Vector tmp)
         ctypedef int (*KINSpilsPrecSetupFn)(N_Vector u, N_Vector uscale,
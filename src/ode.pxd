@@ -17,7 +17,7 @@
 
 import numpy as N
 cimport numpy as N
-from support cimport Statistics
+from support cimport Statistics, ResultBuffer, ResultFile, EventLocator
 
 cdef class ODE:
     cdef public dict options, solver_options, problem_info
@@ -39,9 +39,11 @@ cdef class ODE:
     cdef int time_limit_activated, display_progress_activated
     cdef double clock_start
     cdef public object _event_info
+    cdef EventLocator _locator
     
     #cdef public list t,y,yd,p,sw_cur
-    cdef public list t_sol, y_sol, yd_sol, p_sol, sw
+    cdef public object t_sol, y_sol, yd_sol, q_sol
+    cdef public list p_sol, sw
         
     cpdef log_message(self, message, int level)
     cpdef log_event(self, double time, object event_info, int level)
@@ -55,5 +57,8 @@ cdef class ODE:
     cpdef finalize(self)
     cpdef initialize(self)
     cdef _reset_solution_variables(self)
+    cdef _new_result_buffer(self, int width)
+    cdef _finalize_solution_variables(self)
+    cdef int _default_result_handling(self)
     cpdef get_elapsed_step_time(self)
     cpdef _chattering_check(self, object event_info)
@@ -24,12 +24,17 @@ import multiprocessing
 
 from exception import *
 from problem import Explicit_Problem, Delay_Explicit_Problem, Implicit_Problem, SingPerturbed_Problem
-from support import Statistics
+from problem import cExplicit_Problem, cImplicit_Problem, cOverdetermined_Problem
+from support import Statistics, ResultBuffer, ResultFile
 
 include "constants.pxi" #Includes the constants (textual include)
 
 realtype = N.float 
 
+#The default methods for storing the result, see _default_result_handling
+DEFAULT_HANDLE_RESULT = (cExplicit_Problem.handle_result, cImplicit_Problem.handle_result, 
+                         cOverdetermined_Problem.handle_result)
+
 cdef class ODE:
     """
     Base class for all our integrators.
@@ -48,12 +53,15 @@ cdef class ODE:
                         "store_event_points":True, 
                         "time_limit":0, 
                         "clock_step":False, 
-                        "num_threads":1} #multiprocessing.cpu_count()
+                        "num_threads":1, #multiprocessing.cpu_count()
+                        "result_sink":"memory",
+                        "result_directory":None}
         #self.internal_flags = {"state_events":False,"step_events":False,"time_events":False} #Flags for checking the problem (Does the problem have state events?)
-        self.supports = {"state_events":False,"interpolated_output":False,"report_continuously":False,"sensitivity_calculations":False,"interpolated_sensitivity_output":False} #Flags for determining what the solver supports
+        self.supports = {"state_events":False,"interpolated_output":False,"report_continuously":False,"sensitivity_calculations":False,"interpolated_sensitivity_output":False,"batch_simulation":False} #Flags for determining what the solver supports
         self.problem_info = {"dim":0,"dimRoot":0,"dimSens":0,"state_events":False,"step_events":False,"time_events":False
                              ,"jac_fcn":False, "sens_fcn":False, "jacv_fcn":False,"switches":False,"type":0,"jaclag_fcn":False,'prec_solve':False,'prec_setup':False
-                             ,"jac_fcn_nnz": -1}
+                             ,"jac_fcn_nnz": -1,"jac_bandwidth":None,"jac_sparsity":None,"rhs_inplace":False,"res_inplace":False
+                             ,"quad_fcn":False,"dimQ":0,"mass_matrix":None,"mass_bandwidth":None}
         #Type of the problem
         #0 = Explicit
         #1 = Implicit
@@ -117,6 +125,18 @@ cdef class ODE:
                 self.problem_info["jac_fcn"] = True
         if hasattr(problem, "jac_nnz"):
             self.problem_info["jac_fcn_nnz"] = problem.jac_nnz
+        if hasattr(problem, "jac_bandwidth"):
+            self.problem_info["jac_bandwidth"] = tuple(int(b) for b in problem.jac_bandwidth)
+        if hasattr(problem, "jac_sparsity"):
+            self.problem_info["jac_sparsity"] = problem.jac_sparsity
+        if getattr(problem, "mass_matrix", None) is not None:
+            self.problem_info["mass_matrix"] = problem.mass_matrix
+        if hasattr(problem, "mass_bandwidth"):
+            self.problem_info["mass_bandwidth"] = tuple(int(b) for b in problem.mass_bandwidth)
+        if getattr(problem, "rhs_inplace", False):
+            self.problem_info["rhs_inplace"] = True
+        if getattr(problem, "res_inplace", False):
+            self.problem_info["res_inplace"] = True
         if hasattr(problem, "jacv"):
             self.problem_info["jacv_fcn"] = True
         if hasattr(problem, "jaclag"):
@@ -127,12 +147,15 @@ cdef class ODE:
             self.problem_info["prec_setup"] = True
         if hasattr(problem, "rhs_sens"):
             self.problem_info["sens_fcn"] = True
+        if hasattr(problem, "rhsQ") or hasattr(problem, "resQ"):
+            self.problem_info["quad_fcn"] = True
             
         #Reset solution variables
         self._reset_solution_variables()
         
-        #Specify storing of sensitivity to 0
+        #Specify storing of sensitivity and quadratures to 0
         problem._sensitivity_result = 0
+        problem._quadrature_result = 0
         
         #Initialize timer
         self.elapsed_step_time = -1.0
@@ -162,6 +185,7 @@ cdef class ODE:
         self.statistics.add_key("nsensniters", "Number of sensitivity nonlinear iterations")
         self.statistics.add_key("nsensnfails", "Number of sensitivity nonlinear convergence failures")
         self.statistics.add_key("nsenserrfails", "Number of sensitivity error test failures")
+        self.statistics.add_key("nquadfcns", "Number of quadrature function evaluations")
 
         
     def __call__(self, double tfinal, int ncp=0, list cpts=None):
@@ -169,12 +193,65 @@ cdef class ODE:
         
     cdef _reset_solution_variables(self):
         """
-        Resets solution variables.
+        Resets solution variables. If the result is stored by the default
+        handle_result, the solution variables are preallocated buffers, 
+        otherwise lists.
         """
-        self.t_sol = []
-        self.y_sol = []
-        self.yd_sol = []
-        self.p_sol = [[] for i in range(self.problem_info["dimSens"])]
+        cdef int dim = self.problem_info["dim"]
+        
+        if self._default_result_handling():
+            self.t_sol = self._new_result_buffer(0)
+            self.y_sol = self._new_result_buffer(dim)
+            self.yd_sol = self._new_result_buffer(dim) if self.problem_info["type"] == 1 else []
+            self.p_sol = [self._new_result_buffer(dim) for i in range(self.problem_info["dimSens"])]
+            self.q_sol = self._new_result_buffer(self.problem_info["dimQ"]) if self.problem_info["dimQ"] > 0 else []
+        else:
+            self.t_sol = []
+            self.y_sol = []
+            self.yd_sol = []
+            self.p_sol = [[] for i in range(self.problem_info["dimSens"])]
+            self.q_sol = []
+    
+    cdef _new_result_buffer(self, int width):
+        """
+        Creates a storage for the result according to the option result_sink.
+        """
+        if self.options["result_sink"] == "file":
+            #Files in the temporary directory are removed when the simulation is done
+            return ResultFile(width, directory=self.options["result_directory"], delete=self.options["result_directory"] is None)
+        return ResultBuffer(width)
+    
+    cdef _finalize_solution_variables(self):
+        """
+        Converts the solution buffers (if used) to arrays and closes the
+        result files.
+        """
+        files = [buf for buf in [self.t_sol, self.y_sol, self.yd_sol, self.q_sol] + list(self.p_sol) if isinstance(buf, ResultFile)]
+        try:
+            if isinstance(self.t_sol, ResultBuffer):
+                self.t_sol = self.t_sol.trim()
+            if isinstance(self.y_sol, ResultBuffer):
+                self.y_sol = self.y_sol.trim()
+            if isinstance(self.yd_sol, ResultBuffer):
+                self.yd_sol = self.yd_sol.trim()
+            self.p_sol = [p.trim() if isinstance(p, ResultBuffer) else p for p in self.p_sol]
+            if isinstance(self.q_sol, ResultBuffer):
+                self.q_sol = self.q_sol.trim()
+        finally:
+            for buf in files:
+                buf.close()
+    
+    cdef int _default_result_handling(self):
+        """
+        Checks if the result of the problem is handled by one of the 
+        default handle_result methods, i.e. it is not overridden by
+        the user.
+        """
+        if self.problem is None:
+            return 0
+        if "handle_result" in getattr(self.problem, "__dict__", {}):
+            return 0
+        return 1 if getattr(type(self.problem), "handle_result", None) in DEFAULT_HANDLE_RESULT else 0
         
         
     cpdef simulate(self, double tfinal, int ncp=0, object ncp_list=None):
@@ -296,15 +373,19 @@ cdef class ODE:
         #Start of simulation, start the clock
         time_start = timer()
         
-        #Start the simulation
-        self._simulate(t0, tfinal, output_list, REPORT_CONTINUOUSLY, INTERPOLATE_OUTPUT, TIME_EVENT)
-        
-        #End of simulation, stop the clock
-        time_stop = timer()
-        
-        #Simulation complete, call finalize
-        self.finalize()
-        self.problem.finalize(self)
+        try:
+            #Start the simulation
+            self._simulate(t0, tfinal, output_list, REPORT_CONTINUOUSLY, INTERPOLATE_OUTPUT, TIME_EVENT)
+            
+            #End of simulation, stop the clock
+            time_stop = timer()
+            
+            #Simulation complete, call finalize
+            self.finalize()
+            self.problem.finalize(self)
+        finally:
+            #Convert the solution buffers to arrays (also if the simulation failed)
+            self._finalize_solution_variables()
         
         #Print the simulation statistics
         self.print_statistics(NORMAL)
@@ -315,9 +396,9 @@ cdef class ODE:
         
         #Return the results
         if isinstance(self.problem, Explicit_Problem) or isinstance(self.problem, Delay_Explicit_Problem) or isinstance(self.problem, SingPerturbed_Problem):
-            return self.t_sol, N.array(self.y_sol)
+            return self.t_sol, N.asarray(self.y_sol)
         else:
-            return self.t_sol, N.array(self.y_sol), N.array(self.yd_sol)
+            return self.t_sol, N.asarray(self.y_sol), N.asarray(self.yd_sol)
         
     def _simulate(self,t0, tfinal, output_list, REPORT_CONTINUOUSLY, INTERPOLATE_OUTPUT, TIME_EVENT):
          pass
@@ -424,7 +505,8 @@ cdef class ODE:
     def _get_number_threads(self):
         """
         This options specifies the number of threads to be used for those
-        solvers that supports it.
+        solvers that supports it, for instance by the sparse linear solver
+        and the multithreaded N_Vectors (option nvector) of CVode and IDA.
         
             Parameters::
             
@@ -440,6 +522,58 @@ cdef class ODE:
     num_threads = property(_get_number_threads,_set_number_threads)
     
     
+    def _set_result_sink(self, result_sink):
+        if result_sink not in ("memory", "file"):
+            raise AssimuloException("The result sink must be either 'memory' or 'file'.")
+        self.options["result_sink"] = result_sink
+    
+    def _get_result_sink(self):
+        """
+        Specifies where the result is stored during the simulation when
+        the default handle_result is used. With 'memory', the result is
+        kept in growable arrays. With 'file', the result is streamed in 
+        chunks to .npy files (one per result variable) so that the 
+        memory usage stays constant during the simulation. The result 
+        (t_sol, y_sol, ...) is then returned as read-only memory-mapped
+        arrays. Files created in the temporary directory of the system
+        are removed when the simulation is done (the arrays stay valid),
+        see the option result_directory to keep them.
+        
+            Parameters::
+            
+                result_sink
+                
+                        - Default 'memory'
+                        
+                        - Should be one of 'memory' or 'file'.
+        """
+        return self.options["result_sink"]
+    
+    result_sink = property(_get_result_sink, _set_result_sink)
+    
+    def _set_result_directory(self, result_directory):
+        self.options["result_directory"] = result_directory
+    
+    def _get_result_directory(self):
+        """
+        Specifies the directory in which the result files are created
+        when the option result_sink is 'file'. Note that files created in
+        a given directory are not removed by Assimulo, their names are
+        available as solver.y_sol.filename etc.
+        
+            Parameters::
+            
+                result_directory
+                
+                        - Default None, i.e. the temporary directory of
+                          the system.
+                          
+                        - Should be a string (path to an existing directory).
+        """
+        return self.options["result_directory"]
+    
+    result_directory = property(_get_result_directory, _set_result_directory)
+    
     def _set_store_event_points(self, store_event_points):
         self.options["store_event_points"] = bool(store_event_points)
     
@@ -20,6 +20,7 @@ cimport numpy as N
 
 cdef class cProblem:
     cdef public int _sensitivity_result
+    cdef public int _quadrature_result
     
     cpdef initialize(self, solver)
     cpdef reset(self)
@@ -75,6 +75,8 @@ cdef class cProblem:
 
 cdef class cImplicit_Problem(cProblem):
     
+    res_inplace = False
+    
     def __init__(self, object res=None, y0=None, yd0=None,double t0=0.0, 
                                                           p0=None, sw0=None, name = None):
         cProblem.__init__(self, y0, t0, p0, sw0, name)
@@ -91,24 +93,33 @@ cdef class cImplicit_Problem(cProblem):
         """
         cdef int i = 0
         
-        solver.t_sol.extend([t])
-        solver.y_sol.extend([y])
-        solver.yd_sol.extend([yd])
+        solver.t_sol.append(t)
+        solver.y_sol.append(y)
+        solver.yd_sol.append(yd)
         
         #Store sensitivity result (variable _sensitivity_result are set from the solver by the solver)
         if self._sensitivity_result == 1:
             for i in range(solver.problem_info["dimSens"]):
-                solver.p_sol[i] += [solver.interpolate_sensitivity(t, i=i)] 
+                solver.p_sol[i].append(solver.interpolate_sensitivity(t, i=i))
+        
+        #Store quadrature result (variable _quadrature_result are set from the solver by the solver)
+        if self._quadrature_result == 1:
+            solver.q_sol.append(solver.get_quadrature(t))
         
     cpdef res_internal(self, N.ndarray[double, ndim=1] res, double t, N.ndarray[double, ndim=1] y, N.ndarray[double, ndim=1] yd):
         try:
-            res[:] = self.res(t,y,yd)
+            if self.res_inplace:
+                self.res(t,y,yd,res)
+            else:
+                res[:] = self.res(t,y,yd)
         except:
             return ID_FAIL
         return ID_OK
         
 cdef class cOverdetermined_Problem(cProblem):
     
+    res_inplace = False
+    
     def __init__(self, object res=None, y0=None, yd0=None,double t0=0.0, 
                                                           p0=None, sw0=None, name=None):
         cProblem.__init__(self, y0, t0, p0, sw0, name)
@@ -125,19 +136,24 @@ cdef class cOverdetermined_Problem(cProblem):
         """
         cdef int i = 0
         
-        solver.t_sol.extend([t])
-        solver.y_sol.extend([y])
-        solver.yd_sol.extend([yd])
+        solver.t_sol.append(t)
+        solver.y_sol.append(y)
+        solver.yd_sol.append(yd)
         
     cpdef res_internal(self, N.ndarray[double, ndim=1] res, double t, N.ndarray[double, ndim=1] y, N.ndarray[double, ndim=1] yd):
         try:
-            res[:] = self.res(t,y,yd)
+            if self.res_inplace:
+                self.res(t,y,yd,res)
+            else:
+                res[:] = self.res(t,y,yd)
         except:
             return ID_FAIL
         return ID_OK
     
 cdef class cExplicit_Problem(cProblem):
     
+    rhs_inplace = False
+    
     def __init__(self, object rhs=None, y0=None,double t0=0.0, p0=None, sw0=None, name = None):
         
         cProblem.__init__(self, y0, t0, p0, sw0, name)        
@@ -150,22 +166,37 @@ cdef class cExplicit_Problem(cProblem):
         """
         cdef int i = 0
         
-        solver.t_sol.extend([t])
-        solver.y_sol.extend([y])
+        solver.t_sol.append(t)
+        solver.y_sol.append(y)
         
         #Store sensitivity result (variable _sensitivity_result are set from the solver by the solver)
         if self._sensitivity_result == 1:
             for i in range(solver.problem_info["dimSens"]):
-                solver.p_sol[i] += [solver.interpolate_sensitivity(t, i=i)] 
+                solver.p_sol[i].append(solver.interpolate_sensitivity(t, i=i))
+        
+        #Store quadrature result (variable _quadrature_result are set from the solver by the solver)
+        if self._quadrature_result == 1:
+            solver.q_sol.append(solver.get_quadrature(t))
                 
     cpdef int rhs_internal(self, N.ndarray[double, ndim=1] yd, double t, N.ndarray[double, ndim=1] y):
         try:
-            yd[:] = self.rhs(t,y)
+            if self.rhs_inplace:
+                self.rhs(t,y,yd)
+            else:
+                yd[:] = self.rhs(t,y)
         except:
             return ID_FAIL
         return ID_OK
         
     cpdef N.ndarray res(self, t, y, yd, sw=None):
+        cdef N.ndarray rhs
+        if self.rhs_inplace:
+            rhs = N.empty(len(y))
+            if sw == None:
+                self.rhs(t,y,rhs)
+            else:
+                self.rhs(t,y,rhs,sw)
+            return yd-rhs
         if sw == None:
             return yd-self.rhs(t,y)
         else:
@@ -251,6 +282,12 @@ class Implicit_Problem(cImplicit_Problem):
                     
                     Returns:
                         A numpy array of size len(y).
+                
+                If the problem attribute res_inplace is set to True, the
+                residual is instead written into a preallocated array given
+                as the fourth argument, res(t,y,yd,r), res(t,y,yd,r,sw), ...
+                and the return value is ignored. The arrays given to the
+                function are only valid during the call.
             y0
                 Defines the starting values of y0.
             yd0
@@ -297,12 +334,24 @@ class Implicit_Problem(cImplicit_Problem):
                 
                 Returns:
                     A numpy array of size len(y)*len(y).
+            
+            def resQ(self, t, y, yd, sw, p)
+                Defines the right-hand-side of quadratures, q' = resQ(t,y,yd),
+                i.e. integrals of outputs of the problem. The quadratures
+                are integrated together with y but are not part of the
+                nonlinear system. The switches (sw) and parameters (p)
+                are given as for res. The initial values of the
+                quadratures are given by the (optional) attribute q0,
+                default zeros. The quadratures are stored in q_sol.
+                
+                Returns:
+                    A numpy vector of size len(q0).
                     
             def handle_result(self, solver, t, y, yd)
                 Method for specifying how the result is  handled. 
                 By default the data is stored in three vectors, solver.(t_sol/y_sol/yd_sol). 
                 If the problem to be solved also involve sensitivities these results are
-                stored in p_sol
+                stored in p_sol and quadratures are stored in q_sol.
                 
             def handle_event(self, object solver, event_info):
                 Defines how to handle a discontinuity. This functions gets called when
@@ -425,6 +474,21 @@ class Explicit_Problem(cExplicit_Problem):
                     
                     Returns:
                         A numpy array of size len(y).
+                
+                If the problem attribute rhs_inplace is set to True, the
+                right-hand-side is instead written into a preallocated array
+                given as the third argument, rhs(t,y,ydot), rhs(t,y,ydot,sw), ...
+                and the return value is ignored. The arrays given to the
+                function are only valid during the call.
+                
+                If the problem attribute mass_matrix is set, the problem
+                is instead the linearly implicit M*y' = rhs(t,y) with the
+                constant, possibly singular, mass matrix M (Radau5ODE and
+                RodasODE). The mass matrix is given either as a numpy array
+                of size len(y)*len(y) or as a scipy sparse matrix. If the
+                attribute mass_bandwidth = (ml, mu) is set, the mass matrix
+                is banded and may also be given in compact band storage, an
+                array of size (ml+mu+1)*len(y) where M[mu+i-j,j] = M_ij.
             
             y0
                 Defines the starting values 
@@ -469,11 +533,23 @@ class Explicit_Problem(cExplicit_Problem):
                 Returns:
                     A numpy vector of size len(y).
             
+            def rhsQ(self, t, y, sw, p)
+                Defines the right-hand-side of quadratures, q' = rhsQ(t,y),
+                i.e. integrals of outputs of the problem. The quadratures
+                are integrated together with y but are not part of the
+                nonlinear system. The switches (sw) and parameters (p)
+                are given as for rhs. The initial values of the
+                quadratures are given by the (optional) attribute q0,
+                default zeros. The quadratures are stored in q_sol.
+                
+                Returns:
+                    A numpy vector of size len(q0).
+            
             def handle_result(self, solver, t, y)
                 Method for specifying how the result is handled. 
                 By default the data is stored in two vectors, solver.(t_sol/y_sol). If
                 the problem to be solved also involve sensitivities these results are
-                stored in p_sol
+                stored in p_sol and quadratures are stored in q_sol.
                 
             def handle_event(self, object solver, event_info):
                 Defines how to handle a discontinuity. This functions is called when
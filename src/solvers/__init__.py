@@ -57,7 +57,7 @@ try:
 except ImportError as ie:
     sys.stderr.write("Could not find " + str(ie) + "\n")
 try:
-    from .odepack import LSODAR
+    from .odepack import LSODAR, LSODES, LSODKR
 except ImportError as ie:
     sys.stderr.write("Could not find " + str(ie) + "\n")
 try:
@@ -23,6 +23,7 @@ import scipy.sparse as sp
 #from assimulo.ode import *
 from assimulo.explicit_ode cimport Explicit_ODE
 from assimulo.exception import *
+from assimulo.lib.jacobian import FDJacobian
 
 include "constants.pxi" #Includes the constants (textual include)
 
@@ -64,6 +65,7 @@ cdef class ImplicitEuler(Explicit_ODE):
     cdef double _told
     cdef double _h
     cdef double _inith
+    cdef object _fd_jac
     
     def __init__(self, problem):
         Explicit_ODE.__init__(self, problem) #Calls the base class
@@ -92,19 +94,21 @@ cdef class ImplicitEuler(Explicit_ODE):
         self._curjac = False #Is the current jacobian up to date?
         self._steps_since_last_jac = 0 #Keep track on how long ago we updated the jacobian
         self._inith = 0 #Used for taking an initial step of correct length after an event.
+        self._fd_jac = None #Numeric (colored) jacobian, created when first needed
     
     def set_problem_data(self): 
+        rhs = self._get_rhs()
         if self.problem_info["state_events"]: 
             def event_func(t, y): 
                 return self.problem.state_events(t, y, self.sw) 
             def f(t, y): 
-                return self.problem.rhs(t, y, self.sw)
+                return rhs(t, y, self.sw)
             self.f = f
             self.event_func = event_func
             self._event_info = N.array([0] * self.problem_info["dimRoot"]) 
             self.g_old = self.event_func(self.t, self.y)
         else: 
-            self.f = self.problem.rhs
+            self.f = rhs
     
     
     def _set_usejac(self, jac):
@@ -326,12 +330,11 @@ cdef class ImplicitEuler(Explicit_ODE):
             if isinstance(jac, sp.csc_matrix):
                 jac = jac.toarray()
         else:           #Calculate a numeric jacobian
-            delt = N.array([(self._eps*max(abs(yi),1.e-5))**0.5 for yi in y])*N.identity(self._leny) #Calculate a disturbance
-            Fdelt = N.array([self.f(t,y+e) for e in delt]) #Add the disturbance (row by row) 
-            grad = ((Fdelt-self.f(t,y)).T/delt.diagonal()).T
-            jac = N.array(grad).T
+            if self._fd_jac is None:
+                self._fd_jac = FDJacobian(self._leny, self.problem_info["jac_sparsity"])
+            jac = self._fd_jac(self.f, t, y)
             
-            self.statistics["nfcnjacs"] += 1+self._leny #Add the number of function evaluations
+            self.statistics["nfcnjacs"] += 1+self._fd_jac.ncolors #Add the number of function evaluations
         
         self.statistics["njacs"] += 1 #add the number of jacobian evaluation
         return jac
@@ -524,19 +527,21 @@ cdef class ExplicitEuler(Explicit_ODE):
         self.supports["report_continuously"] = True
         self.supports["interpolated_output"] = False
         self.supports["state_events"] = True
+        self.supports["batch_simulation"] = True
     
     def set_problem_data(self): 
+        rhs = self._get_rhs()
         if self.problem_info["state_events"]: 
             def event_func(t, y): 
                 return self.problem.state_events(t, y, self.sw) 
             def f(t, y): 
-                return self.problem.rhs(t, y, self.sw)
+                return rhs(t, y, self.sw)
             self.f = f
             self.event_func = event_func
             self._event_info = N.array([0] * self.problem_info["dimRoot"]) 
             self.g_old = self.event_func(self.t, self.y)
         else: 
-            self.f = self.problem.rhs
+            self.f = rhs
     
     cpdef step(self,double t,N.ndarray y,double tf,dict opts):
         cdef double h
@@ -634,6 +639,12 @@ cdef class ExplicitEuler(Explicit_ODE):
     def interpolate(self, time):
         return self._yold + (time - self._told) / self._h * (self._ynew - self._yold)
         
+    def _batch_step(self, f, t, y, h, fy):
+        """
+        This calculates the next step for a batch of trajectories.
+        """
+        return y + h*fy, None
+        
     def _set_h(self,h):
         try:
             self.options["h"] = float(h)
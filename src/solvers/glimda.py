@@ -162,7 +162,8 @@ class GLIMDA(Implicit_ODE):
         dfdx_dummy = lambda t:x #df/dx
         dqdx_dummy = lambda t:x #dq/dx
         qeval_dummy = lambda x,t:x #q(x,t)
-        res_dummy = lambda yd,y,t:self.problem.res(t,y,yd) #Needed to correct the order of the arguments
+        res = self._get_res()
+        res_dummy = lambda yd,y,t:res(t,y,yd) #Needed to correct the order of the arguments
 
         #Store the opts
         self._opts = opts
@@ -23,6 +23,7 @@ N.import_array()
 
 import numpy.linalg
 import traceback 
+from timeit import default_timer as timer
  
 from assimulo.exception import * 
 from assimulo.algebraic cimport Algebraic
@@ -32,14 +33,16 @@ cimport sundials_includes as SUNDIALS
 #Various C includes transfered to namespace
 from sundials_includes cimport N_Vector, realtype, N_VectorContent_Serial, DENSE_COL, sunindextype
 from sundials_includes cimport memcpy, N_VNew_Serial, DlsMat, SlsMat, SUNMatrix, SUNMatrixContent_Dense, SUNMatrixContent_Sparse
-from sundials_includes cimport malloc, free, N_VCloneVectorArray_Serial
-from sundials_includes cimport N_VConst_Serial, N_VDestroy_Serial
+from sundials_includes cimport malloc, free, N_VDestroy
 
 include "constants.pxi" #Includes the constants (textual include)
 include "../lib/sundials_constants.pxi" #Sundials related constants
 include "../lib/sundials_callbacks.pxi"
 include "../lib/sundials_callbacks_kinsol.pxi"
 
+#The strategies of KINSOL, see the option strategy
+KIN_STRATEGIES = {"NONE": KIN_NONE, "LINESEARCH": KIN_LINESEARCH, "PICARD": KIN_PICARD, "FP": KIN_FP}
+
 cdef class KINSOL(Algebraic):
     """
     This class provides a connection to the Sundials 
@@ -53,7 +56,7 @@ cdef class KINSOL(Algebraic):
     """
     cdef void* kinsol_mem
     cdef ProblemDataEquationSolver pData #A struct containing information about the problem
-    cdef N_Vector y_temp, y_scale, f_scale
+    cdef N_Vector y_temp, y_scale, f_scale, nv_constraints
     cdef public double _eps
     
     cdef object pt_fcn, pt_jac, pt_jacv, pt_prec_setup, pt_prec_solve
@@ -89,7 +92,14 @@ cdef class KINSOL(Algebraic):
         self.options["no_min_epsilon"] = False #Specifies wheter the scaled linear residual is bounded from below
         self.options["max_beta_fails"] = 10
         self.options["max_krylov"] = 0
+        self.options["max_restarts"] = 0
+        self.options["gstype"] = MODIFIED_GS
         self.options["precond"] = PREC_NONE
+        self.options["maa"] = 0 #The depth of the Anderson acceleration (FP and PICARD)
+        self.options["damping"] = 1.0 #The damping of the Anderson acceleration
+        self.options["constraints"] = None #The constraints on the variables (None: from the bounds of the problem)
+        self.options["nvector"] = "SERIAL" #The N_Vector implementation
+        self.options["num_threads"] = 1
         
         #Statistics
         self.statistics["nfevals"]    = 0 #Function evaluations
@@ -100,15 +110,18 @@ cdef class KINSOL(Algebraic):
         self.statistics["nbcfails"]   = 0 #The function KINGetNumBetaCondFails returns the number of β-condition failures.
         self.statistics["nliters"]    = 0
         self.statistics["nlcfails"]   = 0
-        
-        #Initialize Kinsol
-        self.initialize_kinsol()
                 
     def __dealloc__(self):
         
+        #Deallocate the N_Vectors
         if self.y_temp != NULL:
-            #Deallocate N_Vector
-            N_VDestroy_Serial(self.y_temp)
+            N_VDestroy(self.y_temp)
+        if self.y_scale != NULL:
+            N_VDestroy(self.y_scale)
+        if self.f_scale != NULL:
+            N_VDestroy(self.f_scale)
+        if self.nv_constraints != NULL:
+            N_VDestroy(self.nv_constraints)
         
         if self.kinsol_mem != NULL:
             #Free Memory
@@ -140,7 +153,8 @@ cdef class KINSOL(Algebraic):
         else:
             self.options["y_scale"] = N.array([value]) if isinstance(value, float) or isinstance(value, int) else N.array(value)
             
-        arr2nv_inplace(self.options["y_scale"], self.y_scale)
+        if self.y_scale != NULL:
+            arr2nv_inplace(self.options["y_scale"], self.y_scale)
     
     def update_residual_scaling(self, value="Automatic"):
         """
@@ -150,8 +164,9 @@ cdef class KINSOL(Algebraic):
             pass
         else:
             self.options["f_scale"] = N.array([value]) if isinstance(value, float) or isinstance(value, int) else N.array(value)
-            
-        arr2nv_inplace(self.options["f_scale"], self.f_scale)
+        
+        if self.f_scale != NULL:
+            arr2nv_inplace(self.options["f_scale"], self.f_scale)
             
     cdef set_problem_data(self):
         
@@ -181,10 +196,14 @@ cdef class KINSOL(Algebraic):
             
     cdef initialize_kinsol(self):
         cdef int flag #Used for return
-
-        self.y_temp  = arr2nv(self.y)
-        self.y_scale = arr2nv([1.0]*self.problem_info["dim"])
-        self.f_scale = arr2nv([1.0]*self.problem_info["dim"])
+        cdef long int dim = self.problem_info["dim"]
+        
+        #The vectors are created at the first solve, see the option nvector
+        self.y_temp  = new_nvector(dim, self.options["nvector"], self.options["num_threads"])
+        self.y_scale = new_nvector(dim, self.options["nvector"], self.options["num_threads"])
+        self.f_scale = new_nvector(dim, self.options["nvector"], self.options["num_threads"])
+        self.nv_constraints = new_nvector(dim, self.options["nvector"], self.options["num_threads"])
+        arr2nv_inplace(self.y, self.y_temp)
    
         if self.kinsol_mem == NULL: #The solver is not initialized
             
@@ -194,6 +213,11 @@ cdef class KINSOL(Algebraic):
                 raise KINSOLError(KIN_MEM_NULL)
             self.pData.KIN_MEM = self.kinsol_mem
             
+            #The Anderson acceleration memory is allocated in KINInit
+            flag = SUNDIALS.KINSetMAA(self.kinsol_mem, min(self.options["maa"], dim))
+            if flag < 0:
+                raise KINSOLError(flag)
+            
             #Specify the residual and the initial conditions to the solver
             flag = SUNDIALS.KINInit(self.kinsol_mem, kin_res, self.y_temp)
             if flag < 0:
@@ -238,15 +262,25 @@ cdef class KINSOL(Algebraic):
                     flag = SUNDIALS.KINDlsSetDenseJacFn(self.kinsol_mem, kin_jac);
                 if flag < 0:
                     raise KINSOLError(flag)
-        elif self.options["linear_solver"] == "SPGMR":
+        elif self.options["linear_solver"] in SPILS_SOLVERS:
             IF SUNDIALS_VERSION >= (3,0,0):
                 #Create the linear solver
-                self.sun_linearsolver = SUNDIALS.SUNSPGMR(self.y_temp, self.options["precond"], self.options["max_krylov"])
+                self.sun_linearsolver = create_spils_solver(self.options["linear_solver"], self.y_temp, self.options["precond"], 
+                                                            self.options["max_krylov"], self.options["gstype"], self.options["max_restarts"])
                 #Attach it to Kinsol
                 flag = SUNDIALS.KINSpilsSetLinearSolver(self.kinsol_mem, self.sun_linearsolver)
             ELSE:
-                #Specify the use of KINSpgmr linear solver.
-                flag = SUNDIALS.KINSpgmr(self.kinsol_mem, self.options["max_krylov"])
+                #Specify the use of the KINSpils linear solver.
+                if self.options["linear_solver"] == "SPGMR":
+                    flag = SUNDIALS.KINSpgmr(self.kinsol_mem, self.options["max_krylov"])
+                elif self.options["linear_solver"] == "SPFGMR":
+                    flag = SUNDIALS.KINSpfgmr(self.kinsol_mem, self.options["max_krylov"])
+                elif self.options["linear_solver"] == "SPBCGS":
+                    flag = SUNDIALS.KINSpbcg(self.kinsol_mem, self.options["max_krylov"])
+                else:
+                    flag = SUNDIALS.KINSptfqmr(self.kinsol_mem, self.options["max_krylov"])
+                if flag >= 0 and self.options["linear_solver"] in ("SPGMR", "SPFGMR"):
+                    flag = SUNDIALS.KINSpilsSetMaxRestarts(self.kinsol_mem, self.options["max_restarts"])
             if flag < 0:
                 raise KINSOLError(flag)
             
@@ -321,6 +355,26 @@ cdef class KINSOL(Algebraic):
         if flag < 0:
             raise KINSOLError(flag)
         
+        #Constraints are only supported by the Newton strategies (LINESEARCH and NONE)
+        constraints = self._get_constraints_array()
+        if constraints is not None and self.options["strategy"] in (KIN_PICARD, KIN_FP):
+            if self.options["constraints"] is not None:
+                raise AssimuloException("Constraints are only supported by the strategies 'LINESEARCH' and 'NONE'.")
+            constraints = None #The bounds of the problem are ignored
+        if constraints is None:
+            flag = SUNDIALS.KINSetConstraints(self.kinsol_mem, NULL)
+        else:
+            arr2nv_inplace(constraints, self.nv_constraints)
+            flag = SUNDIALS.KINSetConstraints(self.kinsol_mem, self.nv_constraints)
+        if flag < 0:
+            raise KINSOLError(flag)
+        
+        IF SUNDIALS_VERSION >= (5,0,0):
+            if self.options["maa"] > 0:
+                flag = SUNDIALS.KINSetDampingAA(self.kinsol_mem, self.options["damping"])
+                if flag < 0:
+                    raise KINSOLError(flag)
+        
         flag = SUNDIALS.KINSetPrintLevel(self.kinsol_mem, self._get_print_level()); #The function KINSetPrintLevel specifies the level of verbosity of the output.
         if flag < 0:
             raise KINSOLError(flag)
@@ -352,20 +406,37 @@ cdef class KINSOL(Algebraic):
         else:
             return 3
     
+    cdef setup_solve(self):
+        """
+        Prepares a solve, creates the solver memory and the linear solver
+        (if not already created) and updates the options.
+        """
+        if self.kinsol_mem == NULL:
+            self.initialize_kinsol()
+        
+        if self.options["strategy"] == KIN_PICARD:
+            if (self.options["linear_solver"] == "DENSE" and not self.problem_info["jac_fcn"]) or \
+               (self.options["linear_solver"] in SPILS_SOLVERS and not self.problem_info["jacv_fcn"]):
+                raise AssimuloException("The Picard iteration requires the linear part of the residual, given by the Jacobian (jac) or for the iterative solvers the Jacobian times vector (jacv).")
+        
+        #The fixed-point iteration does not use a linear solver
+        self.pData.fixed_point = self.options["strategy"] == KIN_FP
+        if not self._added_linear_solver and not self.pData.fixed_point:
+            self.add_linear_solver()
+            
+        #Update the solver options
+        self.update_options()
+    
     cpdef _solve(self, y0=None):
         """
         Solves the system.
         """
+        self.setup_solve()
+        
         if y0 is not None:
             arr2nv_inplace(y0, self.y_temp)
         else:
             arr2nv_inplace(self.y, self.y_temp)
-            
-        if not self._added_linear_solver:
-            self.add_linear_solver()
-            
-        #Update the solver options
-        self.update_options()
         
         flag = SUNDIALS.KINSol(self.kinsol_mem, self.y_temp, self.options["strategy"], self.y_scale, self.f_scale)
         self.y = nv2arr(self.y_temp)
@@ -377,7 +448,151 @@ cdef class KINSOL(Algebraic):
         
         self.store_statistics()
         
-        return nv2arr(self.y_temp)
+        return self.y
+    
+    def solve_many(self, y0=None, params=None, predictor=False):
+        """
+        Solves the system for a sequence of initial guesses and/or
+        parameter values. The solver memory and the linear solver are
+        kept between the solves and, after the first solve, the Jacobian
+        of the previous solve is reused until KINSOL decides to update
+        it (see the option max_solves_between_setup_calls).
+        
+            Parameters::
+            
+                y0
+                        - The initial guesses, an array of shape (n, dim).
+                          If None, each solve starts from the solution of
+                          the previous one (the first from the stored y).
+                          
+                params
+                        - The parameter values, an array with n rows (or
+                          of length n). The problem functions are then
+                          called with the parameters as the last
+                          argument, res(y, p), jac(y, p) and
+                          jacv(y, v, p). Default None.
+                          
+                predictor
+                        - If True (and y0 is None), the initial guess is
+                          extrapolated linearly from the two previous
+                          solutions along the parameter path.
+                          Default False.
+                          
+            Returns::
+            
+                Y
+                        - The solutions, an array of shape (n, dim). The
+                          rows of failed solves are NaN.
+                          
+                stats
+                        - The statistics of each solve, a dict of arrays
+                          of length n with the keys of the statistics and
+                          'flag', the return flag of KINSOL.
+                          
+            Example::
+            
+                Y, stats = solver.solve_many(params=N.linspace(0.0, 1.0, 100), predictor=True)
+        """
+        cdef int flag, i, n
+        cdef bint no_initial_setup = self.options["no_initial_setup"]
+        cdef bint reuse_jacobian = no_initial_setup #The current value of KINSetNoInitSetup
+        cdef bint skip_setup
+        cdef list p = [None] #The current parameter values
+        
+        if y0 is None and params is None:
+            raise AssimuloException("Either the initial guesses (y0) or the parameters (params) must be given.")
+        if y0 is not None:
+            y0 = N.array(y0, dtype=float, ndmin=2)
+        if params is not None:
+            params = N.array(params, dtype=float)
+            params = params.reshape(params.shape[0], -1)
+        n = len(y0) if y0 is not None else len(params)
+        if y0 is not None and params is not None and len(params) != n:
+            raise AssimuloException("The initial guesses (y0) and the parameters (params) must be of the same length.")
+        
+        if params is not None: #Pass the parameters to the problem functions
+            res = self.problem.res
+            self.pt_fcn = lambda y: res(y, p[0])
+            self.pData.RES = <void*>self.pt_fcn
+            if self.problem_info["jac_fcn"]:
+                jac = self.problem.jac
+                self.pt_jac = lambda y: jac(y, p[0])
+                self.pData.JAC = <void*>self.pt_jac
+            if self.problem_info["jacv_fcn"]:
+                jacv = self.problem.jacv
+                self.pt_jacv = lambda y, v: jacv(y, v, p[0])
+                self.pData.JACV = <void*>self.pt_jacv
+        
+        Y = N.empty((n, self.problem_info["dim"]))
+        stats = {"flag": N.zeros(n, dtype=int)}
+        y_last = [self.y.copy()] #The last successful solutions (and their parameters)
+        p_last = []
+        
+        time_start = timer()
+        self.setup_solve()
+        try:
+            for i in range(n):
+                if params is not None:
+                    p[0] = params[i] if params.shape[1] > 1 else params[i,0]
+                
+                if y0 is not None:
+                    y_guess = y0[i]
+                elif predictor and params is not None and len(p_last) == 2:
+                    dp = params[i] - p_last[1]
+                    dp_last = p_last[1] - p_last[0]
+                    scale = N.dot(dp, dp_last)/N.dot(dp_last, dp_last) if N.any(dp_last != 0.0) else 0.0
+                    y_guess = y_last[-1] + scale*(y_last[-1] - y_last[-2])
+                else:
+                    y_guess = y_last[-1]
+                
+                #Reuse the Jacobian after a successful solve, the option is only updated when it changes
+                skip_setup = no_initial_setup or (i > 0 and stats["flag"][i-1] >= 0)
+                if skip_setup != reuse_jacobian:
+                    flag = SUNDIALS.KINSetNoInitSetup(self.kinsol_mem, skip_setup)
+                    if flag < 0:
+                        raise KINSOLError(flag)
+                    reuse_jacobian = skip_setup
+                
+                arr2nv_inplace(y_guess, self.y_temp)
+                
+                flag = SUNDIALS.KINSol(self.kinsol_mem, self.y_temp, self.options["strategy"], self.y_scale, self.f_scale)
+                stats["flag"][i] = flag
+                
+                self.store_statistics()
+                for key, value in self.statistics.items():
+                    stats.setdefault(key, N.zeros(n, dtype=int))[i] = value
+                
+                if flag < 0:
+                    Y[i] = N.nan
+                    continue
+                
+                nv2arr_inplace(self.y_temp, Y[i])
+                y_last = [y_last[-1], Y[i]]
+                if params is not None:
+                    p_last = (p_last + [params[i]])[-2:]
+        finally:
+            if reuse_jacobian != no_initial_setup:
+                SUNDIALS.KINSetNoInitSetup(self.kinsol_mem, no_initial_setup)
+            if params is not None:
+                self.pt_fcn = self.problem.res
+                self.pData.RES = <void*>self.pt_fcn
+                if self.problem_info["jac_fcn"]:
+                    self.pt_jac = self.problem.jac
+                    self.pData.JAC = <void*>self.pt_jac
+                if self.problem_info["jacv_fcn"]:
+                    self.pt_jacv = self.problem.jacv
+                    self.pData.JACV = <void*>self.pt_jacv
+        time_stop = timer()
+        
+        #The statistics of the whole sequence
+        for key in stats:
+            if key in self.statistics:
+                self.statistics[key] = int(stats[key].sum())
+        self.y = y_last[-1].copy()
+        
+        self.log_message('Solved %d of %d systems in %g seconds.'%(N.sum(stats["flag"] >= 0), n, time_stop-time_start), NORMAL)
+        
+        return Y, stats
     
     def get_last_flag(self):
         """
@@ -418,7 +633,9 @@ cdef class KINSOL(Algebraic):
             raise KINSOLError(flag)
         self.statistics["nbcfails"] = nbcfails
         
-        if self.options["linear_solver"] == "SPGMR":
+        if not self._added_linear_solver: #The fixed-point iteration
+            pass
+        elif self.options["linear_solver"] in SPILS_SOLVERS:
             
             flag = SUNDIALS.KINSpilsGetNumLinIters(self.kinsol_mem, &nliters)
             if flag < 0:
@@ -474,7 +691,9 @@ cdef class KINSOL(Algebraic):
         self.log_message(' Number of Backtrack Operations (Linesearch) : '+ str(self.statistics["nbacktr"]),   verbose) #The function KINGetNumBacktrackOps returns the number of backtrack operations (step length adjustments) performed by the line search algorithm.
         self.log_message(' Number of Beta-condition Failures           : '+ str(self.statistics["nbcfails"]),  verbose) #The function KINGetNumBetaCondFails returns the number of β-condition failures.
         
-        if self.options["linear_solver"] == "SPGMR":
+        if not self._added_linear_solver: #The fixed-point iteration
+            pass
+        elif self.options["linear_solver"] in SPILS_SOLVERS:
             self.log_message(' Number of Jacobian*Vector Evaluations       : '+ str(self.statistics["njevals"]),   verbose)
             self.log_message(' Number of F-Eval During Jac*Vec-Eval        : '+ str(self.statistics["nfevalsLS"]), verbose)
             self.log_message(' Number of Linear Iterations                 : '+ str(self.statistics["nliters"]), verbose)
@@ -486,8 +705,13 @@ cdef class KINSOL(Algebraic):
     
         self.log_message('\nSolver options:\n',                                     verbose)
         self.log_message(' Solver                  : Kinsol',                       verbose)
-        self.log_message(' Linear Solver           : ' + str(self.options["linear_solver"]),                       verbose)
-        self.log_message(' Globalization Strategy  : ' + ("LINESEARCH" if self.options["strategy"]==1 else "NONE"),                       verbose)
+        if self.options["strategy"] != KIN_FP:
+            self.log_message(' Linear Solver           : ' + str(self.options["linear_solver"]),                       verbose)
+        self.log_message(' Strategy                : ' + self.strategy,               verbose)
+        if self.options["strategy"] in (KIN_PICARD, KIN_FP) and self.options["maa"] > 0:
+            self.log_message(' Anderson Acceleration   : depth %d, damping %g'%(self.options["maa"], self.options["damping"]), verbose)
+        if self.options["nvector"] != "SERIAL":
+            self.log_message(' N_Vector (threads)      : %s (%d)'%(self.options["nvector"], self.options["num_threads"]), verbose)
         self.log_message(' Function Tolerances     : ' + str(self.options["ftol"]),  verbose)
         self.log_message(' Step Tolerances         : ' + str(self.options["stol"]),  verbose)
         self.log_message(' Variable Scaling        : ' + str(self.options["y_scale"]),  verbose)
@@ -589,10 +813,10 @@ cdef class KINSOL(Algebraic):
     max_beta_fails = property(_get_max_beta_fails_method,_set_max_beta_fails_method)
     
     def _set_linear_solver(self, lsolver):
-        if lsolver.upper() == "DENSE" or lsolver.upper() == "SPGMR":
+        if lsolver.upper() == "DENSE" or lsolver.upper() in SPILS_SOLVERS:
             self.options["linear_solver"] = lsolver.upper()
         else:
-            raise Exception('The linear solver must be either "DENSE" or "SPGMR".')
+            raise Exception('The linear solver must be either "DENSE", "SPGMR", "SPFGMR", "SPBCGS" or "SPTFQMR".')
         
     def _get_linear_solver(self):
         """
@@ -601,32 +825,155 @@ cdef class KINSOL(Algebraic):
             Parameters::
             
                 linearsolver
-                        - Default 'DENSE'. Can also be 'SPGMR'.
+                        - Default 'DENSE'. Can also be one of the
+                          iterative (Krylov) solvers 'SPGMR', 'SPFGMR',
+                          'SPBCGS' and 'SPTFQMR'.
         """
         return self.options["linear_solver"]
     
     linear_solver = property(_get_linear_solver, _set_linear_solver)
     
-    def _set_globalization_strategy(self, lsolver):
-        if lsolver.upper() == "LINESEARCH":
-            self.options["strategy"] = KIN_LINSEARCH
-        elif lsolver.upper() == "NONE":
-            self.options["strategy"] = KIN_NONE
+    def _set_strategy(self, strategy):
+        if strategy.upper() in KIN_STRATEGIES:
+            self.options["strategy"] = KIN_STRATEGIES[strategy.upper()]
         else:
-            raise Exception('The linear solver must be either "LINESEARCH" or "NONE".')
+            raise Exception('The strategy must be either "LINESEARCH", "NONE", "PICARD" or "FP".')
         
-    def _get_globalization_strategy(self):
+    def _get_strategy(self):
         """
-        Specifies the globalization strategy to be used.
+        Specifies the strategy to be used. 'LINESEARCH' and 'NONE' are
+        the globalization strategies of the Newton iteration, 'PICARD'
+        is the Picard iteration and 'FP' the fixed-point iteration.
+        
+        The Picard iteration splits the residual into a linear and a
+        nonlinear part, res(y) = L*y - N(y), where L is given by the
+        Jacobian, jac, (or by jacv for the iterative linear solvers).
+        
+        The fixed-point iteration, y = y - res(y), does not use any
+        Jacobian or linear solver, the residual should be scaled so
+        that the iteration converges. Both PICARD and FP can be
+        accelerated by Anderson acceleration, see the option maa.
         
             Parameters::
             
-                linearsolver
-                        - Default 'LINSEARCH'. Can also be 'NONE'.
+                strategy
+                        - Default 'LINESEARCH'. Can also be 'NONE',
+                          'PICARD' or 'FP'.
         """
-        return self.options["strategy"]
+        for name, strategy in KIN_STRATEGIES.items():
+            if strategy == self.options["strategy"]:
+                return name
+    
+    strategy = property(_get_strategy, _set_strategy)
+    globalization_strategy = property(_get_strategy, _set_strategy)
     
-    globalization_strategy = property(_get_globalization_strategy, _set_globalization_strategy)
+    def _set_maa(self, maa):
+        maa = int(maa)
+        if maa < 0:
+            raise Exception("The depth of the Anderson acceleration must be a non-negative integer.")
+        self.options["maa"] = maa
+    
+    def _get_maa(self):
+        """
+        Specifies the depth of the Anderson acceleration of the strategies
+        'PICARD' and 'FP', i.e. the number of previous iterates used. The
+        option takes effect at the first solve and is limited by the
+        dimension of the problem.
+        
+            Parameters::
+            
+                maa
+                        - Default 0 (no acceleration).
+        """
+        return self.options["maa"]
+    
+    maa = property(_get_maa, _set_maa)
+    
+    def _set_damping(self, damping):
+        damping = float(damping)
+        if damping <= 0.0 or damping > 1.0:
+            raise Exception("The damping must be in the interval (0, 1].")
+        IF SUNDIALS_VERSION < (5,0,0):
+            if damping != 1.0:
+                raise AssimuloException("Damping of the Anderson acceleration requires Sundials 5.0 or newer.")
+        self.options["damping"] = damping
+    
+    def _get_damping(self):
+        """
+        Specifies the damping of the Anderson acceleration, see the
+        option maa. With a damping smaller than one, only that fraction
+        of the accelerated update is taken, which may improve the
+        robustness of the iteration.
+        
+            Parameters::
+            
+                damping
+                        - Default 1.0 (no damping). Should be in (0, 1].
+                        - Requires Sundials 5.0 or newer.
+        """
+        return self.options["damping"]
+    
+    damping = property(_get_damping, _set_damping)
+    
+    def _set_constraints(self, constraints):
+        if constraints is None:
+            self.options["constraints"] = None
+            return
+        constraints = N.array(constraints, dtype=float).reshape(-1)
+        if len(constraints) != self.problem_info["dim"]:
+            raise Exception("The constraints must be of the same length as y0.")
+        if not N.all(N.in1d(constraints, [-2.0, -1.0, 0.0, 1.0, 2.0])):
+            raise Exception("The constraints must be one of -2, -1, 0, 1 and 2.")
+        self.options["constraints"] = constraints
+    
+    def _get_constraints(self):
+        """
+        Specifies the sign constraints on the variables, for each
+        variable one of::
+        
+             0 - No constraint.
+             1 - y_i >= 0.
+             2 - y_i > 0.
+            -1 - y_i <= 0.
+            -2 - y_i < 0.
+        
+        By default (None) the constraints are derived from the bounds of
+        the problem, y0_min and y0_max. The constraints are only
+        supported by the strategies 'LINESEARCH' and 'NONE', where the
+        bounds of the problem are ignored for 'PICARD' and 'FP'.
+        
+            Parameters::
+            
+                constraints
+                        - Default None (from the bounds of the problem).
+                        - Should be an array of the same length as y0.
+        """
+        return self.options["constraints"]
+    
+    constraints = property(_get_constraints, _set_constraints)
+    
+    def _get_constraints_array(self):
+        """
+        Returns the constraints used, from the option constraints or the
+        bounds of the problem (where MIN_VALUE and MAX_VALUE are the
+        defaults, i.e. no bounds). None if there are no constraints.
+        """
+        if self.options["constraints"] is not None:
+            return self.options["constraints"]
+        
+        constraints = N.zeros(self.problem_info["dim"])
+        if self.options["y_min"] is not None:
+            y_min = N.array(self.options["y_min"], dtype=float).reshape(-1)
+            bounded = y_min != MIN_VALUE
+            constraints[bounded & (y_min >= 0.0)] = 1.0
+            constraints[bounded & (y_min > 0.0)]  = 2.0
+        if self.options["y_max"] is not None:
+            y_max = N.array(self.options["y_max"], dtype=float).reshape(-1)
+            bounded = y_max != MAX_VALUE
+            constraints[bounded & (y_max <= 0.0)] = -1.0
+            constraints[bounded & (y_max < 0.0)]  = -2.0
+        
+        return constraints if N.any(constraints != 0.0) else None
     
     def _set_max_krylov(self, max_krylov):
         try:
@@ -656,6 +1003,109 @@ cdef class KINSOL(Algebraic):
     
     max_dim_krylov_subspace = property(_get_max_krylov, _set_max_krylov)
     
+    def _set_max_restarts(self, max_restarts):
+        try:
+            self.options["max_restarts"] = int(max_restarts)
+        except:
+            raise Exception("Maximum number of restarts should be an integer.")
+        if self.options["max_restarts"] < 0:
+            raise Exception("Maximum number of restarts should be a non-negative integer.")
+            
+    def _get_max_restarts(self):
+        """
+        Specifies the maximum number of restarts of the linear solvers
+        'SPGMR' and 'SPFGMR'.
+        
+            Parameters::
+            
+                    max_restarts
+                            - A non-negative integer.
+                            - Default 0
+            
+            Returns::
+            
+                The current value of max_restarts.
+                
+        See SUNDIALS documentation 'KINSpilsSetMaxRestarts'
+        """
+        return self.options["max_restarts"]
+    
+    max_restarts = property(_get_max_restarts, _set_max_restarts)
+    
+    def _set_gstype(self, gstype):
+        if gstype.upper() == "MODIFIED":
+            self.options["gstype"] = MODIFIED_GS
+        elif gstype.upper() == "CLASSICAL":
+            self.options["gstype"] = CLASSICAL_GS
+        else:
+            raise Exception('Unknown input of gstype. Should be either "MODIFIED" or "CLASSICAL".')
+            
+    def _get_gstype(self):
+        """
+        Specifies the type of Gram-Schmidt orthogonalization used by the
+        linear solvers 'SPGMR' and 'SPFGMR'. With SUNDIALS older than 3.0
+        modified Gram-Schmidt is always used.
+        
+            Parameters::
+            
+                    gstype
+                            - Should be either "MODIFIED" or "CLASSICAL"
+                            - Default "MODIFIED"
+            
+            Returns::
+            
+                The current value of gstype (as string).
+                
+        See SUNDIALS documentation 'SUNSPGMRSetGSType'
+        """
+        return "MODIFIED" if self.options["gstype"] == MODIFIED_GS else "CLASSICAL"
+    
+    gstype = property(_get_gstype, _set_gstype)
+    
+    def _set_nvector(self, nvector):
+        if nvector.upper() in NVECTORS:
+            self.options["nvector"] = nvector.upper()
+        else:
+            raise Exception('The N_Vector must be either "SERIAL", "OPENMP" or "PTHREADS".')
+    
+    def _get_nvector(self):
+        """
+        Specifies the N_Vector implementation, i.e. how the vector
+        operations of the solver are computed. The multithreaded
+        implementations use the number of threads given by the option
+        num_threads. The option takes effect at the first solve.
+        
+            Parameters::
+            
+                nvector
+                        - Default 'SERIAL'. Can also be 'OPENMP' or
+                          'PTHREADS', provided that Assimulo was compiled
+                          against a Sundials with these vectors.
+        """
+        return self.options["nvector"]
+    
+    nvector = property(_get_nvector, _set_nvector)
+    
+    def _set_num_threads(self, num_threads):
+        num_threads = int(num_threads)
+        if num_threads < 1:
+            raise Exception("The number of threads must be a positive integer.")
+        self.options["num_threads"] = num_threads
+    
+    def _get_num_threads(self):
+        """
+        Specifies the number of threads used by the multithreaded
+        N_Vectors, see the option nvector.
+        
+            Parameters::
+            
+                num_threads
+                        - Default 1.
+        """
+        return self.options["num_threads"]
+    
+    num_threads = property(_get_num_threads, _set_num_threads)
+    
     def get_residual_norm_nonlinear_iterations(self): 
         return self.pData.nl_fnorm
         
@@ -228,6 +228,9 @@ class ODASSL(ODASSL_Common, OverdeterminedDAE):
                               of the 'Explicit_Problem' class.
         """
         OverdeterminedDAE.__init__(self, problem) #Calls the base class
+        
+        if self.problem_info["res_inplace"]:
+            raise ODASSL_Exception("In-place residuals (res_inplace) are not supported, the number of equations is determined from the returned residual.")
             
         #Default values
         self.options["inith"]    = 0.0
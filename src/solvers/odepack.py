@@ -26,7 +26,7 @@ import logging
 from assimulo.explicit_ode import Explicit_ODE
 
 try:
-    from assimulo.lib.odepack import dlsodar, dcfode, dintdy
+    from assimulo.lib.odepack import dlsodar, dlsodes, dlsodkr, dcfode, dintdy
     from assimulo.lib.odepack import set_lsod_common, get_lsod_common
 except ImportError:
     sys.stderr.write("Could not find ODEPACK functions.\n")
@@ -95,6 +95,7 @@ class LSODAR(Explicit_ODE):
                                max(16,self.problem_info["dim"]+9) + 
                                3*self.problem_info["dimRoot"]))
         self._IWORK = N.array([0]*(20 + self.problem_info["dim"]))
+        self._rootfinding = True #The state events are located by ODEPACK
         
         
     def initialize(self):
@@ -113,6 +114,13 @@ class LSODAR(Explicit_ODE):
         # only after an event occured.
         self._rkstarter_active = False
         
+    def _nordsieck_start_index(self):
+        """
+        Returns the (zero based) index of the Nordsieck history array in
+        the real work array.
+        """
+        return 21+3*self.problem_info["dimRoot"] - 1
+        
     def interpolate(self, t):
         """
         Helper method to interpolate the solution at time t using the Nordsieck history
@@ -120,7 +128,7 @@ class LSODAR(Explicit_ODE):
         """
         if self._update_nordsieck:
             #Nordsieck start index
-            nordsieck_start_index = 21+3*self.problem_info["dimRoot"] - 1
+            nordsieck_start_index = self._nordsieck_start_index()
             
             hu, nqu ,nq ,nyh, nqnyh = get_lsod_common()
             self._nordsieck_array = \
@@ -209,10 +217,10 @@ class LSODAR(Explicit_ODE):
             #H=self.autostart(t,y)
             #H=3*H
             # b) compute the Nordsieck array and put it into RWORK
-            rkNordsieck = RKStarterNordsieck(self.problem.rhs,H,number_of_steps=self.rkstarter)
+            rkNordsieck = RKStarterNordsieck(self._get_rhs(),H,number_of_steps=self.rkstarter)
             t,nordsieck = rkNordsieck(t,y,self.sw)
             nordsieck=nordsieck.T
-            nordsieck_start_index = 21+3*self.problem_info["dimRoot"] - 1
+            nordsieck_start_index = self._nordsieck_start_index()
             RWORK[nordsieck_start_index:nordsieck_start_index+nordsieck.size] = \
                                        nordsieck.flatten(order='F')
                         
@@ -277,19 +285,19 @@ class LSODAR(Explicit_ODE):
         
         return jac
     
-    def integrate(self, t, y, tf, opts):
+    def _set_work_options(self, RWORK, IWORK):
+        """
+        Sets the optional inputs of the work arrays and returns the
+        ODEPACK integrator as a function lsod(y, t, tout, ITASK, ISTATE,
+        RWORK, IWORK) returning y, t, ISTATE, RWORK, IWORK and the roots.
+        """
         ITOL  = 2 #Only  atol is a  vector
-        ITASK = 5 #For one step mode and hitting exactly tcrit, normally tf
         IOPT = 1 #optional inputs are used
         
-        # provide work arrays and set common blocks (if needed)
-        ISTATE, RWORK, IWORK = self.integrate_start( t, y)
-        
         JT = 1 if self.usejac else 2#Jacobian type indicator
         JROOT = N.array([0]*self.problem_info["dimRoot"])
         
         #Setting work options
-        RWORK[0] = tf #Do not integrate past tf
         RWORK[5] = self.options["maxh"]
         
         #Setting iwork options
@@ -319,6 +327,36 @@ class LSODAR(Explicit_ODE):
         rhs_extra_args = (self.sw,) if self.problem_info["switches"] else ()
         g_extra_args = (self.sw,) if self.problem_info["switches"] else ()
         
+        #Tolerances:
+        atol = self.atol
+        rtol = self.rtol*N.ones(self.problem_info["dim"])
+        rhs = self._get_rhs()
+        
+        def lsod(y, t, tout, ITASK, ISTATE, RWORK, IWORK):
+            return dlsodar(rhs, y, t, tout, ITOL, rtol, atol,
+                    ITASK, ISTATE, IOPT, RWORK, IWORK, jac_fcn, JT, g_fcn, JROOT,
+                    f_extra_args = rhs_extra_args, g_extra_args = g_extra_args)
+        
+        return lsod
+    
+    def _update_statistics(self, IWORK):
+        """
+        Adds the optional outputs of the last call to the statistics.
+        """
+        self.statistics["nstatefcns"]            += IWORK[9]
+        self.statistics["nsteps"]        += IWORK[10]
+        self.statistics["nfcns"]          += IWORK[11]
+        self.statistics["njacs"]          += IWORK[12]
+    
+    def integrate(self, t, y, tf, opts):
+        ITASK = 5 #For one step mode and hitting exactly tcrit, normally tf
+        
+        # provide work arrays and set common blocks (if needed)
+        ISTATE, RWORK, IWORK = self.integrate_start( t, y)
+        
+        RWORK[0] = tf #Do not integrate past tf
+        lsod = self._set_work_options(RWORK, IWORK)
+        
         #Store the opts
         self._opts = opts
         
@@ -326,25 +364,21 @@ class LSODAR(Explicit_ODE):
         tlist = []
         ylist = []
         
-        
-        
-        #Run in normal mode?
-        normal_mode = 1 if opts["output_list"] is not None else 0
-        
-        #Tolerances:
-        atol = self.atol
-        rtol = self.rtol*N.ones(self.problem_info["dim"])
-        rhs = self.problem.rhs
+        #Solvers without rootfinding locate the events after each step
+        locate_events = self.problem_info["state_events"] and not self._rootfinding
+        if locate_events:
+            self.g_old = N.array(self.event_func(t, y)).copy()
         
         #if normal_mode == 0:
-        if opts["report_continuously"] or opts["output_list"] is None:
+        if opts["report_continuously"] or opts["output_list"] is None or locate_events:
             
-            while (ISTATE == 2 or ISTATE == 1) and t < tf:
+            output_list = opts["output_list"]
+            output_index = opts["output_index"]
             
-                y, t, ISTATE, RWORK, IWORK, roots = dlsodar(rhs, y.copy(), t, tf, ITOL, 
-                        rtol, atol,
-                        ITASK, ISTATE, IOPT, RWORK, IWORK, jac_fcn, JT, g_fcn, JROOT,
-                        f_extra_args = rhs_extra_args, g_extra_args = g_extra_args)
+            while (ISTATE == 2 or ISTATE == 1) and t < tf:
+                t_low = t
+                
+                y, t, ISTATE, RWORK, IWORK, roots = lsod(y.copy(), t, tf, ITASK, ISTATE, RWORK, IWORK)
                 
                 self._update_nordsieck = True
                 self._IWORK = IWORK
@@ -352,18 +386,35 @@ class LSODAR(Explicit_ODE):
                 #hu, nqu ,nq ,nyh, nqnyh = get_lsod_common()
                 #self._nordsieck_array = \
                 #     RWORK[nordsieck_start_index:nordsieck_start_index+(nq+1)*nyh].reshape((nyh,-1),order='F') 
-                #self._nyh = nyh              
-                self._event_info = roots
+                #self._nyh = nyh
+                if locate_events:
+                    if ISTATE == 2:
+                        event_flag, t, y = self.event_locator(t_low, t, y)
+                        if event_flag == ID_PY_EVENT:
+                            ISTATE = 3
+                else:
+                    self._event_info = roots
                 
                 if opts["report_continuously"]:
                     flag_initialize = self.report_solution(t, y, opts)
                     if flag_initialize:
                         #If a step event has occured the integration has to be reinitialized
                         ISTATE = 3
-                else:
+                elif output_list is None:
                     #Store results
                     tlist.append(t)
                     ylist.append(y.copy())
+                else:
+                    #Store the interpolated results at the output points passed
+                    output_end = output_index + N.searchsorted(output_list[output_index:], t, side="right")
+                    for tout in output_list[output_index:output_end]:
+                        tlist.append(tout)
+                        ylist.append(self.interpolate(tout) if tout != t else y.copy())
+                    output_index = output_end
+                    
+                    if ISTATE == 3 and (len(tlist) == 0 or tlist[-1] != t):
+                        tlist.append(t)
+                        ylist.append(y.copy())
             
                 #Checking return
                 if ISTATE == 2:
@@ -371,7 +422,10 @@ class LSODAR(Explicit_ODE):
                 elif ISTATE == 3:
                     flag = ID_PY_EVENT
                 else:
-                    raise ODEPACK_Exception("LSODAR failed with flag %d"%ISTATE)
+                    raise ODEPACK_Exception("%s failed with flag %d"%(self.__class__.__name__, ISTATE))
+            
+            if output_list is not None and not opts["report_continuously"]:
+                opts["output_index"] = output_index
             
         else:
             
@@ -386,10 +440,7 @@ class LSODAR(Explicit_ODE):
             for tout in output_list:
                 output_index += 1
 
-                y, t, ISTATE, RWORK, IWORK, roots = dlsodar(rhs, y.copy(), t, tout, ITOL, 
-                    rtol, atol,
-                    ITASK, ISTATE, IOPT, RWORK, IWORK, jac_fcn, JT, g_fcn, JROOT,
-                    f_extra_args = rhs_extra_args, g_extra_args = g_extra_args)
+                y, t, ISTATE, RWORK, IWORK, roots = lsod(y.copy(), t, tout, ITASK, ISTATE, RWORK, IWORK)
                 
                 #Store results
                 tlist.append(t)
@@ -404,7 +455,7 @@ class LSODAR(Explicit_ODE):
                     flag = ID_PY_EVENT
                     break
                 elif ISTATE < 0:
-                    raise ODEPACK_Exception("LSODAR failed with flag %d"%ISTATE)
+                    raise ODEPACK_Exception("%s failed with flag %d"%(self.__class__.__name__, ISTATE))
             
             opts["output_index"] = output_index
         # deciding on restarting options
@@ -412,11 +463,9 @@ class LSODAR(Explicit_ODE):
         #print 'rkstarter_active set to {} and ISTATE={}'.format(self._rkstarter_active, ISTATE)
         
         #Retrieving statistics
-        self.statistics["nstatefcns"]            += IWORK[9]
-        self.statistics["nsteps"]        += IWORK[10]
-        self.statistics["nfcns"]          += IWORK[11]
-        self.statistics["njacs"]          += IWORK[12]
-        self.statistics["nstateevents"] += 1  if flag == ID_PY_EVENT else 0
+        self._update_statistics(IWORK)
+        if not locate_events: #Counted by the event locator
+            self.statistics["nstateevents"] += 1  if flag == ID_PY_EVENT else 0
         # save RWORK, IWORK for restarting feature
         if self.rkstarter>1:
             self._RWORK=RWORK
@@ -666,6 +715,426 @@ class LSODAR(Explicit_ODE):
     
     rkstarter = property(_get_rkstarter, _set_rkstarter)
 
+class LSODES(LSODAR):
+    """
+        LSODES is a multistep method for solving stiff explicit ordinary
+        differential equations on the form,
+        
+        .. math::
+    
+            \dot{y} = f(t,y), \quad y(t_0) = y_0,
+            
+        where the Jacobian, df/dy, is sparse. LSODES uses the BDF method
+        and solves the linear systems with a direct sparse solver (the
+        Yale Sparse Matrix Package).
+        
+        The sparsity structure of the Jacobian is taken from the problem
+        attribute jac_sparsity if given, otherwise it is determined by
+        ODEPACK from the Jacobian (see usejac) or from the right-hand side.
+        The number of nonzero elements, jac_nnz, is used to estimate the
+        size of the work arrays.
+        
+        LSODES does not monitor events itself, the state events are
+        located by Assimulo between the steps.
+        
+        LSODES is part of ODEPACK, http://www.netlib.org/odepack/opkd-sum
+    """
+    
+    def __init__(self, problem):
+        """
+        Initiates the solver.
+        
+            Parameters::
+            
+                problem     
+                            - The problem to be solved. Should be an instance
+                              of the 'Explicit_Problem' class.
+        """
+        LSODAR.__init__(self, problem) #Calls the base class
+        
+        self._rootfinding = False #The state events are located by Assimulo
+        self._event_info = None
+        self._lrw = 0 #Length of the real work array required by ODEPACK
+        
+    def initialize(self):
+        """
+        Initializes the overall simulation process
+        (called before _simulate) 
+        """ 
+        LSODAR.initialize(self)
+        
+        #The sparsity pattern, with the diagonal as needed by the iteration matrix
+        if self.problem_info["jac_sparsity"] is not None:
+            pattern = abs(sp.csc_matrix(self.problem_info["jac_sparsity"], dtype=float)) + sp.eye(self._leny, format="csc")
+            pattern.sort_indices()
+            self._jac_pattern = pattern
+        else:
+            self._jac_pattern = None
+        
+        if self.problem_info["state_events"]:
+            if self.problem_info["switches"]:
+                def event_func(t, y):
+                    return self.problem.state_events(t, y, self.sw)
+            else:
+                def event_func(t, y):
+                    return self.problem.state_events(t, y)
+            self.event_func = event_func
+            self._event_info = [0] * self.problem_info["dimRoot"]
+    
+    def _nordsieck_start_index(self):
+        """
+        Returns the (zero based) index of the Nordsieck history array in
+        the real work array (the optional output LYH).
+        """
+        return self._IWORK[21] - 1
+    
+    def _rwork_length(self):
+        """
+        Estimates the length of the real work array from the number of
+        nonzero elements in the Jacobian. The estimate of ODEPACK is a
+        crude lower bound and is doubled to account for the fill-in of
+        the sparse LU factorization.
+        """
+        n = self.problem_info["dim"]
+        if self._jac_pattern is not None:
+            nnz = self._jac_pattern.nnz
+        elif self.problem_info["jac_fcn_nnz"] > 0:
+            nnz = min(n*n, self.problem_info["jac_fcn_nnz"] + n)
+        else:
+            nnz = min(n*n, 10*n)
+        lwm = 2*nnz + 2*n + (nnz + 10*n)//2
+        
+        return max(20 + n*(self.maxords + 1) + 3*n + 2*lwm, self._lrw)
+    
+    def integrate_start(self, t, y):
+        """
+        Helper program for the initialization of LSODES. The sparsity
+        structure, if given, is stored in the integer work array.
+        """
+        n = self.problem_info["dim"]
+        pattern = self._jac_pattern
+        
+        RWORK = N.zeros(self._rwork_length())
+        if pattern is None:
+            IWORK = N.zeros(30, dtype=N.int32)
+        else:
+            IWORK = N.zeros(31 + n + pattern.nnz, dtype=N.int32)
+            IWORK[30:31+n] = pattern.indptr + 1 #IA
+            IWORK[31+n:]   = pattern.indices + 1 #JA
+        
+        return 1, RWORK, IWORK
+    
+    def _set_work_options(self, RWORK, IWORK):
+        """
+        Sets the optional inputs of the work arrays and returns the
+        ODEPACK integrator as a function lsod(y, t, tout, ITASK, ISTATE,
+        RWORK, IWORK) returning y, t, ISTATE, RWORK, IWORK and the roots.
+        """
+        ITOL  = 2 #Only  atol is a  vector
+        IOPT = 1 #optional inputs are used
+        
+        #Method flag, MF = 100*MOSS + 10*METH + MITER
+        MITER = 1 if self.usejac else 2
+        if self._jac_pattern is not None:
+            MOSS = 0 #Structure given in IWORK
+        else:
+            MOSS = MITER #Structure determined from the Jacobian or the rhs
+        MF = 100*MOSS + 20 + MITER
+        
+        #Setting work options
+        RWORK[5] = self.options["maxh"]
+        
+        #Setting iwork options
+        IWORK[4] = self.maxords
+        IWORK[5] = self.maxsteps
+        
+        if self.usejac:
+            def jac_fcn(t, y, j, ian, jan):
+                #The columns are requested in order, starting with the first
+                if j == 1:
+                    self._jac_csc = sp.csc_matrix(self.problem.jac(t, y))
+                jac = self._jac_csc
+                col = N.zeros(len(y))
+                col[jac.indices[jac.indptr[j-1]:jac.indptr[j]]] = jac.data[jac.indptr[j-1]:jac.indptr[j]]
+                return col
+        else:
+            def jac_fcn(t, y, j, ian, jan):
+                return N.zeros(len(y))
+        
+        #Extra args to rhs
+        rhs_extra_args = (self.sw,) if self.problem_info["switches"] else ()
+        
+        #Tolerances:
+        atol = self.atol
+        rtol = self.rtol*N.ones(self.problem_info["dim"])
+        rhs = self._get_rhs()
+        
+        def lsod(y, t, tout, ITASK, ISTATE, RWORK, IWORK):
+            options = (RWORK[:20].copy(), IWORK.copy())
+            
+            y_out, t_out, ISTATE_out, RWORK, IWORK = dlsodes(rhs, y.copy(), t, tout, ITOL, rtol, atol,
+                    ITASK, ISTATE, IOPT, RWORK, IWORK, jac_fcn, MF, f_extra_args = rhs_extra_args)
+            
+            while ISTATE_out == -3 and ISTATE == 1 and IWORK[16] > len(RWORK):
+                #The estimated real work array is too short, retry with the length required
+                self._lrw = IWORK[16]
+                RWORK = N.zeros(self._lrw)
+                RWORK[:20], IWORK = options
+                
+                y_out, t_out, ISTATE_out, RWORK, IWORK = dlsodes(rhs, y.copy(), t, tout, ITOL, rtol, atol,
+                        ITASK, ISTATE, IOPT, RWORK, IWORK, jac_fcn, MF, f_extra_args = rhs_extra_args)
+            
+            return y_out, t_out, ISTATE_out, RWORK, IWORK, None
+        
+        return lsod
+    
+    def _update_statistics(self, IWORK):
+        """
+        Adds the optional outputs of the last call to the statistics.
+        """
+        self.statistics["nsteps"]        += IWORK[10]
+        self.statistics["nfcns"]         += IWORK[11]
+        self.statistics["njacs"]         += IWORK[12]
+        self.statistics["nlus"]          += IWORK[20]
+        if not self.usejac:
+            self.statistics["nfcnjacs"]  += IWORK[19]*IWORK[12]
+    
+    def set_event_info(self, event_info):
+        self._event_info = event_info
+    
+    def print_statistics(self, verbose=NORMAL):
+        """
+        Prints the run-time statistics for the problem.
+        """
+        Explicit_ODE.print_statistics(self, verbose) #Calls the base class
+
+        self.log_message('\nSolver options:\n',                                      verbose)
+        self.log_message(' Solver                  : LSODES ',         verbose)
+        self.log_message(' Absolute tolerances     : {}'.format(self.options["atol"]),  verbose)
+        self.log_message(' Relative tolerances     : {}'.format(self.options["rtol"]),  verbose)
+        self.log_message(' Sparsity structure      : {}'.format("given" if self._jac_pattern is not None else "computed"),  verbose)
+        if self.maxords < 5:
+            self.log_message(' Maximal order BDF       : {}'.format(self.maxords),  verbose)
+        if self.maxh > 0. :
+            self.log_message(' Maximal stepsize maxh   : {}'.format(self.maxh),  verbose)
+        self.log_message('',                                                         verbose)
+    
+    def _set_rkstarter(self, rkstarter):
+        if rkstarter != 1:
+            raise ODEPACK_Exception("{} only supports the classical starter (rkstarter = 1).".format(self.__class__.__name__))
+        self.options["rkstarter"] = rkstarter
+    
+    rkstarter = property(LSODAR._get_rkstarter, _set_rkstarter)
+
+class LSODKR(LSODAR):
+    """
+        LSODKR is a multistep method for solving explicit ordinary 
+        differential equations on the form,
+        
+        .. math::
+    
+            \dot{y} = f(t,y), \quad y(t_0) = y_0.
+            
+        LSODKR uses the BDF method and automatically switches between
+        functional iteration and a Newton iteration where the linear
+        systems are solved with the preconditioned Krylov method SPIGMR.
+        It is also able to monitor events.
+        
+        A preconditioner, P = I - gamma*J where J approximates df/dy, is
+        used if the problem defines prec_solve (and optionally prec_setup),
+        with the same signatures as for CVode,
+        
+            prec_setup(t, y, fy, jok, gamma, data) -> (jcur, data)
+            prec_solve(t, y, fy, r, gamma, delta, data) -> z
+            
+        The preconditioner is applied from the left.
+        
+        LSODKR is part of ODEPACK, http://www.netlib.org/odepack/opkd-sum
+    """
+    
+    def __init__(self, problem):
+        """
+        Initiates the solver.
+        
+            Parameters::
+            
+                problem     
+                            - The problem to be solved. Should be an instance
+                              of the 'Explicit_Problem' class.
+        """
+        LSODAR.__init__(self, problem) #Calls the base class
+        
+        #Default values
+        self.options["maxkrylov"] = 5
+        
+        #Statistics
+        self.statistics.add_key("nliters", "Number of linear iterations")
+        self.statistics.add_key("nlcfails", "Number of linear convergence failures")
+        
+        self._prec_data = None
+        
+    def initialize(self):
+        """
+        Initializes the overall simulation process
+        (called before _simulate) 
+        """ 
+        LSODAR.initialize(self)
+        
+        self._prec_data = None
+    
+    def integrate_start(self, t, y):
+        """
+        Helper program for the initialization of LSODKR.
+        """
+        n = self.problem_info["dim"]
+        ng = self.problem_info["dimRoot"]
+        maxl = self.maxkrylov
+        
+        #Lengths for MF = 22 and KMP = MAXL, with one element each of the
+        #preconditioner work arrays (the preconditioner data is kept in Python)
+        lrw = 20 + 3*ng + n*(self.maxords + 1) + n*(maxl + 2) + (maxl + 3)*maxl + 1 + 1 + 4*n
+        liw = 30 + 1
+        
+        return 1, N.zeros(lrw), N.zeros(liw, dtype=N.int32)
+    
+    def _set_work_options(self, RWORK, IWORK):
+        """
+        Sets the optional inputs of the work arrays and returns the
+        ODEPACK integrator as a function lsod(y, t, tout, ITASK, ISTATE,
+        RWORK, IWORK) returning y, t, ISTATE, RWORK, IWORK and the roots.
+        """
+        ITOL  = 2 #Only  atol is a  vector
+        IOPT = 1 #optional inputs are used
+        MF = 22 #BDF with SPIGMR
+        
+        JROOT = N.array([0]*self.problem_info["dimRoot"], dtype=N.int32)
+        
+        #Setting work options
+        RWORK[5] = self.options["maxh"]
+        
+        #Setting iwork options
+        IWORK[0] = 1 #LWP
+        IWORK[1] = 1 #LIWP
+        IWORK[2] = 1 if self.problem_info["prec_solve"] else 0 #JPRE, left preconditioning
+        IWORK[3] = 1 if self.problem_info["prec_solve"] and self.problem_info["prec_setup"] else 0 #JACFLG
+        IWORK[4] = self.maxords
+        IWORK[5] = self.maxsteps
+        IWORK[7] = self.maxkrylov
+        
+        #The state events
+        if self.problem_info["state_events"]:
+            if self.problem_info["switches"]:
+                def state_events(t,y,sw):
+                    return self.problem.state_events(t,y,sw)
+                g_fcn = state_events
+            else:
+                def state_events(t,y):
+                    return self.problem.state_events(t,y)
+                g_fcn = state_events
+        else:
+            g_fcn = g_dummy
+        
+        #The preconditioner, P = I - hl0*J
+        if IWORK[3] == 1:
+            def jac_fcn(t, y, ysv, rewt, fty, v, hlo, jok, wp, iwp):
+                try:
+                    jcur, self._prec_data = self.problem.prec_setup(t, y, fty, jok == 1, hlo, self._prec_data)
+                except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+                    return 1 #Recoverable error
+                return 0
+        else:
+            def jac_fcn(t, y, ysv, rewt, fty, v, hlo, jok, wp, iwp):
+                return 0
+        
+        if IWORK[2] == 1:
+            def psol_fcn(t, y, fty, wk, hlo, wp, iwp, b, lr):
+                try:
+                    z = self.problem.prec_solve(t, y, fty, b, hlo, 0.0, self._prec_data)
+                except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+                    return b, 1 #Recoverable error
+                return z, 0
+        else:
+            def psol_fcn(t, y, fty, wk, hlo, wp, iwp, b, lr):
+                return b, 0
+        
+        #Extra args to rhs and state_events
+        rhs_extra_args = (self.sw,) if self.problem_info["switches"] else ()
+        g_extra_args = (self.sw,) if self.problem_info["switches"] else ()
+        
+        #Tolerances:
+        atol = self.atol
+        rtol = self.rtol*N.ones(self.problem_info["dim"])
+        rhs = self._get_rhs()
+        
+        def lsod(y, t, tout, ITASK, ISTATE, RWORK, IWORK):
+            return dlsodkr(rhs, y, t, tout, ITOL, rtol, atol,
+                    ITASK, ISTATE, IOPT, RWORK, IWORK, jac_fcn, psol_fcn, MF, g_fcn, JROOT,
+                    f_extra_args = rhs_extra_args, g_extra_args = g_extra_args)
+        
+        return lsod
+    
+    def _update_statistics(self, IWORK):
+        """
+        Adds the optional outputs of the last call to the statistics.
+        """
+        self.statistics["nstatefcns"]    += IWORK[9]
+        self.statistics["nsteps"]        += IWORK[10]
+        self.statistics["nfcns"]         += IWORK[11]
+        if self.problem_info["prec_solve"] and self.problem_info["prec_setup"]:
+            self.statistics["nprecsetups"] += IWORK[12]
+        self.statistics["nniters"]       += IWORK[18]
+        self.statistics["nliters"]       += IWORK[19]
+        if self.problem_info["prec_solve"]:
+            self.statistics["nprecs"]    += IWORK[20]
+        self.statistics["nnfails"]       += IWORK[21]
+        self.statistics["nlcfails"]      += IWORK[22]
+    
+    def print_statistics(self, verbose=NORMAL):
+        """
+        Prints the run-time statistics for the problem.
+        """
+        Explicit_ODE.print_statistics(self, verbose) #Calls the base class
+
+        self.log_message('\nSolver options:\n',                                      verbose)
+        self.log_message(' Solver                  : LSODKR ',         verbose)
+        self.log_message(' Absolute tolerances     : {}'.format(self.options["atol"]),  verbose)
+        self.log_message(' Relative tolerances     : {}'.format(self.options["rtol"]),  verbose)
+        self.log_message(' Preconditioning         : {}'.format("left" if self.problem_info["prec_solve"] else "none"),  verbose)
+        self.log_message(' Maximum Krylov dimension: {}'.format(self.maxkrylov),  verbose)
+        if self.maxords < 5:
+            self.log_message(' Maximal order BDF       : {}'.format(self.maxords),  verbose)
+        if self.maxh > 0. :
+            self.log_message(' Maximal stepsize maxh   : {}'.format(self.maxh),  verbose)
+        self.log_message('',                                                         verbose)
+    
+    def _get_maxkrylov(self):
+        """
+        The maximum dimension of the Krylov subspace (MAXL), i.e. the
+        maximum number of linear iterations per nonlinear iteration.
+        
+            Parameters::
+            
+                maxkrylov
+                            - Default 5
+                            
+                            - Should be a positive integer
+        """
+        return self.options["maxkrylov"]
+    
+    def _set_maxkrylov(self, maxkrylov):
+        try:
+            maxkrylov = int(maxkrylov)
+        except (TypeError, ValueError):
+            raise ODEPACK_Exception("Maximum Krylov dimension must be a positive integer.")
+        if maxkrylov < 1:
+            raise ODEPACK_Exception("Maximum Krylov dimension must be a positive integer.")
+        self.options["maxkrylov"] = maxkrylov
+    
+    maxkrylov = property(_get_maxkrylov, _set_maxkrylov)
+    
+    _set_rkstarter = LSODES._set_rkstarter
+    rkstarter = property(LSODAR._get_rkstarter, _set_rkstarter)
+
 class RKStarterNordsieck(object):
     """
     A family of Runge-Kutta starters producing a 
@@ -19,13 +19,16 @@ import numpy as N
 import scipy as S
 import scipy.linalg as LIN
 import scipy.sparse as sp
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer as timer
 
 from assimulo.exception import *
 from assimulo.ode import *
 
 from assimulo.explicit_ode import Explicit_ODE
 from assimulo.implicit_ode import Implicit_ODE
-from assimulo.lib.radau_core import Radau_Common
+from assimulo.lib.radau_core import Radau_Common, Radau_LU
+from assimulo.lib.jacobian import FDJacobian, band_storage, mass_storage
 
 from assimulo.lib import radau5
 
@@ -50,6 +53,21 @@ class Radau5Error(AssimuloException):
             return repr('Radau failed with flag %s. At time %f.'%(self.value, self.t))
 
 
+def _contr5(cont, time):
+    """
+    Evaluates the collocation polynomial of the last step taken by the
+    Fortran Radau5 for all the components (as CONTR5 but vectorized). If
+    time is a vector of time points, an array of shape (len(time), nn) is
+    returned.
+    """
+    conra5 = radau5.conra5
+    nn = int(conra5.nn)
+    s = (N.asarray(time, dtype=float) - conra5.xsol)/conra5.hsol
+    if s.ndim > 0:
+        s = s[:,N.newaxis]
+    
+    return cont[:nn] + s*(cont[nn:2*nn] + (s - conra5.c2m1)*(cont[2*nn:3*nn] + (s - conra5.c1m1)*cont[3*nn:4*nn]))
+
 class Radau5ODE(Radau_Common,Explicit_ODE):
     """
     Radau IIA fifth-order three-stages with step-size control and 
@@ -57,6 +75,10 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
     G.Wanner, which can be found here: 
     http://www.unige.ch/~hairer/software.html
     
+    Linearly implicit problems, M*y' = f(t,y), with a constant (possibly
+    singular) mass matrix M are solved if the problem attribute
+    mass_matrix is set.
+    
     Details about the implementation (FORTRAN) can be found in the book,::
     
         Solving Ordinary Differential Equations II,
@@ -94,6 +116,8 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
         self.options["rtol"]     = 1.0e-6 #Relative tolerance
         self.options["usejac"]   = True if self.problem_info["jac_fcn"] else False
         self.options["maxsteps"] = 100000
+        self.options["linear_solver"] = "DENSE"
+        self.options["light_reinit"] = False
         
         #Solver support
         self.supports["report_continuously"] = True
@@ -105,20 +129,56 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
         self._event_info = None
         self._werr = N.zeros(self._leny)
         
+        #Work arrays, kept between the calls to Radau5
+        self._work_key = None
+        self._rtol_vec = None
+        
     def initialize(self):
         #Reset statistics
-        self.statistics.reset()
-        #for k in self.statistics.keys():
-        #    self.statistics[k] = 0
+        self.statistics.reset()
+        #for k in self.statistics.keys():
+        #    self.statistics[k] = 0
+        
+        #Nothing is carried over from a previous simulation
+        self._last_h = None
+        self._jac_stored = False
+        
+        #The mass matrix in the storage used by Radau5
+        self._mass = None
+        if self.problem_info["mass_matrix"] is not None:
+            self._mass = mass_storage(self.problem_info["mass_matrix"], self.problem_info["dim"], self.problem_info["mass_bandwidth"])
+            if self.options["linear_solver"] == "BAND":
+                ml, mu = self.problem_info["jac_bandwidth"]
+                if self.problem_info["mass_bandwidth"] is None or self._mass[1] > ml or self._mass[2] > mu:
+                    raise Explicit_ODE_Exception("For the BAND linear solver, the bandwidth of the mass matrix must be specified via the problem attribute 'mass_bandwidth' = (ml, mu) and be within the bandwidth of the Jacobian.")
+    
+    def _get_work_arrays(self, key, lwork, liwork):
+        """
+        Returns the work arrays for Radau5. They are allocated once per
+        problem size and Jacobian structure (key) and reused by the
+        following calls, which also keeps the last Jacobian in WORK.
+        """
+        if self._work_key != key:
+            self._work_key = key
+            self._WORK  = N.zeros(lwork) #Work (double) vector
+            self._IWORK = N.zeros(liwork, dtype=N.intc) #Work (integer) vector
+            self._jac_stored = False
+        else:
+            #Reset the parameters, the working area is kept
+            self._WORK[:20]  = 0.0
+            self._IWORK[:20] = 0
+        
+        return self._WORK, self._IWORK
             
     def set_problem_data(self):
+        rhs_fcn = self._get_rhs()
         if self.problem_info["state_events"]:
             def event_func(t, y):
                 return self.problem.state_events(t, y, self.sw)
             def f(t, y):
                 ret = 0
                 try:
-                    rhs = self.problem.rhs(t, y, self.sw)
+                    rhs = rhs_fcn(t, y, self.sw)
                 except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
                     rhs = y.copy()
                     ret = -1 #Recoverable error
@@ -131,7 +191,7 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
             def f(t, y):
                 ret = 0
                 try:
-                    rhs = self.problem.rhs(t, y)
+                    rhs = rhs_fcn(t, y)
                 except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
                     rhs = y.copy()
                     ret = -1 #Recoverable error
@@ -139,11 +199,12 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
             self.f = f
     
     def interpolate(self, time):
-        y = N.empty(self._leny)
-        for i in range(self._leny):
-            y[i] = radau5.contr5(i+1, time, self.cont)
-        
-        return y
+        """
+        Evaluates the collocation polynomial of the last step for all the
+        components. If time is a vector of time points, an array of shape
+        (len(time), dim) is returned.
+        """
+        return _contr5(self.cont, time)[...,:self._leny]
         
     def get_weighted_local_errors(self):
         """
@@ -173,15 +234,11 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
             else:
                 output_list = self._opts["output_list"]
                 output_index = self._opts["output_index"]
-                try:
-                    while output_list[output_index] <= t:
-                        self._tlist.append(output_list[output_index])
-                        self._ylist.append(self.interpolate(output_list[output_index]))
-                        
-                        output_index += 1
-                except IndexError:
-                    pass
-                self._opts["output_index"] = output_index
+                output_end = output_index + N.searchsorted(output_list[output_index:], t, side="right")
+                if output_end > output_index:
+                    self._tlist.extend(output_list[output_index:output_end])
+                    self._ylist.extend(self.interpolate(output_list[output_index:output_end]))
+                self._opts["output_index"] = output_end
                 
                 if self.problem_info["state_events"] and flag == ID_PY_EVENT and len(self._tlist) > 0 and self._tlist[-1] != t:
                     self._tlist.append(t)
@@ -196,22 +253,94 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
         """
         jac = self.problem.jac(t,y)
         
+        if self.options["linear_solver"] == "BAND":
+            return band_storage(jac, *self.problem_info["jac_bandwidth"])
+        
         if isinstance(jac, sp.csc_matrix):
             jac = jac.toarray()
         
         return jac
+    
+    def _mas(self, am):
+        """
+        Returns the (constant) mass matrix of the problem.
+        """
+        return self._mass[0]
+    
+    def _set_linear_solver(self, lsolver):
+        lsolver = str(lsolver).upper()
+        if lsolver not in ("DENSE", "BAND"):
+            raise Explicit_ODE_Exception('The linear solver must be either "DENSE" or "BAND".')
+        if lsolver == "BAND" and self.problem_info["jac_bandwidth"] is None:
+            raise Explicit_ODE_Exception("For the BAND linear solver, the bandwidth of the Jacobian must be specified via the problem attribute 'jac_bandwidth' = (ml, mu).")
+        self.options["linear_solver"] = lsolver
+    
+    def _get_linear_solver(self):
+        """
+        Specifies the linear algebra used by Radau5. With 'BAND' the
+        Jacobian is treated as banded with the lower and upper bandwidths
+        given by the problem attribute jac_bandwidth = (ml, mu) (MLJAC and
+        MUJAC in Radau5). A user defined Jacobian may then be given either
+        as a full matrix or in compact band storage, an array of shape
+        (ml+mu+1, dim) where jac[mu+i-j, j] = df_i/dy_j.
+        
+            Parameters::
             
+                linear_solver
+                        - Default 'DENSE'. Can also be 'BAND'.
+        """
+        return self.options["linear_solver"]
+    
+    linear_solver = property(_get_linear_solver, _set_linear_solver)
+    
+    def _set_light_reinit(self, light_reinit):
+        self.options["light_reinit"] = bool(light_reinit)
+    
+    def _get_light_reinit(self):
+        """
+        A Boolean flag which indicates that the reinitializations of
+        the solver after events are light, i.e. that Radau5 restarts
+        with the last step size used (instead of inith) and with the
+        last Jacobian, which is kept in the work arrays. The Jacobian
+        is evaluated again if the Newton iteration fails to converge.
+        The LU decompositions are recomputed, as the step size changes.
+        
+            Parameters::
+            
+                light_reinit
+                                - Default 'False'.
+                
+                                - Should be a boolean.
+                                
+                                    Example:
+                                        light_reinit = True
+        """
+        return self.options["light_reinit"]
+    
+    light_reinit = property(_get_light_reinit, _set_light_reinit)
+    
     def integrate(self, t, y, tf, opts):
         ITOL  = 1 #Both atol and rtol are vectors
         IJAC  = 1 if self.usejac else 0 #Switch for the jacobian, 0==NO JACOBIAN
-        MLJAC = self.problem_info["dim"] #The jacobian is full
-        MUJAC = self.problem_info["dim"] #See MLJAC
-        IMAS  = 0 #The mass matrix is the identity
-        MLMAS = self.problem_info["dim"] #The mass matrix is full
-        MUMAS = self.problem_info["dim"] #See MLMAS
+        if self.options["linear_solver"] == "BAND":
+            MLJAC, MUJAC = self.problem_info["jac_bandwidth"] #The jacobian is banded
+            LJAC, LE = MLJAC+MUJAC+1, 2*MLJAC+MUJAC+1 #Sizes of the jacobian and its LU factors
+        else:
+            MLJAC = self.problem_info["dim"] #The jacobian is full
+            MUJAC = self.problem_info["dim"] #See MLJAC
+            LJAC = LE = self.problem_info["dim"]
+        if self._mass is None:
+            IMAS  = 0 #The mass matrix is the identity
+            MLMAS = self.problem_info["dim"] #The mass matrix is full
+            MUMAS = self.problem_info["dim"] #See MLMAS
+            LMAS  = 0
+        else:
+            IMAS  = 1 #The mass matrix is supplied
+            MLMAS, MUMAS = self._mass[1:] #Full if equal to the dimension, otherwise banded
+            LMAS  = self._mass[0].shape[0]
         IOUT  = 1 #solout is called after every step
-        WORK  = N.array([0.0]*(4*self.problem_info["dim"]**2+12*self.problem_info["dim"]+20)) #Work (double) vector
-        IWORK = N.array([0]*(3*self.problem_info["dim"]+20)) #Work (integer) vector
+        WORK, IWORK = self._get_work_arrays((IJAC, MLJAC, MUJAC, LMAS), self.problem_info["dim"]*(LJAC+LMAS+3*LE+12)+20,
+                                            3*self.problem_info["dim"]+20)
         
         #Setting work options
         WORK[1] = self.safe
@@ -227,8 +356,14 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
         IWORK[1] = self.maxsteps
         IWORK[2] = self.newt
         
+        #Restart with the last step size and Jacobian
+        inith = self.inith
+        if self.options["light_reinit"] and self._last_h is not None:
+            inith = self._last_h
+            IWORK[10] = 1 if self._jac_stored else 0
+        
         #Dummy methods
-        mas_dummy = lambda t:x
+        mas_dummy = (lambda t:x) if not IMAS else self._mas
         jac_dummy = (lambda t:x) if not self.usejac else self._jacobian
         
         #Check for initialization
@@ -241,9 +376,16 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
         #Store the opts
         self._opts = opts
         
-        t, y, h, iwork, flag =  radau5.radau5(self.f, t, y.copy(), tf, self.inith, self.rtol*N.ones(self.problem_info["dim"]), self.atol, 
+        if self._rtol_vec is None:
+            self._rtol_vec = N.empty(self.problem_info["dim"])
+        self._rtol_vec[:] = self.rtol #Refilled as the tolerances are modified by the solver
+        
+        t, y, h, iwork, flag =  radau5.radau5(self.f, t, y.copy(), tf, inith, self._rtol_vec, self.atol, 
                         ITOL, jac_dummy, IJAC, MLJAC, MUJAC, mas_dummy, IMAS, MLMAS, MUMAS, self._solout, IOUT, WORK, IWORK)
         
+        self._last_h = h
+        self._jac_stored = self._jac_stored or iwork[14] > 0
+        
         #Checking return
         if flag == 1:
             flag = ID_PY_COMPLETE
@@ -256,7 +398,7 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
         self.statistics["nsteps"]      += iwork[16]
         self.statistics["nfcns"]        += iwork[13]
         self.statistics["njacs"]        += iwork[14]
-        self.statistics["nfcnjacs"]    += (iwork[14]*self.problem_info["dim"] if not self.usejac else 0)
+        self.statistics["nfcnjacs"]    += (iwork[14]*min(LJAC, self.problem_info["dim"]) if not self.usejac else 0)
         #self.statistics["nstepstotal"] += iwork[15]
         self.statistics["nerrfails"]     += iwork[17]
         self.statistics["nlus"]         += iwork[18]
@@ -279,6 +421,8 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
         self.log_message(' Solver                  : Radau5 ' + self._type,          verbose)
         self.log_message(' Tolerances (absolute)   : ' + str(self._compact_atol()),  verbose)
         self.log_message(' Tolerances (relative)   : ' + str(self.options["rtol"]),  verbose)
+        if self.options["light_reinit"]:
+            self.log_message(' Light reinitialization  : ' + str(self.options["light_reinit"]),  verbose)
         self.log_message('',                                                         verbose)
         
 
@@ -326,6 +470,7 @@ class _Radau5ODE(Radau_Common,Explicit_ODE):
         self.options["rtol"]     = 1.0e-6 #Relative tolerance
         self.options["usejac"]   = True if self.problem_info["jac_fcn"] else False
         self.options["maxsteps"] = 10000
+        self.options["linear_solver"] = "DENSE"
         
         #Internal values
         self._curjac = False #Current jacobian?
@@ -355,12 +500,140 @@ class _Radau5ODE(Radau_Common,Explicit_ODE):
         self.supports["one_step_mode"] = True
         self.supports["interpolated_output"] = True
         
+        #Thread pool for the stage systems (num_threads > 1)
+        self._pool = None
+        self._pool_threads = 0
+        
+        #Statistics
+        self.statistics.add_key("tlus", "Time in LU decompositions [s]")
+        self.statistics.add_key("tsolves", "Time in linear solves [s]")
+        
         # - Retrieve the Radau5 parameters
         self._load_parameters() #Set the Radau5 parameters
     
     def initialize(self):
         #Reset statistics
-        self.statistics.reset()
+        self.statistics.reset()
+        
+        #Numeric jacobian, created when first needed (see _get_fd_jac)
+        self._fd_jac = None
+    
+    def _get_fd_jac(self):
+        """
+        Returns the numeric (colored) jacobian, sparse for the sparse
+        linear solvers.
+        """
+        if self._fd_jac is None:
+            output = "DENSE" if self.options["linear_solver"] == "DENSE" else "CSC"
+            sparsity = self.problem_info["jac_sparsity"]
+            if sparsity is None and self.options["linear_solver"] == "BAND":
+                ml, mu = self.problem_info["jac_bandwidth"]
+                sparsity = sp.diags([1.0]*(ml+mu+1), range(-ml, mu+1), shape=(self._leny, self._leny))
+            self._fd_jac = FDJacobian(self._leny, sparsity, output)
+        return self._fd_jac
+    
+    def _set_linear_solver(self, lsolver):
+        lsolver = str(lsolver).upper()
+        if lsolver not in ("DENSE", "SPARSE", "BAND"):
+            raise Explicit_ODE_Exception('The linear solver must be either "DENSE", "SPARSE" or "BAND".')
+        if lsolver == "BAND" and self.problem_info["jac_bandwidth"] is None:
+            raise Explicit_ODE_Exception("For the BAND linear solver, the bandwidth of the Jacobian must be specified via the problem attribute 'jac_bandwidth' = (ml, mu).")
+        self.options["linear_solver"] = lsolver
+    
+    def _get_linear_solver(self):
+        """
+        Specifies the linear solver used for the systems in the simplified
+        Newton iterations. With 'SPARSE' the systems are factorized by
+        SuperLU (through scipy.sparse) and the Jacobian may be given as a
+        scipy.sparse matrix. With 'BAND' a band LU factorization is used
+        where the lower and upper bandwidths of the Jacobian are given by
+        the problem attribute jac_bandwidth = (ml, mu).
+        
+            Parameters::
+            
+                linear_solver
+                        - Default 'DENSE'. Can also be 'SPARSE' or 'BAND'.
+        """
+        return self.options["linear_solver"]
+    
+    linear_solver = property(_get_linear_solver, _set_linear_solver)
+    
+    def _set_num_threads(self, num_threads):
+        try:
+            num_threads = int(num_threads)
+        except (ValueError, TypeError):
+            raise Explicit_ODE_Exception('The number of threads must be an integer.')
+        if num_threads < 1:
+            raise Explicit_ODE_Exception('The number of threads must be a positive integer.')
+        self.options["num_threads"] = num_threads
+    
+    def _get_num_threads(self):
+        """
+        Specifies the number of threads used for the stage systems of the
+        simplified Newton iterations. With more than one thread, the LU
+        factorizations and the solves of the real and the complex stage
+        systems are computed concurrently in a thread pool (LAPACK and SuperLU
+        release the GIL). This pays off for larger problems, where the
+        linear algebra dominates, and if the threads are not already
+        used by a multithreaded BLAS.
+        
+            Parameters::
+            
+                num_threads
+                        - Default 1.
+                        
+                        - Should be a positive integer.
+                        
+                            Example:
+                                num_threads = 3
+        """
+        return self.options["num_threads"]
+    
+    num_threads = property(_get_num_threads, _set_num_threads)
+    
+    def _map(self, fcn, *args):
+        """
+        Applies fcn to the stages, concurrently if num_threads > 1.
+        """
+        if self.options["num_threads"] == 1:
+            return list(map(fcn, *args))
+        
+        if self._pool is None or self._pool_threads != self.options["num_threads"]:
+            if self._pool is not None:
+                self._pool.shutdown()
+            self._pool = ThreadPoolExecutor(self.options["num_threads"])
+            self._pool_threads = self.options["num_threads"]
+        return list(self._pool.map(fcn, *args))
+    
+    def _shutdown_pool(self):
+        """
+        Shuts down the thread pool (if created).
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+            self._pool_threads = 0
+    
+    def finalize(self):
+        self._shutdown_pool()
+    
+    def _factorize(self, shift):
+        """
+        Computes the LU factorization of shift*I - J.
+        """
+        return Radau_LU(self._jac, shift, self._mass, self.options["linear_solver"], self.problem_info["jac_bandwidth"])
+    
+    def _solve(self, LU, b):
+        """
+        Solves a stage system using its LU factorization.
+        """
+        return LU.solve(b)
+    
+    def _transform(self, T, Z):
+        """
+        Computes kron(T, I)*Z without forming the Kronecker product.
+        """
+        return N.dot(T, Z.reshape(3,-1)).ravel()
     
     def step_generator(self, t, y, tf, opts):
         
@@ -377,7 +650,7 @@ class _Radau5ODE(Radau_Common,Explicit_ODE):
         self._tc = t
         self._yc = y
         
-        for i in range(self.maxsteps):
+        for i in range(self.maxsteps):
             
             if t < tf:
                 t, y = self._step(t, y)
@@ -403,9 +676,16 @@ class _Radau5ODE(Radau_Common,Explicit_ODE):
     def step(self, t, y, tf, opts):
         if opts["initialize"]:
             self._next_step = self.step_generator(t,y,tf,opts)
-        return next(self._next_step)
+        return next(self._next_step)
     
     def integrate(self, t, y, tf, opts):
+        try:
+            return self._integrate(t, y, tf, opts)
+        except:
+            self._shutdown_pool() #finalize is not called when the simulation fails
+            raise
+    
+    def _integrate(self, t, y, tf, opts):
         
         if opts["output_list"] is not None:
             
@@ -418,7 +698,7 @@ class _Radau5ODE(Radau_Common,Explicit_ODE):
             res = [ID_PY_OK]
             
             while res[0] != ID_PY_COMPLETE:
-                res = next(next_step)
+                res = next(next_step)
                 try:
                     while output_list[output_index] <= res[1]:
                         tlist.append(output_list[output_index])
@@ -429,7 +709,7 @@ class _Radau5ODE(Radau_Common,Explicit_ODE):
                     pass
             return res[0], tlist, ylist
         else:
-            [flags, tlist, ylist] = list(zip(*list(self.step_generator(t, y, tf,opts))))
+            [flags, tlist, ylist] = list(zip(*list(self.step_generator(t, y, tf,opts))))
 
             return flags[-1], tlist, ylist
         
@@ -543,7 +823,7 @@ class _Radau5ODE(Radau_Common,Explicit_ODE):
             Z[leny:2*leny]  = cq[1,0]*(newtval[:leny]+(cq[1,0]-self.C[1,0]+1.)*(newtval[leny:2*leny]+(cq[1,0]-self.C[0,0]+1.)*newtval[2*leny:3*leny]))
             Z[2*leny:3*leny]= cq[2,0]*(newtval[:leny]+(cq[2,0]-self.C[1,0]+1.)*(newtval[leny:2*leny]+(cq[2,0]-self.C[0,0]+1.)*newtval[2*leny:3*leny]))
             
-            W = N.dot(self.T2,Z)
+            W = self._transform(self.Tinv,Z)
             
         return Z, W
     
@@ -552,7 +832,7 @@ class _Radau5ODE(Radau_Common,Explicit_ODE):
         The newton iteration. 
         """
         
-        for k in range(20):
+        for k in range(20):
             
             self._curiter = 0 #Reset the iteration
             self._fac_con = max(self._fac_con, self._eps)**0.8;
@@ -564,35 +844,34 @@ class _Radau5ODE(Radau_Common,Explicit_ODE):
             if self._needLU:
                 self.statistics["nlus"] += 1
                 self._a = self._alpha/self.h
-                self._b = self._beta/self.h
                 self._g = self._gamma/self.h
-                self._B = self._g*self.I - self._jac
                 
-                self._P1,self._L1,self._U1 = S.linalg.lu(self._B) #LU decomposition
-                self._P2,self._L2,self._U2 = S.linalg.lu(self._a*self.I-self._jac)
-                self._P3,self._L3,self._U3 = S.linalg.lu(self._b*self.I-self._jac)
+                tstart = timer()
+                self._LU1, self._LU2 = self._map(self._factorize, (self._g, self._a)) #Real and complex LU decompositions
+                self.statistics["tlus"] += timer()-tstart
                 
                 self._needLU = False
                 
-                if min(abs(N.diag(self._U1)))<self._eps:
+                if self._LU1.singular:
                     raise Explicit_ODE_Exception('Error, gI-J is singular.')
                     
             Z, W = self.calc_start_values()
         
-            for i in range(self.newt):
+            for i in range(self.newt):
                 self._curiter += 1 #The current iteration
                 self.statistics["nniters"] += 1 #Adding one iteration
                 
                 #Solve the system
-                Z = N.dot(self.T2,self._radau_F(Z.real,t,y))
+                Z = self._transform(self.Tinv,self._radau_F(Z.real,t,y))
 
-                Z[:self._leny]              =Z[:self._leny]              -self._g*N.dot(self.I,W[:self._leny])
-                Z[self._leny:2*self._leny]  =Z[self._leny:2*self._leny]  -self._a*N.dot(self.I,W[self._leny:2*self._leny])   #+self._b*N.dot(self.I,W[2*self._leny:3*self._leny])
-                Z[2*self._leny:3*self._leny]=Z[2*self._leny:3*self._leny]-self._b*N.dot(self.I,W[2*self._leny:3*self._leny]) #-self._a*N.dot(self.I,W[2*self._leny:3*self._leny])
+                Z[:self._leny]              =Z[:self._leny]              -self._g*W[:self._leny]
+                Z[self._leny:2*self._leny]  =Z[self._leny:2*self._leny]  -self._a*W[self._leny:2*self._leny]
                 
-                Z[:self._leny]              =N.linalg.solve(self._U1,N.linalg.solve(self._L1,N.linalg.solve(self._P1,Z[:self._leny])))
-                Z[self._leny:2*self._leny]  =N.linalg.solve(self._U2,N.linalg.solve(self._L2,N.linalg.solve(self._P2,Z[self._leny:2*self._leny])))
-                Z[2*self._leny:3*self._leny]=N.linalg.solve(self._U3,N.linalg.solve(self._L3,N.linalg.solve(self._P3,Z[2*self._leny:3*self._leny])))
+                tstart = timer()
+                Z[:self._leny], Z[self._leny:2*self._leny] = self._map(self._solve,
+                    (self._LU1, self._LU2), (Z[:self._leny], Z[self._leny:2*self._leny]))
+                self.statistics["tsolves"] += timer()-tstart
+                Z[2*self._leny:3*self._leny]=Z[self._leny:2*self._leny].conj() #The conjugate of the complex stage
                 #----
                 newnrm = N.linalg.norm(Z.reshape(-1,self._leny)/self._scaling,'fro')/N.sqrt(3.*self._leny)
                       
@@ -621,7 +900,7 @@ class _Radau5ODE(Radau_Common,Explicit_ODE):
                 oldnrm = max(newnrm,self._eps) #Store oldnorm
                 W = W+Z #Perform the iteration
 
-                Z = N.dot(self.T3,W) #Calculate the new Z values
+                Z = self._transform(self.T,W) #Calculate the new Z values
                 
                 if self._fac_con*newnrm <= self.fnewt: #Convergence?
                     self._itfail = False;
@@ -689,7 +968,7 @@ class _Radau5ODE(Radau_Common,Explicit_ODE):
         temp = 1./self.h*(self.E[0]*self._Z[:self._leny]+self.E[1]*self._Z[self._leny:2*self._leny]+self.E[2]*self._Z[2*self._leny:3*self._leny])
 
         scal = self._scaling#/self.h
-        err_v = N.linalg.solve(self._U1,N.linalg.solve(self._L1,N.linalg.solve(self._P1,self._f0+temp)))
+        err_v = self._LU1.solve(self._f0+temp)
         err = N.linalg.norm(err_v/scal)
         err = max(err/N.sqrt(self._leny),1.e-10)
 
@@ -697,7 +976,7 @@ class _Radau5ODE(Radau_Common,Explicit_ODE):
             self.statistics["nfcns"] += 1
             err_new = N.array([0.0]*self._leny)
             self.f(err_new,self._tc,self._yc+err_v)
-            err_v =  N.linalg.solve(self._U1,N.linalg.solve(self._L1,N.linalg.solve(self._P1,err_new+temp)))
+            err_v = self._LU1.solve(err_new+temp)
             err = N.linalg.norm(err_v/scal)
             err = max(err/N.sqrt(self._leny),1.e-10)
 
@@ -715,12 +994,9 @@ class _Radau5ODE(Radau_Common,Explicit_ODE):
         if self.usejac: #Retrieve the user-defined jacobian
             cjac = self.problem.jac(t,y)
         else:           #Calculate a numeric jacobian
-            delt = N.array([(self._eps*max(abs(yi),1.e-5))**0.5 for yi in y])*N.identity(self._leny) #Calculate a disturbance
-            Fdelt = N.array([self.problem.rhs(t,y+e) for e in delt]) #Add the disturbance (row by row) 
-            grad = ((Fdelt-self.problem.rhs(t,y)).T/delt.diagonal()).T
-            cjac = N.array(grad).T
+            cjac = self._get_fd_jac()(self._get_rhs(), t, y)
 
-            self.statistics["nfcnjacs"] += 1+self._leny #Add the number of function evaluations
+            self.statistics["nfcnjacs"] += 1+self._fd_jac.ncolors #Add the number of function evaluations
         
         self.statistics["njacs"] += 1 #add the number of jacobian evaluation
         return cjac
@@ -783,22 +1059,17 @@ class _Radau5ODE(Radau_Common,Explicit_ODE):
         T[:,2] = temp1
         Tinv = N.linalg.inv(T)
         
-        I = N.eye(self._leny)
         I3 = N.eye(3)
-        T1 = N.kron(J,I)
-        T2 = N.kron(Tinv,I)
-        T3 = N.kron(T,I)
         
         self.A = A
         self.B = B
         self.C = C
-        self.I = I
         self.E = E
-        self.T1 = T1
-        self.T2 = T2
-        self.T3 = T3
+        self.T = T
+        self.Tinv = Tinv
         self.I3 = I3
         self.EIG = eig
+        self._mass = N.ones(self._leny)
 
 class Radau5DAE(Radau_Common,Implicit_ODE):
     """
@@ -856,11 +1127,13 @@ class Radau5DAE(Radau_Common,Implicit_ODE):
         
     def initialize(self):
         #Reset statistics
-        self.statistics.reset()
-        #for k in self.statistics.keys():
-        #    self.statistics[k] = 0
+        self.statistics.reset()
+        #for k in self.statistics.keys():
+        #    self.statistics[k] = 0
         
     def set_problem_data(self):
+        res = self._get_res()
+        fy = N.empty(2*self._leny)
         if self.problem_info["state_events"]:
             if self.problem_info["type"] == 1:
                 def event_func(t, y, yd):
@@ -871,8 +1144,9 @@ class Radau5DAE(Radau_Common,Implicit_ODE):
             def f(t, y):
                 leny = self._leny
                 ret = 0
-                res = self.problem.res(t, y[:leny], y[leny:2*leny], self.sw)
-                return N.append(y[leny:2*leny],res), [ret]
+                fy[:leny] = y[leny:2*leny]
+                fy[leny:] = res(t, y[:leny], y[leny:2*leny], self.sw)
+                return fy, [ret]
             self._f = f
             self.event_func = event_func
             self._event_info = [0] * self.problem_info["dimRoot"]
@@ -881,18 +1155,22 @@ class Radau5DAE(Radau_Common,Implicit_ODE):
             def f(t, y):
                 leny = self._leny
                 ret = 0
-                res = self.problem.res(t, y[:leny], y[leny:2*leny])
-                return N.append(y[leny:2*leny],res), [ret]
+                fy[:leny] = y[leny:2*leny]
+                fy[leny:] = res(t, y[:leny], y[leny:2*leny])
+                return fy, [ret]
             self._f = f
     
     def interpolate(self, time, k=0):
-        y = N.empty(self._leny*2)
-        for i in range(self._leny*2):
-            y[i] = radau5.contr5(i+1, time, self.cont)
+        """
+        Evaluates the collocation polynomial of the last step for all the
+        components. If time is a vector of time points, an array of shape
+        (len(time), dim) is returned.
+        """
+        y = _contr5(self.cont, time)
         if k == 0:
-            return y[:self._leny]
+            return y[...,:self._leny]
         elif k == 1:
-            return y[self._leny:2*self._leny]
+            return y[...,self._leny:2*self._leny]
         
     def _solout(self, nrsol, told, t, y, cont, lrc, irtrn):
         """
@@ -918,16 +1196,12 @@ class Radau5DAE(Radau_Common,Implicit_ODE):
             else:
                 output_list = self._opts["output_list"]
                 output_index = self._opts["output_index"]
-                try:
-                    while output_list[output_index] <= t:
-                        self._tlist.append(output_list[output_index])
-                        self._ylist.append(self.interpolate(output_list[output_index]))
-                        self._ydlist.append(self.interpolate(output_list[output_index], 1))
-    
-                        output_index += 1
-                except IndexError:
-                    pass
-                self._opts["output_index"] = output_index
+                output_end = output_index + N.searchsorted(output_list[output_index:], t, side="right")
+                if output_end > output_index:
+                    self._tlist.extend(output_list[output_index:output_end])
+                    self._ylist.extend(self.interpolate(output_list[output_index:output_end]))
+                    self._ydlist.extend(self.interpolate(output_list[output_index:output_end], 1))
+                self._opts["output_index"] = output_end
                 
                 if self.problem_info["state_events"] and flag == ID_PY_EVENT and len(self._tlist) > 0 and self._tlist[-1] != t:
                     self._tlist.append(t)
@@ -1067,6 +1341,7 @@ class _Radau5DAE(Radau_Common,Implicit_ODE):
         #Internal values
         self._leny = len(self.y) #Dimension of the problem
         self._2leny = 2*self._leny
+        self._fd_jac = None #Numeric jacobian, created when first needed
         
         #Default values
         self.options["inith"] = 0.01
@@ -1084,6 +1359,7 @@ class _Radau5DAE(Radau_Common,Implicit_ODE):
         self.options["index"]    = N.array([1]*self._leny+[2]*self._leny)
         self.options["usejac"]   = True if self.problem_info["jac_fcn"] else False
         self.options["maxsteps"] = 10000
+        self.options["linear_solver"] = "DENSE"
         
         #Internal values
         self._curjac = False #Current jacobian?
@@ -1159,7 +1435,41 @@ class _Radau5DAE(Radau_Common,Implicit_ODE):
     
     def initialize(self):
         #Reset statistics
-        self.statistics.reset()
+        self.statistics.reset()
+    
+    def _set_linear_solver(self, lsolver):
+        lsolver = str(lsolver).upper()
+        if lsolver not in ("DENSE", "SPARSE"):
+            raise Implicit_ODE_Exception('The linear solver must be either "DENSE" or "SPARSE".')
+        self.options["linear_solver"] = lsolver
+    
+    def _get_linear_solver(self):
+        """
+        Specifies the linear solver used for the systems in the simplified
+        Newton iterations. With 'SPARSE' the systems are factorized by
+        SuperLU (through scipy.sparse) and the Jacobian may be given as a
+        scipy.sparse matrix.
+        
+            Parameters::
+            
+                linear_solver
+                        - Default 'DENSE'. Can also be 'SPARSE'.
+        """
+        return self.options["linear_solver"]
+    
+    linear_solver = property(_get_linear_solver, _set_linear_solver)
+    
+    def _factorize(self, shift):
+        """
+        Computes the LU factorization of shift*M - J.
+        """
+        return Radau_LU(self._jac, shift, self._mass, self.options["linear_solver"])
+    
+    def _transform(self, T, Z):
+        """
+        Computes kron(T, I)*Z without forming the Kronecker product.
+        """
+        return N.dot(T, Z.reshape(3,-1)).ravel()
     
     def step_generator(self, t, y, yd, tf, opts):
         
@@ -1177,7 +1487,7 @@ class _Radau5DAE(Radau_Common,Implicit_ODE):
         self._yc = y
         self._ydc = yd
         
-        for i in range(self.maxsteps):
+        for i in range(self.maxsteps):
             
             if t < tf:
                 t, y, yd = self._step(t, y, yd)
@@ -1202,7 +1512,7 @@ class _Radau5DAE(Radau_Common,Implicit_ODE):
         
         if opts["initialize"]:
             self._next_step = self.step_generator(t,y,yd,tf,opts)
-        return next(self._next_step)
+        return next(self._next_step)
     
     def integrate(self, t, y, yd, tf, opts):
         
@@ -1217,7 +1527,7 @@ class _Radau5DAE(Radau_Common,Implicit_ODE):
             res = [ID_PY_OK]
             
             while res[0] != ID_PY_COMPLETE:
-                res = next(next_step)
+                res = next(next_step)
                 try:
                     while output_list[output_index] <= res[1]:
                         tlist.append(output_list[output_index])
@@ -1229,7 +1539,7 @@ class _Radau5DAE(Radau_Common,Implicit_ODE):
                     pass
             return res[0], tlist, ylist, ydlist
         else:
-            [flags, tlist, ylist, ydlist] = list(zip(*list(self.step_generator(t, y, yd, tf,opts))))
+            [flags, tlist, ylist, ydlist] = list(zip(*list(self.step_generator(t, y, yd, tf,opts))))
             
             return flags[-1], tlist, ylist, ydlist
     
@@ -1332,7 +1642,7 @@ class _Radau5DAE(Radau_Common,Implicit_ODE):
         The newton iteration. 
         """
         
-        for k in range(20):
+        for k in range(20):
             
             self._curiter = 0 #Reset the iteration
             self._fac_con = max(self._fac_con, self._eps)**0.8;
@@ -1344,35 +1654,31 @@ class _Radau5DAE(Radau_Common,Implicit_ODE):
             if self._needLU:
                 self.statistics["nlus"] += 1
                 self._a = self._alpha/self.h
-                self._b = self._beta/self.h
                 self._g = self._gamma/self.h
-                self._B = self._g*self.M - self._jac
                 
-                self._P1,self._L1,self._U1 = S.linalg.lu(self._B) #LU decomposition
-                self._P2,self._L2,self._U2 = S.linalg.lu(self._a*self.M-self._jac)
-                self._P3,self._L3,self._U3 = S.linalg.lu(self._b*self.M-self._jac)
+                self._LU1 = self._factorize(self._g) #Real LU decomposition
+                self._LU2 = self._factorize(self._a) #Complex LU decomposition
                 
                 self._needLU = False
                 
-                if min(abs(N.diag(self._U1)))<self._eps:
+                if self._LU1.singular:
                     raise Implicit_ODE_Exception('Error, gM-J is singular at ',self._tc)
                     
             Z, W = self.calc_start_values()
 
-            for i in range(self.newt):
+            for i in range(self.newt):
                 self._curiter += 1 #The current iteration
                 self.statistics["nniters"] += 1 #Adding one iteration
 
                 #Solve the system
-                Z = N.dot(self.T2,self._radau_F(Z.real,t,y,yd))
+                Z = self._transform(self.Tinv,self._radau_F(Z.real,t,y,yd))
 
-                Z[:self._2leny]               =Z[:self._2leny]               -self._g*N.dot(self.M,W[:self._2leny])
-                Z[self._2leny:2*self._2leny]  =Z[self._2leny:2*self._2leny]  -self._a*N.dot(self.M,W[self._2leny:2*self._2leny])   #+self._b*N.dot(self.I,W[2*self._leny:3*self._leny])
-                Z[2*self._2leny:3*self._2leny]=Z[2*self._2leny:3*self._2leny]-self._b*N.dot(self.M,W[2*self._2leny:3*self._2leny]) #-self._a*N.dot(self.I,W[2*self._leny:3*self._leny])
+                Z[:self._2leny]               =Z[:self._2leny]               -self._g*self._mass*W[:self._2leny]
+                Z[self._2leny:2*self._2leny]  =Z[self._2leny:2*self._2leny]  -self._a*self._mass*W[self._2leny:2*self._2leny]
                 
-                Z[:self._2leny]               =N.linalg.solve(self._U1,N.linalg.solve(self._L1,N.linalg.solve(self._P1,Z[:self._2leny])))
-                Z[self._2leny:2*self._2leny]  =N.linalg.solve(self._U2,N.linalg.solve(self._L2,N.linalg.solve(self._P2,Z[self._2leny:2*self._2leny])))
-                Z[2*self._2leny:3*self._2leny]=N.linalg.solve(self._U3,N.linalg.solve(self._L3,N.linalg.solve(self._P3,Z[2*self._2leny:3*self._2leny])))
+                Z[:self._2leny]               =self._LU1.solve(Z[:self._2leny])
+                Z[self._2leny:2*self._2leny]  =self._LU2.solve(Z[self._2leny:2*self._2leny])
+                Z[2*self._2leny:3*self._2leny]=Z[self._2leny:2*self._2leny].conj() #The conjugate of the complex stage
                 #----
                 
                 self._scaling = self._scaling/self.h**(self.index-1)#hfac
@@ -1405,7 +1711,7 @@ class _Radau5DAE(Radau_Common,Implicit_ODE):
                 oldnrm = max(newnrm,self._eps) #Store oldnorm
                 W = W+Z #Perform the iteration
                 
-                Z = N.dot(self.T3,W) #Calculate the new Z values
+                Z = self._transform(self.T,W) #Calculate the new Z values
                 
                 if self._fac_con*newnrm <= self.fnewt: #Convergence?
                     self._itfail = False;
@@ -1437,19 +1743,19 @@ class _Radau5DAE(Radau_Common,Implicit_ODE):
     def estimate_error(self):
         
         temp = 1./self.h*(self.E[0]*self._Z[:self._2leny]+self.E[1]*self._Z[self._2leny:2*self._2leny]+self.E[2]*self._Z[2*self._2leny:3*self._2leny])
-        temp = N.dot(self.M,temp)
+        temp = self._mass*temp
         
         self._scaling = self._scaling/self.h**(self.index-1)#hfac
         
         scal = self._scaling#/self.h
-        err_v = N.linalg.solve(self._U1,N.linalg.solve(self._L1,N.linalg.solve(self._P1,self._f0+temp)))
+        err_v = self._LU1.solve(self._f0+temp)
         err = N.linalg.norm(err_v/scal)
         err = max(err/N.sqrt(self._2leny),1.e-10)
 
         if (self._rejected or self._first) and err >= 1.: #If the step was rejected, use the more expensive error estimation
             self.statistics["nfcns"] += 1
             err_v = self._ode_f(self._tc,N.append(self._yc,self._ydc)+err_v)
-            err_v = N.linalg.solve(self._U1,N.linalg.solve(self._L1,N.linalg.solve(self._P1,err_v+temp)))
+            err_v = self._LU1.solve(err_v+temp)
             err = N.linalg.norm(err_v/scal)
             err = max(err/N.sqrt(self._2leny),1.e-10)
             
@@ -1489,11 +1795,10 @@ class _Radau5DAE(Radau_Common,Implicit_ODE):
         if self.usejac: #Retrieve the user-defined jacobian
             cjac = self.problem.jac(t,y,yd)
         else:           #Calculate a numeric jacobian
-            delt = N.array([(self._eps*max(abs(yi),1.e-5))**0.5 for yi in q])*N.identity(self._2leny) #Calculate a disturbance
-            Fdelt = N.array([self._ode_f(t,q+e) for e in delt]) #Add the disturbance (row by row) 
-            grad = ((Fdelt-self._ode_f(t,q)).T/delt.diagonal()).T
-            cjac = N.array(grad).T
-            self.statistics["nfcnjacs"] += 1+self._2leny #Add the number of function evaluations
+            if self._fd_jac is None:
+                self._fd_jac = FDJacobian(self._2leny)
+            cjac = self._fd_jac(self._ode_f, t, q)
+            self.statistics["nfcnjacs"] += 1+self._fd_jac.ncolors #Add the number of function evaluations
 
         self.statistics["njacs"] += 1 #add the number of jacobian evaluation
         return cjac
@@ -1563,7 +1868,7 @@ class _Radau5DAE(Radau_Common,Implicit_ODE):
             Z[leny:2*leny]  = cq[1,0]*(newtval[:leny]+(cq[1,0]-self.C[1,0]+1.)*(newtval[leny:2*leny]+(cq[1,0]-self.C[0,0]+1.)*newtval[2*leny:3*leny]))
             Z[2*leny:3*leny]= cq[2,0]*(newtval[:leny]+(cq[2,0]-self.C[1,0]+1.)*(newtval[leny:2*leny]+(cq[2,0]-self.C[0,0]+1.)*newtval[2*leny:3*leny]))
             
-            W = N.dot(self.T2,Z)
+            W = self._transform(self.Tinv,Z)
             
         return Z, W
     
@@ -1616,21 +1921,14 @@ class _Radau5DAE(Radau_Common,Implicit_ODE):
         T[:,2] = temp1
         Tinv = N.linalg.inv(T)
         
-        I = N.eye(self._2leny)
-        M = N.kron(M,N.eye(self._leny))
         I3 = N.eye(3)
-        T1 = N.kron(J,M)
-        T2 = N.kron(Tinv,I)
-        T3 = N.kron(T,I)
         
         self.A = A
         self.B = B
         self.C = C
-        self.I = I
         self.E = E
-        self.M = M
-        self.T1 = T1
-        self.T2 = T2
-        self.T3 = T3
+        self.T = T
+        self.Tinv = Tinv
         self.I3 = I3
         self.EIG = eig
+        self._mass = N.kron(N.diag(M),N.ones(self._leny))
@@ -23,6 +23,7 @@ from assimulo.explicit_ode import Explicit_ODE
 
 from assimulo.exception import *
 from assimulo.support import set_type_shape_array
+from assimulo.lib.jacobian import band_storage, mass_storage
 
 from assimulo.lib import rodas
 
@@ -265,6 +266,10 @@ class RodasODE(Rodas_Common, Explicit_ODE):
     Based on the FORTRAN code RODAS by E.Hairer and G.Wanner, which can 
     be found here: http://www.unige.ch/~hairer/software.html
     
+    Linearly implicit problems, M*y' = f(t,y), with a constant (possibly
+    singular) mass matrix M are solved if the problem attribute
+    mass_matrix is set.
+    
     Details about the implementation (FORTRAN) can be found in the book,::
     
         Solving Ordinary Differential Equations II,
@@ -297,6 +302,8 @@ class RodasODE(Rodas_Common, Explicit_ODE):
         self.options["rtol"]     = 1.0e-6 #Relative tolerance
         self.options["usejac"]   = True if self.problem_info["jac_fcn"] else False
         self.options["maxsteps"] = 10000
+        self.options["linear_solver"] = "DENSE"
+        self.options["light_reinit"] = False
         
         #Solver support
         self.supports["report_continuously"] = True
@@ -306,22 +313,56 @@ class RodasODE(Rodas_Common, Explicit_ODE):
         #Internal
         self._leny = len(self.y) #Dimension of the problem
         
+        #Work arrays, kept between the calls to Rodas
+        self._work_key = None
+        self._rtol_vec = None
+        
     def initialize(self):
         #Reset statistics
         self.statistics.reset()
+        
+        #Nothing is carried over from a previous simulation
+        self._last_h = None
+        
+        #The mass matrix in the storage used by Rodas
+        self._mass = None
+        if self.problem_info["mass_matrix"] is not None:
+            self._mass = mass_storage(self.problem_info["mass_matrix"], self.problem_info["dim"], self.problem_info["mass_bandwidth"])
+            if self.options["linear_solver"] == "BAND":
+                ml, mu = self.problem_info["jac_bandwidth"]
+                if self.problem_info["mass_bandwidth"] is None or self._mass[1] > ml or self._mass[2] > mu:
+                    raise Rodas_Exception("For the BAND linear solver, the bandwidth of the mass matrix must be specified via the problem attribute 'mass_bandwidth' = (ml, mu) and be within the bandwidth of the Jacobian.")
+    
+    def _get_work_arrays(self, key, lwork, liwork):
+        """
+        Returns the work arrays for Rodas. They are allocated once per
+        problem size and Jacobian structure (key) and reused by the
+        following calls.
+        """
+        if self._work_key != key:
+            self._work_key = key
+            self._WORK  = N.zeros(lwork) #Work (double) vector
+            self._IWORK = N.zeros(liwork, dtype=N.intc) #Work (integer) vector
+        else:
+            #Reset the parameters, the working area is kept
+            self._WORK[:20]  = 0.0
+            self._IWORK[:20] = 0
+        
+        return self._WORK, self._IWORK
             
     def set_problem_data(self):
+        rhs = self._get_rhs()
         if self.problem_info["state_events"]:
             def event_func(t, y):
                 return self.problem.state_events(t, y, self.sw)
             def f(t, y):
-                return self.problem.rhs(t, y, self.sw)
+                return rhs(t, y, self.sw)
             self.f = f
             self.event_func = event_func
             self._event_info = [0] * self.problem_info["dimRoot"]
             self.g_old = self.event_func(self.t, self.y)
         else:
-            self.f = self.problem.rhs
+            self.f = rhs
     
     def interpolate(self, time):
         y = N.empty(self._leny)
@@ -374,24 +415,94 @@ class RodasODE(Rodas_Common, Explicit_ODE):
         """
         jac = self.problem.jac(t,y)
         
+        if self.options["linear_solver"] == "BAND":
+            return band_storage(jac, *self.problem_info["jac_bandwidth"])
+        
         if isinstance(jac, sp.csc_matrix):
             jac = jac.toarray()
         
         return jac
     
+    def _mas(self, am):
+        """
+        Returns the (constant) mass matrix of the problem.
+        """
+        return self._mass[0]
+    
+    def _set_linear_solver(self, lsolver):
+        lsolver = str(lsolver).upper()
+        if lsolver not in ("DENSE", "BAND"):
+            raise Rodas_Exception('The linear solver must be either "DENSE" or "BAND".')
+        if lsolver == "BAND" and self.problem_info["jac_bandwidth"] is None:
+            raise Rodas_Exception("For the BAND linear solver, the bandwidth of the Jacobian must be specified via the problem attribute 'jac_bandwidth' = (ml, mu).")
+        self.options["linear_solver"] = lsolver
+    
+    def _get_linear_solver(self):
+        """
+        Specifies the linear algebra used by Rodas. With 'BAND' the
+        Jacobian is treated as banded with the lower and upper bandwidths
+        given by the problem attribute jac_bandwidth = (ml, mu) (MLJAC and
+        MUJAC in Rodas). A user defined Jacobian may then be given either
+        as a full matrix or in compact band storage, an array of shape
+        (ml+mu+1, dim) where jac[mu+i-j, j] = df_i/dy_j.
+        
+            Parameters::
+            
+                linear_solver
+                        - Default 'DENSE'. Can also be 'BAND'.
+        """
+        return self.options["linear_solver"]
+    
+    linear_solver = property(_get_linear_solver, _set_linear_solver)
+    
+    def _set_light_reinit(self, light_reinit):
+        self.options["light_reinit"] = bool(light_reinit)
+    
+    def _get_light_reinit(self):
+        """
+        A Boolean flag which indicates that the reinitializations of
+        the solver after events are light, i.e. that Rodas restarts
+        with the last step size used instead of inith. (Rodas evaluates
+        the Jacobian in every step, so there is no Jacobian to keep.)
+        
+            Parameters::
+            
+                light_reinit
+                                - Default 'False'.
+                
+                                - Should be a boolean.
+                                
+                                    Example:
+                                        light_reinit = True
+        """
+        return self.options["light_reinit"]
+    
+    light_reinit = property(_get_light_reinit, _set_light_reinit)
+    
     def integrate(self, t, y, tf, opts):
         IFCN  = 1 #The function may depend on t
         ITOL  = 1 #Both rtol and atol are vectors
         IJAC  = 1 if self.usejac else 0 #Switch for the jacobian, 0==NO JACOBIAN
-        MLJAC = self.problem_info["dim"] #The jacobian is full
-        MUJAC = self.problem_info["dim"] #The jacobian is full
+        if self.options["linear_solver"] == "BAND":
+            MLJAC, MUJAC = self.problem_info["jac_bandwidth"] #The jacobian is banded
+            LJAC, LE1 = MLJAC+MUJAC+1, 2*MLJAC+MUJAC+1 #Sizes of the jacobian and its LU factors
+        else:
+            MLJAC = self.problem_info["dim"] #The jacobian is full
+            MUJAC = self.problem_info["dim"] #The jacobian is full
+            LJAC = LE1 = self.problem_info["dim"]
         IDFX  = 0 #df/dt is computed internally
-        IMAS  = 0 #The mass matrix is the identity
-        MLMAS = self.problem_info["dim"] #The mass matrix is full
-        MUMAS = self.problem_info["dim"] #The mass matrix is full
+        if self._mass is None:
+            IMAS  = 0 #The mass matrix is the identity
+            MLMAS = self.problem_info["dim"] #The mass matrix is full
+            MUMAS = self.problem_info["dim"] #The mass matrix is full
+            LMAS  = 0
+        else:
+            IMAS  = 1 #The mass matrix is supplied
+            MLMAS, MUMAS = self._mass[1:] #Full if equal to the dimension, otherwise banded
+            LMAS  = self._mass[0].shape[0]
         IOUT  = 1 #Solout is called after every accepted step
-        WORK  = N.array([0.0]*(2*self.problem_info["dim"]**2+14*self.problem_info["dim"]+20))
-        IWORK = N.array([0]*(self.problem_info["dim"]+20))
+        WORK, IWORK = self._get_work_arrays((MLJAC, MUJAC, LMAS), self.problem_info["dim"]*(LJAC+LMAS+LE1+14)+20,
+                                            self.problem_info["dim"]+20)
         
         #Setting work options
         WORK[1] = self.maxh
@@ -403,7 +514,7 @@ class RodasODE(Rodas_Common, Explicit_ODE):
         IWORK[0] = self.maxsteps
         
         #Dummy methods
-        mas_dummy = lambda t:x
+        mas_dummy = (lambda t:x) if not IMAS else self._mas
         jac_dummy = (lambda t:x) if not self.usejac else self._jacobian
         dfx_dummy = lambda t:x
         
@@ -416,8 +527,17 @@ class RodasODE(Rodas_Common, Explicit_ODE):
         #Store the opts
         self._opts = opts
         
-        t, y, h, iwork, flag = rodas.rodas(self.f, IFCN, t, y.copy(), tf, self.inith, self.rtol*N.ones(self.problem_info["dim"]), self.atol,
+        #Restart with the last step size
+        inith = self._last_h if self.options["light_reinit"] and self._last_h is not None else self.inith
+        
+        if self._rtol_vec is None:
+            self._rtol_vec = N.empty(self.problem_info["dim"])
+        self._rtol_vec[:] = self.rtol
+        
+        t, y, h, iwork, flag = rodas.rodas(self.f, IFCN, t, y.copy(), tf, inith, self._rtol_vec, self.atol,
                     ITOL, jac_dummy, IJAC, MLJAC, MUJAC, dfx_dummy, IDFX, mas_dummy, IMAS, MLMAS, MUMAS, self._solout, IOUT, WORK, IWORK)
+        
+        self._last_h = h
                     
         #Checking return
         if flag == 1:
@@ -432,7 +552,7 @@ class RodasODE(Rodas_Common, Explicit_ODE):
         self.statistics["nfcns"]        += iwork[13]
         self.statistics["njacs"]        += iwork[14]
         #self.statistics["nstepstotal"] += iwork[15]
-        self.statistics["nfcnjacs"]    += (iwork[14]*self.problem_info["dim"] if not self.usejac else 0)
+        self.statistics["nfcnjacs"]    += (iwork[14]*min(LJAC, self.problem_info["dim"]) if not self.usejac else 0)
         self.statistics["nerrfails"]     += iwork[17]
         self.statistics["nlus"]         += iwork[18]
         
@@ -454,6 +574,8 @@ class RodasODE(Rodas_Common, Explicit_ODE):
         self.log_message(' Solver                  : Rodas ',          verbose)
         self.log_message(' Tolerances (absolute)   : ' + str(self._compact_atol()),  verbose)
         self.log_message(' Tolerances (relative)   : ' + str(self.options["rtol"]),  verbose)
+        if self.options["light_reinit"]:
+            self.log_message(' Light reinitialization  : ' + str(self.options["light_reinit"]),  verbose)
         self.log_message('',                                                         verbose)
 
 
@@ -77,24 +77,32 @@ class Dopri5(Explicit_ODE):
         self.statistics.reset()
     
     def set_problem_data(self):
+        rhs = self._get_rhs()
         if self.problem_info["state_events"]:
             def event_func(t, y):
                 return self.problem.state_events(t, y, self.sw)
             def f(t, y):
-                return self.problem.rhs(t, y, self.sw)
+                return rhs(t, y, self.sw)
             self.f = f
             self.event_func = event_func
             self._event_info = [0] * self.problem_info["dimRoot"]
             self.g_old = self.event_func(self.t, self.y)
         else:
-            self.f = self.problem.rhs
+            self.f = rhs
     
     def interpolate(self, time):
-        y = N.empty(self._leny)
-        for i in range(self._leny):
-            y[i] = dopri5.contd5(i+1, time, self.cont, self.lrc)
-                    
-        return y
+        """
+        Evaluates the continuous output of the last step for all the
+        components. If time is a vector of time points, an array of
+        shape (len(time), dim) is returned.
+        """
+        con = self.cont.reshape(5, -1)
+        theta = (N.asarray(time, dtype=float) - dopri5.condo5.xold)/dopri5.condo5.h
+        if theta.ndim > 0:
+            theta = theta[:,N.newaxis]
+        theta1 = 1.0 - theta
+        
+        return con[0] + theta*(con[1] + theta1*(con[2] + theta*(con[3] + theta1*con[4])))
         
     def _solout(self, nrsol, told, t, y, cont, lrc, irtrn):
         """
@@ -119,15 +127,11 @@ class Dopri5(Explicit_ODE):
             else:
                 output_list = self._opts["output_list"]
                 output_index = self._opts["output_index"]
-                try:
-                    while output_list[output_index] <= t:
-                        self._tlist.append(output_list[output_index])
-                        self._ylist.append(self.interpolate(output_list[output_index]))
-
-                        output_index += 1
-                except IndexError:
-                    pass
-                self._opts["output_index"] = output_index
+                output_end = output_index + N.searchsorted(output_list[output_index:], t, side="right")
+                if output_end > output_index:
+                    self._tlist.extend(output_list[output_index:output_end])
+                    self._ylist.extend(self.interpolate(output_list[output_index:output_end]))
+                self._opts["output_index"] = output_end
                 
                 if self.problem_info["state_events"] and flag == ID_PY_EVENT and len(self._tlist) > 0 and self._tlist[-1] != t:
                     self._tlist.append(t)
@@ -454,6 +458,7 @@ class RungeKutta34(Explicit_ODE):
         self.supports["report_continuously"] = True
         self.supports["interpolated_output"] = True
         self.supports["state_events"] = True
+        self.supports["batch_simulation"] = True
     
     def initialize(self):
         #Reset statistics
@@ -465,7 +470,10 @@ class RungeKutta34(Explicit_ODE):
                 return self.problem.state_events(t, y, self.sw) 
             def f(dy ,t, y): 
                 try:
-                    dy[:] = self.problem.rhs(t, y, self.sw)
+                    if self.problem_info["rhs_inplace"]:
+                        self.problem.rhs(t, y, dy, self.sw)
+                    else:
+                        dy[:] = self.problem.rhs(t, y, self.sw)
                 except:
                     return False
                 return True
@@ -706,6 +714,34 @@ class RungeKutta34(Explicit_ODE):
         
         return t_next, y_next, error
         
+    def _batch_initial_step(self):
+        return self.options["inith"]
+    
+    def _batch_adjust_stepsize(self, h, error):
+        """
+        Adjusts the step-sizes of a batch of trajectories.
+        """
+        fac = N.ones(len(error))*2.0
+        nonzero = error > 0.0
+        fac[nonzero] = N.minimum((1.0/error[nonzero])**(1.0/4.0), 2.)
+        
+        return h*fac
+    
+    def _batch_step(self, f, t, y, h, fy):
+        """
+        This calculates the next step for a batch of trajectories.
+        """
+        scaling = abs(y)*self.rtol + N.array(self.atol, ndmin=1).reshape(-1,1) # to normalize the error
+        
+        Y2 = f(t + h/2., y + h*fy/2.)
+        Y3 = f(t + h/2., y + h*Y2/2.)
+        Z3 = f(t + h, y - h*fy + 2.0*h*Y2)
+        Y4 = f(t + h, y + h*Y3)
+        
+        error = N.sqrt(N.sum((h/6.0*(2.0*Y2 + Z3 - 2.0*Y3 - Y4)/scaling)**2, axis=0)) #normalized
+        
+        return y + h/6.0*(fy + 2.0*Y2 + 2.0*Y3 + Y4), error
+        
     def state_event_info(self): 
         return self._event_info
         
@@ -776,6 +812,7 @@ class RungeKutta4(Explicit_ODE):
         
         #Solver support
         self.supports["one_step_mode"] = True
+        self.supports["batch_simulation"] = True
         
     def step(self, t, y, tf, opts):
         initialize = opts["initialize"]
@@ -843,6 +880,16 @@ class RungeKutta4(Explicit_ODE):
         
         return t+h, y + h/6.*(self.Y1 + 2.*self.Y2 + 2.*self.Y3 + self.Y4)
         
+    def _batch_step(self, f, t, y, h, fy):
+        """
+        This calculates the next step for a batch of trajectories.
+        """
+        Y2 = f(t + h/2., y + h*fy/2.)
+        Y3 = f(t + h/2., y + h*Y2/2.)
+        Y4 = f(t + h, y + h*Y3)
+        
+        return y + h/6.*(fy + 2.*Y2 + 2.*Y3 + Y4), None
+        
     def print_statistics(self, verbose):
         """
         Should print the statistics.
@@ -30,14 +30,16 @@ from assimulo.exception import *
 from assimulo.explicit_ode cimport Explicit_ODE 
 from assimulo.implicit_ode cimport Implicit_ODE
 from assimulo.support import set_type_shape_array
+from assimulo.lib.jacobian import FDJacobian, band_storage
+from assimulo.lib.adjoint import ExplicitAdjoint, ImplicitAdjoint
 
 cimport sundials_includes as SUNDIALS
 
 #Various C includes transfered to namespace
 from sundials_includes cimport N_Vector, realtype, N_VectorContent_Serial, DENSE_COL, sunindextype
-from sundials_includes cimport memcpy, N_VNew_Serial, DlsMat, SlsMat, SUNMatrix, SUNMatrixContent_Dense, SUNMatrixContent_Sparse
-from sundials_includes cimport malloc, free, N_VCloneVectorArray_Serial
-from sundials_includes cimport N_VConst_Serial, N_VDestroy_Serial
+from sundials_includes cimport memcpy, N_VNew_Serial, DlsMat, SlsMat, SUNMatrix, SUNMatrixContent_Dense, SUNMatrixContent_Sparse, SUNMatrixContent_Band
+from sundials_includes cimport malloc, free, N_VCloneVectorArray, N_VCloneEmpty
+from sundials_includes cimport N_VConst, N_VDestroy, N_VDestroyVectorArray
 
 include "constants.pxi" #Includes the constants (textual include)
 include "../lib/sundials_constants.pxi" #Sundials related constants
@@ -61,18 +63,31 @@ cdef class IDA(Implicit_ODE):
     """
     cdef void* ida_mem
     cdef ProblemData pData      #A struct containing information about the problem
-    cdef N_Vector yTemp, ydTemp, nv_atol
+    cdef N_Vector yTemp, ydTemp, nv_atol, nv_id, yOut, ydOut, nv_view
     cdef N_Vector *ySO
     cdef N_Vector *ydSO
+    cdef int nSO #Number of allocated sensitivity vectors
+    cdef N_Vector yB, ydB, qB #The adjoint variables and the backward quadrature
+    cdef int whichB #Identifier of the backward problem
+    cdef bint adj_init, adj_created #Is the adjoint memory allocated and the backward problem created?
+    cdef realtype adj_t0 #Start time of the checkpointed forward solution
+    cdef object adj_y0, adj_yd0
+    cdef N_Vector yQ #The quadratures
+    cdef public N.ndarray q0, q #The initial and current values of the quadratures
+    cdef list q_out #Quadratures at the output points of the last call to integrate
     cdef object f
     cdef public object event_func
     #cdef public dict statistics
     cdef object pt_root, pt_fcn, pt_jac, pt_jacv, pt_sens
+    cdef object pt_rhsB, pt_quadB, pt_quad
+    cdef bint options_initialized #Are the options set since the last call to initialize?
     cdef public N.ndarray yS0
     #cdef N.ndarray _event_info
     cdef public N.ndarray g_old
     cdef SUNDIALS.SUNMatrix sun_matrix
     cdef SUNDIALS.SUNLinearSolver sun_linearsolver
+    cdef SUNDIALS.SUNMatrix sun_matrixB
+    cdef SUNDIALS.SUNLinearSolver sun_linearsolverB
     
     def __init__(self, problem):
         Implicit_ODE.__init__(self, problem) #Calls the base class
@@ -103,6 +118,15 @@ cdef class IDA(Implicit_ODE):
         self.options["dqrhomax"] = 0.0
         self.options["pbar"] = [1]*self.problem_info["dimSens"]
         self.options["external_event_detection"] = False #Sundials rootfinding is used for event location as default 
+        self.options["gstype"] = MODIFIED_GS
+        self.options["maxrestarts"] = 5
+        self.options["eplifac"] = 0.05
+        self.options["adjoint"] = False
+        self.options["adjsteps"] = 100
+        self.options["adjinterp"] = "HERMITE"
+        self.options["suppress_quad"] = True #Turn on or off the local error test on the quadratures
+        self.options["nvector"] = "SERIAL"   #The N_Vector implementation
+        self.options["light_reinit"] = False #Keep the options and the linear solver at reinitializations after events
 
         #Solver support
         self.supports["report_continuously"] = True
@@ -110,6 +134,9 @@ cdef class IDA(Implicit_ODE):
         self.supports["interpolated_sensitivity_output"] = True
         self.supports["state_events"] = True
         
+        self.statistics.add_key("nliters", "Number of linear iterations")
+        self.statistics.add_key("nlcfails", "Number of linear convergence failures")
+        
         #Get options from Problem
         if hasattr(problem, 'pbar'):
             self.pbar = problem.pbar
@@ -125,6 +152,7 @@ cdef class IDA(Implicit_ODE):
         #Sets the residual or rhs
         self.pt_fcn = self.problem.res
         self.pData.RHS = <void*>self.pt_fcn#<void*>self.problem.f
+        self.pData.rhs_inplace = self.problem_info["res_inplace"]
         self.pData.dim = self.problem_info["dim"] 
         self.pData.memSize = self.pData.dim*sizeof(realtype)
         
@@ -160,21 +188,83 @@ cdef class IDA(Implicit_ODE):
         else:
             self.pData.dimSens = 0
         
+        if self.problem_info["quad_fcn"] is True: #Sets the right-hand-side of the quadratures
+            if not hasattr(self.problem, "resQ"):
+                raise AssimuloException("The right-hand-side of the quadratures should be given by the problem method resQ(t,y,yd) for IDA.")
+            self.pt_quad = self.problem.resQ
+            self.pData.QUAD = <void*>self.pt_quad
+            if hasattr(self.problem, "q0"):
+                self.q0 = set_type_shape_array(self.problem.q0)
+            else: #Start from zero, the number of quadratures is given by their right-hand-side
+                args = [self.t0, self.y0, self.yd0] + ([self.sw0.tolist()] if self.problem_info["switches"] else []) + ([self.p0] if self.pData.dimSens > 0 else [])
+                self.q0 = N.zeros(len(set_type_shape_array(self.pt_quad(*args))))
+            self.q = self.q0.copy()
+            self.pData.dimQ = len(self.q0)
+            self.problem_info["dimQ"] = self.pData.dimQ
+        else:
+            self.pData.dimQ = 0
+        
         self.pData.verbose = 2
         self.pData.create_work_arrays()  
     
+    cdef create_work_vectors(self):
+        """
+        Creates the N_Vectors used by the solver, of the implementation
+        given by the option nvector. They are created at the first
+        initialization, reused for the lifetime of the solver and
+        deallocated in __dealloc__.
+        """
+        cdef str nvector = self.options["nvector"]
+        cdef int num_threads = self.options["num_threads"]
+        
+        self.yTemp   = new_nvector(self.pData.dim, nvector, num_threads)
+        self.ydTemp  = new_nvector(self.pData.dim, nvector, num_threads)
+        self.nv_atol = new_nvector(self.pData.dim, nvector, num_threads)
+        self.nv_id   = new_nvector(self.pData.dim, nvector, num_threads)
+        self.yOut    = new_nvector(self.pData.dim, nvector, num_threads)
+        self.ydOut   = new_nvector(self.pData.dim, nvector, num_threads)
+        self.nv_view = N_VCloneEmpty(self.yTemp) #Points to the output arrays, see nv_set_output
+        
+        if self.pData.dimSens > 0:
+            self.nSO  = self.pData.dimSens
+            self.ySO  = N_VCloneVectorArray(self.nSO, self.yTemp)
+            self.ydSO = N_VCloneVectorArray(self.nSO, self.ydTemp)
+            self.yB   = new_nvector(self.pData.dim, nvector, num_threads)
+            self.ydB  = new_nvector(self.pData.dim, nvector, num_threads)
+            self.qB   = new_nvector(self.pData.dimSens+1, nvector, num_threads)
+        
+        if self.pData.dimQ > 0:
+            self.yQ   = new_nvector(self.pData.dimQ, nvector, num_threads)
+    
     def __dealloc__(self):
         
+        #Deallocate the N_Vectors
         if self.yTemp != NULL:
-            #Deallocate N_Vector
-            N_VDestroy_Serial(self.yTemp)
-            
+            N_VDestroy(self.yTemp)
         if self.ydTemp != NULL:
-            #Deallocate N_Vector
-            N_VDestroy_Serial(self.ydTemp)
-            
+            N_VDestroy(self.ydTemp)
         if self.nv_atol != NULL:
-            N_VDestroy_Serial(self.nv_atol)
+            N_VDestroy(self.nv_atol)
+        if self.nv_id != NULL:
+            N_VDestroy(self.nv_id)
+        if self.yOut != NULL:
+            N_VDestroy(self.yOut)
+        if self.ydOut != NULL:
+            N_VDestroy(self.ydOut)
+        if self.nv_view != NULL:
+            N_VDestroy(self.nv_view)
+        if self.ySO != NULL:
+            N_VDestroyVectorArray(self.ySO, self.nSO)
+        if self.ydSO != NULL:
+            N_VDestroyVectorArray(self.ydSO, self.nSO)
+        if self.yB != NULL:
+            N_VDestroy(self.yB)
+        if self.ydB != NULL:
+            N_VDestroy(self.ydB)
+        if self.qB != NULL:
+            N_VDestroy(self.qB)
+        if self.yQ != NULL:
+            N_VDestroy(self.yQ)
         
         if self.ida_mem != NULL: 
             #Free Memory
@@ -186,6 +276,12 @@ cdef class IDA(Implicit_ODE):
                 
             if self.sun_linearsolver != NULL:
                 SUNDIALS.SUNLinSolFree(self.sun_linearsolver)
+            
+            if self.sun_matrixB != NULL:
+                SUNDIALS.SUNMatDestroy(self.sun_matrixB)
+                
+            if self.sun_linearsolverB != NULL:
+                SUNDIALS.SUNLinSolFree(self.sun_linearsolverB)
     
     cpdef state_event_info(self):
         """
@@ -228,36 +324,47 @@ cdef class IDA(Implicit_ODE):
         if self.problem_info['step_events'] or self.options['report_continuously']:
             self.problem._sensitivity_result = 1
         
+        #Initialize storing of the quadratures in handle_result
+        if self.pData.dimQ > 0:
+            self.problem._quadrature_result = 1
+        
+        #The checkpoints are discarded when the solver is reinitialized
+        if self.options["adjoint"] and (self.problem_info["state_events"] or self.problem_info["time_events"] or self.problem_info["step_events"]):
+            raise AssimuloException("Adjoint sensitivity analysis is not supported for problems with events.")
+        
         #Reset statistics
         self.statistics.reset()
         
+        self.options_initialized = False
         self.initialize_ida()
     
     cdef initialize_ida(self):
         cdef int flag #Used for return
         cdef realtype ZERO = 0.0
+        
+        if self.yTemp == NULL: #The first initialization
+            self.create_work_vectors()
 
-        self.yTemp  = arr2nv(self.y)
-        self.ydTemp = arr2nv(self.yd)
+        arr2nv_inplace(self.y, self.yTemp)
+        arr2nv_inplace(self.yd, self.ydTemp)
+        if self.pData.dimQ > 0:
+            arr2nv_inplace(self.q, self.yQ)
         
         #Updates the switches
         if self.problem_info["switches"]:
             self.pData.sw = <void*>self.sw
         
         if self.pData.dimSens > 0:
-            #Create the initial matrices
-            self.ySO  = N_VCloneVectorArray_Serial(self.pData.dimSens, self.yTemp)
-            self.ydSO = N_VCloneVectorArray_Serial(self.pData.dimSens, self.ydTemp)
-            
             #Filling the start vectors
             for i in range(self.pData.dimSens):
-                 N_VConst_Serial(ZERO,  self.ySO[i]);
-                 N_VConst_Serial(ZERO, self.ydSO[i]); 
+                 N_VConst(ZERO,  self.ySO[i]);
+                 N_VConst(ZERO, self.ydSO[i]); 
                  if self.yS0 is not None:
                     for j in range(self.pData.dim):
                         (<N_VectorContent_Serial>self.ySO[i].content).data[j] = self.yS0[i,j]
 
         if self.ida_mem == NULL: #The solver is not initialized
+            self.options_initialized = False
         
             self.ida_mem = SUNDIALS.IDACreate() #Create solver
             if self.ida_mem == NULL:
@@ -283,18 +390,70 @@ cdef class IDA(Implicit_ODE):
                 if flag < 0:
                     raise IDAError(flag, self.t)
                         
-            elif self.options["linear_solver"] == 'SPGMR':
+            elif self.options["linear_solver"] in SPILS_SOLVERS:
                 IF SUNDIALS_VERSION >= (3,0,0):
                     #Create the linear solver
-                    self.sun_linearsolver = SUNDIALS.SUNSPGMR(self.yTemp, PREC_NONE, 0)
+                    self.sun_linearsolver = create_spils_solver(self.options["linear_solver"], self.yTemp, PREC_NONE, 0,
+                                                                self.options["gstype"], self.options["maxrestarts"])
                     #Attach it to IDAS
                     flag = SUNDIALS.IDASpilsSetLinearSolver(self.ida_mem, self.sun_linearsolver)
                 ELSE:
-                    #Specify the use of SPGMR linear solver.
-                    flag = SUNDIALS.IDASpgmr(self.ida_mem, 0) #0 == Default krylov iterations
+                    #Specify the use of the IDASpils linear solver (0 == Default krylov iterations).
+                    if self.options["linear_solver"] == 'SPGMR':
+                        flag = SUNDIALS.IDASpgmr(self.ida_mem, 0)
+                        if flag >= 0:
+                            flag = SUNDIALS.IDASpilsSetGSType(self.ida_mem, self.options["gstype"])
+                        if flag >= 0:
+                            flag = SUNDIALS.IDASpilsSetMaxRestarts(self.ida_mem, self.options["maxrestarts"])
+                    elif self.options["linear_solver"] == 'SPBCGS':
+                        flag = SUNDIALS.IDASpbcg(self.ida_mem, 0)
+                    elif self.options["linear_solver"] == 'SPTFQMR':
+                        flag = SUNDIALS.IDASptfqmr(self.ida_mem, 0)
+                    else:
+                        raise AssimuloException("The linear solver 'SPFGMR' requires SUNDIALS 3.0 or newer.")
                 if flag < 0: 
                     raise IDAError(flag, self.t)
                 
+            elif self.options["linear_solver"] == 'BAND':
+                if self.problem_info["jac_bandwidth"] is None:
+                    raise AssimuloException("For the BAND linear solver, the bandwidth of the Jacobian must be specified via the problem attribute 'jac_bandwidth' = (ml, mu).")
+                ml, mu = self.problem_info["jac_bandwidth"]
+                
+                IF SUNDIALS_VERSION >= (3,0,0):
+                    #Create a band Sundials matrix, with storage for the fill-in of the LU factorization
+                    self.sun_matrix = SUNDIALS.SUNBandMatrixStorage(self.pData.dim, mu, ml, min(self.pData.dim-1, mu+ml))
+                    #Create a band Sundials linear solver
+                    self.sun_linearsolver = SUNDIALS.SUNBandLinearSolver(self.yTemp, self.sun_matrix)
+                    #Attach it to IDA
+                    flag = SUNDIALS.IDADlsSetLinearSolver(self.ida_mem, self.sun_linearsolver, self.sun_matrix)
+                ELSE:
+                    #Specify the use of the internal band linear algebra functions.
+                    flag = SUNDIALS.IDABand(self.ida_mem, self.pData.dim, mu, ml)
+                if flag < 0:
+                    raise IDAError(flag, self.t)
+                
+            elif self.options["linear_solver"] == 'SPARSE':
+                if SUNDIALS.version() < (2,6,0): 
+                    raise AssimuloException("Not supported with this SUNDIALS version.")
+                if SUNDIALS.with_superlu() == 0:
+                    raise AssimuloException("No support for SuperLU was detected, please verify that SuperLU and SUNDIALS has been installed correctly.")
+                
+                #Without a Jacobian, approximate it using the sparsity pattern of the problem
+                if self.problem_info["jac_fcn"] is False and self.problem_info["jac_sparsity"] is not None:
+                    self._set_fd_jac_sparse()
+                
+                if self.problem_info["jac_fcn_nnz"] == -1:
+                    raise AssimuloException("Need to specify the number of non zero elements in the Jacobian via the option 'jac_nnz'")
+                
+                IF SUNDIALS_VERSION >= (3,0,0):
+                    self.sun_matrix = SUNDIALS.SUNSparseMatrix(self.pData.dim, self.pData.dim, self.problem_info["jac_fcn_nnz"], CSC_MAT)
+                    self.sun_linearsolver = SUNDIALS.SUNSuperLUMT(self.yTemp, self.sun_matrix, self.options["num_threads"])
+                    flag = SUNDIALS.IDADlsSetLinearSolver(self.ida_mem, self.sun_linearsolver, self.sun_matrix)
+                ELSE:
+                    flag = SUNDIALS.IDASuperLUMT(self.ida_mem, self.options["num_threads"], self.pData.dim, self.problem_info["jac_fcn_nnz"])
+                if flag < 0:
+                    raise IDAError(flag, self.t)
+                
             else:
                 raise IDAError(100,self.t) #Unknown error message
                 
@@ -317,6 +476,11 @@ cdef class IDA(Implicit_ODE):
                 if flag < 0:
                     raise IDAError(flag, self.t)
             
+            if self.pData.dimQ > 0:
+                flag = SUNDIALS.IDAQuadInit(self.ida_mem, ida_rhsQ, self.yQ)
+                if flag < 0:
+                    raise IDAError(flag, self.t)
+            
         else: #The solver needs to be reinitialized
             
             #Reinitialize
@@ -328,6 +492,11 @@ cdef class IDA(Implicit_ODE):
                 flag = SUNDIALS.IDASensReInit(self.ida_mem, IDA_STAGGERED if self.options["sensmethod"] == "STAGGERED" else IDA_SIMULTANEOUS, self.ySO, self.ydSO)
                 if flag < 0:
                     raise IDAError(flag, self.t)
+            
+            if self.pData.dimQ > 0:
+                flag = SUNDIALS.IDAQuadReInit(self.ida_mem, self.yQ)
+                if flag < 0:
+                    raise IDAError(flag, self.t)
         
         if self.options["linear_solver"] == 'DENSE':
             #Specify the jacobian to the solver
@@ -346,7 +515,11 @@ cdef class IDA(Implicit_ODE):
                 if flag < 0:
                     raise IDAError(flag,self.t)
                     
-        elif self.options["linear_solver"] == 'SPGMR':
+        elif self.options["linear_solver"] in SPILS_SOLVERS:
+            flag = SUNDIALS.IDASpilsSetEpsLin(self.ida_mem, self.options["eplifac"])
+            if flag < 0:
+                raise IDAError(flag, self.t)
+            
             #Specify the jacobian times vector function
             if self.pData.JACV != NULL and self.options["usejac"]:
                 IF SUNDIALS_VERSION >= (3,0,0):
@@ -362,6 +535,33 @@ cdef class IDA(Implicit_ODE):
                     flag = SUNDIALS.IDASpilsSetJacTimesVecFn(self.ida_mem, NULL);
                 if flag < 0:
                     raise IDAError(flag, self.t)
+                    
+        elif self.options["linear_solver"] == 'BAND':
+            #Specify the jacobian to the solver
+            if self.pData.JAC != NULL and self.options["usejac"]:
+                IF SUNDIALS_VERSION >= (3,0,0):
+                    flag = SUNDIALS.IDADlsSetJacFn(self.ida_mem, ida_jac_band)
+                ELSE:
+                    flag = SUNDIALS.IDADlsSetBandJacFn(self.ida_mem, ida_jac_band)
+            else:
+                IF SUNDIALS_VERSION >= (3,0,0):
+                    flag = SUNDIALS.IDADlsSetJacFn(self.ida_mem, NULL)
+                ELSE:
+                    flag = SUNDIALS.IDADlsSetBandJacFn(self.ida_mem, NULL)
+            if flag < 0:
+                raise IDAError(flag, self.t)
+                    
+        elif self.options["linear_solver"] == 'SPARSE':
+            #Specify the jacobian to the solver
+            if self.pData.JAC != NULL and (self.options["usejac"] or self.problem_info["jac_fcn"] is False):
+                IF SUNDIALS_VERSION >= (3,0,0):
+                    flag = SUNDIALS.IDADlsSetJacFn(self.ida_mem, ida_jac_sparse)
+                ELSE:
+                    flag = SUNDIALS.IDASlsSetSparseJacFn(self.ida_mem, ida_jac_sparse)
+                if flag < 0:
+                    raise IDAError(flag, self.t)
+            else:
+                raise AssimuloException("For the SPARSE linear solver, the Jacobian must be provided and activated (or its sparsity pattern given via the problem attribute 'jac_sparsity').")
         else:
             raise IDAError(100, self.t)
         
@@ -369,7 +569,214 @@ cdef class IDA(Implicit_ODE):
         flag = SUNDIALS.IDASetUserData(self.ida_mem, <void*>self.pData)
         if flag < 0:
             raise IDAError(flag, self.t)
+        
+        #Adjoint sensitivity analysis, the forward solution is checkpointed from the start
+        if self.adj_init:
+            SUNDIALS.IDAAdjFree(self.ida_mem) #Also frees the backward problem
+            self.adj_init = False
+            self.adj_created = False
+        if self.options["adjoint"]:
+            flag = SUNDIALS.IDAAdjInit(self.ida_mem, self.options["adjsteps"], IDA_HERMITE if self.options["adjinterp"] == "HERMITE" else IDA_POLYNOMIAL)
+            if flag < 0:
+                raise IDAError(flag, self.t)
+            self.adj_init = True
+            self.adj_t0 = self.t
+            self.adj_y0 = N.array(self.y, dtype=float)
+            self.adj_yd0 = N.array(self.yd, dtype=float)
+    
+    cdef int ida_solve(self, realtype tout, realtype *tret, N_Vector yret, N_Vector ypret, int itask):
+        """
+        Advances the solution using IDASolve or, if the forward solution
+        is checkpointed for adjoint sensitivity analysis, IDASolveF.
+        """
+        cdef int ncheck
+        
+        if self.adj_init:
+            return SUNDIALS.IDASolveF(self.ida_mem, tout, tret, yret, ypret, itask, &ncheck)
+        return SUNDIALS.IDASolve(self.ida_mem, tout, tret, yret, ypret, itask)
+    
+    def solve_adjoint(self):
+        """
+        Computes the gradient, with respect to the parameters p, of the
+        cost functional
+        
+            G(p) = int_{t0}^{tf} g(t, y, p) dt
+        
+        over the last simulation using adjoint sensitivity analysis. The
+        adjoint variables are integrated backwards from tf to t0, using 
+        the checkpoints of the forward solution stored during the 
+        simulation, together with a quadrature for the gradient. The 
+        cost is roughly that of one backward integration, independent of
+        the number of parameters. The adjoint formulation requires that
+        dF/dyd is constant along the solution, which is the case for
+        instance for semi-explicit problems. The algebraic variables are 
+        specified by algvar.
+        
+        The option adjoint has to be set before the simulation and the
+        problem has to define the parameters, p0, and the integrand of
+        the cost functional,
+        
+            def cost(self, t, y, p)
+        
+        The problem can also define the gradients of the integrand and
+        the products of the Jacobians of the residual with the adjoint 
+        variables, which are otherwise approximated by finite 
+        differences,
+        
+            def cost_grad(self, t, y, p)             -> dg/dy, dg/dp
+            def res_adjoint(self, t, y, yd, yB, p)   -> (dF/dy)^T yB, (dF/dyd)^T yB, (dF/dp)^T yB
+        
+        If the problem defines the sensitivities of the initial values,
+        yS0, their contribution to the gradient is included.
+        
+            Returns::
+            
+                The cost, G, and its gradient, dG/dp.
+                
+            Example::
+            
+                sim.adjoint = True
+                sim.usesens = False #The forward sensitivities are not needed
+                sim.simulate(10.0)
+                G, dGdp = sim.solve_adjoint()
+        
+        See SUNDIALS IDAS documentation 'Adjoint sensitivity analysis'.
+        """
+        cdef int flag
+        cdef realtype tret, tout1
+        cdef realtype ZERO = 0.0
+        
+        if not self.adj_init:
+            raise AssimuloException("No checkpoints of the forward solution are stored, the option adjoint has to be set before the simulation.")
+        if not hasattr(self.problem, "cost"):
+            raise AssimuloException("The problem has to define the integrand of the cost functional, cost(t, y, p).")
+        
+        res = self._get_res()
+        if self.problem_info["switches"]:
+            F = lambda t, y, yd, p: res(t, y, yd, sw=self.sw, p=p)
+        else:
+            F = res
+        
+        adjoint = ImplicitAdjoint(F, self.problem.cost, self.pData.dimSens, getattr(self.problem, "cost_grad", None),
+                                  getattr(self.problem, "res_adjoint", None))
+        
+        self.pt_rhsB = adjoint.res
+        self.pt_quadB = adjoint.rhs_quad
+        self.pData.RHS_B = <void*>self.pt_rhsB
+        self.pData.QUAD_B = <void*>self.pt_quadB
+        
+        N_VConst(ZERO, self.yB)
+        N_VConst(ZERO, self.ydB)
+        N_VConst(ZERO, self.qB)
+        
+        if not self.adj_created:
+            #Create the backward problem
+            flag = SUNDIALS.IDACreateB(self.ida_mem, &self.whichB)
+            if flag < 0:
+                raise IDAError(flag, self.t)
+            
+            flag = SUNDIALS.IDAInitB(self.ida_mem, self.whichB, ida_resB, self.t, self.yB, self.ydB)
+            if flag < 0:
+                raise IDAError(flag, self.t)
+            
+            flag = SUNDIALS.IDAQuadInitB(self.ida_mem, self.whichB, ida_rhsQB, self.qB)
+            if flag < 0:
+                raise IDAError(flag, self.t)
+            
+            #The backward problem uses a dense linear solver with a difference quotient Jacobian
+            IF SUNDIALS_VERSION >= (3,0,0):
+                if self.sun_matrixB == NULL:
+                    self.sun_matrixB = SUNDIALS.SUNDenseMatrix(self.pData.dim, self.pData.dim)
+                    self.sun_linearsolverB = SUNDIALS.SUNDenseLinearSolver(self.yB, self.sun_matrixB)
+                flag = SUNDIALS.IDADlsSetLinearSolverB(self.ida_mem, self.whichB, self.sun_linearsolverB, self.sun_matrixB)
+            ELSE:
+                flag = SUNDIALS.IDADenseB(self.ida_mem, self.whichB, self.pData.dim)
+            if flag < 0:
+                raise IDAError(flag, self.t)
+            
+            self.adj_created = True
+        else:
+            flag = SUNDIALS.IDAReInitB(self.ida_mem, self.whichB, self.t, self.yB, self.ydB)
+            if flag < 0:
+                raise IDAError(flag, self.t)
+            
+            flag = SUNDIALS.IDAQuadReInitB(self.ida_mem, self.whichB, self.qB)
+            if flag < 0:
+                raise IDAError(flag, self.t)
+        
+        flag = SUNDIALS.IDASetUserDataB(self.ida_mem, self.whichB, <void*>self.pData)
+        if flag < 0:
+            raise IDAError(flag, self.t)
+        
+        flag = SUNDIALS.IDASVtolerancesB(self.ida_mem, self.whichB, self.options["rtol"], self.nv_atol)
+        if flag < 0:
+            raise IDAError(flag, self.t)
+        
+        flag = SUNDIALS.IDASetQuadErrConB(self.ida_mem, self.whichB, True)
+        if flag < 0:
+            raise IDAError(flag, self.t)
+        
+        flag = SUNDIALS.IDAQuadSStolerancesB(self.ida_mem, self.whichB, self.options["rtol"], N.min(self.options["atol"]))
+        if flag < 0:
+            raise IDAError(flag, self.t)
+        
+        flag = SUNDIALS.IDASetMaxNumStepsB(self.ida_mem, self.whichB, self.options["maxsteps"])
+        if flag < 0:
+            raise IDAError(flag, self.t)
+        
+        #Consistent final values of the adjoint variables (the algebraic components of yB
+        #and the differential components of ydB), given the forward solution at tf
+        flag = SUNDIALS.IDASetIdB(self.ida_mem, self.whichB, self.nv_id)
+        if flag < 0:
+            raise IDAError(flag, self.t)
+        
+        arr2nv_inplace(self.y, self.yTemp)
+        arr2nv_inplace(self.yd, self.ydTemp)
+        tout1 = self.t - self.options["tout1"] if self.adj_t0 < self.t else self.t + self.options["tout1"]
+        flag = SUNDIALS.IDACalcICB(self.ida_mem, self.whichB, tout1, self.yTemp, self.ydTemp)
+        if flag < 0:
+            raise IDAError(flag, self.t)
+        
+        #Integrate the adjoint problem backwards
+        flag = SUNDIALS.IDASolveB(self.ida_mem, self.adj_t0, IDA_NORMAL)
+        if flag < 0:
+            raise IDAError(flag, self.adj_t0)
+        
+        flag = SUNDIALS.IDAGetB(self.ida_mem, self.whichB, &tret, self.yB, self.ydB)
+        if flag < 0:
+            raise IDAError(flag, tret)
+        
+        flag = SUNDIALS.IDAGetQuadB(self.ida_mem, self.whichB, &tret, self.qB)
+        if flag < 0:
+            raise IDAError(flag, tret)
+        
+        return adjoint.gradient(nv2arr(self.yB), nv2arr(self.qB), self.yS0, self.adj_t0, self.adj_y0, self.adj_yd0, self.p)
             
+    def _set_fd_jac_sparse(self):
+        """
+        Sets a colored finite difference approximation of the Jacobian,
+        dF/dy + c*dF/dyd, based on the sparsity pattern given by the
+        problem attribute jac_sparsity, to be used by the SPARSE linear
+        solver. The pattern should cover both dF/dy and dF/dyd.
+        """
+        fd_jac = FDJacobian(self.pData.dim, self.problem_info["jac_sparsity"], "CSC")
+        res = self._get_res()
+        
+        def jac(c, t, y, yd, sw=None, p=None):
+            if p is not None:
+                F = (lambda t, y, yd: res(t, y, yd, sw=sw, p=p)) if sw is not None else (lambda t, y, yd: res(t, y, yd, p))
+            elif sw is not None:
+                F = lambda t, y, yd: res(t, y, yd, sw)
+            else:
+                F = res
+            self.statistics["nfcnjacs"] += 1+fd_jac.ncolors
+            #A perturbation of y is followed by a perturbation c times larger of yd
+            return fd_jac(lambda t, v: F(t, v, yd + c*(v - y)), t, y)
+        
+        self.pt_jac = jac
+        self.pData.JAC = <void*>self.pt_jac
+        self.problem_info["jac_fcn_nnz"] = fd_jac.nnz
+    
     def initialize_event_detection(self):
         if self.problem_info["type"] == 1:
             def event_func(t, y, yd): 
@@ -454,7 +861,8 @@ cdef class IDA(Implicit_ODE):
             raise IDAError(flag)
         
         #Set the algebraic components and the differential
-        flag = SUNDIALS.IDASetId(self.ida_mem, arr2nv(self.options["algvar"]))
+        arr2nv_inplace(self.options["algvar"], self.nv_id)
+        flag = SUNDIALS.IDASetId(self.ida_mem, self.nv_id)
         if flag < 0:
             raise IDAError(flag)
         
@@ -464,7 +872,7 @@ cdef class IDA(Implicit_ODE):
             raise IDAError(flag)
             
         #Set the tolerances
-        self.nv_atol = arr2nv(self.options["atol"])
+        arr2nv_inplace(self.options["atol"], self.nv_atol)
         flag = SUNDIALS.IDASVtolerances(self.ida_mem, self.options["rtol"], self.nv_atol)
         if flag < 0:
             raise IDAError(flag)
@@ -472,20 +880,33 @@ cdef class IDA(Implicit_ODE):
         #Initialize sensitivity if any
         if self.pData.dimSens > 0:
             self.initialize_sensitivity_options()
+        
+        #Include the quadratures in the error test (with the smallest absolute tolerance) or not
+        if self.pData.dimQ > 0:
+            if self.options["suppress_quad"] == False:
+                flag = SUNDIALS.IDAQuadSStolerances(self.ida_mem, self.options["rtol"], N.min(self.options["atol"]))
+                if flag < 0:
+                    raise IDAError(flag)
+            flag = SUNDIALS.IDASetQuadErrCon(self.ida_mem, self.options["suppress_quad"]==False)
+            if flag < 0:
+                raise IDAError(flag)
+        
+        self.options_initialized = True
     
     cpdef integrate(self,double t,N.ndarray[ndim=1, dtype=realtype] y,N.ndarray[ndim=1, dtype=realtype] yd,double tf,dict opts):
         cdef int flag, output_index, normal_mode
-        cdef N_Vector yout, ydout
+        cdef N_Vector yout = self.yOut, ydout = self.ydOut
         cdef double tret = 0.0, tout
         cdef list tr = [], yr = [], ydr = []
         cdef N.ndarray output_list
-        yout = arr2nv(y)
-        ydout = arr2nv(yd)
+        
+        self.q_out = []
         
         #Initialize? 
         if opts["initialize"]:
             self.initialize_ida()
-            self.initialize_options()
+            if not (self.options["light_reinit"] and self.options_initialized):
+                self.initialize_options()
             if self.options["external_event_detection"]:
                 self.initialize_event_detection()
         
@@ -499,7 +920,7 @@ cdef class IDA(Implicit_ODE):
             while True:
                 
                 #Integration loop
-                flag = SUNDIALS.IDASolve(self.ida_mem,tf,&tret,yout,ydout,IDA_ONE_STEP)
+                flag = self.ida_solve(tf,&tret,yout,ydout,IDA_ONE_STEP)
                 if flag < 0:
                     raise IDAError(flag, tret)
                     
@@ -514,6 +935,9 @@ cdef class IDA(Implicit_ODE):
                     event_flag, t, y, yd = self.event_locator(told, t, y, yd)
                     if event_flag == ID_PY_EVENT: flag = CV_ROOT_RETURN
                 
+                if self.pData.dimQ > 0:
+                    self.q = self.interpolate_quadrature(t)
+                
                 if opts["report_continuously"]: 
                     flag_initialize = self.report_solution(t, y, yd, opts) 
                     if flag_initialize:
@@ -524,6 +948,8 @@ cdef class IDA(Implicit_ODE):
                     tr.append(t)
                     yr.append(y)
                     ydr.append(yd)
+                    if self.pData.dimQ > 0:
+                        self.q_out.append(self.q)
                 
                 if flag == IDA_ROOT_RETURN: #Found a root
                     flag = ID_EVENT #Convert to Assimulo flags
@@ -540,7 +966,7 @@ cdef class IDA(Implicit_ODE):
             
             for tout in output_list:
                 #Integration loop
-                flag = SUNDIALS.IDASolve(self.ida_mem,tout,&tret,yout,ydout,IDA_NORMAL)
+                flag = self.ida_solve(tout,&tret,yout,ydout,IDA_NORMAL)
                 if flag < 0:
                     raise IDAError(flag, tret)
                 
@@ -548,6 +974,9 @@ cdef class IDA(Implicit_ODE):
                 tr.append(tret)
                 yr.append(nv2arr(yout))
                 ydr.append(nv2arr(ydout))
+                if self.pData.dimQ > 0:
+                    self.q = self.interpolate_quadrature(tret)
+                    self.q_out.append(self.q)
                 
                 if flag == IDA_ROOT_RETURN: #Found a root
                     flag = ID_EVENT #Convert to Assimulo flags
@@ -568,30 +997,24 @@ cdef class IDA(Implicit_ODE):
             
             opts["output_index"] = output_index
         
-        #Deallocate
-        N_VDestroy_Serial(yout)
-        N_VDestroy_Serial(ydout)
-        
         return flag, tr, yr, ydr
     
     
     cpdef step(self,double t,N.ndarray y, N.ndarray yd, double tf,dict opts):
         cdef int flag
-        cdef N_Vector yout, ydout 
+        cdef N_Vector yout = self.yOut, ydout = self.ydOut
         cdef double tret = t
         cdef double tr
         cdef N.ndarray yr, ydr
         
-        yout  = arr2nv(y)
-        ydout = arr2nv(yd)
-        
         #Get options
         initialize  = opts["initialize"]
         
         #Initialize?
         if initialize:
             self.initialize_ida()
-            self.initialize_options()
+            if not (self.options["light_reinit"] and self.options_initialized):
+                self.initialize_options()
         
         #Set stop time
         flag = SUNDIALS.IDASetStopTime(self.ida_mem, tf)
@@ -599,7 +1022,7 @@ cdef class IDA(Implicit_ODE):
             raise IDAError(flag, t)
         
         #Integration loop
-        flag = SUNDIALS.IDASolve(self.ida_mem,tf,&tret,yout,ydout,IDA_ONE_STEP)
+        flag = self.ida_solve(tf,&tret,yout,ydout,IDA_ONE_STEP)
         if flag < 0:
             raise IDAError(flag, tret)
             
@@ -607,6 +1030,8 @@ cdef class IDA(Implicit_ODE):
         tr  = tret
         yr  = nv2arr(yout)
         ydr = nv2arr(ydout)
+        if self.pData.dimQ > 0:
+            self.q = self.interpolate_quadrature(tret)
         
         if flag == IDA_ROOT_RETURN: #Found a root
             flag = ID_EVENT #Convert to Assimulo flags
@@ -616,10 +1041,6 @@ cdef class IDA(Implicit_ODE):
             flag = ID_COMPLETE
             self.store_statistics(IDA_TSTOP_RETURN)
         
-        #Deallocate
-        N_VDestroy_Serial(yout)
-        N_VDestroy_Serial(ydout)
-        
         return flag, tr, yr, ydr
     
     cpdef make_consistent(self, method):
@@ -691,46 +1112,42 @@ cdef class IDA(Implicit_ODE):
     
     cpdef get_last_estimated_errors(self):
         cdef flag
-        cdef N.ndarray err, pyweight, pyele
-        cdef N_Vector ele=N_VNew_Serial(self.pData.dim)
-        cdef N_Vector eweight=N_VNew_Serial(self.pData.dim)
+        cdef N.ndarray pyweight, pyele
         
-        flag = SUNDIALS.IDAGetErrWeights(self.ida_mem, eweight)
+        if self.nv_view == NULL: #Not initialized, see create_work_vectors
+            raise IDAError(IDA_MEM_NULL, self.t)
+        pyweight = nv_set_output(self.nv_view, None, self.pData.dim)
+        flag = SUNDIALS.IDAGetErrWeights(self.ida_mem, self.nv_view)
         if flag < 0:
             raise IDAError(flag)
-        flag = SUNDIALS.IDAGetEstLocalErrors(self.ida_mem, ele)
+        pyele = nv_set_output(self.nv_view, None, self.pData.dim)
+        flag = SUNDIALS.IDAGetEstLocalErrors(self.ida_mem, self.nv_view)
         if flag < 0:
             raise IDAError(flag)
         
-        pyweight = nv2arr(eweight)
-        pyele = nv2arr(ele)
+        pyele *= pyweight
         
-        err = pyweight*pyele
-        
-        N_VDestroy_Serial(ele) #Deallocate
-        N_VDestroy_Serial(eweight) #Deallocate
-        
-        return err
+        return pyele
     
-    cpdef N.ndarray interpolate(self,double t,int k = 0):
+    cpdef N.ndarray interpolate(self,double t,int k = 0, N.ndarray out = None):
         """
         Calls the internal IDAGetDky for the interpolated values at time t.
         t must be within the last internal step. k is the derivative of y which
-        can be from zero to the current order.
+        can be from zero to the current order. If given, the values are 
+        written into the (contiguous, float) array out which is returned.
         """
         cdef flag
         cdef N.ndarray res
-        cdef N_Vector dky=N_VNew_Serial(self.pData.dim)
         
-        flag = SUNDIALS.IDAGetDky(self.ida_mem, t, k, dky)
+        if self.nv_view == NULL: #Not initialized, see create_work_vectors
+            raise IDAError(IDA_MEM_NULL, t)
+        res = nv_set_output(self.nv_view, out, self.pData.dim)
+        
+        flag = SUNDIALS.IDAGetDky(self.ida_mem, t, k, self.nv_view)
         
         if flag < 0:
             raise IDAError(flag, t)
         
-        res = nv2arr(dky)
-        
-        N_VDestroy_Serial(dky) #Deallocate
-        
         return res
         
     cpdef interpolate_sensitivity(self,double t, int k = 0, int i=-1):
@@ -755,36 +1172,75 @@ cdef class IDA(Implicit_ODE):
             
                     A matrix containing the Ns vectors or a vector if i is specified.
         """
-        cdef N_Vector dkyS=N_VNew_Serial(self.pData.dim)
         cdef flag
         cdef N.ndarray res
         
+        if self.nv_view == NULL: #Not initialized, see create_work_vectors
+            raise IDAError(IDA_MEM_NULL, t)
+        
         if i==-1:
             
-            matrix = []
+            res = N.empty((self.pData.dimSens, self.pData.dim))
             
-            for x in xrange(self.pData.dimSens):
-                flag = SUNDIALS.IDAGetSensDky1(self.ida_mem, t, k, x, dkyS)
+            for x in range(self.pData.dimSens):
+                nv_set_output(self.nv_view, res[x], self.pData.dim)
+                flag = SUNDIALS.IDAGetSensDky1(self.ida_mem, t, k, x, self.nv_view)
                 
                 if flag<0:
                     raise IDAError(flag, t)
-                
-                matrix += [nv2arr(dkyS)]
-            
-            N_VDestroy_Serial(dkyS)
             
-            return np.array(matrix)
+            return res
         else:
-            flag = SUNDIALS.IDAGetSensDky1(self.ida_mem, t, k, i, dkyS)
+            res = nv_set_output(self.nv_view, None, self.pData.dim)
+            flag = SUNDIALS.IDAGetSensDky1(self.ida_mem, t, k, i, self.nv_view)
             
             if flag <0:
                 raise IDAError(flag, t)
             
-            res = nv2arr(dkyS)
-            
-            N_VDestroy_Serial(dkyS)
-            
             return res
+    
+    cpdef N.ndarray interpolate_quadrature(self, double t, int k = 0):
+        """
+        Calls the internal IDAGetQuadDky for the interpolated values of the
+        quadratures at time t. t must be within the last internal step. k 
+        is the derivative of q which can be from zero to the current order.
+        """
+        cdef flag
+        
+        if self.pData.dimQ == 0:
+            raise IDAError(IDA_NO_QUAD, t)
+        
+        if self.yQ == NULL: #Not initialized
+            raise IDAError(IDA_MEM_NULL, t)
+        
+        flag = SUNDIALS.IDAGetQuadDky(self.ida_mem, t, k, self.yQ)
+        if flag < 0:
+            raise IDAError(flag, t)
+        
+        return nv2arr(self.yQ)
+    
+    cpdef get_quadrature(self, double t):
+        """
+        Returns the quadratures at the output point t, used by handle_result
+        to store them in q_sol. The output points of a call to integrate are
+        handled after the integration, in order, and their quadratures are
+        therefore stored during the integration.
+        """
+        if self.q_out:
+            return self.q_out.pop(0)
+        if t == self.t:
+            return self.q.copy()
+        return self.interpolate_quadrature(t)
+    
+    def re_init(self, t0, y0, yd0, sw0=None):
+        """
+        Reinitiates the solver, see Implicit_ODE.re_init. The quadratures
+        are reset to their initial values, q0.
+        """
+        Implicit_ODE.re_init(self, t0, y0, yd0, sw0)
+        
+        if self.pData.dimQ > 0:
+            self.q = self.q0.copy()
             
     def _set_lsoff(self, lsoff):
         try:
@@ -921,6 +1377,89 @@ cdef class IDA(Implicit_ODE):
 
     suppress_sens=property(_get_suppress_sens,_set_suppress_sens)
     
+    def _set_suppress_quad(self,suppress_quad):
+        try:
+            self.options["suppress_quad"] = bool(suppress_quad)
+        except:
+            raise AssimuloException("Unkown input to suppress_quad, must be a boolean.")
+
+    def _get_suppress_quad(self):
+        """
+        A Boolean flag which indicates that the error-tests are 
+        suppressed on the quadratures (problem.resQ). If the 
+        quadratures are included in the error-test, the relative 
+        tolerance and the smallest of the absolute tolerances are used.
+        
+            Parameters::
+            
+                suppress_quad    
+                                - Default 'True'.
+                
+                                - Should be a boolean.
+                                
+                                    Example:
+                                        suppress_quad = False
+                                        
+        See SUNDIALS IDAS documentation 'IDASetQuadErrCon' 
+        for more details.
+        """
+        return self.options["suppress_quad"]    
+
+    suppress_quad=property(_get_suppress_quad,_set_suppress_quad)
+    
+    def _set_nvector(self, nvector):
+        if nvector.upper() in NVECTORS:
+            self.options["nvector"] = nvector.upper()
+        else:
+            raise AssimuloException('The N_Vector must be either "SERIAL", "OPENMP" or "PTHREADS".')
+    
+    def _get_nvector(self):
+        """
+        Specifies the N_Vector implementation, i.e. how the vector
+        operations of the solver (norms, linear combinations etc.) are
+        computed. The multithreaded implementations use the number of
+        threads given by the option num_threads and pay off for large
+        systems. The option takes effect at the first initialization of
+        the solver.
+        
+            Parameters::
+            
+                nvector
+                        - Default 'SERIAL'. Can also be 'OPENMP' or
+                          'PTHREADS', provided that Assimulo was compiled
+                          against a Sundials with these vectors.
+        """
+        return self.options["nvector"]
+    
+    nvector = property(_get_nvector, _set_nvector)
+    
+    def _set_light_reinit(self, light_reinit):
+        self.options["light_reinit"] = bool(light_reinit)
+    
+    def _get_light_reinit(self):
+        """
+        A Boolean flag which indicates that the reinitializations of
+        the solver after events are light, i.e. that the options are
+        not set again and that the linear solver is kept. Options
+        changed during the simulation (for instance in handle_event)
+        then take effect at the next call to simulate. Note that the
+        Jacobian of IDA depends on the step size and is therefore
+        evaluated at the first step after an event regardless.
+        
+            Parameters::
+            
+                light_reinit
+                                - Default 'False'.
+                
+                                - Should be a boolean.
+                                
+                                    Example:
+                                        light_reinit = True
+        """
+        return self.options["light_reinit"]
+    
+    light_reinit = property(_get_light_reinit, _set_light_reinit)
+    
     def _set_atol(self,atol):
         
         #self.options["atol"] = N.array(atol,dtype=N.float) if len(N.array(atol,dtype=N.float).shape)>0 else N.array([atol],dtype=N.float)
@@ -1100,10 +1639,10 @@ cdef class IDA(Implicit_ODE):
     maxh=property(_get_max_h,_set_max_h)
     
     def _set_linear_solver(self, lsolver):
-        if lsolver.upper() == "DENSE" or lsolver.upper() == "SPGMR":
+        if lsolver.upper() in ("DENSE", "SPARSE", "BAND") + SPILS_SOLVERS:
             self.options["linear_solver"] = lsolver.upper()
         else:
-            raise AssimuloException('The linear solver must be either "DENSE" or "SPGMR".')
+            raise AssimuloException('The linear solver must be either "DENSE", "SPARSE", "BAND", "SPGMR", "SPFGMR", "SPBCGS" or "SPTFQMR".')
         
     def _get_linear_solver(self):
         """
@@ -1112,12 +1651,120 @@ cdef class IDA(Implicit_ODE):
             Parameters::
             
                 linearsolver
-                        - Default 'DENSE'. Can also be 'SPGMR'.
+                        - Default 'DENSE'. Can also be 'SPARSE', 'BAND' or
+                          one of the iterative (Krylov) solvers 'SPGMR',
+                          'SPFGMR', 'SPBCGS' and 'SPTFQMR'. 'SPFGMR'
+                          requires SUNDIALS 3.0 or newer.
+                        
+                        - The 'BAND' solver requires the lower and upper
+                          bandwidth of the Jacobian, dF/dy + c*dF/dyd,
+                          given by the problem attribute jac_bandwidth =
+                          (ml, mu). The Jacobian may be given either as a
+                          full matrix or in compact band storage, an array
+                          of shape (ml+mu+1, dim) where
+                          jac[mu+i-j, j] = dF_i/dy_j + c*dF_i/dyd_j.
+                        
+                        - The 'SPARSE' solver (SuperLU_MT) requires the
+                          Jacobian, dF/dy + c*dF/dyd, on Scipy's CSC
+                          format and its number of nonzero elements
+                          (problem attribute jac_nnz), or the sparsity
+                          pattern of the Jacobian (problem attribute
+                          jac_sparsity). The number of threads used
+                          by SuperLU_MT is set by the option num_threads.
         """
         return self.options["linear_solver"]
     
     linear_solver = property(_get_linear_solver, _set_linear_solver)
     
+    def _set_gstype(self, gstype):
+        if gstype.upper() == "MODIFIED":
+            self.options["gstype"] = MODIFIED_GS
+        elif gstype.upper() == "CLASSICAL":
+            self.options["gstype"] = CLASSICAL_GS
+        else:
+            raise AssimuloException('Unknown input of gstype. Should be either "MODIFIED" or "CLASSICAL".')
+    
+    def _get_gstype(self):
+        """
+        Specifies the type of Gram-Schmidt orthogonalization used by the
+        linear solvers 'SPGMR' and 'SPFGMR'.
+        
+            Parameters::
+            
+                    gstype
+                            - Should be either "MODIFIED" or "CLASSICAL"
+                            - Default "MODIFIED"
+            
+            Returns::
+            
+                The current value of gstype (as string).
+                
+        See SUNDIALS documentation 'IDASpilsSetGSType'
+        """
+        return "MODIFIED" if self.options["gstype"] == MODIFIED_GS else "CLASSICAL"
+    
+    gstype = property(_get_gstype, _set_gstype)
+    
+    def _set_max_restarts(self, maxrestarts):
+        try:
+            self.options["maxrestarts"] = int(maxrestarts)
+        except (ValueError, TypeError):
+            raise AssimuloException("The maximum number of restarts should be an integer.")
+        if self.options["maxrestarts"] < 0:
+            raise AssimuloException("The maximum number of restarts should be a non-negative integer.")
+    
+    def _get_max_restarts(self):
+        """
+        Specifies the maximum number of restarts of the linear solvers
+        'SPGMR' and 'SPFGMR'.
+        
+            Parameters::
+            
+                    maxrestarts
+                            - A non-negative integer.
+                            - Default 5
+            
+            Returns::
+            
+                The current value of maxrestarts.
+                
+        See SUNDIALS documentation 'IDASpilsSetMaxRestarts'
+        """
+        return self.options["maxrestarts"]
+    
+    maxrestarts = property(_get_max_restarts, _set_max_restarts)
+    
+    def _set_eplifac(self, eplifac):
+        try:
+            self.options["eplifac"] = float(eplifac)
+        except (ValueError, TypeError):
+            raise AssimuloException("The linear convergence tolerance factor should be a float.")
+        if self.options["eplifac"] < 0.0:
+            raise AssimuloException("The linear convergence tolerance factor should be non-negative.")
+    
+    def _get_eplifac(self):
+        """
+        Specifies the factor by which the tolerance on the nonlinear
+        iteration is multiplied to get the tolerance on the linear
+        iterations of the iterative (Krylov) linear solvers.
+        
+            Parameters::
+            
+                    eplifac
+                            - A non-negative float. Zero gives the
+                              default value.
+                            - Default 0.05
+            
+            Returns::
+            
+                The current value of eplifac.
+                
+        See SUNDIALS documentation 'IDASpilsSetEpsLin'
+        """
+        return self.options["eplifac"]
+    
+    eplifac = property(_get_eplifac, _set_eplifac)
+    
     def _set_algvar(self,algvar):
         self.options["algvar"] = N.array(algvar,dtype=N.float) if len(N.array(algvar,dtype=N.float).shape)>0 else N.array([algvar],dtype=N.float)
         
@@ -1293,6 +1940,88 @@ cdef class IDA(Implicit_ODE):
     
     dqrhomax = property(_get_dqrhomax, _set_dqrhomax)
     
+    def _set_adjoint(self, adjoint):
+        self.options["adjoint"] = bool(adjoint)
+    
+    def _get_adjoint(self):
+        """
+        This option specifies if the forward solution is checkpointed 
+        during the simulation, which is needed for the adjoint 
+        sensitivity analysis, see solve_adjoint. Note that the forward
+        sensitivities are not needed for the adjoint sensitivity analysis
+        and can be deactivated (usesens).
+        
+            Parameters::
+            
+                adjoint
+                        - Default False.
+                        
+                        - Should be a boolean.
+                        
+                            Example:
+                                adjoint = True
+                                
+        See SUNDIALS documentation 'IDAAdjInit'
+        """
+        return self.options["adjoint"]
+    
+    adjoint = property(_get_adjoint, _set_adjoint)
+    
+    def _set_adjsteps(self, adjsteps):
+        try:
+            adjsteps = int(adjsteps)
+        except (ValueError, TypeError):
+            raise AssimuloException("The number of steps between the checkpoints should be an integer.")
+        if adjsteps < 1:
+            raise AssimuloException("The number of steps between the checkpoints should be positive.")
+        self.options["adjsteps"] = adjsteps
+    
+    def _get_adjsteps(self):
+        """
+        Specifies the number of integration steps between two 
+        consecutive checkpoints of the forward solution, used by the 
+        adjoint sensitivity analysis. A larger value requires less 
+        checkpoints but more memory for the interpolation data between
+        two checkpoints.
+        
+            Parameters::
+            
+                adjsteps
+                        - Default 100.
+                        
+                        - Should be a positive integer.
+                        
+        See SUNDIALS documentation 'IDAAdjInit'
+        """
+        return self.options["adjsteps"]
+    
+    adjsteps = property(_get_adjsteps, _set_adjsteps)
+    
+    def _set_adjinterp(self, adjinterp):
+        if adjinterp.upper() not in ("HERMITE", "POLYNOMIAL"):
+            raise AssimuloException('Unknown input of adjinterp. Should be either "HERMITE" or "POLYNOMIAL".')
+        self.options["adjinterp"] = adjinterp.upper()
+    
+    def _get_adjinterp(self):
+        """
+        Specifies the interpolation of the forward solution between the
+        checkpoints, used by the adjoint sensitivity analysis. The cubic
+        Hermite interpolation requires the storage of the solution and 
+        its derivative at each step, while the variable-degree polynomial
+        interpolation only requires the solution.
+        
+            Parameters::
+            
+                adjinterp
+                        - Should be either "HERMITE" or "POLYNOMIAL"
+                        - Default "HERMITE"
+                        
+        See SUNDIALS documentation 'IDAAdjInit'
+        """
+        return self.options["adjinterp"]
+    
+    adjinterp = property(_get_adjinterp, _set_adjinterp)
+    
     def _set_pbar(self, pbar):
         if len(pbar) != self.problem_info['dimSens']:
             raise AssimuloException('pbar must be of equal length as the parameters.')
@@ -1358,7 +2087,8 @@ cdef class IDA(Implicit_ODE):
         cdef long int nniters = 0, nncfails = 0, ngevals = 0
         cdef long int nSniters = 0, nSncfails = 0, njevals = 0, nrevalsLS = 0
         cdef long int nfSevals = 0, nfevalsS = 0, nSetfails = 0, nlinsetupsS = 0
-        cdef long int njvevals = 0, nfevalsLS = 0
+        cdef long int njvevals = 0, nfevalsLS = 0, nliters = 0, nlcfails = 0
+        cdef long int nrevalsQ = 0
         cdef int klast, kcur
         cdef realtype hinused, hlast, hcur, tcur
         
@@ -1369,11 +2099,21 @@ cdef class IDA(Implicit_ODE):
         #flag = SUNDIALS.IDADlsGetNumJacEvals(self.ida_mem, &njevals)
         #flag = SUNDIALS.IDADlsGetNumResEvals(self.ida_mem, &nrevalsLS)
         
-        if self.options["linear_solver"] == "SPGMR":
+        if self.options["linear_solver"] in SPILS_SOLVERS:
             flag = SUNDIALS.IDASpilsGetNumJtimesEvals(self.ida_mem, &njvevals) #Number of jac*vector
             flag = SUNDIALS.IDASpilsGetNumResEvals(self.ida_mem, &nfevalsLS) #Number of rhs due to jac*vector
+            flag = SUNDIALS.IDASpilsGetNumLinIters(self.ida_mem, &nliters) #Number of linear iterations
+            flag = SUNDIALS.IDASpilsGetNumConvFails(self.ida_mem, &nlcfails) #Number of linear convergence failures
             self.statistics["nfcnjacs"] += nfevalsLS
             self.statistics["njacvecs"] += njvevals
+            self.statistics["nliters"] += nliters
+            self.statistics["nlcfails"] += nlcfails
+        elif self.options["linear_solver"] == "SPARSE":
+            IF SUNDIALS_VERSION >= (3,0,0):
+                flag = SUNDIALS.IDADlsGetNumJacEvals(self.ida_mem, &njevals)
+            ELSE:
+                flag = SUNDIALS.IDASlsGetNumJacEvals(self.ida_mem, &njevals)
+            self.statistics["njacs"] += njevals
         else:
             flag = SUNDIALS.IDADlsGetNumJacEvals(self.ida_mem, &njevals)
             flag = SUNDIALS.IDADlsGetNumResEvals(self.ida_mem, &nrevalsLS)
@@ -1403,6 +2143,11 @@ cdef class IDA(Implicit_ODE):
                 flag = SUNDIALS.IDAGetSensNonlinSolvStats(self.ida_mem, &nSniters, &nSncfails)
                 self.statistics["nsensniters"]   += nSniters
                 self.statistics["nsensnfails"]  += nSncfails
+        
+        #If quadratures
+        if self.pData.dimQ > 0:
+            flag = SUNDIALS.IDAGetQuadNumRhsEvals(self.ida_mem, &nrevalsQ)
+            self.statistics["nquadfcns"] += nrevalsQ
     
     def print_statistics(self, verbose=NORMAL):
         """
@@ -1420,6 +2165,12 @@ cdef class IDA(Implicit_ODE):
         self.log_message(' Solver                       : IDA (BDF)',                      verbose)
         self.log_message(' Maximal order                : ' + str(self.options["maxord"]), verbose)
         self.log_message(' Suppressed algebr. variables : ' + str(self.options["suppress_alg"]), verbose)
+        if self.problem_info['dimQ'] > 0:
+            self.log_message(' Suppressed quadratures       : ' + str(self.options["suppress_quad"]), verbose)
+        if self.options["nvector"] != "SERIAL":
+            self.log_message(' N_Vector (threads)           : %s (%d)'%(self.options["nvector"], self.options["num_threads"]), verbose)
+        if self.options["light_reinit"]:
+            self.log_message(' Light reinitialization       : ' + str(self.options["light_reinit"]), verbose)
         self.log_message(' Tolerances (absolute)        : ' + str(self._compact_atol()),   verbose)
         self.log_message(' Tolerances (relative)        : ' + str(self.options["rtol"]),   verbose)
         self.log_message('',                                                          verbose)
@@ -1442,12 +2193,25 @@ cdef class CVode(Explicit_ODE):
     """
     cdef void* cvode_mem
     cdef ProblemData pData      #A struct containing information about the problem
-    cdef N_Vector yTemp, ydTemp, nv_atol
+    cdef N_Vector yTemp, ydTemp, nv_atol, yOut, nv_view
     cdef N_Vector *ySO
+    cdef int nSO #Number of allocated sensitivity vectors
+    cdef N_Vector yB, qB #The adjoint variables and the backward quadrature
+    cdef int whichB #Identifier of the backward problem
+    cdef bint adj_init, adj_created #Is the adjoint memory allocated and the backward problem created?
+    cdef realtype adj_t0 #Start time of the checkpointed forward solution
+    cdef N_Vector yQ #The quadratures
+    cdef realtype (*wrmsnorm)(N_Vector, N_Vector)
+    cdef public N.ndarray q0, q #The initial and current values of the quadratures
+    cdef list q_out #Quadratures at the output points of the last call to integrate
     cdef object f
     cdef public object event_func
     #cdef public dict statistics
     cdef object pt_root, pt_fcn, pt_jac, pt_jacv, pt_sens,pt_prec_solve,pt_prec_setup
+    cdef object pt_rhsB, pt_quadB, pt_quad
+    cdef bint options_initialized #Are the options set since the last call to initialize?
+    cdef bint jac_reuse, prec_reuse #Reuse the Jacobian data at the next request (light reinitialization)
+    cdef object pt_jac_light, pt_prec_setup_light, jac_last
     cdef public N.ndarray yS0
     #cdef N.ndarray _event_info
     cdef public N.ndarray g_old
@@ -1455,6 +2219,8 @@ cdef class CVode(Explicit_ODE):
     cdef SUNDIALS.SUNLinearSolver sun_linearsolver
     cdef SUNDIALS.SUNNonlinearSolver sun_nonlinearsolver
     cdef SUNDIALS.SUNNonlinearSolver sun_nonlinearsolver_sens
+    cdef SUNDIALS.SUNMatrix sun_matrixB
+    cdef SUNDIALS.SUNLinearSolver sun_linearsolverB
     
     def __init__(self, problem):
         Explicit_ODE.__init__(self, problem) #Calls the base class
@@ -1494,6 +2260,15 @@ cdef class CVode(Explicit_ODE):
         
         self.options["maxkrylov"] = 5
         self.options["precond"] = PREC_NONE
+        self.options["gstype"] = MODIFIED_GS
+        self.options["maxrestarts"] = 0
+        self.options["eplifac"] = 0.05
+        self.options["adjoint"] = False
+        self.options["adjsteps"] = 100
+        self.options["adjinterp"] = "HERMITE"
+        self.options["suppress_quad"] = True #Turn on or off the local error test on the quadratures
+        self.options["nvector"] = "SERIAL"   #The N_Vector implementation
+        self.options["light_reinit"] = False #Keep the options, the linear solver and the Jacobian at reinitializations after events
         
         #Solver support
         self.supports["report_continuously"] = True
@@ -1502,6 +2277,9 @@ cdef class CVode(Explicit_ODE):
         self.supports["state_events"] = True
         
         self.statistics.add_key("nlsred", "Number of order reductions due to stability")
+        self.statistics.add_key("nliters", "Number of linear iterations")
+        self.statistics.add_key("nlcfails", "Number of linear convergence failures")
+        self.statistics.add_key("njacreuse", "Number of Jacobians reused after events")
          
         #Get options from Problem
         if hasattr(problem, 'pbar'):
@@ -1511,14 +2289,50 @@ cdef class CVode(Explicit_ODE):
         if hasattr(problem, 'yS0'):
             self.yS0 = problem.yS0
     
+    cdef create_work_vectors(self):
+        """
+        Creates the N_Vectors used by the solver, of the implementation
+        given by the option nvector. They are created at the first
+        initialization, reused for the lifetime of the solver and
+        deallocated in __dealloc__.
+        """
+        cdef str nvector = self.options["nvector"]
+        cdef int num_threads = self.options["num_threads"]
+        
+        self.yTemp   = new_nvector(self.pData.dim, nvector, num_threads)
+        self.wrmsnorm = self.yTemp.ops.nvwrmsnorm #The WRMS norm of the implementation, see the option norm
+        self.nv_atol = new_nvector(self.pData.dim, nvector, num_threads)
+        self.yOut    = new_nvector(self.pData.dim, nvector, num_threads)
+        self.nv_view = N_VCloneEmpty(self.yTemp) #Points to the output arrays, see nv_set_output
+        
+        if self.pData.dimSens > 0:
+            self.nSO = self.pData.dimSens
+            self.ySO = N_VCloneVectorArray(self.nSO, self.yTemp)
+            self.yB = new_nvector(self.pData.dim, nvector, num_threads)
+            self.qB = new_nvector(self.pData.dimSens+1, nvector, num_threads)
+        
+        if self.pData.dimQ > 0:
+            self.yQ = new_nvector(self.pData.dimQ, nvector, num_threads)
+    
     def __dealloc__(self):
         
+        #Deallocate the N_Vectors
         if self.yTemp != NULL:
-            #Deallocate N_Vector
-            N_VDestroy_Serial(self.yTemp)
-            
+            N_VDestroy(self.yTemp)
         if self.nv_atol != NULL:
-            N_VDestroy_Serial(self.nv_atol)
+            N_VDestroy(self.nv_atol)
+        if self.yOut != NULL:
+            N_VDestroy(self.yOut)
+        if self.nv_view != NULL:
+            N_VDestroy(self.nv_view)
+        if self.ySO != NULL:
+            N_VDestroyVectorArray(self.ySO, self.nSO)
+        if self.yB != NULL:
+            N_VDestroy(self.yB)
+        if self.qB != NULL:
+            N_VDestroy(self.qB)
+        if self.yQ != NULL:
+            N_VDestroy(self.yQ)
         
         if self.cvode_mem != NULL:
             #Free Memory
@@ -1530,22 +2344,27 @@ cdef class CVode(Explicit_ODE):
                 
             if self.sun_linearsolver != NULL:
                 SUNDIALS.SUNLinSolFree(self.sun_linearsolver)
+            
+            if self.sun_matrixB != NULL:
+                SUNDIALS.SUNMatDestroy(self.sun_matrixB)
+                
+            if self.sun_linearsolverB != NULL:
+                SUNDIALS.SUNLinSolFree(self.sun_linearsolverB)
     
     cpdef get_local_errors(self):
         """
         Returns the vector of estimated local errors at the current step.
         """
         cdef int flag
-        cdef N_Vector ele=N_VNew_Serial(self.pData.dim) #Allocates a new N_Vector
+        cdef N.ndarray ele_py
+        
+        if self.nv_view == NULL: #Not initialized, see create_work_vectors
+            raise CVodeError(CV_MEM_NULL, self.t)
+        ele_py = nv_set_output(self.nv_view, None, self.pData.dim)
         
-        flag = SUNDIALS.CVodeGetEstLocalErrors(self.cvode_mem, ele)
+        flag = SUNDIALS.CVodeGetEstLocalErrors(self.cvode_mem, self.nv_view)
         if flag < 0:
             raise CVodeError(flag, self.t)
-            
-        ele_py = nv2arr(ele)
-        
-        #Deallocate N_Vector
-        N_VDestroy_Serial(ele)
         
         return ele_py
         
@@ -1612,16 +2431,15 @@ cdef class CVode(Explicit_ODE):
         Returns the solution error weights at the current step.
         """
         cdef int flag
-        cdef N_Vector eweight=N_VNew_Serial(self.pData.dim) #Allocates a new N_Vector
+        cdef N.ndarray eweight_py
+        
+        if self.nv_view == NULL: #Not initialized, see create_work_vectors
+            raise CVodeError(CV_MEM_NULL, self.t)
+        eweight_py = nv_set_output(self.nv_view, None, self.pData.dim)
         
-        flag = SUNDIALS.CVodeGetErrWeights(self.cvode_mem, eweight)
+        flag = SUNDIALS.CVodeGetErrWeights(self.cvode_mem, self.nv_view)
         if flag < 0:
             raise CVodeError(flag, self.t)
-            
-        eweight_py = nv2arr(eweight)
-        
-        #Deallocate N_Vector
-        N_VDestroy_Serial(eweight)
         
         return eweight_py
     
@@ -1630,6 +2448,7 @@ cdef class CVode(Explicit_ODE):
         #Sets the residual or rhs
         self.pt_fcn = self.problem.rhs
         self.pData.RHS = <void*>self.pt_fcn#<void*>self.problem.f
+        self.pData.rhs_inplace = self.problem_info["rhs_inplace"]
         self.pData.dim = self.problem_info["dim"]
         self.pData.memSize = self.pData.dim*sizeof(realtype)
         
@@ -1673,6 +2492,22 @@ cdef class CVode(Explicit_ODE):
             self.pData.pbar = <realtype*> malloc(self.problem_info["dimSens"]*sizeof(realtype))
         else:
             self.pData.dimSens = 0
+        
+        if self.problem_info["quad_fcn"] is True: #Sets the right-hand-side of the quadratures
+            if not hasattr(self.problem, "rhsQ"):
+                raise AssimuloException("The right-hand-side of the quadratures should be given by the problem method rhsQ(t,y) for CVode.")
+            self.pt_quad = self.problem.rhsQ
+            self.pData.QUAD = <void*>self.pt_quad
+            if hasattr(self.problem, "q0"):
+                self.q0 = set_type_shape_array(self.problem.q0)
+            else: #Start from zero, the number of quadratures is given by their right-hand-side
+                args = [self.t0, self.y0] + ([self.sw0.tolist()] if self.problem_info["switches"] else []) + ([self.p0] if self.pData.dimSens > 0 else [])
+                self.q0 = N.zeros(len(set_type_shape_array(self.pt_quad(*args))))
+            self.q = self.q0.copy()
+            self.pData.dimQ = len(self.q0)
+            self.problem_info["dimQ"] = self.pData.dimQ
+        else:
+            self.pData.dimQ = 0
             
         self.pData.verbose = 2
         self.pData.create_work_arrays()
@@ -1681,18 +2516,24 @@ cdef class CVode(Explicit_ODE):
         cdef int flag #Used for return
         cdef realtype ZERO = 0.0
         
+        if self.yTemp == NULL: #The first initialization
+            self.create_work_vectors()
+        
+        arr2nv_inplace(self.y, self.yTemp)
+        if self.pData.dimQ > 0:
+            arr2nv_inplace(self.q, self.yQ)
+        
+        #The norm is inherited by the vectors that CVode clones from yTemp (and ySO)
         if self.options["norm"] == "EUCLIDEAN":
-            self.yTemp = arr2nv_euclidean(self.y)
+            self.yTemp.ops.nvwrmsnorm = self.yTemp.ops.nvwl2norm #Overwrite the WRMS norm to the 2-Norm
         else:
-            self.yTemp = arr2nv(self.y)
+            self.yTemp.ops.nvwrmsnorm = self.wrmsnorm
         
         if self.pData.dimSens > 0:
-            #Create the initial matrices
-            self.ySO  = N_VCloneVectorArray_Serial(self.pData.dimSens, self.yTemp)
-            
             #Filling the start vectors
             for i in range(self.pData.dimSens):
-                 N_VConst_Serial(ZERO,  self.ySO[i]);
+                 self.ySO[i].ops.nvwrmsnorm = self.yTemp.ops.nvwrmsnorm
+                 N_VConst(ZERO,  self.ySO[i]);
                  if self.yS0 is not None:
                     for j in range(self.pData.dim):
                         (<N_VectorContent_Serial>self.ySO[i].content).data[j] = self.yS0[i,j]
@@ -1703,6 +2544,7 @@ cdef class CVode(Explicit_ODE):
             self.pData.sw = <void*>self.sw
             
         if self.cvode_mem == NULL: #The solver is not initialized
+            self.options_initialized = False
             
             #Create the solver
             IF SUNDIALS_VERSION >= (4,0,0):
@@ -1775,23 +2617,207 @@ cdef class CVode(Explicit_ODE):
                     if flag < 0:
                         raise CVodeError(flag, self.t)
             
-        else: #The solver needs to be reinitialized
-            #Reinitialize
-            flag = SUNDIALS.CVodeReInit(self.cvode_mem, self.t, self.yTemp)
+            #Quadratures
+            if self.pData.dimQ > 0:
+                flag = SUNDIALS.CVodeQuadInit(self.cvode_mem, cv_rhsQ, self.yQ)
+                if flag < 0:
+                    raise CVodeError(flag, self.t)
+            
+        else: #The solver needs to be reinitialized
+            #Reinitialize
+            flag = SUNDIALS.CVodeReInit(self.cvode_mem, self.t, self.yTemp)
+            if flag < 0:
+                raise CVodeError(flag, self.t)
+            
+            #Sensitivity
+            if self.pData.dimSens > 0:
+                flag = SUNDIALS.CVodeSensReInit(self.cvode_mem, CV_STAGGERED if self.options["sensmethod"] == "STAGGERED" else CV_SIMULTANEOUS, self.ySO)
+                if flag < 0:
+                    raise CVodeError(flag, self.t)
+            
+            #Quadratures
+            if self.pData.dimQ > 0:
+                flag = SUNDIALS.CVodeQuadReInit(self.cvode_mem, self.yQ)
+                if flag < 0:
+                    raise CVodeError(flag, self.t)
+            
+            #Set the user data
+            flag = SUNDIALS.CVodeSetUserData(self.cvode_mem, <void*>self.pData)
+            if flag < 0:
+                raise CVodeError(flag, self.t)
+        
+        #Adjoint sensitivity analysis, the forward solution is checkpointed from the start
+        if self.adj_init:
+            SUNDIALS.CVodeAdjFree(self.cvode_mem) #Also frees the backward problem
+            self.adj_init = False
+            self.adj_created = False
+        if self.options["adjoint"]:
+            flag = SUNDIALS.CVodeAdjInit(self.cvode_mem, self.options["adjsteps"], CV_HERMITE if self.options["adjinterp"] == "HERMITE" else CV_POLYNOMIAL)
+            if flag < 0:
+                raise CVodeError(flag, self.t)
+            self.adj_init = True
+            self.adj_t0 = self.t
+    
+    cdef int cvode_solve(self, realtype tout, N_Vector yout, realtype *tret, int itask):
+        """
+        Advances the solution using CVode or, if the forward solution is
+        checkpointed for adjoint sensitivity analysis, CVodeF.
+        """
+        cdef int ncheck
+        
+        if self.adj_init:
+            return SUNDIALS.CVodeF(self.cvode_mem, tout, yout, tret, itask, &ncheck)
+        return SUNDIALS.CVode(self.cvode_mem, tout, yout, tret, itask)
+    
+    def solve_adjoint(self):
+        """
+        Computes the gradient, with respect to the parameters p, of the
+        cost functional
+        
+            G(p) = int_{t0}^{tf} g(t, y, p) dt
+        
+        over the last simulation using adjoint sensitivity analysis. The
+        adjoint variables are integrated backwards from tf to t0, using 
+        the checkpoints of the forward solution stored during the 
+        simulation, together with a quadrature for the gradient. The 
+        cost is roughly that of one backward integration, independent of
+        the number of parameters.
+        
+        The option adjoint has to be set before the simulation and the
+        problem has to define the parameters, p0, and the integrand of
+        the cost functional,
+        
+            def cost(self, t, y, p)
+        
+        The problem can also define the gradients of the integrand and
+        the products of the Jacobians of the right-hand-side with the 
+        adjoint variables, which are otherwise approximated by finite
+        differences (or by using the Jacobian, jac),
+        
+            def cost_grad(self, t, y, p)        -> dg/dy, dg/dp
+            def rhs_adjoint(self, t, y, yB, p)  -> (df/dy)^T yB, (df/dp)^T yB
+        
+        If the problem defines the sensitivities of the initial values,
+        yS0, their contribution to the gradient is included.
+        
+            Returns::
+            
+                The cost, G, and its gradient, dG/dp.
+                
+            Example::
+            
+                sim.adjoint = True
+                sim.usesens = False #The forward sensitivities are not needed
+                sim.simulate(10.0)
+                G, dGdp = sim.solve_adjoint()
+        
+        See SUNDIALS CVodes documentation 'Adjoint sensitivity analysis'.
+        """
+        cdef int flag
+        cdef realtype tret
+        cdef realtype ZERO = 0.0
+        
+        if not self.adj_init:
+            raise AssimuloException("No checkpoints of the forward solution are stored, the option adjoint has to be set before the simulation.")
+        if not hasattr(self.problem, "cost"):
+            raise AssimuloException("The problem has to define the integrand of the cost functional, cost(t, y, p).")
+        
+        rhs = self._get_rhs()
+        if self.problem_info["switches"]:
+            f = lambda t, y, p: rhs(t, y, sw=self.sw, p=p)
+        else:
+            f = rhs
+        
+        jac = None
+        if self.options["usejac"] and self.problem_info["jac_fcn"] and self.options["linear_solver"] in ("DENSE", "SPARSE"):
+            def jac(t, y, p):
+                J = self.problem.jac(t, y, sw=self.sw, p=p) if self.problem_info["switches"] else self.problem.jac(t, y, p=p)
+                return J.toarray() if hasattr(J, "toarray") else J
+        
+        adjoint = ExplicitAdjoint(f, self.problem.cost, self.pData.dimSens, getattr(self.problem, "cost_grad", None), 
+                                  getattr(self.problem, "rhs_adjoint", None), jac, self.problem_info["jac_sparsity"])
+        
+        self.pt_rhsB = adjoint.rhs
+        self.pt_quadB = adjoint.rhs_quad
+        self.pData.RHS_B = <void*>self.pt_rhsB
+        self.pData.QUAD_B = <void*>self.pt_quadB
+        
+        N_VConst(ZERO, self.yB)
+        N_VConst(ZERO, self.qB)
+        
+        if not self.adj_created:
+            #Create the backward problem
+            IF SUNDIALS_VERSION >= (4,0,0):
+                flag = SUNDIALS.CVodeCreateB(self.cvode_mem, CV_BDF if self.options["discr"] == "BDF" else CV_ADAMS, &self.whichB)
+            ELSE:
+                flag = SUNDIALS.CVodeCreateB(self.cvode_mem, CV_BDF if self.options["discr"] == "BDF" else CV_ADAMS, CV_NEWTON, &self.whichB)
+            if flag < 0:
+                raise CVodeError(flag, self.t)
+            
+            flag = SUNDIALS.CVodeInitB(self.cvode_mem, self.whichB, cv_rhsB, self.t, self.yB)
             if flag < 0:
                 raise CVodeError(flag, self.t)
             
-            #Sensitivity
-            if self.pData.dimSens > 0:
-                flag = SUNDIALS.CVodeSensReInit(self.cvode_mem, CV_STAGGERED if self.options["sensmethod"] == "STAGGERED" else CV_SIMULTANEOUS, self.ySO)
-                if flag < 0:
-                    raise CVodeError(flag, self.t)
+            flag = SUNDIALS.CVodeQuadInitB(self.cvode_mem, self.whichB, cv_rhsQB, self.qB)
+            if flag < 0:
+                raise CVodeError(flag, self.t)
             
-            #Set the user data
-            flag = SUNDIALS.CVodeSetUserData(self.cvode_mem, <void*>self.pData)
+            #The backward problem uses a dense linear solver with a difference quotient Jacobian
+            IF SUNDIALS_VERSION >= (3,0,0):
+                if self.sun_matrixB == NULL:
+                    self.sun_matrixB = SUNDIALS.SUNDenseMatrix(self.pData.dim, self.pData.dim)
+                    self.sun_linearsolverB = SUNDIALS.SUNDenseLinearSolver(self.yB, self.sun_matrixB)
+                flag = SUNDIALS.CVDlsSetLinearSolverB(self.cvode_mem, self.whichB, self.sun_linearsolverB, self.sun_matrixB)
+            ELSE:
+                flag = SUNDIALS.CVDenseB(self.cvode_mem, self.whichB, self.pData.dim)
+            if flag < 0:
+                raise CVodeError(flag, self.t)
+            
+            self.adj_created = True
+        else:
+            flag = SUNDIALS.CVodeReInitB(self.cvode_mem, self.whichB, self.t, self.yB)
             if flag < 0:
                 raise CVodeError(flag, self.t)
             
+            flag = SUNDIALS.CVodeQuadReInitB(self.cvode_mem, self.whichB, self.qB)
+            if flag < 0:
+                raise CVodeError(flag, self.t)
+        
+        flag = SUNDIALS.CVodeSetUserDataB(self.cvode_mem, self.whichB, <void*>self.pData)
+        if flag < 0:
+            raise CVodeError(flag, self.t)
+        
+        flag = SUNDIALS.CVodeSVtolerancesB(self.cvode_mem, self.whichB, self.options["rtol"], self.nv_atol)
+        if flag < 0:
+            raise CVodeError(flag, self.t)
+        
+        flag = SUNDIALS.CVodeSetQuadErrConB(self.cvode_mem, self.whichB, True)
+        if flag < 0:
+            raise CVodeError(flag, self.t)
+        
+        flag = SUNDIALS.CVodeQuadSStolerancesB(self.cvode_mem, self.whichB, self.options["rtol"], N.min(self.options["atol"]))
+        if flag < 0:
+            raise CVodeError(flag, self.t)
+        
+        flag = SUNDIALS.CVodeSetMaxNumStepsB(self.cvode_mem, self.whichB, self.options["maxsteps"])
+        if flag < 0:
+            raise CVodeError(flag, self.t)
+        
+        #Integrate the adjoint problem backwards
+        flag = SUNDIALS.CVodeB(self.cvode_mem, self.adj_t0, CV_NORMAL)
+        if flag < 0:
+            raise CVodeError(flag, self.adj_t0)
+        
+        flag = SUNDIALS.CVodeGetB(self.cvode_mem, self.whichB, &tret, self.yB)
+        if flag < 0:
+            raise CVodeError(flag, tret)
+        
+        flag = SUNDIALS.CVodeGetQuadB(self.cvode_mem, self.whichB, &tret, self.qB)
+        if flag < 0:
+            raise CVodeError(flag, tret)
+        
+        return adjoint.gradient(nv2arr(self.yB), nv2arr(self.qB), self.yS0)
+    
     def initialize_event_detection(self):
         def event_func(t, y):
             return self.problem.state_events(t, y, self.sw)
@@ -1800,26 +2826,25 @@ cdef class CVode(Explicit_ODE):
         self._event_info = N.array([0] * self.problem_info["dimRoot"])
         
     
-    cpdef N.ndarray interpolate(self,double t,int k = 0):
+    cpdef N.ndarray interpolate(self,double t,int k = 0, N.ndarray out = None):
         """
         Calls the internal CVodeGetDky for the interpolated values at time t.
         t must be within the last internal step. k is the derivative of y which
-        can be from zero to the current order.
+        can be from zero to the current order. If given, the values are 
+        written into the (contiguous, float) array out which is returned.
         """
         cdef flag
         cdef N.ndarray res
-        cdef N_Vector dky=N_VNew_Serial(self.pData.dim) #Allocates a new N_Vector
         
-        flag = SUNDIALS.CVodeGetDky(self.cvode_mem, t, k, dky)
+        if self.nv_view == NULL: #Not initialized, see create_work_vectors
+            raise CVodeError(CV_MEM_NULL, t)
+        res = nv_set_output(self.nv_view, out, self.pData.dim)
+        
+        flag = SUNDIALS.CVodeGetDky(self.cvode_mem, t, k, self.nv_view)
         
         if flag < 0:
             raise CVodeError(flag, t)
         
-        res = nv2arr(dky)
-        
-        #Deallocate N_Vector
-        N_VDestroy_Serial(dky)
-        
         return res
         
     cpdef N.ndarray interpolate_sensitivity(self, realtype t, int k = 0, int i=-1):
@@ -1844,56 +2869,103 @@ cdef class CVode(Explicit_ODE):
             
                     A matrix containing the Ns vectors or a vector if i is specified.
         """
-        #cdef N_Vector dkyS=N_VNew_Serial(self.pData.dimSens)
-        cdef N_Vector dkyS=N_VNew_Serial(self.pData.dim)
         cdef int flag
         cdef N.ndarray res
         
+        if self.nv_view == NULL: #Not initialized, see create_work_vectors
+            raise CVodeError(CV_MEM_NULL, t)
+        
         if i==-1:
             
-            matrix = []
+            res = N.empty((self.pData.dimSens, self.pData.dim))
             
             for x in range(self.pData.dimSens):
-                flag = SUNDIALS.CVodeGetSensDky1(self.cvode_mem, t, k, x, dkyS)
+                nv_set_output(self.nv_view, res[x], self.pData.dim)
+                flag = SUNDIALS.CVodeGetSensDky1(self.cvode_mem, t, k, x, self.nv_view)
                 if flag<0:
                     raise CVodeError(flag, t)
-                
-                matrix += [nv2arr(dkyS)]
-            
-            N_VDestroy_Serial(dkyS)
             
-            return N.array(matrix)
+            return res
         else:
-            flag = SUNDIALS.CVodeGetSensDky1(self.cvode_mem, t, k, i, dkyS)
+            res = nv_set_output(self.nv_view, None, self.pData.dim)
+            flag = SUNDIALS.CVodeGetSensDky1(self.cvode_mem, t, k, i, self.nv_view)
             if flag <0:
                 raise CVodeError(flag, t)
             
-            res = nv2arr(dkyS)
-            
-            N_VDestroy_Serial(dkyS)
-            
             return res
     
+    cpdef N.ndarray interpolate_quadrature(self, double t, int k = 0):
+        """
+        Calls the internal CVodeGetQuadDky for the interpolated values of the
+        quadratures at time t. t must be within the last internal step. k 
+        is the derivative of q which can be from zero to the current order.
+        """
+        cdef flag
+        
+        if self.pData.dimQ == 0:
+            raise CVodeError(CV_NO_QUAD, t)
+        
+        if self.yQ == NULL: #Not initialized
+            raise CVodeError(CV_MEM_NULL, t)
+        
+        flag = SUNDIALS.CVodeGetQuadDky(self.cvode_mem, t, k, self.yQ)
+        if flag < 0:
+            raise CVodeError(flag, t)
+        
+        return nv2arr(self.yQ)
+    
+    cpdef get_quadrature(self, double t):
+        """
+        Returns the quadratures at the output point t, used by handle_result
+        to store them in q_sol. The output points of a call to integrate are
+        handled after the integration, in order, and their quadratures are
+        therefore stored during the integration.
+        """
+        if self.q_out:
+            return self.q_out.pop(0)
+        if t == self.t:
+            return self.q.copy()
+        return self.interpolate_quadrature(t)
+    
+    def re_init(self, t0, y0, sw0=None):
+        """
+        Reinitiates the solver, see Explicit_ODE.re_init. The quadratures
+        are reset to their initial values, q0.
+        """
+        Explicit_ODE.re_init(self, t0, y0, sw0)
+        
+        if self.pData.dimQ > 0:
+            self.q = self.q0.copy()
+    
     cpdef initialize(self):
         
         #Initialize storing of sensitivyt result in handle_result
         if self.problem_info['step_events'] or self.options['report_continuously']:
             self.problem._sensitivity_result = 1
         
+        #Initialize storing of the quadratures in handle_result
+        if self.pData.dimQ > 0:
+            self.problem._quadrature_result = 1
+        
+        #The checkpoints are discarded when the solver is reinitialized
+        if self.options["adjoint"] and (self.problem_info["state_events"] or self.problem_info["time_events"] or self.problem_info["step_events"]):
+            raise AssimuloException("Adjoint sensitivity analysis is not supported for problems with events.")
+        
         #Reset statistics
         self.statistics.reset()
         
+        self.options_initialized = False
+        self.jac_reuse = self.prec_reuse = False
+        self.jac_last = None
         self.initialize_cvode() 
     
     cpdef step(self,double t,N.ndarray y,double tf,dict opts):
         cdef int flag
-        cdef N_Vector yout
+        cdef N_Vector yout = self.yOut
         cdef double tret = t
         cdef double tr
         cdef N.ndarray yr
         
-        yout = arr2nv(y)
-        
         #Get options
         initialize  = opts["initialize"]
         output_list = opts["output_list"]        
@@ -1901,7 +2973,7 @@ cdef class CVode(Explicit_ODE):
         #Initialize?
         if initialize:
             self.initialize_cvode()
-            self.initialize_options()
+            self.initialize_light_reinit()
         
         #Set stop time
         flag = SUNDIALS.CVodeSetStopTime(self.cvode_mem, tf)
@@ -1909,13 +2981,15 @@ cdef class CVode(Explicit_ODE):
             raise CVodeError(flag, t)
         
         #Integration loop
-        flag = SUNDIALS.CVode(self.cvode_mem,tf,yout,&tret,CV_ONE_STEP)
+        flag = self.cvode_solve(tf,yout,&tret,CV_ONE_STEP)
         if flag < 0:
             raise CVodeError(flag, tret)
             
         #Store results
         tr = tret
         yr = nv2arr(yout)
+        if self.pData.dimQ > 0:
+            self.q = self.interpolate_quadrature(tret)
         
         if flag == CV_ROOT_RETURN: #Found a root
             flag = ID_EVENT #Convert to Assimulo flags
@@ -1924,44 +2998,36 @@ cdef class CVode(Explicit_ODE):
         if flag == CV_TSTOP_RETURN: #Reached tf
             flag = ID_COMPLETE
             self.store_statistics(CV_TSTOP_RETURN)
-        
-        #Deallocate
-        N_VDestroy_Serial(yout)
                 
         return flag, tr, yr
     
     cpdef integrate(self,double t,N.ndarray[ndim=1, dtype=realtype] y,double tf,dict opts):
         cdef int flag, output_index, normal_mode
-        cdef N_Vector yout
+        cdef N_Vector yout = self.yOut
         cdef double tret = self.t, tout
         cdef list tr = [], yr = []
         cdef N.ndarray output_list
-    
-        if self.options["norm"] == "EUCLIDEAN":
-            yout = arr2nv_euclidean(y)
-        else:
-            yout = arr2nv(y)
+        
+        self.q_out = []
         
         #Initialize? 
         if opts["initialize"]:
             self.initialize_cvode() 
-            self.initialize_options()
+            self.initialize_light_reinit()
             if self.options["external_event_detection"]:
                 self.initialize_event_detection()
         
         #Set stop time
         flag = SUNDIALS.CVodeSetStopTime(self.cvode_mem, tf)
         if flag < 0:
-            N_VDestroy_Serial(yout)
             raise CVodeError(flag, t)
         
         if opts["report_continuously"] or opts["output_list"] is None: 
             #Integration loop
             while True:
                     
-                flag = SUNDIALS.CVode(self.cvode_mem,tf,yout,&tret,CV_ONE_STEP)
+                flag = self.cvode_solve(tf,yout,&tret,CV_ONE_STEP)
                 if flag < 0:
-                    N_VDestroy_Serial(yout)
                     raise CVodeError(flag, tret)
                 
                 t = tret
@@ -1974,6 +3040,9 @@ cdef class CVode(Explicit_ODE):
                     event_flag, t, y = self.event_locator(told, t, y)
                     if event_flag == ID_PY_EVENT: flag = CV_ROOT_RETURN
                 
+                if self.pData.dimQ > 0:
+                    self.q = self.interpolate_quadrature(t)
+                
                 if opts["report_continuously"]:
                     flag_initialize = self.report_solution(t, y, opts)
                     if flag_initialize:
@@ -1983,6 +3052,8 @@ cdef class CVode(Explicit_ODE):
                     #Store results
                     tr.append(t)
                     yr.append(y)
+                    if self.pData.dimQ > 0:
+                        self.q_out.append(self.q)
                     
                 if flag == CV_ROOT_RETURN or flag == CV_STEP_RETURN: #Found a root or step event
                     self.store_statistics(flag)
@@ -1997,14 +3068,16 @@ cdef class CVode(Explicit_ODE):
             output_list  = opts["output_list"][output_index:]
 
             for tout in output_list:
-                flag = SUNDIALS.CVode(self.cvode_mem,tout,yout,&tret,CV_NORMAL)
+                flag = self.cvode_solve(tout,yout,&tret,CV_NORMAL)
                 if flag < 0:
-                    N_VDestroy_Serial(yout)
                     raise CVodeError(flag, tret)
                 
                 #Store results
                 tr.append(tret)
                 yr.append(nv2arr(yout))
+                if self.pData.dimQ > 0:
+                    self.q = self.interpolate_quadrature(tret)
+                    self.q_out.append(self.q)
                 
                 if flag == CV_ROOT_RETURN: #Found a root
                     self.store_statistics(CV_ROOT_RETURN)
@@ -2026,9 +3099,6 @@ cdef class CVode(Explicit_ODE):
         
             opts["output_index"] = output_index
         
-        #Deallocate
-        N_VDestroy_Serial(yout)
-        
         return flag, tr, yr
     
     cpdef state_event_info(self):
@@ -2108,6 +3178,29 @@ cdef class CVode(Explicit_ODE):
             if flag < 0:
                 raise CVodeError(flag, self.t)
     
+    def _set_fd_jac_sparse(self):
+        """
+        Sets a colored finite difference approximation of the Jacobian,
+        based on the sparsity pattern given by the problem attribute
+        jac_sparsity, to be used by the SPARSE linear solver.
+        """
+        fd_jac = FDJacobian(self.pData.dim, self.problem_info["jac_sparsity"], "CSC")
+        rhs = self._get_rhs()
+        
+        def jac(t, y, sw=None, p=None):
+            if p is not None:
+                f = (lambda t, y: rhs(t, y, sw=sw, p=p)) if sw is not None else (lambda t, y: rhs(t, y, p))
+            elif sw is not None:
+                f = lambda t, y: rhs(t, y, sw)
+            else:
+                f = rhs
+            self.statistics["nfcnjacs"] += 1+fd_jac.ncolors
+            return fd_jac(f, t, y)
+        
+        self.pt_jac = jac
+        self.pData.JAC = <void*>self.pt_jac
+        self.problem_info["jac_fcn_nnz"] = fd_jac.nnz
+    
     cpdef initialize_options(self):
         """
         Updates the simulation options.
@@ -2147,17 +3240,63 @@ cdef class CVode(Explicit_ODE):
                 if flag < 0:
                     raise CVodeError(flag)
                     
-        elif self.options["linear_solver"] == 'SPGMR' and self.options["iter"] == "Newton":
+        elif self.options["linear_solver"] == 'BAND' and self.options["iter"] == "Newton":
+            if self.problem_info["jac_bandwidth"] is None:
+                raise AssimuloException("For the BAND linear solver, the bandwidth of the Jacobian must be specified via the problem attribute 'jac_bandwidth' = (ml, mu).")
+            ml, mu = self.problem_info["jac_bandwidth"]
+            
+            IF SUNDIALS_VERSION >= (3,0,0):
+                #Create a band Sundials matrix, with storage for the fill-in of the LU factorization
+                self.sun_matrix = SUNDIALS.SUNBandMatrixStorage(self.pData.dim, mu, ml, min(self.pData.dim-1, mu+ml))
+                #Create a band Sundials linear solver
+                self.sun_linearsolver = SUNDIALS.SUNBandLinearSolver(self.yTemp, self.sun_matrix)
+                #Attach it to CVode
+                flag = SUNDIALS.CVDlsSetLinearSolver(self.cvode_mem, self.sun_linearsolver, self.sun_matrix)
+            ELSE:
+                #Specify the use of the internal band linear algebra functions.
+                flag = SUNDIALS.CVBand(self.cvode_mem, self.pData.dim, mu, ml)
+            if flag < 0:
+                raise CVodeError(flag)
+            
+            #Specify the jacobian to the solver
+            if self.pData.JAC != NULL and self.options["usejac"]:
+                IF SUNDIALS_VERSION >= (3,0,0):
+                    flag = SUNDIALS.CVDlsSetJacFn(self.cvode_mem, cv_jac_band)
+                ELSE:
+                    flag = SUNDIALS.CVDlsSetBandJacFn(self.cvode_mem, cv_jac_band)
+            else:
+                IF SUNDIALS_VERSION >= (3,0,0):
+                    flag = SUNDIALS.CVDlsSetJacFn(self.cvode_mem, NULL)
+                ELSE:
+                    flag = SUNDIALS.CVDlsSetBandJacFn(self.cvode_mem, NULL)
+            if flag < 0:
+                raise CVodeError(flag)
+                    
+        elif self.options["linear_solver"] in SPILS_SOLVERS and self.options["iter"] == "Newton":
             IF SUNDIALS_VERSION >= (3,0,0):
                 #Create the linear solver
-                self.sun_linearsolver = SUNDIALS.SUNSPGMR(self.yTemp, self.options["precond"], self.options["maxkrylov"])
+                self.sun_linearsolver = create_spils_solver(self.options["linear_solver"], self.yTemp, self.options["precond"], 
+                                                            self.options["maxkrylov"], self.options["gstype"], self.options["maxrestarts"])
                 #Attach it to CVode
                 flag = SUNDIALS.CVSpilsSetLinearSolver(self.cvode_mem, self.sun_linearsolver)
             ELSE:
-                #Specify the use of CVSPGMR linear solver.
-                flag = SUNDIALS.CVSpgmr(self.cvode_mem, self.options["precond"], self.options["maxkrylov"])
+                #Specify the use of the CVSpils linear solver.
+                if self.options["linear_solver"] == 'SPGMR':
+                    flag = SUNDIALS.CVSpgmr(self.cvode_mem, self.options["precond"], self.options["maxkrylov"])
+                    if flag >= 0:
+                        flag = SUNDIALS.CVSpilsSetGSType(self.cvode_mem, self.options["gstype"])
+                elif self.options["linear_solver"] == 'SPBCGS':
+                    flag = SUNDIALS.CVSpbcg(self.cvode_mem, self.options["precond"], self.options["maxkrylov"])
+                elif self.options["linear_solver"] == 'SPTFQMR':
+                    flag = SUNDIALS.CVSptfqmr(self.cvode_mem, self.options["precond"], self.options["maxkrylov"])
+                else:
+                    raise AssimuloException("The linear solver 'SPFGMR' requires SUNDIALS 3.0 or newer.")
             if flag < 0:
                 raise CVodeError(flag) 
+            
+            flag = SUNDIALS.CVSpilsSetEpsLin(self.cvode_mem, self.options["eplifac"])
+            if flag < 0:
+                raise CVodeError(flag)
                 
             if self.pData.PREC_SOLVE != NULL:
                 if self.pData.PREC_SETUP != NULL: 
@@ -2191,6 +3330,11 @@ cdef class CVode(Explicit_ODE):
             if SUNDIALS.with_superlu() == 0:
                 raise AssimuloException("No support for SuperLU was detected, please verify that SuperLU and SUNDIALS has been installed correctly.")
                 
+            #Without a Jacobian, approximate it using the sparsity pattern of the problem
+            fd_jac = self.problem_info["jac_fcn"] is False and self.problem_info["jac_sparsity"] is not None
+            if fd_jac:
+                self._set_fd_jac_sparse()
+            
             #Specify the use of CVSPGMR linear solver.
             if self.problem_info["jac_fcn_nnz"] == -1:
                 raise AssimuloException("Need to specify the number of non zero elements in the Jacobian via the option 'jac_nnz'")
@@ -2205,7 +3349,7 @@ cdef class CVode(Explicit_ODE):
                     raise CVodeError(flag)
             
             #Specify the jacobian to the solver
-            if self.pData.JAC != NULL and self.options["usejac"]:
+            if self.pData.JAC != NULL and (self.options["usejac"] or fd_jac):
                 IF SUNDIALS_VERSION >= (3,0,0):
                     flag = SUNDIALS.CVDlsSetJacFn(self.cvode_mem, cv_jac_sparse)
                 ELSE:
@@ -2213,7 +3357,7 @@ cdef class CVode(Explicit_ODE):
                 if flag < 0:
                     raise CVodeError(flag)
             else:
-                raise AssimuloException("For the SPARSE linear solver, the Jacobian must be provided and activated.")
+                raise AssimuloException("For the SPARSE linear solver, the Jacobian must be provided and activated (or its sparsity pattern given via the problem attribute 'jac_sparsity').")
             
         else: #Functional Iteration choosen.
             pass #raise CVodeError(100,t0) #Unknown error message
@@ -2259,7 +3403,7 @@ cdef class CVode(Explicit_ODE):
             raise CVodeError(flag)
         
         #Tolerances
-        self.nv_atol = arr2nv(self.options["atol"])
+        arr2nv_inplace(self.options["atol"], self.nv_atol)
         flag = SUNDIALS.CVodeSVtolerances(self.cvode_mem, self.options["rtol"], self.nv_atol)
         if flag < 0:
             raise CVodeError(flag)
@@ -2273,6 +3417,69 @@ cdef class CVode(Explicit_ODE):
         #Initialize sensitivity if any
         if self.pData.dimSens > 0:
             self.initialize_sensitivity_options()
+        
+        #Include the quadratures in the error test (with the smallest absolute tolerance) or not
+        if self.pData.dimQ > 0:
+            if self.options["suppress_quad"] == False:
+                flag = SUNDIALS.CVodeQuadSStolerances(self.cvode_mem, self.options["rtol"], N.min(self.options["atol"]))
+                if flag < 0:
+                    raise CVodeError(flag)
+            flag = SUNDIALS.CVodeSetQuadErrCon(self.cvode_mem, self.options["suppress_quad"]==False)
+            if flag < 0:
+                raise CVodeError(flag)
+        
+        #Keep the Jacobian data for the light reinitializations
+        if self.options["light_reinit"]:
+            self._set_light_reinit_fcns()
+        
+        self.options_initialized = True
+    
+    cdef initialize_light_reinit(self):
+        """
+        Sets the options after a (re)initialization of CVode unless the
+        reinitialization is light (see the option light_reinit), in which
+        case the options, the linear solver and the Jacobian data are kept
+        and reused at the first request of the solver.
+        """
+        if self.options["light_reinit"] and self.options_initialized:
+            self.jac_reuse = True
+            self.prec_reuse = True
+        else:
+            self.initialize_options()
+    
+    def _set_light_reinit_fcns(self):
+        """
+        Wraps the Jacobian and the preconditioner setup function so that
+        the first Jacobian requested after a light reinitialization is the
+        last one evaluated and so that the first preconditioner setup is
+        allowed to reuse its Jacobian data (jok = True).
+        """
+        if self.pData.JAC != NULL and self.pt_jac is not self.pt_jac_light:
+            jac_fcn = self.pt_jac
+            
+            def jac(t, y, *args, **kwargs):
+                if self.jac_reuse and self.jac_last is not None:
+                    self.jac_reuse = False
+                    self.statistics["njacreuse"] += 1
+                    return self.jac_last
+                self.jac_reuse = False
+                self.jac_last = jac_fcn(t, y, *args, **kwargs)
+                return self.jac_last
+            
+            self.pt_jac = self.pt_jac_light = jac
+            self.pData.JAC = <void*>self.pt_jac
+        
+        if self.pData.PREC_SETUP != NULL and self.pt_prec_setup is not self.pt_prec_setup_light:
+            prec_setup_fcn = self.pt_prec_setup
+            
+            def prec_setup(t, y, fy, jok, gamma, data):
+                if self.prec_reuse:
+                    self.prec_reuse = False
+                    jok = True
+                return prec_setup_fcn(t, y, fy, jok, gamma, data)
+            
+            self.pt_prec_setup = self.pt_prec_setup_light = prec_setup
+            self.pData.PREC_SETUP = <void*>self.pt_prec_setup
     
     def _set_discr_method(self,discr='Adams'):
         
@@ -2490,10 +3697,10 @@ cdef class CVode(Explicit_ODE):
     maxord=property(_get_max_ord,_set_max_ord)
     
     def _set_linear_solver(self, lsolver):
-        if lsolver.upper() == "DENSE" or lsolver.upper() == "SPGMR" or lsolver.upper() == "SPARSE":
+        if lsolver.upper() in ("DENSE", "SPARSE", "BAND") + SPILS_SOLVERS:
             self.options["linear_solver"] = lsolver.upper()
         else:
-            raise AssimuloException('The linear solver must be either "DENSE", "SPGMR" or "SPARSE".')
+            raise AssimuloException('The linear solver must be either "DENSE", "SPARSE", "BAND", "SPGMR", "SPFGMR", "SPBCGS" or "SPTFQMR".')
         
     def _get_linear_solver(self):
         """
@@ -2502,7 +3709,17 @@ cdef class CVode(Explicit_ODE):
             Parameters::
             
                 linearsolver
-                        - Default 'DENSE'. Can also be 'SPGMR' or 'SPARSE'.
+                        - Default 'DENSE'. Can also be 'SPARSE', 'BAND' or
+                          one of the iterative (Krylov) solvers 'SPGMR',
+                          'SPFGMR', 'SPBCGS' and 'SPTFQMR'. 'SPFGMR'
+                          requires SUNDIALS 3.0 or newer.
+                        
+                        - The 'BAND' solver requires the lower and upper
+                          bandwidth of the Jacobian, given by the problem
+                          attribute jac_bandwidth = (ml, mu). The Jacobian
+                          may be given either as a full matrix or in
+                          compact band storage, an array of shape
+                          (ml+mu+1, dim) where jac[mu+i-j, j] = df_i/dy_j.
         """
         return self.options["linear_solver"]
     
@@ -2804,6 +4021,92 @@ cdef class CVode(Explicit_ODE):
 
     suppress_sens=property(_get_suppress_sens,_set_suppress_sens)
     
+    def _set_suppress_quad(self,suppress_quad):
+        try:
+            self.options["suppress_quad"] = bool(suppress_quad)
+        except:
+            raise AssimuloException("Unkown input to suppress_quad, must be a boolean.")
+
+    def _get_suppress_quad(self):
+        """
+        A Boolean flag which indicates that the error-tests are 
+        suppressed on the quadratures (problem.rhsQ). If the 
+        quadratures are included in the error-test, the relative 
+        tolerance and the smallest of the absolute tolerances are used.
+        
+            Parameters::
+            
+                suppress_quad    
+                                - Default 'True'.
+                
+                                - Should be a boolean.
+                                
+                                    Example:
+                                        suppress_quad = False
+                                        
+        See SUNDIALS CVODES documentation 'CVodeSetQuadErrCon' 
+        for more details.
+        """
+        return self.options["suppress_quad"]    
+
+    suppress_quad=property(_get_suppress_quad,_set_suppress_quad)
+    
+    def _set_nvector(self, nvector):
+        if nvector.upper() in NVECTORS:
+            self.options["nvector"] = nvector.upper()
+        else:
+            raise AssimuloException('The N_Vector must be either "SERIAL", "OPENMP" or "PTHREADS".')
+    
+    def _get_nvector(self):
+        """
+        Specifies the N_Vector implementation, i.e. how the vector
+        operations of the solver (norms, linear combinations etc.) are
+        computed. The multithreaded implementations use the number of
+        threads given by the option num_threads and pay off for large
+        systems. The option takes effect at the first initialization of
+        the solver.
+        
+            Parameters::
+            
+                nvector
+                        - Default 'SERIAL'. Can also be 'OPENMP' or
+                          'PTHREADS', provided that Assimulo was compiled
+                          against a Sundials with these vectors.
+        """
+        return self.options["nvector"]
+    
+    nvector = property(_get_nvector, _set_nvector)
+    
+    def _set_light_reinit(self, light_reinit):
+        self.options["light_reinit"] = bool(light_reinit)
+    
+    def _get_light_reinit(self):
+        """
+        A Boolean flag which indicates that the reinitializations of
+        the solver after events are light, i.e. that the options are
+        not set again and that the linear solver is kept. The first
+        Jacobian requested by CVode after an event is then the last one
+        evaluated (provided by the problem, jac), and the first call to
+        the preconditioner setup (prec_setup) is allowed to reuse its
+        Jacobian data (jok = True). Later Jacobians are evaluated when
+        CVode asks for them, e.g. after convergence failures. Options
+        changed during the simulation (for instance in handle_event)
+        take effect at the next call to simulate.
+        
+            Parameters::
+            
+                light_reinit
+                                - Default 'False'.
+                
+                                - Should be a boolean.
+                                
+                                    Example:
+                                        light_reinit = True
+        """
+        return self.options["light_reinit"]
+    
+    light_reinit = property(_get_light_reinit, _set_light_reinit)
+    
     def _set_dqtype(self, dqtype):
         if not isinstance(dqtype, str):
             raise AssimuloException('DQtype must be string.')
@@ -2960,6 +4263,177 @@ cdef class CVode(Explicit_ODE):
     
     precond = property(_get_pre_cond, _set_pre_cond)
     
+    def _set_gstype(self, gstype):
+        if gstype.upper() == "MODIFIED":
+            self.options["gstype"] = MODIFIED_GS
+        elif gstype.upper() == "CLASSICAL":
+            self.options["gstype"] = CLASSICAL_GS
+        else:
+            raise AssimuloException('Unknown input of gstype. Should be either "MODIFIED" or "CLASSICAL".')
+    
+    def _get_gstype(self):
+        """
+        Specifies the type of Gram-Schmidt orthogonalization used by the
+        linear solvers 'SPGMR' and 'SPFGMR'.
+        
+            Parameters::
+            
+                    gstype
+                            - Should be either "MODIFIED" or "CLASSICAL"
+                            - Default "MODIFIED"
+            
+            Returns::
+            
+                The current value of gstype (as string).
+                
+        See SUNDIALS documentation 'CVSpilsSetGSType'
+        """
+        return "MODIFIED" if self.options["gstype"] == MODIFIED_GS else "CLASSICAL"
+    
+    gstype = property(_get_gstype, _set_gstype)
+    
+    def _set_max_restarts(self, maxrestarts):
+        try:
+            self.options["maxrestarts"] = int(maxrestarts)
+        except (ValueError, TypeError):
+            raise AssimuloException("The maximum number of restarts should be an integer.")
+        if self.options["maxrestarts"] < 0:
+            raise AssimuloException("The maximum number of restarts should be a non-negative integer.")
+    
+    def _get_max_restarts(self):
+        """
+        Specifies the maximum number of restarts of the linear solvers
+        'SPGMR' and 'SPFGMR'. Requires SUNDIALS 3.0 or newer.
+        
+            Parameters::
+            
+                    maxrestarts
+                            - A non-negative integer.
+                            - Default 0
+            
+            Returns::
+            
+                The current value of maxrestarts.
+                
+        See SUNDIALS documentation 'SUNSPGMRSetMaxRestarts'
+        """
+        return self.options["maxrestarts"]
+    
+    maxrestarts = property(_get_max_restarts, _set_max_restarts)
+    
+    def _set_eplifac(self, eplifac):
+        try:
+            self.options["eplifac"] = float(eplifac)
+        except (ValueError, TypeError):
+            raise AssimuloException("The linear convergence tolerance factor should be a float.")
+        if self.options["eplifac"] < 0.0:
+            raise AssimuloException("The linear convergence tolerance factor should be non-negative.")
+    
+    def _get_eplifac(self):
+        """
+        Specifies the factor by which the tolerance on the nonlinear
+        iteration is multiplied to get the tolerance on the linear
+        iterations of the iterative (Krylov) linear solvers.
+        
+            Parameters::
+            
+                    eplifac
+                            - A non-negative float. Zero gives the
+                              default value.
+                            - Default 0.05
+            
+            Returns::
+            
+                The current value of eplifac.
+                
+        See SUNDIALS documentation 'CVSpilsSetEpsLin'
+        """
+        return self.options["eplifac"]
+    
+    eplifac = property(_get_eplifac, _set_eplifac)
+    
+    def _set_adjoint(self, adjoint):
+        self.options["adjoint"] = bool(adjoint)
+    
+    def _get_adjoint(self):
+        """
+        This option specifies if the forward solution is checkpointed 
+        during the simulation, which is needed for the adjoint 
+        sensitivity analysis, see solve_adjoint. Note that the forward
+        sensitivities are not needed for the adjoint sensitivity analysis
+        and can be deactivated (usesens).
+        
+            Parameters::
+            
+                adjoint
+                        - Default False.
+                        
+                        - Should be a boolean.
+                        
+                            Example:
+                                adjoint = True
+                                
+        See SUNDIALS documentation 'CVodeAdjInit'
+        """
+        return self.options["adjoint"]
+    
+    adjoint = property(_get_adjoint, _set_adjoint)
+    
+    def _set_adjsteps(self, adjsteps):
+        try:
+            adjsteps = int(adjsteps)
+        except (ValueError, TypeError):
+            raise AssimuloException("The number of steps between the checkpoints should be an integer.")
+        if adjsteps < 1:
+            raise AssimuloException("The number of steps between the checkpoints should be positive.")
+        self.options["adjsteps"] = adjsteps
+    
+    def _get_adjsteps(self):
+        """
+        Specifies the number of integration steps between two 
+        consecutive checkpoints of the forward solution, used by the 
+        adjoint sensitivity analysis. A larger value requires less 
+        checkpoints but more memory for the interpolation data between
+        two checkpoints.
+        
+            Parameters::
+            
+                adjsteps
+                        - Default 100.
+                        
+                        - Should be a positive integer.
+                        
+        See SUNDIALS documentation 'CVodeAdjInit'
+        """
+        return self.options["adjsteps"]
+    
+    adjsteps = property(_get_adjsteps, _set_adjsteps)
+    
+    def _set_adjinterp(self, adjinterp):
+        if adjinterp.upper() not in ("HERMITE", "POLYNOMIAL"):
+            raise AssimuloException('Unknown input of adjinterp. Should be either "HERMITE" or "POLYNOMIAL".')
+        self.options["adjinterp"] = adjinterp.upper()
+    
+    def _get_adjinterp(self):
+        """
+        Specifies the interpolation of the forward solution between the
+        checkpoints, used by the adjoint sensitivity analysis. The cubic
+        Hermite interpolation requires the storage of the solution and 
+        its derivative at each step, while the variable-degree polynomial
+        interpolation only requires the solution.
+        
+            Parameters::
+            
+                adjinterp
+                        - Should be either "HERMITE" or "POLYNOMIAL"
+                        - Default "HERMITE"
+                        
+        See SUNDIALS documentation 'CVodeAdjInit'
+        """
+        return self.options["adjinterp"]
+    
+    adjinterp = property(_get_adjinterp, _set_adjinterp)
+    
     def _set_pbar(self, pbar):
         if len(pbar) != self.problem_info['dimSens']:
             raise AssimuloException('pbar must be of equal length as the parameters.')
@@ -3024,14 +4498,19 @@ cdef class CVode(Explicit_ODE):
         cdef long int nsteps = 0, njevals = 0, ngevals = 0, netfails = 0, nniters = 0, nncfails = 0
         cdef long int nSniters = 0, nSncfails = 0, nfevalsLS = 0, njvevals = 0, nfevals = 0
         cdef long int nfSevals = 0,nfevalsS = 0,nSetfails = 0,nlinsetupsS = 0, nlinsetups = 0
-        cdef long int npevals = 0, npsolves = 0, nlsred = 0
+        cdef long int npevals = 0, npsolves = 0, nlsred = 0, nliters = 0, nlcfails = 0
+        cdef long int nfevalsQ = 0
         cdef int qlast = 0, qcur = 0
         cdef realtype hinused = 0.0, hlast = 0.0, hcur = 0.0, tcur = 0.0
 
-        if self.options["linear_solver"] == "SPGMR":
+        if self.options["linear_solver"] in SPILS_SOLVERS:
             flag = SUNDIALS.CVSpilsGetNumJtimesEvals(self.cvode_mem, &njvevals) #Number of jac*vector
             flag = SUNDIALS.CVSpilsGetNumRhsEvals(self.cvode_mem, &nfevalsLS) #Number of rhs due to jac*vector
+            flag = SUNDIALS.CVSpilsGetNumLinIters(self.cvode_mem, &nliters) #Number of linear iterations
+            flag = SUNDIALS.CVSpilsGetNumConvFails(self.cvode_mem, &nlcfails) #Number of linear convergence failures
             self.statistics["njacvecs"]  += njvevals
+            self.statistics["nliters"]   += nliters
+            self.statistics["nlcfails"]  += nlcfails
         elif self.options["linear_solver"] == "SPARSE":
             IF SUNDIALS_VERSION >= (3,0,0):
                 flag = SUNDIALS.CVDlsGetNumJacEvals(self.cvode_mem, &njevals)
@@ -3084,6 +4563,11 @@ cdef class CVode(Explicit_ODE):
                 flag = SUNDIALS.CVodeGetSensNonlinSolvStats(self.cvode_mem, &nSniters, &nSncfails)
                 self.statistics["nsensniters"]   += nSniters
                 self.statistics["nsensnfails"]  += nSncfails
+        
+        #If quadratures
+        if self.pData.dimQ > 0:
+            flag = SUNDIALS.CVodeGetQuadNumRhsEvals(self.cvode_mem, &nfevalsQ)
+            self.statistics["nquadfcns"] += nfevalsQ
                 
     def print_statistics(self, verbose=NORMAL):
         """
@@ -3104,6 +4588,12 @@ cdef class CVode(Explicit_ODE):
         if self.options["iter"] == "Newton":
             self.log_message(' Linear solver type       : ' + self.options["linear_solver"],       verbose)
         self.log_message(' Maximal order            : ' + str(self.options["maxord"]),verbose)
+        if self.problem_info['dimQ'] > 0:
+            self.log_message(' Suppressed quadratures   : ' + str(self.options["suppress_quad"]), verbose)
+        if self.options["nvector"] != "SERIAL":
+            self.log_message(' N_Vector (threads)       : %s (%d)'%(self.options["nvector"], self.options["num_threads"]), verbose)
+        if self.options["light_reinit"]:
+            self.log_message(' Light reinitialization   : ' + str(self.options["light_reinit"]), verbose)
         self.log_message(' Tolerances (absolute)    : ' + str(self._compact_atol()),  verbose)
         self.log_message(' Tolerances (relative)    : ' + str(self.options["rtol"]),  verbose)
         self.log_message('',                                                         verbose)
@@ -3134,6 +4624,10 @@ class CVodeError(Exception):
             CV_BAD_DKY           : 'The output derivative vector is NULL.',
             CV_TOO_CLOSE         : 'The output and initial times are too close to each other.',
             CV_SRHSFUNC_FAIL     : 'The sensitivity right-hand side function failed unrecoverable.',
+            CV_NO_QUAD           : 'Quadrature integration was not activated.',
+            CV_QRHSFUNC_FAIL     : 'The quadrature right-hand side function failed unrecoverable.',
+            CV_FIRST_QRHSFUNC_ERR: 'The quadrature right-hand side function failed at the first call.',
+            CV_REPTD_QRHSFUNC_ERR: 'The quadrature right-hand side function had repeated recoverable errors.',
             CV_NLS_INIT_FAIL     : "The nonlinear solver's init routine failed."}
     
     def __init__(self, value, t = 0.0):
@@ -3176,7 +4670,11 @@ class IDAError(Exception):
             IDA_BAD_DKY          : 'The vector argument where derivative should be stored is NULL.',
             IDA_SRES_FAIL        : 'The user-provided sensitivity residual function failed in an unrecoverable manner.',
             IDA_REP_SRES_ERR     : 'The user-provided sensitivity residual function repeatedly returned a recoverable error flag, but the solver was unable to recover.',
-            IDA_BAD_IS           : 'The sensitivity identifier is not valid.'}
+            IDA_BAD_IS           : 'The sensitivity identifier is not valid.',
+            IDA_NO_QUAD          : 'Quadrature integration was not activated.',
+            IDA_QRHS_FAIL        : 'The quadrature right-hand side function failed unrecoverable.',
+            IDA_FIRST_QRHS_ERR   : 'The quadrature right-hand side function failed at the first call.',
+            IDA_REP_QRHS_ERR     : 'The quadrature right-hand side function had repeated recoverable errors.'}
     
     def __init__(self, value, t = 0.0):
         self.value = value
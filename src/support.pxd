@@ -22,3 +22,35 @@ cimport numpy as N
 cdef class Statistics:
     cdef public object statistics_msg
     cdef public object statistics
+
+cdef class ResultBuffer:
+    cdef N.ndarray data
+    cdef public int size
+    cdef readonly int width
+    
+    cpdef append(self, object value)
+    cpdef N.ndarray array(self)
+    cpdef N.ndarray trim(self)
+    cdef tuple _shape(self, int rows)
+    cdef _grow(self)
+
+cdef class ResultFile(ResultBuffer):
+    cdef object fp
+    cdef object mmap
+    cdef public bint delete
+    cdef readonly object filename
+    cdef readonly int nwritten
+    
+    cdef _write_header(self)
+    cdef _flush(self)
+
+cdef class EventLocator:
+    cdef readonly int n_g
+    cdef readonly long nevals
+    cdef readonly double t_event
+    cdef readonly N.ndarray g_event
+    cdef N.ndarray g_low, g_high, g_mid, event_info
+    
+    cdef int _store(self, N.ndarray buf, object g) except -1
+    cdef int _crossing(self, double[::1] g_low, double[::1] g_high)
+    cdef _event_info(self, double[::1] g_low, double[::1] g_high)
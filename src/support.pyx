@@ -17,11 +17,19 @@
 
 import numpy as N
 cimport numpy as N
+cimport cython
+from libc.math cimport fabs
 
+import os
+import struct
+import tempfile
 from collections import OrderedDict
 
 realtype = N.float
 
+#Size in bytes of the header written by ResultFile
+DEF RESULT_FILE_HEADER_SIZE = 128
+
 def set_type_shape_array(var, datatype=realtype):
     """
     Helper function to convert a scalar or list to a 1D-array
@@ -60,7 +68,8 @@ cdef class Statistics:
         for k in list(self.statistics.keys()):
             if self.statistics[k] == -1:
                 continue
-            print(" %s %s: %d")%(self.statistics_msg[k], " "*(max_len_msg-len(self.statistics_msg[k])+1) ,self.statistics[k])
+            value = ("%.4g" if isinstance(self.statistics[k], float) else "%d")%self.statistics[k]
+            print(" %s %s: %s")%(self.statistics_msg[k], " "*(max_len_msg-len(self.statistics_msg[k])+1) ,value)
         
     def reset(self):
         """
@@ -79,3 +88,371 @@ cdef class Statistics:
         
     def keys(self):
         return self.statistics.keys()
+
+cdef class ResultBuffer:
+    """
+    Growable and contiguous storage of simulation results. The values are 
+    stored as rows in a preallocated array which capacity is doubled when
+    it is full, so that storing n points only requires O(log(n))
+    reallocations. The stored rows are retrieved as an array view through 
+    the method array.
+    
+        Parameters::
+        
+            width
+                    - Default '0'. Number of columns of a row. If '0', 
+                      scalars are stored in a 1-D array.
+            
+            capacity
+                    - Default '128'. Number of rows initially allocated.
+    """
+    def __init__(self, int width=0, int capacity=128):
+        self.width = width
+        self.size = 0
+        if capacity < 1:
+            capacity = 1
+        self.data = N.empty(self._shape(capacity), dtype=realtype)
+    
+    cdef tuple _shape(self, int rows):
+        if self.width > 0:
+            return (rows, self.width)
+        return (rows,)
+    
+    cdef _grow(self):
+        shape = self._shape(2*len(self.data))
+        try:
+            #Enlarge in place (avoids the copy if the memory can be extended)
+            self.data.resize(shape)
+        except ValueError:
+            #Views of the current storage exists, allocate new storage
+            data = N.empty(shape, dtype=realtype)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+    
+    cpdef append(self, object value):
+        """
+        Stores a value (scalar or row) last in the buffer.
+        """
+        if self.size == len(self.data):
+            self._grow()
+        self.data[self.size] = value
+        self.size += 1
+        
+    def extend(self, values):
+        """
+        Stores a sequence of values last in the buffer.
+        """
+        for value in values:
+            self.append(value)
+    
+    cpdef N.ndarray array(self):
+        """
+        Returns a view of the stored values.
+        """
+        return self.data[:self.size]
+    
+    cpdef N.ndarray trim(self):
+        """
+        Shrinks the storage to the number of stored values and returns
+        it. The storage is shrunk in place if no views of it are held,
+        otherwise a view of the stored values is returned.
+        """
+        shape = self._shape(self.size)
+        try:
+            self.data.resize(shape)
+        except ValueError:
+            return self.array()
+        return self.data
+    
+    def __len__(self):
+        return self.size
+    
+    def __getitem__(self, key):
+        return self.array()[key]
+        
+    def __iter__(self):
+        return iter(self.array())
+        
+    def __array__(self, dtype=None):
+        return self.array() if dtype is None else self.array().astype(dtype)
+
+cdef class ResultFile(ResultBuffer):
+    """
+    Storage of simulation results in a .npy file on disk. The values are 
+    collected in an in-memory chunk which is appended to the file when it
+    is full, so that the memory used is independent of the number of 
+    stored values. The stored values are retrieved as a (read-only) 
+    memory-mapped array through the method array, the array is cached
+    until more values are appended.
+    
+        Parameters::
+        
+            width
+                    - Default '0'. Number of columns of a row. If '0', 
+                      scalars are stored in a 1-D array.
+            
+            capacity
+                    - Default '1024'. Number of rows in a chunk.
+            
+            directory
+                    - Default None. The directory in which the file is
+                      created. If None, the default temporary directory
+                      is used.
+                      
+            prefix
+                    - Default 'assimulo_'. The prefix of the file name.
+                    
+            delete
+                    - Default True. If True, the file is removed when the 
+                      ResultFile is closed (or deallocated). Memory-mapped
+                      arrays already returned by array remain valid on
+                      POSIX systems.
+    """
+    def __init__(self, int width=0, int capacity=1024, directory=None, prefix="assimulo_", delete=True):
+        ResultBuffer.__init__(self, width, capacity)
+        
+        self.delete = delete
+        self.mmap = None
+        fd, self.filename = tempfile.mkstemp(suffix=".npy", prefix=prefix, dir=directory)
+        self.fp = os.fdopen(fd, "w+b")
+        self.nwritten = 0
+        self._write_header()
+    
+    def __dealloc__(self):
+        if self.fp is not None:
+            self.fp.close()
+        if self.delete and self.filename is not None and os.path.exists(self.filename):
+            try:
+                os.remove(self.filename)
+            except OSError: #The file is still mapped (Windows)
+                pass
+    
+    cdef _write_header(self):
+        """
+        Writes a .npy header (version 1.0) with the current number of rows.
+        The header is padded to a fixed size so that it can be rewritten
+        in place as the file grows.
+        """
+        header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }"%(
+                  N.lib.format.dtype_to_descr(N.dtype(realtype)), self._shape(self.nwritten))
+        header = header.ljust(RESULT_FILE_HEADER_SIZE - 11) + "\n"
+        self.fp.seek(0)
+        self.fp.write(b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1"))
+        self.fp.seek(0, 2)
+    
+    cdef _flush(self):
+        """
+        Appends the rows in the current chunk to the file.
+        """
+        if self.size > 0:
+            self.data[:self.size].tofile(self.fp)
+            self.nwritten += self.size
+            self.size = 0
+            self.mmap = None #The cached array does not include the new rows
+            self._write_header()
+        self.fp.flush()
+    
+    cdef _grow(self):
+        self._flush()
+    
+    cpdef N.ndarray array(self):
+        """
+        Returns a read-only memory-mapped view of the stored values.
+        """
+        if self.size > 0:
+            self._flush()
+        if self.nwritten == 0:
+            return N.empty(self._shape(0), dtype=realtype)
+        if self.mmap is None:
+            self.mmap = N.load(self.filename, mmap_mode="r")
+        return self.mmap
+    
+    cpdef N.ndarray trim(self):
+        """
+        Writes the remaining values to the file, closes the file handle 
+        and returns a read-only memory-mapped view of the stored values.
+        """
+        res = self.array()
+        if self.fp is not None:
+            self.fp.close()
+            self.fp = None
+        return res
+    
+    def close(self):
+        """
+        Writes the remaining values to the file and closes it. If delete
+        is True, the file is removed, the values stay available through
+        the method array.
+        """
+        self.trim()
+        if self.delete and os.path.exists(self.filename):
+            try:
+                os.remove(self.filename)
+            except OSError: #The file is still mapped (Windows)
+                pass
+    
+    def __len__(self):
+        return self.nwritten + self.size
+
+cdef class EventLocator:
+    """
+    Locates state events, i.e. sign changes of the event functions, in
+    an interval [t_low, t_high] using the Illinois algorithm. The event
+    function is iterated with the component which has its crossing
+    closest to t_low. The sign changes of all the components are scanned 
+    in compiled loops over buffers allocated once for the number of event
+    functions, so the cost of a step without events is a single pass
+    over the event values.
+    
+        Parameters::
+        
+            n_g
+                    - The number of event functions.
+    
+        Example::
+        
+            locator = EventLocator(2)
+            event_info = locator.locate(g, t_low, t_high, g_low, g_high)
+            
+            event_info  -> None if there are no events in the interval
+                           otherwise an array with 1 (-1) for the event
+                           functions crossing from below (above) zero.
+            locator.t_event -> The right endpoint of the final bracket.
+            locator.g_event -> A copy of the event values at t_event.
+    """
+    def __init__(self, int n_g):
+        self.n_g = n_g
+        self.g_low = N.empty(n_g, dtype=realtype)
+        self.g_high = N.empty(n_g, dtype=realtype)
+        self.g_mid = N.empty(n_g, dtype=realtype)
+        self.event_info = N.zeros(n_g, dtype=N.intc)
+        self.nevals = 0
+    
+    cdef int _store(self, N.ndarray buf, object g) except -1:
+        g = N.asarray(g, dtype=realtype).reshape(-1)
+        if len(g) != self.n_g:
+            raise ValueError("The number of event functions (%d) do not match the expected number (%d)."%(len(g), self.n_g))
+        buf[:] = g
+        return 0
+    
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef int _crossing(self, double[::1] g_low, double[::1] g_high):
+        """
+        Returns the index of the event function which crossing is closest
+        to the left endpoint, -1 if no event function changes sign.
+        """
+        cdef int i, imax = -1
+        cdef double gfrac, maxfrac = 0.0
+        for i in range(self.n_g):
+            if (g_low[i] > 0) != (g_high[i] > 0):
+                gfrac = fabs(g_high[i]/(g_low[i] - g_high[i]))
+                if gfrac >= maxfrac:
+                    maxfrac = gfrac
+                    imax = i
+        return imax
+    
+    def locate(self, g_fcn, double t_low, double t_high, g_low, g_high):
+        """
+        Checks if an event occurs in [t_low, t_high] and if so, finds the
+        earliest small interval that contains a change in sign. The 
+        event function, g_fcn(t), is only evaluated (and thus the
+        solution only interpolated) when an event has been detected.
+        
+            Parameters::
+            
+                g_fcn
+                        - The event functions as a function of the
+                          time, g_fcn(t).
+                
+                t_low, g_low
+                        - The left endpoint and the event values there.
+                        
+                t_high, g_high
+                        - The right endpoint and the event values there.
+                        
+            Returns::
+            
+                None if there are no events, otherwise the event 
+                information (see the class documentation). The number of
+                evaluations of g_fcn is stored in nevals.
+        """
+        cdef double[::1] g_lo = self.g_low
+        cdef double[::1] g_hi = self.g_high
+        cdef double TOL = max(fabs(t_low), fabs(t_high))*1e-13
+        cdef double alpha = 1.0, t_mid, delta, fracint
+        cdef int imax, side = 0, sideprev = -1
+        
+        self._store(self.g_low, g_low)
+        self._store(self.g_high, g_high)
+        self.nevals = 0
+        self.t_event = t_high
+        
+        imax = self._crossing(g_lo, g_hi)
+        if imax < 0:
+            self.g_event = self.g_high.copy()
+            return None
+        
+        while fabs(t_high - t_low) > TOL:
+            #Adjust alpha if the same side is choosen more than once in a row.
+            if sideprev == side:
+                if side == 2:
+                    alpha = alpha*2.0
+                else:
+                    alpha = alpha/2.0
+            #Otherwise alpha = 1 and the secant rule is used.
+            else:
+                alpha = 1.0
+            
+            #Hack for solving the slow converging case when g is zero for a large part of [t_low, t_high].
+            if g_hi[imax] == 0 or g_lo[imax] == 0:
+                t_mid = (t_low + t_high)/2
+            else:
+                t_mid = t_high - (t_high - t_low)*g_hi[imax]/(g_hi[imax] - alpha*g_lo[imax])
+            
+            #Check if t_mid is to close to current brackets and adjust inwards if so is the case.
+            if fabs(t_mid - t_low) < TOL/2:
+                fracint = fabs(t_low - t_high)/TOL
+                delta = (t_high - t_low)/10.0 if fracint > 5 else (t_high - t_low)/(2.0*fracint)
+                t_mid = t_low + delta
+            
+            if fabs(t_mid - t_high) < TOL/2:
+                fracint = fabs(t_low - t_high)/TOL
+                delta = (t_high - t_low)/10.0 if fracint > 5 else (t_high - t_low)/(2.0*fracint)
+                t_mid = t_high - delta
+            
+            #Calculate g at t_mid and check for events in [t_low, t_mid].
+            g_mid = g_fcn(t_mid)
+            self.nevals += 1
+            sideprev = side
+            
+            #The buffer of the discarded endpoint is reused for g_mid.
+            self._store(self.g_mid, g_mid)
+            if self._crossing(g_lo, self.g_mid) >= 0:
+                t_high = t_mid
+                self.g_high, self.g_mid = self.g_mid, self.g_high
+                g_hi = self.g_high
+                side = 1
+            #If there are no events in [t_low, t_mid] there must be some event in [t_mid, t_high].
+            else:
+                t_low = t_mid
+                self.g_low, self.g_mid = self.g_mid, self.g_low
+                g_lo = self.g_low
+                side = 2
+            imax = self._crossing(g_lo, g_hi)
+        
+        self._event_info(g_lo, g_hi)
+        self.t_event = t_high
+        self.g_event = self.g_high.copy()
+        return self.event_info.copy()
+    
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef _event_info(self, double[::1] g_low, double[::1] g_high):
+        cdef int[::1] info = self.event_info
+        cdef int i
+        for i in range(self.n_g):
+            if (g_low[i] > 0) != (g_high[i] > 0):
+                info[i] = 1 if g_high[i] > 0 else -1
+            else:
+                info[i] = 0
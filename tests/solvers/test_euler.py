@@ -21,6 +21,8 @@ from assimulo.solvers.euler import *
 from assimulo.problem import Explicit_Problem
 from assimulo.exception import *
 import scipy.sparse as sp
+import os
+import tempfile
 
 class Extended_Problem(Explicit_Problem):
     
@@ -209,6 +211,90 @@ class Test_Explicit_Euler:
         nose.tools.assert_almost_equal(self.simulator.t_sol[-1], 1.0)
         nose.tools.assert_almost_equal(float(self.simulator.y_sol[-1]), 2.0)
         
+    @testattr(stddist = True)
+    def test_result_arrays(self):
+        """
+        This tests that the result is stored in arrays by the default handle_result.
+        """
+        t, y = self.simulator.simulate(1)
+        
+        assert isinstance(self.simulator.t_sol, N.ndarray)
+        assert t is self.simulator.t_sol
+        assert y.shape == (101, 1)
+        nose.tools.assert_almost_equal(y[-1][0], 2.0)
+        
+    @testattr(stddist = True)
+    def test_result_sink_file(self):
+        """
+        This tests that the result can be streamed to files.
+        """
+        t_ref, y_ref = self.simulator.simulate(1)
+        
+        sim = ExplicitEuler(self.problem)
+        sim.result_sink = "file"
+        t, y = sim.simulate(1)
+        
+        assert isinstance(sim.y_sol, N.memmap)
+        assert N.all(t == t_ref)
+        assert N.all(y == y_ref)
+        nose.tools.assert_raises(AssimuloException, sim._set_result_sink, "disk")
+        assert not os.path.exists(sim.y_sol.filename) #Temporary files are removed
+        
+        directory = tempfile.mkdtemp()
+        sim.reset()
+        sim.result_directory = directory
+        sim.simulate(1)
+        
+        assert N.all(N.load(sim.y_sol.filename) == y_ref)
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+        
+        def f(t, y):
+            if t > 0.5:
+                raise ValueError("Failed")
+            return 1.0
+        sim = ExplicitEuler(Explicit_Problem(f, 0.0))
+        sim.result_sink = "file"
+        nose.tools.assert_raises(ValueError, sim.simulate, 1.0)
+        
+        assert isinstance(sim.y_sol, N.memmap) #The result up to the failure
+        assert not os.path.exists(sim.y_sol.filename)
+        
+    @testattr(stddist = True)
+    def test_result_user_defined_handle_result(self):
+        """
+        This tests that the result is stored in lists when handle_result is overridden.
+        """
+        def handle_result(solver, t, y):
+            solver.t_sol.extend([t])
+            solver.y_sol.extend([y[0]])
+        self.problem.handle_result = handle_result
+        
+        sim = ExplicitEuler(self.problem)
+        sim.simulate(1)
+        
+        assert isinstance(sim.t_sol, list)
+        assert len(sim.y_sol) == 101
+        nose.tools.assert_almost_equal(sim.y_sol[-1], 2.0)
+        
+    @testattr(stddist = True)
+    def test_simulate_batch(self):
+        """
+        This tests that the batched mode gives the same result as simulating the trajectories one by one.
+        """
+        f = lambda t,y: -y*t
+        y0 = N.array([[1.0], [2.0], [-0.5]])
+        
+        sim = ExplicitEuler(Explicit_Problem(f, 1.0))
+        t, y = sim.simulate_batch(y0, 1.0, 100)
+        
+        for i in range(3):
+            ref = ExplicitEuler(Explicit_Problem(f, y0[i]))
+            t_ref, y_ref = ref.simulate(1.0)
+            assert N.allclose(t, t_ref)
+            assert N.allclose(y[i], y_ref)
+        
     @testattr(stddist = True)
     def test_exception(self):
         """
@@ -289,6 +375,28 @@ class Test_Implicit_Euler:
         nose.tools.assert_almost_equal(exp_sim.y_sol[-1][0], -121.995500, 4)
         assert exp_sim.statistics["nfcnjacs"] > 0
     
+    @testattr(stddist = True)
+    def test_jac_sparsity(self):
+        """
+        This tests the numeric jacobian computed using the sparsity pattern.
+        """
+        f = lambda t,x: N.array([x[1], -9.82, -x[2]])       #Defines the rhs
+        
+        exp_mod = Explicit_Problem(f, [1.0,0.0,1.0])
+        exp_sim = ImplicitEuler(exp_mod)
+        exp_sim.simulate(5.,100)
+        y_dense = exp_sim.y_sol[-1]
+        
+        assert exp_sim.statistics["nfcnjacs"] == 4*exp_sim.statistics["njacs"]
+        
+        exp_mod.jac_sparsity = N.array([[0,1,0],[0,0,0],[0,0,1]])
+        exp_sim = ImplicitEuler(exp_mod)
+        exp_sim.simulate(5.,100)
+        
+        nose.tools.assert_almost_equal(exp_sim.y_sol[-1][0], y_dense[0], 6)
+        nose.tools.assert_almost_equal(exp_sim.y_sol[-1][2], y_dense[2], 6)
+        assert exp_sim.statistics["nfcnjacs"] == 2*exp_sim.statistics["njacs"]
+    
     @testattr(stddist = True)
     def test_h(self):
         
@@ -16,6 +16,7 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import nose
+import numpy as N
 from assimulo import testattr
 from assimulo.solvers.kinsol import *
 from assimulo.problem import Algebraic_Problem
@@ -54,3 +55,117 @@ class Test_KINSOL:
         
         solver.max_beta_fails = 15
         assert solver.max_beta_fails == 15
+        
+        assert solver.nvector == "SERIAL"
+        solver.nvector = "pthreads"
+        assert solver.nvector == "PTHREADS"
+        nose.tools.assert_raises(Exception, solver._set_nvector, "Test")
+        
+        solver.num_threads = 2
+        assert solver.num_threads == 2
+        nose.tools.assert_raises(Exception, solver._set_num_threads, 0)
+
+    @testattr(stddist = True)
+    def test_krylov_solvers(self):
+        res = lambda y: N.array([2.0*y[0] - y[1] - 1.0, -y[0] + 2.0*y[1] - 2.0 + y[1]**3])
+        model  = Algebraic_Problem(res, N.array([0.0, 0.0]))
+        
+        for lsolver in ["SPGMR", "SPFGMR", "SPBCGS", "SPTFQMR"]:
+            solver = KINSOL(model)
+            solver.linear_solver = lsolver
+            solver.max_restarts = 2
+            solver.gstype = "CLASSICAL"
+            y = solver.solve()
+            
+            assert solver.linear_solver == lsolver
+            nose.tools.assert_almost_equal(y[0], 1.0, 6)
+            nose.tools.assert_almost_equal(y[1], 1.0, 6)
+            assert solver.statistics["nliters"] > 0
+        
+        nose.tools.assert_raises(Exception, solver._set_linear_solver, "Test")
+        nose.tools.assert_raises(Exception, solver._set_gstype, "Test")
+    
+    @testattr(stddist = True)
+    def test_fixed_point(self):
+        res = lambda y: y - 0.5*N.cos(y)
+        model  = Algebraic_Problem(res, N.array([0.0, 1.0]))
+        
+        for maa in [0, 2]:
+            solver = KINSOL(model)
+            solver.strategy = "FP"
+            solver.maa = maa
+            y = solver.solve()
+            
+            assert solver.strategy == "FP"
+            assert N.allclose(res(y), 0.0, atol=1e-5)
+            assert solver.statistics["njevals"] == 0
+        
+        nose.tools.assert_raises(Exception, solver._set_strategy, "Test")
+        nose.tools.assert_raises(Exception, solver._set_maa, -1)
+        nose.tools.assert_raises(Exception, solver._set_damping, 0.0)
+    
+    @testattr(stddist = True)
+    def test_picard(self):
+        A = N.array([[2.0, -1.0], [-1.0, 2.0]])
+        res = lambda y: A.dot(y) - N.array([1.0, 0.9 + 0.1*y[1]**3])
+        model  = Algebraic_Problem(res, N.array([0.0, 0.0]))
+        
+        solver = KINSOL(model)
+        solver.strategy = "PICARD"
+        nose.tools.assert_raises(AssimuloException, solver.solve)
+        
+        model  = Algebraic_Problem(res, N.array([0.0, 0.0]), jac=lambda y: A)
+        solver = KINSOL(model)
+        solver.strategy = "PICARD"
+        solver.maa = 1
+        y = solver.solve()
+        
+        nose.tools.assert_almost_equal(y[0], 1.0, 5)
+        nose.tools.assert_almost_equal(y[1], 1.0, 5)
+    
+    @testattr(stddist = True)
+    def test_solve_many(self):
+        res = lambda y, p: N.array([y[0]**2 - p, y[1] - p*y[0]])
+        jac = lambda y, p: N.array([[2*y[0], 0.0], [-p, 1.0]])
+        model  = Algebraic_Problem(res, N.array([1.0, 1.0]), jac=jac)
+        params = N.linspace(1.0, 4.0, 7)
+        
+        solver = KINSOL(model)
+        Y, stats = solver.solve_many(params=params, predictor=True)
+        
+        assert Y.shape == (7, 2)
+        assert N.all(stats["flag"] >= 0)
+        assert N.allclose(Y[:,0], N.sqrt(params), atol=1e-6)
+        assert N.allclose(Y[:,1], params**1.5, atol=1e-5)
+        assert len(stats["nniters"]) == 7
+        assert solver.statistics["nniters"] == stats["nniters"].sum()
+        assert N.all(solver.y == Y[-1])
+        
+        #Only initial guesses
+        model  = Algebraic_Problem(lambda y: y**2 - 4.0, N.array([1.0]))
+        solver = KINSOL(model)
+        Y, stats = solver.solve_many(y0=[[1.0], [3.0]])
+        
+        assert N.allclose(Y[:,0], [2.0, 2.0], atol=1e-6)
+        nose.tools.assert_raises(AssimuloException, solver.solve_many)
+        nose.tools.assert_raises(AssimuloException, solver.solve_many, [[1.0]], [1.0, 2.0])
+    
+    @testattr(stddist = True)
+    def test_constraints(self):
+        res = lambda y: N.array([y[0]**2 - 4.0, y[1]**2 - 1.0])
+        model  = Algebraic_Problem(res, N.array([1.0, -0.5]), y0_min=[0.0, -10.0], y0_max=[10.0, -0.1])
+        
+        solver = KINSOL(model)
+        assert solver.constraints is None
+        y = solver.solve()
+        
+        nose.tools.assert_almost_equal(y[0], 2.0, 5)
+        nose.tools.assert_almost_equal(y[1], -1.0, 5)
+        
+        solver.constraints = [2, -2]
+        assert N.all(solver.constraints == [2.0, -2.0])
+        solver.strategy = "FP"
+        nose.tools.assert_raises(AssimuloException, solver.solve)
+        
+        nose.tools.assert_raises(Exception, solver._set_constraints, [3, 0])
+        nose.tools.assert_raises(Exception, solver._set_constraints, [1])
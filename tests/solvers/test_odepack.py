@@ -19,12 +19,14 @@ import nose
 import numpy.testing
 from assimulo import testattr
 from assimulo.lib.odepack import dsrcar, dcfode
-from assimulo.solvers import LSODAR, odepack
+from assimulo.solvers import LSODAR, LSODES, LSODKR, odepack
 from assimulo.problem import Explicit_Problem
 from assimulo.exception import *
 
 import numpy as N
 import scipy.sparse as sp
+from scipy.linalg import expm
+from scipy.sparse.linalg import splu
 
 class Extended_Problem(Explicit_Problem):
     
@@ -332,3 +334,154 @@ class Test_LSODAR:
         self.sim.simulate(1.,100) #Simulate 2 seconds
 
         nose.tools.assert_almost_equal(self.sim.y_sol[-1][0], -1.863646028, 4)
+
+class Test_LSODES:
+    """
+    Tests the LSODES solver.
+    """
+    def setUp(self):
+        """
+        This sets up the test case, the van der pol problem and a
+        discretized heat equation with a sparse (tridiagonal) Jacobian.
+        """
+        def f(t,y):
+            eps = 1.e-6
+            my = 1./eps
+            yd_0 = y[1]
+            yd_1 = my*((1.-y[0]**2)*y[1]-y[0])
+            
+            return N.array([yd_0,yd_1])
+        
+        self.sim = LSODES(Explicit_Problem(f,[2.0,-0.6]))
+        
+        self.n = 50
+        self.A = sp.diags([1.,-2.,1.],[-1,0,1],shape=(self.n,self.n),format="csc")*1.e3
+        
+        heat_mod = Explicit_Problem(lambda t,y: self.A.dot(y), N.ones(self.n))
+        heat_mod.jac = lambda t,y: self.A
+        heat_mod.jac_sparsity = self.A
+        self.heat = heat_mod
+    
+    @testattr(stddist = True)
+    def test_simulation(self):
+        self.sim.simulate(1.)
+        
+        nose.tools.assert_almost_equal(self.sim.y_sol[-1][0], -1.863646028, 4)
+    
+    @testattr(stddist = True)
+    def test_sparsity(self):
+        exact = expm(self.A.toarray()*0.1).dot(N.ones(self.n))
+        
+        for usejac in [True, False]:
+            sim = LSODES(self.heat)
+            sim.usejac = usejac
+            sim.atol = sim.rtol = 1e-8
+            t, y = sim.simulate(0.1)
+            
+            assert sim.statistics["nlus"] > 0
+            assert (sim.statistics["nfcnjacs"] == 0) == usejac
+            numpy.testing.assert_allclose(y[-1], exact, atol=1e-5)
+        
+        #Structure determined by ODEPACK
+        del self.heat.jac_sparsity
+        sim = LSODES(self.heat)
+        sim.atol = sim.rtol = 1e-8
+        t, y = sim.simulate(0.1, ncp_list=[0.05])
+        
+        numpy.testing.assert_allclose(y[-1], exact, atol=1e-5)
+    
+    @testattr(stddist = True)
+    def test_event_localizer(self):
+        exp_sim = LSODES(Extended_Problem())
+        exp_sim.verbosity = 0
+        
+        t, y = exp_sim.simulate(10.0,1000)
+        
+        nose.tools.assert_almost_equal(y[-1][0],8.0)
+        nose.tools.assert_almost_equal(y[-1][1],3.0)
+        nose.tools.assert_almost_equal(y[-1][2],2.0)
+        assert exp_sim.statistics["nstateevents"] == 1
+    
+    @testattr(stddist = True)
+    def test_rkstarter(self):
+        nose.tools.assert_raises(ODEPACK_Exception, setattr, self.sim, "rkstarter", 4)
+
+class Test_LSODKR:
+    """
+    Tests the LSODKR solver.
+    """
+    def setUp(self):
+        """
+        This sets up the test case, the van der pol problem and a
+        discretized heat equation with an exact preconditioner.
+        """
+        def f(t,y):
+            eps = 1.e-6
+            my = 1./eps
+            yd_0 = y[1]
+            yd_1 = my*((1.-y[0]**2)*y[1]-y[0])
+            
+            return N.array([yd_0,yd_1])
+        
+        self.sim = LSODKR(Explicit_Problem(f,[2.0,-0.6]))
+        
+        self.n = 50
+        self.A = sp.diags([1.,-2.,1.],[-1,0,1],shape=(self.n,self.n),format="csc")*1.e3
+        
+        def prec_setup(t, y, fy, jok, gamma, data):
+            return True, splu(sp.eye(self.n, format="csc") - gamma*self.A)
+        
+        def prec_solve(t, y, fy, r, gamma, delta, data):
+            return data.solve(r)
+        
+        heat_mod = Explicit_Problem(lambda t,y: self.A.dot(y), N.ones(self.n))
+        heat_mod.prec_setup = prec_setup
+        heat_mod.prec_solve = prec_solve
+        self.heat = heat_mod
+    
+    @testattr(stddist = True)
+    def test_simulation(self):
+        self.sim.simulate(1.)
+        
+        nose.tools.assert_almost_equal(self.sim.y_sol[-1][0], -1.863646028, 3)
+    
+    @testattr(stddist = True)
+    def test_preconditioner(self):
+        exact = expm(self.A.toarray()*0.1).dot(N.ones(self.n))
+        
+        sim = LSODKR(self.heat)
+        sim.atol = sim.rtol = 1e-8
+        t, y = sim.simulate(0.1)
+        
+        assert sim.statistics["nprecsetups"] > 0
+        assert sim.statistics["nprecs"] > 0
+        assert sim.statistics["nliters"] > 0
+        numpy.testing.assert_allclose(y[-1], exact, atol=1e-5)
+        
+        del self.heat.prec_setup, self.heat.prec_solve
+        sim = LSODKR(self.heat)
+        sim.atol = sim.rtol = 1e-8
+        sim.maxkrylov = 10
+        t, y = sim.simulate(0.1)
+        
+        assert sim.statistics["nprecs"] == 0
+        numpy.testing.assert_allclose(y[-1], exact, atol=1e-5)
+    
+    @testattr(stddist = True)
+    def test_event_localizer(self):
+        exp_sim = LSODKR(Extended_Problem())
+        exp_sim.verbosity = 0
+        exp_sim.report_continuously = True
+        
+        t, y = exp_sim.simulate(10.0,1000)
+        
+        nose.tools.assert_almost_equal(y[-1][0],8.0)
+        nose.tools.assert_almost_equal(y[-1][1],3.0)
+        nose.tools.assert_almost_equal(y[-1][2],2.0)
+    
+    @testattr(stddist = True)
+    def test_maxkrylov(self):
+        self.sim.maxkrylov = 10
+        assert self.sim.maxkrylov == 10
+        
+        nose.tools.assert_raises(ODEPACK_Exception, setattr, self.sim, "maxkrylov", 0)
@@ -24,6 +24,7 @@ from assimulo.problem import Explicit_Problem
 from assimulo.problem import Implicit_Problem
 from assimulo.exception import *
 from assimulo.lib.radau_core import Radau_Exception, Radau_Common
+from assimulo.lib import radau5
 import scipy.sparse as sp
 
 class Extended_Problem(Explicit_Problem):
@@ -370,6 +371,87 @@ class Test_Explicit_Radau5:
         assert steps3==steps2
         
         nose.tools.assert_raises(Radau_Exception, self.sim._set_atol, [1e-6,1e-6,1e-6])
+    
+    @testattr(stddist = True)
+    def test_linear_solver(self):
+        """
+        This tests the sparse and banded linear solvers.
+        """
+        self.sim.simulate(1.0)
+        y_dense = self.sim.y_sol[-1]
+        
+        nose.tools.assert_raises(Explicit_ODE_Exception, self.sim._set_linear_solver, "SPGMR")
+        nose.tools.assert_raises(Explicit_ODE_Exception, self.sim._set_linear_solver, "BAND")
+        
+        jac = self.mod.jac
+        self.mod.jac = lambda t,y: sp.csc_matrix(jac(t,y))
+        self.mod.jac_bandwidth = (1,1)
+        
+        for linear_solver in ["SPARSE", "BAND"]:
+            for usejac in [True, False]:
+                sim = _Radau5ODE(self.mod)
+                sim.atol = 1e-4
+                sim.rtol = 1e-4
+                sim.inith = 1.e-4
+                sim.usejac = usejac
+                sim.linear_solver = linear_solver
+                sim.simulate(1.0)
+                
+                nose.tools.assert_almost_equal(sim.y_sol[-1][0], y_dense[0], 4)
+                assert sim.linear_solver == linear_solver
+    
+    @testattr(stddist = True)
+    def test_jac_sparsity(self):
+        """
+        This tests the numeric jacobian computed using the sparsity pattern.
+        """
+        n = 20
+        def f(t,y):
+            yd = -2.0*y - y**3
+            yd[1:] += y[:-1]
+            yd[:-1] += y[1:]
+            return 100.0*yd
+        
+        mod = Explicit_Problem(f, N.linspace(0.0, 1.0, n))
+        mod.jac_sparsity = sp.diags([1,1,1], [-1,0,1], shape=(n,n))
+        mod.jac_bandwidth = (1,1)
+        
+        y_ref = None
+        for linear_solver in ["DENSE", "SPARSE", "BAND"]:
+            sim = _Radau5ODE(mod)
+            sim.linear_solver = linear_solver
+            sim.simulate(1.0)
+            
+            assert sim.statistics["nfcnjacs"] == 4*sim.statistics["njacs"]
+            if y_ref is None:
+                y_ref = sim.y_sol[-1]
+            nose.tools.assert_almost_equal(N.max(N.abs(sim.y_sol[-1]-y_ref)), 0.0, 6)
+    
+    @testattr(stddist = True)
+    def test_num_threads(self):
+        """
+        This tests that the stage systems solved in a thread pool give the
+        same result as the sequential solves.
+        """
+        nose.tools.assert_raises(Explicit_ODE_Exception, self.sim._set_num_threads, 0)
+        nose.tools.assert_raises(Explicit_ODE_Exception, self.sim._set_num_threads, "many")
+        
+        self.sim.simulate(1.0)
+        
+        sim = _Radau5ODE(self.mod)
+        sim.atol = 1e-4
+        sim.rtol = 1e-4
+        sim.inith = 1.e-4
+        sim.usejac = False
+        sim.num_threads = 3
+        sim.simulate(1.0)
+        
+        assert sim.num_threads == 3
+        assert N.all(sim.y_sol[-1] == self.sim.y_sol[-1])
+        assert sim.statistics["nlus"] == self.sim.statistics["nlus"]
+        assert sim.statistics["tlus"] > 0.0
+        assert sim.statistics["tsolves"] > 0.0
+        assert sim._pool is None #Shut down after the simulation
 
 class Test_Explicit_Fortran_Radau5:
     """
@@ -519,6 +601,24 @@ class Test_Explicit_Fortran_Radau5:
         nose.tools.assert_almost_equal(self.sim_t0.t_sol[-1], 3.0000000, 4)
         nose.tools.assert_almost_equal(self.sim_t0.y_sol[-1][0], 1.7061680350, 4)
         
+    @testattr(stddist = True)
+    def test_interpolate_vector(self):
+        """
+        This tests the vectorized evaluation of the collocation polynomial.
+        """
+        self.sim.simulate(1.0)
+        
+        t_old = self.sim.t_sol[-2]
+        times = N.linspace(t_old, 1.0, 5)
+        y = self.sim.interpolate(times)
+        
+        assert y.shape == (5, 2)
+        for k, time in enumerate(times):
+            y_ref = [radau5.contr5(i+1, time, self.sim.cont) for i in range(2)]
+            assert N.allclose(y[k], y_ref, rtol=1e-12, atol=1e-14)
+            assert N.allclose(self.sim.interpolate(time), y_ref, rtol=1e-12, atol=1e-14)
+        assert N.allclose(y[-1], self.sim.y_sol[-1])
+        
     @testattr(stddist = True)
     def test_simulation(self):
         """
@@ -692,7 +792,109 @@ class Test_Explicit_Fortran_Radau5:
         sim.simulate(3)
         assert sim.sw[0] == False
 
+    @testattr(stddist = True)
+    def test_light_reinit(self):
+        """
+        This tests that the step-size, the Jacobian and the work arrays are
+        kept over events when light_reinit is set.
+        """
+        A = N.array([[-1000.0, 1.0], [0.0, -0.5]])
+        def time_events(t, y, sw):
+            return t + 0.1 if t < 0.9 else None
+        mod = Explicit_Problem(lambda t, y: A.dot(y), [1.0, 1.0])
+        mod.jac = lambda t, y: A
+        mod.time_events = time_events
+        mod.handle_event = lambda solver, event_info: None
+        
+        sim = Radau5ODE(mod)
+        sim.simulate(1.0)
+        
+        sim_light = Radau5ODE(mod)
+        sim_light.light_reinit = True
+        sim_light.simulate(0.5)
+        work = sim_light._WORK
+        sim_light.simulate(1.0)
+        
+        assert sim_light._WORK is work
+        assert sim_light.statistics["njacs"] < sim.statistics["njacs"]
+        nose.tools.assert_almost_equal(sim_light.y_sol[-1][1], sim.y_sol[-1][1], places=4)
+
+    @testattr(stddist = True)
+    def test_mass_matrix(self):
+        """
+        This tests linearly implicit problems, M*y' = f(t,y), with a dense,
+        a sparse (CSC) and a banded mass matrix.
+        """
+        f = lambda t, y: N.array([-y[0], y[1]-y[0]])
+    
+        #Singular mass matrix, the second equation is algebraic
+        mod = Explicit_Problem(f, [1.0, 1.0])
+        mod.mass_matrix = N.array([[1.0, 0.0], [0.0, 0.0]])
+        sim = Radau5ODE(mod)
+        sim.simulate(1.0)
+        nose.tools.assert_almost_equal(sim.y_sol[-1][0], N.exp(-1.0), 5)
+        nose.tools.assert_almost_equal(sim.y_sol[-1][1], N.exp(-1.0), 5)
+    
+        mod.mass_matrix = sp.csc_matrix(mod.mass_matrix)
+        sim = Radau5ODE(mod)
+        sim.simulate(1.0)
+        nose.tools.assert_almost_equal(sim.y_sol[-1][1], N.exp(-1.0), 5)
+    
+        #Diagonal mass matrix in compact band storage with the BAND linear solver
+        f = lambda t, y: -y
+        mod = Explicit_Problem(f, [1.0, 1.0])
+        mod.jac = lambda t, y: -N.eye(2)
+        mod.jac_bandwidth = (0, 0)
+        mod.mass_matrix = N.array([[2.0, 1.0]])
+        mod.mass_bandwidth = (0, 0)
+        sim = Radau5ODE(mod)
+        sim.linear_solver = "BAND"
+        sim.simulate(1.0)
+        nose.tools.assert_almost_equal(sim.y_sol[-1][0], N.exp(-0.5), 5)
+        nose.tools.assert_almost_equal(sim.y_sol[-1][1], N.exp(-1.0), 5)
+    
+        mod.mass_matrix = N.array([[2.0, 1.0], [0.0, 1.0]])
+        del mod.mass_bandwidth
+        sim = Radau5ODE(mod)
+        sim.linear_solver = "BAND"
+        nose.tools.assert_raises(Explicit_ODE_Exception, sim.simulate, 1.0)
 
+    @testattr(stddist = True)
+    def test_linear_solver_band(self):
+        """
+        This tests the banded Jacobian (MLJAC, MUJAC).
+        """
+        nose.tools.assert_raises(Explicit_ODE_Exception, self.sim._set_linear_solver, "BAND")
+        
+        n = 20
+        def f(t,y):
+            yd = -2.0*y - y**3
+            yd[1:] += y[:-1]
+            yd[:-1] += y[1:]
+            return 100.0*yd
+        def jac(t,y): #Compact band storage
+            J = N.ones((3,n))*100.0
+            J[1] = 100.0*(-2.0 - 3.0*y**2)
+            return J
+        
+        mod = Explicit_Problem(f, N.linspace(0.0, 1.0, n))
+        mod.jac = jac
+        mod.jac_bandwidth = (1,1)
+        
+        sim = Radau5ODE(mod)
+        sim.usejac = False
+        sim.simulate(1.0)
+        y_ref = sim.y_sol[-1]
+        
+        for usejac in [True, False]:
+            sim = Radau5ODE(mod)
+            sim.linear_solver = "BAND"
+            sim.usejac = usejac
+            sim.simulate(1.0)
+            
+            assert sim.statistics["nfcnjacs"] == (0 if usejac else 3*sim.statistics["njacs"])
+            nose.tools.assert_almost_equal(N.max(N.abs(sim.y_sol[-1]-y_ref)), 0.0, 5)
+    
 class Test_Implicit_Fortran_Radau5:
     """
     Tests the implicit Radau solver.
@@ -1023,6 +1225,25 @@ class Test_Implicit_Radau5:
         self.sim.maxh = 0.01
         self.sim.simulate(0.5)
         assert max(N.diff(self.sim.t_sol))-N.finfo('double').eps <= 0.01
+    
+    @testattr(stddist = True)
+    def test_linear_solver(self):
+        """
+        This tests the sparse linear solver.
+        """
+        self.sim.simulate(1.0)
+        y_dense = self.sim.y_sol[-1]
+        
+        nose.tools.assert_raises(Implicit_ODE_Exception, self.sim._set_linear_solver, "BAND")
+        
+        sim = _Radau5DAE(self.mod)
+        sim.atol = 1e-4
+        sim.rtol = 1e-4
+        sim.inith = 1.e-4
+        sim.linear_solver = "SPARSE"
+        sim.simulate(1.0)
+        
+        nose.tools.assert_almost_equal(sim.y_sol[-1][0], y_dense[0], 4)
 
 class Test_Radau_Common:
     """
@@ -87,3 +87,106 @@ class Test_RodasODE:
         assert sim.statistics["nfcnjacs"] == 0
         
         nose.tools.assert_almost_equal(sim.y_sol[-1][0], 1.7061680350, 4)
+    
+    @testattr(stddist = True)
+    def test_light_reinit(self):
+        """
+        This tests that the step-size and the work arrays are kept over
+        events when light_reinit is set.
+        """
+        A = N.array([[-1000.0, 1.0], [0.0, -0.5]])
+        def time_events(t, y, sw):
+            return t + 0.1 if t < 0.9 else None
+        mod = Explicit_Problem(lambda t, y: A.dot(y), [1.0, 1.0])
+        mod.jac = lambda t, y: A
+        mod.time_events = time_events
+        mod.handle_event = lambda solver, event_info: None
+        
+        sim = RodasODE(mod)
+        sim.simulate(1.0)
+        
+        sim_light = RodasODE(mod)
+        sim_light.light_reinit = True
+        sim_light.simulate(0.5)
+        work = sim_light._WORK
+        sim_light.simulate(1.0)
+        
+        assert sim_light._WORK is work
+        assert sim_light.statistics["nsteps"] < sim.statistics["nsteps"]
+        nose.tools.assert_almost_equal(sim_light.y_sol[-1][1], sim.y_sol[-1][1], 4)
+    
+    @testattr(stddist = True)
+    def test_mass_matrix(self):
+        """
+        This tests linearly implicit problems, M*y' = f(t,y), with a dense,
+        a sparse (CSC) and a banded mass matrix.
+        """
+        f = lambda t, y: N.array([-y[0], y[1]-y[0]])
+        
+        #Singular mass matrix, the second equation is algebraic
+        mod = Explicit_Problem(f, [1.0, 1.0])
+        mod.mass_matrix = N.array([[1.0, 0.0], [0.0, 0.0]])
+        sim = RodasODE(mod)
+        sim.simulate(1.0)
+        nose.tools.assert_almost_equal(sim.y_sol[-1][0], N.exp(-1.0), 5)
+        nose.tools.assert_almost_equal(sim.y_sol[-1][1], N.exp(-1.0), 5)
+        
+        mod.mass_matrix = sp.csc_matrix(mod.mass_matrix)
+        sim = RodasODE(mod)
+        sim.simulate(1.0)
+        nose.tools.assert_almost_equal(sim.y_sol[-1][1], N.exp(-1.0), 5)
+        
+        #Diagonal mass matrix in compact band storage with the BAND linear solver
+        f = lambda t, y: -y
+        mod = Explicit_Problem(f, [1.0, 1.0])
+        mod.jac = lambda t, y: -N.eye(2)
+        mod.jac_bandwidth = (0, 0)
+        mod.mass_matrix = N.array([[2.0, 1.0]])
+        mod.mass_bandwidth = (0, 0)
+        sim = RodasODE(mod)
+        sim.linear_solver = "BAND"
+        sim.simulate(1.0)
+        nose.tools.assert_almost_equal(sim.y_sol[-1][0], N.exp(-0.5), 5)
+        nose.tools.assert_almost_equal(sim.y_sol[-1][1], N.exp(-1.0), 5)
+        
+        mod.mass_matrix = N.array([[2.0, 1.0], [0.0, 1.0]])
+        del mod.mass_bandwidth
+        sim = RodasODE(mod)
+        sim.linear_solver = "BAND"
+        nose.tools.assert_raises(Rodas_Exception, sim.simulate, 1.0)
+    
+    @testattr(stddist = True)
+    def test_linear_solver_band(self):
+        """
+        This tests the banded Jacobian (MLJAC, MUJAC).
+        """
+        nose.tools.assert_raises(Rodas_Exception, RodasODE(self.mod)._set_linear_solver, "BAND")
+        
+        n = 20
+        def f(t,y):
+            yd = -2.0*y - y**3
+            yd[1:] += y[:-1]
+            yd[:-1] += y[1:]
+            return 100.0*yd
+        def jac(t,y): #Compact band storage
+            J = N.ones((3,n))*100.0
+            J[1] = 100.0*(-2.0 - 3.0*y**2)
+            return J
+        
+        mod = Explicit_Problem(f, N.linspace(0.0, 1.0, n))
+        mod.jac = jac
+        mod.jac_bandwidth = (1,1)
+        
+        sim = RodasODE(mod)
+        sim.usejac = False
+        sim.simulate(1.0)
+        y_ref = sim.y_sol[-1]
+        
+        for usejac in [True, False]:
+            sim = RodasODE(mod)
+            sim.linear_solver = "BAND"
+            sim.usejac = usejac
+            sim.simulate(1.0)
+            
+            assert sim.statistics["nfcnjacs"] == (0 if usejac else 3*sim.statistics["njacs"])
+            nose.tools.assert_almost_equal(N.max(N.abs(sim.y_sol[-1]-y_ref)), 0.0, 5)
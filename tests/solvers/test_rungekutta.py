@@ -20,6 +20,7 @@ from assimulo import testattr
 from assimulo.solvers.runge_kutta import *
 from assimulo.problem import Explicit_Problem
 from assimulo.exception import *
+from assimulo.lib import dopri5
 
 class Test_Dopri5:
     
@@ -42,7 +43,26 @@ class Test_Dopri5:
         
         nose.tools.assert_almost_equal(self.simulator.t_sol[-1], 1.0)
         nose.tools.assert_almost_equal(float(self.simulator.y_sol[-1]), 2.0)
+    
     @testattr(stddist = True)
+    def test_interpolate_vector(self):
+        """
+        This tests the vectorized evaluation of the continuous output.
+        """
+        f = lambda t,y: N.array([y[1], -y[0]])
+        sim = Dopri5(Explicit_Problem(f, [1.0, 0.0]))
+        sim.simulate(1.0)
+        
+        t_old = sim.t_sol[-2]
+        times = N.linspace(t_old, 1.0, 5)
+        y = sim.interpolate(times)
+        
+        assert y.shape == (5, 2)
+        for k, time in enumerate(times):
+            y_ref = [dopri5.contd5(i+1, time, sim.cont, sim.lrc) for i in range(2)]
+            assert N.allclose(y[k], y_ref, rtol=1e-12, atol=1e-14)
+            assert N.allclose(sim.interpolate(time), y_ref, rtol=1e-12, atol=1e-14)
+        assert N.allclose(y[-1], sim.y_sol[-1])
     
     @testattr(stddist = True)
     def test_time_event(self):
@@ -192,6 +212,35 @@ class Test_RungeKutta34:
         nose.tools.assert_raises(Explicit_ODE_Exception, self.simulator._set_atol, [1.0,1.0])
 
 
+    @testattr(stddist = True)
+    def test_simulate_batch(self):
+        """
+        This tests the batched mode with per trajectory step-size control.
+        """
+        f = lambda t,y: N.array([y[1], -y[0]])
+        y0 = N.array([[1.0, 0.0], [0.0, 2.0], [0.0, 0.0], [3.0, -1.0]])
+        
+        sim = RungeKutta34(Explicit_Problem(f, [1.0, 0.0]))
+        sim.atol = 1e-8
+        sim.rtol = 1e-8
+        sim.simulate(1.0)
+        nsteps = sim.statistics["nsteps"]
+        sim.reset()
+        t, y = sim.simulate_batch(y0, 5.0, 50)
+        
+        assert t.shape == (51,)
+        assert y.shape == (4, 51, 2)
+        for i in range(4):
+            exact = y0[i,0]*N.cos(t) + y0[i,1]*N.sin(t)
+            assert N.allclose(y[i,:,0], exact, atol=1e-5)
+        assert N.all(y[2] == 0.0)
+        assert sim.batch_statistics["nsteps"] > 0
+        assert sim.statistics["nsteps"] == nsteps
+        assert sim.t == 0.0
+        
+        nose.tools.assert_raises(Explicit_ODE_Exception, sim.simulate_batch, y0, 5.0)
+        nose.tools.assert_raises(Explicit_ODE_Exception, sim.simulate_batch, N.ones((4,3)), 5.0, 50)
+    
     @testattr(stddist = True)
     def test_switches(self):
         """
@@ -278,3 +327,24 @@ class Test_RungeKutta4:
         
         nose.tools.assert_almost_equal(self.simulator.t_sol[-1], 1.0)
         nose.tools.assert_almost_equal(float(self.simulator.y_sol[-1]), 2.0)
+    
+    @testattr(stddist = True)
+    def test_simulate_batch(self):
+        """
+        This tests that the batched mode gives the same result as simulating the trajectories one by one.
+        """
+        f = lambda t,y: N.array([y[1], -y[0]*(1.0 + 0.1*t)])
+        y0 = N.array([[1.0, 0.0], [0.5, 1.0], [-2.0, 0.3]])
+        
+        sim = RungeKutta4(Explicit_Problem(f, [1.0, 0.0]))
+        sim.h = 0.1
+        t, y = sim.simulate_batch(y0, 2.0, 20)
+        
+        assert y.shape == (3, 21, 2)
+        for i in range(3):
+            ref = RungeKutta4(Explicit_Problem(f, y0[i]))
+            ref.h = 0.1
+            t_ref, y_ref = ref.simulate(2.0)
+            assert N.allclose(t, t_ref)
+            assert N.allclose(y[i], y_ref)
+        assert sim.batch_statistics["nfcns"] == 1 + 4*20
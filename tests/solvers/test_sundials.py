@@ -198,6 +198,21 @@ class Test_CVode:
         err = self.simulator.get_local_errors()
         assert err[0] < 1e-5
     
+    @testattr(stddist = True)
+    def test_output_before_simulate(self):
+        f = lambda t,y,p: -p[0]*y
+        
+        exp_mod = Explicit_Problem(f,[1.0],p0=[1.0])
+        exp_sim = CVode(exp_mod)
+        
+        nose.tools.assert_raises(CVodeError, exp_sim.interpolate, 0.0)
+        nose.tools.assert_raises(CVodeError, exp_sim.interpolate_sensitivity, 0.0)
+        nose.tools.assert_raises(CVodeError, exp_sim.get_error_weights)
+        nose.tools.assert_raises(CVodeError, exp_sim.get_local_errors)
+        
+        exp_sim.simulate(1.0)
+        nose.tools.assert_almost_equal(exp_sim.interpolate(1.0)[0], np.exp(-1.0), 4)
+    
     @testattr(stddist = True)
     def test_get_last_order(self):
         nose.tools.assert_raises(CVodeError, self.simulator.get_last_order)
@@ -442,6 +457,92 @@ class Test_CVode:
         nose.tools.assert_almost_equal(exp_sim.y_sol[-1][0], -121.75000143, 4)
         assert exp_sim.statistics["nfcnjacs"] > 0
     
+    @testattr(stddist = True)
+    def test_rhs_inplace(self):
+        """
+        This tests the in-place right-hand-side.
+        """
+        def f(t, y, ydot):
+            ydot[0] = y[1]
+            ydot[1] = -9.82
+        
+        exp_mod = Explicit_Problem(f, [1.0,0.0])
+        exp_mod.rhs_inplace = True
+        
+        exp_sim = CVode(exp_mod)
+        exp_sim.simulate(5.,100)
+        
+        nose.tools.assert_almost_equal(exp_sim.y_sol[-1][0], -121.75000143, 4)
+        
+        def f(t, y, ydot):
+            y[0] = 0.0
+        exp_mod = Explicit_Problem(f, [1.0,0.0])
+        exp_mod.rhs_inplace = True
+        
+        exp_sim = CVode(exp_mod)
+        nose.tools.assert_raises(CVodeError, exp_sim.simulate, 1.0)
+    
+    @testattr(stddist = True)
+    def test_rhs_modifies_states(self):
+        """
+        This tests that the states given to a (not in-place) right-hand-side
+        are writable copies.
+        """
+        def f(t, y):
+            y[0] = max(y[0], 0.0)
+            return np.array([-1.0, y[0]])
+        
+        exp_mod = Explicit_Problem(f, [1.0, 0.0])
+        exp_sim = CVode(exp_mod)
+        exp_sim.simulate(2.0)
+        
+        nose.tools.assert_almost_equal(exp_sim.y_sol[-1][0], -1.0, 4)
+        nose.tools.assert_almost_equal(exp_sim.y_sol[-1][1], 0.5, 3)
+    
+    @testattr(stddist = True)
+    def test_jac_sparsity(self):
+        """
+        This tests the finite difference Jacobian used by the SPARSE linear solver.
+        """
+        f = lambda t,x: N.array([x[1], -9.82])       #Defines the rhs
+        
+        exp_mod = Explicit_Problem(f, [1.0,0.0])
+        exp_mod.jac_sparsity = sp.csc_matrix(N.array([[0.,1.],[0.,0.]]))
+        
+        exp_sim = CVode(exp_mod)
+        exp_sim.linear_solver = 'SPARSE'
+        exp_sim.simulate(5.,100)
+        
+        nose.tools.assert_almost_equal(exp_sim.y_sol[-1][0], -121.75000143, 4)
+        assert exp_sim.statistics["nfcnjacs"] == 2*exp_sim.statistics["njacs"]
+    
+    @testattr(stddist = True)
+    def test_linear_solver_band(self):
+        """
+        This tests the BAND linear solver.
+        """
+        f = lambda t,x: N.array([x[1], -9.82])       #Defines the rhs
+        jac = lambda t,x: N.array([[0.,1.],[0.,0.],[0.,0.]]) #Defines the jacobian, compact band storage
+        
+        exp_mod = Explicit_Problem(f, [1.0,0.0])
+        exp_mod.jac_bandwidth = (1,1)
+        
+        exp_sim = CVode(exp_mod)
+        exp_sim.linear_solver = 'BAND'
+        exp_sim.simulate(5.,100)
+        
+        nose.tools.assert_almost_equal(exp_sim.y_sol[-1][0], -121.75000143, 4)
+        assert exp_sim.statistics["nfcnjacs"] > 0
+        
+        exp_mod.jac = jac
+        exp_sim = CVode(exp_mod)
+        exp_sim.linear_solver = 'BAND'
+        exp_sim.usejac = True
+        exp_sim.simulate(5.,100)
+        
+        nose.tools.assert_almost_equal(exp_sim.y_sol[-1][0], -121.75000143, 4)
+        assert exp_sim.statistics["nfcnjacs"] == 0
+    
     @testattr(stddist = True)
     def test_usejac_csc_matrix(self):
         """
@@ -538,6 +639,11 @@ class Test_CVode:
         sim.reset()
         sim.simulate(10.)
         nose.tools.assert_almost_equal(float(y100[-2]), float(sim.interpolate(9.9,0)),5)
+        
+        out = N.zeros(1)
+        assert sim.interpolate(9.9, 0, out) is out
+        nose.tools.assert_almost_equal(float(y100[-2]), out[0], 5)
+        nose.tools.assert_raises(ValueError, sim.interpolate, 9.9, 0, N.zeros(2))
     
     @testattr(stddist = True)
     def test_ncp_list(self):
@@ -656,6 +762,50 @@ class Test_CVode:
         exp_mod.jacv = jacvswp #Sets the jacobian
         run_sim(exp_mod)
     
+    @testattr(stddist = True)
+    def test_krylov_solvers(self):
+        """
+        This tests the iterative (Krylov) linear solvers.
+        """
+        f = lambda t,y: N.array([y[1], -9.82])
+        jacv = lambda t,y,fy,v: N.dot(N.array([[0,1.],[0,0]]),v)
+        
+        exp_mod = Explicit_Problem(f,[1.0,0.0])
+        exp_mod.jacv = jacv
+        
+        for lsolver in ["SPGMR", "SPFGMR", "SPBCGS", "SPTFQMR"]:
+            exp_sim = CVode(exp_mod)
+            exp_sim.linear_solver = lsolver
+            exp_sim.gstype = "CLASSICAL"
+            exp_sim.maxrestarts = 2
+            exp_sim.eplifac = 0.01
+            t, y = exp_sim.simulate(5, 1000)
+            
+            nose.tools.assert_almost_equal(y[-1][0],-121.75000000,4)
+            nose.tools.assert_almost_equal(y[-1][1],-49.100000000)
+            assert exp_sim.statistics["nliters"] > 0
+            assert exp_sim.statistics["njacvecs"] > 0
+    
+    @testattr(stddist = True)
+    def test_krylov_options(self):
+        """
+        This tests the options of the iterative linear solvers.
+        """
+        assert self.simulator.gstype == "MODIFIED"
+        self.simulator.gstype = "classical"
+        assert self.simulator.gstype == "CLASSICAL"
+        nose.tools.assert_raises(AssimuloException, self.simulator._set_gstype, "Test")
+        
+        assert self.simulator.maxrestarts == 0
+        self.simulator.maxrestarts = 3
+        assert self.simulator.maxrestarts == 3
+        nose.tools.assert_raises(AssimuloException, self.simulator._set_max_restarts, -1)
+        
+        assert self.simulator.eplifac == 0.05
+        self.simulator.eplifac = 0.1
+        assert self.simulator.eplifac == 0.1
+        nose.tools.assert_raises(AssimuloException, self.simulator._set_eplifac, -1.0)
+    
     @testattr(stddist = True)
     def test_max_order_discr(self):
         """
@@ -719,6 +869,8 @@ class Test_CVode:
         assert self.simulator.linear_solver == 'DENSE'
         self.simulator.linear_solver = 'spgmr'
         assert self.simulator.linear_solver == 'SPGMR'
+        self.simulator.linear_solver = 'sptfqmr'
+        assert self.simulator.linear_solver == 'SPTFQMR'
         
         nose.tools.assert_raises(Exception, self.simulator._set_linear_solver, 'Test')
     
@@ -824,6 +976,20 @@ class Test_IDA:
         assert self.simulator.maxsteps == 10000
         assert self.simulator.y[0] == 1.0
     
+    @testattr(stddist = True)
+    def test_output_before_simulate(self):
+        f = lambda t,y,yd,p: yd+p[0]*y
+        
+        imp_mod = Implicit_Problem(f,[1.0],[-1.0],p0=[1.0])
+        imp_sim = IDA(imp_mod)
+        
+        nose.tools.assert_raises(IDAError, imp_sim.interpolate, 0.0)
+        nose.tools.assert_raises(IDAError, imp_sim.interpolate_sensitivity, 0.0)
+        nose.tools.assert_raises(IDAError, imp_sim.get_last_estimated_errors)
+        
+        imp_sim.simulate(1.0)
+        nose.tools.assert_almost_equal(imp_sim.interpolate(1.0)[0], np.exp(-1.0), 4)
+    
     @testattr(stddist = True)
     def test_interpolate(self):
         """
@@ -840,6 +1006,11 @@ class Test_IDA:
         sim.reset()
         sim.simulate(10.)
         nose.tools.assert_almost_equal(y100[-2], sim.interpolate(9.9,0),5)
+        
+        out = N.zeros(1)
+        assert sim.interpolate(9.9, 0, out) is out
+        nose.tools.assert_almost_equal(y100[-2], out[0], 5)
+        nose.tools.assert_raises(ValueError, sim.interpolate, 9.9, 0, N.zeros(2))
     
     @testattr(stddist = True)
     def test_handle_result(self):
@@ -1035,6 +1206,87 @@ class Test_IDA:
         nose.tools.assert_almost_equal(imp_sim.y_sol[-1][0], 45.1900000, 4)
         assert imp_sim.statistics["nfcnjacs"] > 0
     
+    @testattr(stddist = True)
+    def test_usejac_csc_matrix(self):
+        """
+        This tests the SPARSE linear solver with a CSC Jacobian.
+        """
+        f = lambda t,x,xd: N.array([xd[0]-x[1], xd[1]-9.82])       #Defines the rhs
+        jac = lambda c,t,x,xd: sp.csc_matrix(N.array([[c,-1.],[0.,c]])) #Defines the jacobian
+        
+        imp_mod = Implicit_Problem(f,[1.0,0.0],[0.,-9.82])
+        imp_mod.jac = jac
+        imp_mod.jac_nnz = 3
+        
+        imp_sim = IDA(imp_mod)
+        imp_sim.linear_solver = 'SPARSE'
+        imp_sim.simulate(3,100)
+        
+        assert imp_sim.statistics["nfcnjacs"] == 0
+        assert imp_sim.statistics["njacs"] > 0
+        nose.tools.assert_almost_equal(imp_sim.y_sol[-1][0], 45.1900000, 4)
+    
+    @testattr(stddist = True)
+    def test_jac_sparsity(self):
+        """
+        This tests the finite difference Jacobian used by the SPARSE linear solver.
+        """
+        f = lambda t,x,xd: N.array([xd[0]-x[1], xd[1]-9.82])       #Defines the rhs
+        
+        imp_mod = Implicit_Problem(f,[1.0,0.0],[0.,-9.82])
+        imp_mod.jac_sparsity = sp.csc_matrix(N.array([[1.,1.],[0.,1.]]))
+        
+        imp_sim = IDA(imp_mod)
+        imp_sim.linear_solver = 'SPARSE'
+        imp_sim.simulate(3,100)
+        
+        nose.tools.assert_almost_equal(imp_sim.y_sol[-1][0], 45.1900000, 4)
+        assert imp_sim.statistics["nfcnjacs"] == 3*imp_sim.statistics["njacs"]
+    
+    @testattr(stddist = True)
+    def test_krylov_solvers(self):
+        """
+        This tests the iterative (Krylov) linear solvers.
+        """
+        f = lambda t,x,xd: N.array([xd[0]-x[1], xd[1]-9.82])       #Defines the rhs
+        
+        imp_mod = Implicit_Problem(f,[1.0,0.0],[0.,-9.82])
+        
+        for lsolver in ["SPGMR", "SPFGMR", "SPBCGS", "SPTFQMR"]:
+            imp_sim = IDA(imp_mod)
+            imp_sim.linear_solver = lsolver
+            imp_sim.gstype = "CLASSICAL"
+            imp_sim.eplifac = 0.01
+            imp_sim.simulate(3,100)
+            
+            assert imp_sim.gstype == "CLASSICAL" and imp_sim.maxrestarts == 5
+            nose.tools.assert_almost_equal(imp_sim.y_sol[-1][0], 45.1900000, 4)
+            assert imp_sim.statistics["nliters"] > 0
+        
+        nose.tools.assert_raises(AssimuloException, imp_sim._set_linear_solver, "Test")
+        nose.tools.assert_raises(AssimuloException, imp_sim._set_max_restarts, -1)
+    
+    @testattr(stddist = True)
+    def test_linear_solver_band(self):
+        """
+        This tests the BAND linear solver.
+        """
+        f = lambda t,x,xd: N.array([xd[0]-x[1], xd[1]-9.82])       #Defines the rhs
+        jac = lambda c,t,x,xd: N.array([[c,-1.],[0.,c]]) #Defines the jacobian
+        
+        imp_mod = Implicit_Problem(f,[1.0,0.0],[0.,-9.82])
+        imp_mod.jac = jac
+        imp_mod.jac_bandwidth = (0,1)
+        
+        for usejac in [True, False]:
+            imp_sim = IDA(imp_mod)
+            imp_sim.linear_solver = 'BAND'
+            imp_sim.usejac = usejac
+            imp_sim.simulate(3,100)
+            
+            nose.tools.assert_almost_equal(imp_sim.y_sol[-1][0], 45.1900000, 4)
+            assert (imp_sim.statistics["nfcnjacs"] == 0) == usejac
+    
     @testattr(stddist = True)
     def test_terminate_simulation(self):
         """
@@ -1448,3 +1700,193 @@ class Test_Sundials:
         
         nose.tools.assert_almost_equal(imp_sim.pbar[0], 1000.00000,4)
         nose.tools.assert_almost_equal(imp_sim.pbar[1], 100.000000,4)
+    
+    @testattr(stddist = True)
+    def test_adjoint(self):
+        """
+        Tests the gradient of a cost functional computed using adjoint sensitivities.
+        """
+        p, y0, T = 0.5, 2.0, 2.0
+        G_ref = y0**2*(1.0-N.exp(-2*p*T))/(2*p)
+        dGdp_ref = y0**2*(T*N.exp(-2*p*T)/p-(1.0-N.exp(-2*p*T))/(2*p**2))
+        
+        f = lambda t,y,p: N.array([-p[0]*y[0]])
+        exp_mod = Explicit_Problem(f,[y0],p0=[p])
+        exp_mod.cost = lambda t,y,p: y[0]**2
+        
+        exp_sim = CVode(exp_mod)
+        exp_sim.rtol = exp_sim.atol = 1e-8
+        exp_sim.usesens = False
+        exp_sim.simulate(T)
+        nose.tools.assert_raises(AssimuloException, exp_sim.solve_adjoint) #No checkpoints
+        
+        exp_sim.reset()
+        exp_sim.adjoint = True
+        exp_sim.simulate(T)
+        G, dGdp = exp_sim.solve_adjoint()
+        nose.tools.assert_almost_equal(G, G_ref, 5)
+        nose.tools.assert_almost_equal(dGdp[0], dGdp_ref, 5)
+        
+        #The gradients of the cost and the products with the Jacobians given
+        exp_mod.cost_grad = lambda t,y,p: (2*y, N.array([0.0]))
+        exp_mod.rhs_adjoint = lambda t,y,yB,p: (-p[0]*yB, N.array([-y[0]*yB[0]]))
+        exp_sim.reset()
+        exp_sim.simulate(T)
+        G, dGdp = exp_sim.solve_adjoint()
+        nose.tools.assert_almost_equal(G, G_ref, 5)
+        nose.tools.assert_almost_equal(dGdp[0], dGdp_ref, 5)
+        
+        #An algebraic variable, z = y, in the cost
+        f = lambda t,y,yd,p: N.array([yd[0]+p[0]*y[0], y[1]-y[0]])
+        imp_mod = Implicit_Problem(f,[y0,y0],[-p*y0,-p*y0],p0=[p])
+        imp_mod.cost = lambda t,y,p: y[1]**2
+        
+        imp_sim = IDA(imp_mod)
+        imp_sim.rtol = imp_sim.atol = 1e-8
+        imp_sim.algvar = [1.0, 0.0]
+        imp_sim.usesens = False
+        imp_sim.adjoint = True
+        imp_sim.simulate(T)
+        G, dGdp = imp_sim.solve_adjoint()
+        nose.tools.assert_almost_equal(G, G_ref, 5)
+        nose.tools.assert_almost_equal(dGdp[0], dGdp_ref, 5)
+    
+    @testattr(stddist = True)
+    def test_adjoint_options(self):
+        """
+        Tests the properties of the adjoint sensitivity analysis.
+        """
+        for sim in [self.sim, CVode(Explicit_Problem(lambda t,y,p: -p[0]*y,[1.0],p0=[1.0]))]:
+            assert sim.adjoint == False
+            assert sim.adjsteps == 100
+            assert sim.adjinterp == "HERMITE"
+            
+            sim.adjoint = 1
+            assert sim.adjoint == True
+            sim.adjsteps = 10.5
+            assert sim.adjsteps == 10
+            sim.adjinterp = "polynomial"
+            assert sim.adjinterp == "POLYNOMIAL"
+            
+            nose.tools.assert_raises(AssimuloException, sim._set_adjsteps, 0)
+            nose.tools.assert_raises(AssimuloException, sim._set_adjsteps, "str")
+            nose.tools.assert_raises(AssimuloException, sim._set_adjinterp, "LINEAR")
+        
+        #Events are not supported
+        self.simulators[1].adjoint = True
+        nose.tools.assert_raises(AssimuloException, self.simulators[1].simulate, 2.0)
+    
+    @testattr(stddist = True)
+    def test_nvector(self):
+        """
+        Tests the option nvector, the multithreaded N_Vectors should give the same result as the serial.
+        """
+        for sim in self.simulators:
+            assert sim.nvector == "SERIAL"
+            sim.nvector = "openmp"
+            assert sim.nvector == "OPENMP"
+            nose.tools.assert_raises(AssimuloException, sim._set_nvector, "Test")
+        
+        exp_mod = Explicit_Problem(lambda t,y: -y, [1.0, 2.0])
+        t, y_serial = CVode(exp_mod).simulate(1.0, 10)
+        
+        for nvector in ["OPENMP", "PTHREADS"]:
+            exp_sim = CVode(exp_mod)
+            exp_sim.nvector = nvector
+            exp_sim.num_threads = 2
+            try:
+                t, y = exp_sim.simulate(1.0, 10)
+            except AssimuloException: #Sundials is not compiled with the N_Vector
+                continue
+            assert N.allclose(y, y_serial)
+    
+    @testattr(stddist = True)
+    def test_light_reinit(self):
+        """
+        Tests the option light_reinit, the results with events should agree with a full reinitialization.
+        """
+        for sim in self.simulators:
+            assert sim.light_reinit == False
+            sim.light_reinit = True
+            assert sim.light_reinit == True
+        
+        def handle_event(solver, event_info):
+            solver.sw[0] = not solver.sw[0]
+        
+        exp_mod = Explicit_Problem(lambda t,y,sw: -(2.0 if sw[0] else 1.0)*y, [1.0], sw0=[False])
+        exp_mod.jac = lambda t,y,sw: N.array([[-(2.0 if sw[0] else 1.0)]])
+        exp_mod.state_events = lambda t,y,sw: N.array([t-0.5])
+        exp_mod.handle_event = handle_event
+        
+        imp_mod = Implicit_Problem(lambda t,y,yd,sw: yd+(2.0 if sw[0] else 1.0)*y, [1.0], [-1.0], sw0=[False])
+        imp_mod.state_events = lambda t,y,yd,sw: N.array([t-0.5])
+        imp_mod.handle_event = handle_event
+        
+        for Solver, mod in [(CVode, exp_mod), (IDA, imp_mod)]:
+            res = []
+            for light_reinit in [False, True]:
+                mod.sw0 = [False]
+                sim = Solver(mod)
+                sim.light_reinit = light_reinit
+                sim.simulate(1.0)
+                res.append(sim.y_sol[-1][0])
+            assert N.abs(res[0] - res[1]) < 1e-4
+            nose.tools.assert_almost_equal(res[1], N.exp(-1.5), 3)
+            
+            if Solver is CVode:
+                assert sim.statistics["njacreuse"] > 0
+    
+    @testattr(stddist = True)
+    def test_quadratures(self):
+        """
+        Tests the integration of quadratures, q' = y, separated from the states.
+        """
+        exp_mod = Explicit_Problem(lambda t,y: -y, [1.0])
+        exp_mod.rhsQ = lambda t,y: N.array([y[0], 2*y[0]])
+        
+        exp_sim = CVode(exp_mod)
+        exp_sim.rtol = exp_sim.atol = 1e-8
+        assert exp_sim.suppress_quad == True
+        t, y = exp_sim.simulate(2.0, 10)
+        
+        assert exp_sim.q_sol.shape == (11, 2)
+        assert exp_sim.statistics["nquadfcns"] > 0
+        nose.tools.assert_almost_equal(exp_sim.q_sol[0,0], 0.0)
+        nose.tools.assert_almost_equal(exp_sim.q_sol[-1,0], 1.0-N.exp(-2.0), 6)
+        assert N.allclose(exp_sim.q_sol[:,0], 1.0-N.exp(-N.array(t)), atol=1e-6)
+        assert N.allclose(exp_sim.q_sol[:,1], 2*exp_sim.q_sol[:,0])
+        nsteps = exp_sim.statistics["nsteps"]
+        
+        #The quadratures continue from the last point
+        exp_sim.simulate(3.0)
+        nose.tools.assert_almost_equal(exp_sim.q_sol[-1,0], 1.0-N.exp(-3.0), 6)
+        
+        #Reported continuously and included in the error test
+        exp_mod.q0 = [1.0, 0.0]
+        exp_sim = CVode(exp_mod)
+        exp_sim.rtol = exp_sim.atol = 1e-8
+        exp_sim.report_continuously = True
+        exp_sim.suppress_quad = False
+        t, y = exp_sim.simulate(2.0)
+        
+        assert len(exp_sim.q_sol) == len(t)
+        assert exp_sim.statistics["nsteps"] >= nsteps
+        nose.tools.assert_almost_equal(exp_sim.q_sol[-1,0], 2.0-N.exp(-2.0), 6)
+        
+        exp_sim.reset()
+        assert N.all(exp_sim.q == [1.0, 0.0])
+        
+        #The quadratures of an implicit problem
+        imp_mod = Implicit_Problem(lambda t,y,yd: yd+y, [1.0], [-1.0])
+        imp_mod.resQ = lambda t,y,yd: -yd
+        
+        imp_sim = IDA(imp_mod)
+        imp_sim.rtol = imp_sim.atol = 1e-8
+        t, y, yd = imp_sim.simulate(2.0, 10)
+        
+        assert imp_sim.q_sol.shape == (11, 1)
+        assert N.allclose(imp_sim.q_sol[:,0], 1.0-N.exp(-N.array(t)), atol=1e-6)
+        
+        imp_mod = Implicit_Problem(lambda t,y,yd: yd+y, [1.0], [-1.0])
+        imp_mod.rhsQ = lambda t,y: y
+        nose.tools.assert_raises(AssimuloException, IDA, imp_mod)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010 Modelon AB
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import nose
+import numpy as N
+from assimulo import testattr
+from assimulo.exception import AssimuloException
+from assimulo.lib.adjoint import fd_jacobian, ExplicitAdjoint, ImplicitAdjoint
+
+class Test_Adjoint:
+
+    def setUp(self):
+        """
+        Sets up the problem y0' = -p0 y0 + p1 y1, y1' = -p1 y1 with the
+        cost g = y0^2 + p0 y1, and its implicit form with the algebraic
+        variable z = y0 + p0 y1 and the cost g = z^2.
+        """
+        self.f = lambda t, y, p: N.array([-p[0]*y[0]+p[1]*y[1], -p[1]*y[1]])
+        self.g = lambda t, y, p: y[0]**2 + p[0]*y[1]
+        self.F = lambda t, y, yd, p: N.array([yd[0]+p[0]*y[0]-p[1]*y[1], yd[1]+p[1]*y[1], y[2]-y[0]-p[0]*y[1]])
+        self.g_imp = lambda t, y, p: y[2]**2
+
+        self.t = 0.3
+        self.y = N.array([1.0, 2.0])
+        self.yB = N.array([0.5, -1.5])
+        self.p = N.array([0.5, 0.3])
+
+    @testattr(stddist = True)
+    def test_fd_jacobian(self):
+        J = fd_jacobian(lambda x: self.f(self.t, x, self.p), self.y)
+
+        assert J.shape == (2, 2)
+        assert N.allclose(J, [[-0.5, 0.3], [0.0, -0.3]], atol=1e-6)
+
+        J = fd_jacobian(lambda x: self.g(self.t, self.y, x), self.p)
+        assert J.shape == (1, 2)
+        assert N.allclose(J, [[2.0, 0.0]], atol=1e-6)
+
+    @testattr(stddist = True)
+    def test_explicit(self):
+        adj = ExplicitAdjoint(self.f, self.g, 2)
+        t, y, yB, p = self.t, self.y, self.yB, self.p
+
+        J_y = N.array([[-p[0], p[1]], [0.0, -p[1]]])
+        J_p = N.array([[-y[0], y[1]], [0.0, -y[1]]])
+        g_y = N.array([2*y[0], p[0]])
+        g_p = N.array([y[1], 0.0])
+
+        assert N.allclose(adj.rhs(t, y, yB, p), -J_y.T.dot(yB)-g_y, atol=1e-6)
+        assert N.allclose(adj.rhs_quad(t, y, yB, p), N.append(-J_p.T.dot(yB)-g_p, -self.g(t, y, p)), atol=1e-6)
+
+        adj = ExplicitAdjoint(self.f, self.g, 2, lambda t, y, p: (g_y, g_p), lambda t, y, yB, p: (J_y.T.dot(yB), J_p.T.dot(yB)))
+        assert N.allclose(adj.rhs(t, y, yB, p), -J_y.T.dot(yB)-g_y)
+
+        G, grad = adj.gradient(yB, N.array([1.0, 2.0, 3.0]), N.array([[0.0, 0.0], [1.0, 0.0]]))
+        assert G == 3.0
+        assert N.allclose(grad, [1.0, 2.0+yB[0]])
+
+        nose.tools.assert_raises(AssimuloException, ExplicitAdjoint, self.f, self.g, 0)
+
+    @testattr(stddist = True)
+    def test_implicit(self):
+        adj = ImplicitAdjoint(self.F, self.g_imp, 2)
+        t, p = self.t, self.p
+        y = N.append(self.y, self.y[0]+p[0]*self.y[1])
+        yd = N.append(self.f(t, self.y, p), 0.0)
+
+        #The algebraic component of the adjoint variables is consistent for zero derivatives
+        yB = N.array([0.5, -1.5, -2*y[2]])
+        assert abs(adj.res(t, y, yd, yB, N.zeros(3), p)[2]) < 1e-6
+        assert N.allclose(adj.res(t, y, yd, yB, N.array([1.0, 2.0, 3.0]), p)[:2] - adj.res(t, y, yd, yB, N.zeros(3), p)[:2], [1.0, 2.0], atol=1e-6)
+
+        J_p = N.array([[y[0], -y[1]], [0.0, y[1]], [-y[1], 0.0]])
+        assert N.allclose(adj.rhs_quad(t, y, yd, yB, p), N.append(-J_p.T.dot(yB), -y[2]**2), atol=1e-5)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python 
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010 Modelon AB
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import nose
+import numpy as N
+from assimulo import testattr
+from assimulo.ensemble import Ensemble
+from assimulo.problem import Explicit_Problem
+from assimulo.solvers import RungeKutta34
+from assimulo.exception import *
+
+class Decay_Problem(Explicit_Problem):
+    k = 1.0
+    
+    def rhs(self, t, y):
+        return -self.k*y
+
+def factory():
+    sim = RungeKutta34(Decay_Problem(y0=[1.0, 2.0]))
+    sim.verbosity = 50
+    return sim
+
+class Test_Ensemble:
+    
+    def setUp(self):
+        self.variants = [{"y0":[1.0, float(i)], "attributes":{"k":0.5*(i+1)}} for i in range(6)]
+    
+    @testattr(stddist = True)
+    def test_simulate(self):
+        ens = Ensemble(factory, self.variants)
+        ens.num_threads = 2
+        t, y = ens.simulate(1.0, 10)
+        
+        assert t.shape == (6, 11)
+        assert y.shape == (6, 11, 2)
+        assert len(ens.statistics) == 6
+        assert ens.statistics[0]["nsteps"] > 0
+        for i in range(6):
+            nose.tools.assert_almost_equal(y[i,-1,1], i*N.exp(-0.5*(i+1)), 4)
+            
+    @testattr(stddist = True)
+    def test_simulate_serial(self):
+        ens = Ensemble(factory, self.variants)
+        ens.num_threads = 2
+        t, y = ens.simulate(1.0, 10)
+        
+        ens.num_threads = 1
+        t_ser, y_ser = ens.simulate(1.0, 10)
+        
+        assert N.all(t == t_ser)
+        assert N.all(y == y_ser)
+        
+    @testattr(stddist = True)
+    def test_attributes_restored(self):
+        """
+        This tests that an attribute set by one variant is not inherited
+        by the following variants in the same worker.
+        """
+        variants = [{"y0":[1.0, float(i)], "attributes":{"k":3.0}} if i % 2 == 0 else {"y0":[1.0, float(i)]} for i in range(6)]
+        
+        ens = Ensemble(factory, variants)
+        ens.num_threads = 2
+        t, y = ens.simulate(1.0, 10)
+        
+        for i in range(6):
+            ens_ser = Ensemble(factory, [variants[i]])
+            ens_ser.num_threads = 1
+            t_ser, y_ser = ens_ser.simulate(1.0, 10)
+            assert N.all(y[i] == y_ser[0])
+        
+        ens.num_threads = 1
+        t_ser, y_ser = ens.simulate(1.0, 10)
+        assert N.all(y == y_ser)
+        nose.tools.assert_almost_equal(y_ser[1,-1,1], N.exp(-1.0), 4)
+        nose.tools.assert_almost_equal(y_ser[2,-1,1], 2*N.exp(-3.0), 4)
+        
+    @testattr(stddist = True)
+    def test_variants(self):
+        nose.tools.assert_raises(AssimuloException, Ensemble, factory, [{"x0":[1.0]}])
+        
+        ens = Ensemble(factory, [{"p0":[1.0]}])
+        ens.num_threads = 1
+        nose.tools.assert_raises(AssimuloException, ens.simulate, 1.0)
+        
+        ens = Ensemble(factory, [{}])
+        nose.tools.assert_raises(AssimuloException, ens._set_number_threads, 0)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010 Modelon AB
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import nose
+import numpy as N
+import scipy.sparse as sp
+from assimulo import testattr
+from assimulo.exception import AssimuloException
+from assimulo.lib.jacobian import color_columns, FDJacobian, band_storage
+
+class Test_Jacobian:
+
+    def setUp(self):
+        """
+        Sets up a tridiagonal test function, f(y)_i = y_{i-1} - 2 y_i^2 + y_{i+1}.
+        """
+        self.n = 10
+        def f(t, y):
+            self.nfcns += 1
+            yd = -2.0*y**2
+            yd[1:] += y[:-1]
+            yd[:-1] += y[1:]
+            return yd
+        def jac(t, y):
+            return N.diag(-4.0*y) + N.eye(self.n, k=1) + N.eye(self.n, k=-1)
+        self.f = f
+        self.jac = jac
+        self.nfcns = 0
+        self.sparsity = sp.diags([1, 1, 1], [-1, 0, 1], shape=(self.n, self.n))
+        self.y = N.linspace(1.0, 2.0, self.n)
+
+    @testattr(stddist = True)
+    def test_color_columns(self):
+        colors, ncolors = color_columns(self.sparsity)
+
+        assert ncolors == 3
+        pattern = self.sparsity.toarray() != 0
+        for c in range(ncolors):
+            assert N.all(pattern[:, colors == c].sum(axis=1) <= 1)
+
+        colors, ncolors = color_columns(N.eye(self.n))
+        assert ncolors == 1
+
+        colors, ncolors = color_columns(N.ones((self.n, self.n)))
+        assert ncolors == self.n
+
+    @testattr(stddist = True)
+    def test_dense(self):
+        fd_jac = FDJacobian(self.n)
+        J = fd_jac(self.f, 0.0, self.y)
+
+        assert fd_jac.ncolors == self.n
+        assert self.nfcns == self.n+1
+        assert N.allclose(J, self.jac(0.0, self.y), atol=1e-6)
+
+        J = FDJacobian(self.n, output="CSC")(self.f, 0.0, self.y)
+        assert isinstance(J, sp.csc_matrix)
+        assert N.allclose(J.toarray(), self.jac(0.0, self.y), atol=1e-6)
+
+    @testattr(stddist = True)
+    def test_unsorted_sparsity(self):
+        A = sp.csc_matrix(self.jac(0.0, self.y))
+        for j in range(self.n): #Reverse the row indices in each column
+            A.indices[A.indptr[j]:A.indptr[j+1]] = A.indices[A.indptr[j]:A.indptr[j+1]][::-1].copy()
+            A.data[A.indptr[j]:A.indptr[j+1]] = A.data[A.indptr[j]:A.indptr[j+1]][::-1].copy()
+        A.has_sorted_indices = False
+        A.data[0] = 0.0 #An explicit zero
+        A_ref = A.toarray()
+        indices = A.indices.copy()
+
+        color_columns(A)
+        fd_jac = FDJacobian(self.n, A)
+
+        assert N.all(A.toarray() == A_ref)
+        assert N.all(A.indices == indices)
+        assert A.nnz == 3*self.n-2
+        assert fd_jac.nnz == 3*self.n-3
+
+    @testattr(stddist = True)
+    def test_sparsity(self):
+        fd_jac = FDJacobian(self.n, self.sparsity)
+        J = fd_jac(self.f, 0.0, self.y, f0=self.f(0.0, self.y))
+
+        assert fd_jac.ncolors == 3
+        assert self.nfcns == 4
+        assert N.allclose(J, self.jac(0.0, self.y), atol=1e-6)
+
+        fd_jac = FDJacobian(self.n, self.sparsity, output="CSC")
+        J = fd_jac(self.f, 0.0, self.y)
+
+        assert isinstance(J, sp.csc_matrix)
+        assert J.nnz == fd_jac.nnz == 3*self.n-2
+        assert N.allclose(J.toarray(), self.jac(0.0, self.y), atol=1e-6)
+
+    @testattr(stddist = True)
+    def test_exception(self):
+        nose.tools.assert_raises(AssimuloException, FDJacobian, self.n, N.eye(self.n+1))
+        nose.tools.assert_raises(AssimuloException, FDJacobian, self.n, None, "BAND")
+
+    @testattr(stddist = True)
+    def test_band_storage(self):
+        J = self.jac(0.0, self.y)
+        band = band_storage(J, 1, 1)
+        
+        assert band.shape == (3, self.n)
+        assert N.all(band[1] == N.diag(J))
+        assert N.all(band[0,1:] == N.diag(J, 1))
+        assert N.all(band[2,:-1] == N.diag(J, -1))
+        assert N.all(band_storage(sp.csc_matrix(J), 1, 1) == band)
+        assert band_storage(band, 1, 1) is band
+        
+        nose.tools.assert_raises(AssimuloException, band_storage, N.ones((2, self.n)), 1, 1)
@@ -21,6 +21,9 @@ from assimulo import testattr
 from assimulo.exception import *
 from assimulo.problem import *
 from assimulo.solvers import Radau5DAE, Radau5ODE, Dopri5, RodasODE
+from assimulo.solvers import RungeKutta34, RungeKutta4, ExplicitEuler, ImplicitEuler, LSODAR, ODASSL
+from assimulo.solvers.radau5 import _Radau5ODE, _Radau5DAE
+from assimulo.solvers.odassl import ODASSL_Exception
 
 def res(t,y,yd,sw):
     return np.array([yd+y])
@@ -71,4 +74,63 @@ class Test_Solvers:
         
         nose.tools.assert_almost_equal(float(y[-1]), 0.135, 3)
 
+    @testattr(stddist = True)
+    def test_rhs_inplace(self):
+        def rhs(t, y):
+            return np.array([y[1], -y[0]])
+        def rhs_inplace(t, y, ydot):
+            ydot[0] = y[1]
+            ydot[1] = -y[0]
+        
+        for Solver in [Radau5ODE, _Radau5ODE, Dopri5, RodasODE, RungeKutta34, RungeKutta4, ExplicitEuler, ImplicitEuler, LSODAR]:
+            solver = Solver(Explicit_Problem(rhs, [1.0, 0.0]))
+            t, y = solver.simulate(1.0)
+            
+            inplace_problem = Explicit_Problem(rhs_inplace, [1.0, 0.0])
+            inplace_problem.rhs_inplace = True
+            solver = Solver(inplace_problem)
+            t, y_inplace = solver.simulate(1.0)
+            
+            nose.tools.assert_almost_equal(y_inplace[-1][0], y[-1][0], 10)
+            nose.tools.assert_almost_equal(y_inplace[-1][1], y[-1][1], 10)
+    
+    @testattr(stddist = True)
+    def test_rhs_inplace_state_events(self):
+        def rhs_inplace(t, y, ydot, sw):
+            ydot[:] = -y
+        
+        inplace_problem = Explicit_Problem(rhs_inplace, [1.0])
+        inplace_problem.state_events = estate_events
+        inplace_problem.rhs_inplace = True
+        
+        for Solver in [Radau5ODE, Dopri5, RodasODE]:
+            solver = Solver(inplace_problem)
+            t, y = solver.simulate(2,33)
+            
+            nose.tools.assert_almost_equal(float(y[-1]), 0.135, 3)
     
+    @testattr(stddist = True)
+    def test_res_inplace(self):
+        def res_inplace(t, y, yd, r, sw):
+            r[:] = yd + y
+        
+        inplace_problem = Implicit_Problem(res_inplace, [1.0], [-1.0])
+        inplace_problem.state_events = state_events
+        inplace_problem.res_inplace = True
+        
+        solver = Radau5DAE(inplace_problem)
+        t, y, yd = solver.simulate(2,33)
+        
+        nose.tools.assert_almost_equal(float(y[-1]), 0.135, 3)
+        
+        def res_inplace(t, y, yd, r):
+            r[:] = yd + y
+        
+        inplace_problem = Implicit_Problem(res_inplace, [1.0], [-1.0])
+        inplace_problem.res_inplace = True
+        
+        solver = _Radau5DAE(inplace_problem)
+        t, y, yd = solver.simulate(2,33)
+        
+        nose.tools.assert_almost_equal(float(y[-1]), np.exp(-2), 3)
+        nose.tools.assert_raises(ODASSL_Exception, ODASSL, inplace_problem)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python 
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010 Modelon AB
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import nose
+import numpy as N
+from assimulo import testattr
+import os
+import tempfile
+from assimulo.support import ResultBuffer, ResultFile, EventLocator
+
+class Test_ResultBuffer:
+    
+    @testattr(stddist = True)
+    def test_append_scalar(self):
+        buf = ResultBuffer(capacity=2)
+        for i in range(10):
+            buf.append(float(i))
+        
+        assert len(buf) == 10
+        assert buf[-1] == 9.0
+        assert N.all(buf.array() == N.arange(10.0))
+        
+    @testattr(stddist = True)
+    def test_append_rows(self):
+        buf = ResultBuffer(3, capacity=1)
+        buf.append(N.array([1.0, 2.0, 3.0]))
+        buf.extend([N.array([4.0, 5.0, 6.0]), N.array([7.0, 8.0, 9.0])])
+        
+        assert len(buf) == 3
+        assert buf.array().shape == (3, 3)
+        nose.tools.assert_almost_equal(buf[-1][0], 7.0)
+        nose.tools.assert_almost_equal(N.array(buf)[1, 2], 6.0)
+        
+    @testattr(stddist = True)
+    def test_grow_with_views(self):
+        buf = ResultBuffer(2, capacity=1)
+        buf.append(N.array([1.0, 2.0]))
+        first = buf[0] #Keep a view of the storage
+        for i in range(5):
+            buf.append(N.array([3.0, 4.0]))
+        
+        assert N.all(first == [1.0, 2.0])
+        assert N.all(buf[0] == [1.0, 2.0])
+        
+    @testattr(stddist = True)
+    def test_trim(self):
+        buf = ResultBuffer(2)
+        buf.append(N.array([1.0, 2.0]))
+        buf.append(N.array([3.0, 4.0]))
+        
+        res = buf.trim()
+        
+        assert res.shape == (2, 2)
+        assert N.all(res == [[1.0, 2.0], [3.0, 4.0]])
+
+class Test_ResultFile:
+    
+    @testattr(stddist = True)
+    def test_append_rows(self):
+        buf = ResultFile(2, capacity=3)
+        for i in range(10):
+            buf.append(N.array([i, 2.0*i]))
+        
+        assert len(buf) == 10
+        nose.tools.assert_almost_equal(buf[-1][1], 18.0)
+        
+        res = buf.trim()
+        
+        assert res.shape == (10, 2)
+        assert isinstance(res, N.memmap)
+        assert N.all(N.load(buf.filename) == res)
+        
+        buf.close()
+        assert not os.path.exists(buf.filename)
+        assert N.all(res[:,0] == N.arange(10))
+    
+    @testattr(stddist = True)
+    def test_cached_array(self):
+        buf = ResultFile(capacity=2)
+        buf.extend([1.0, 2.0, 3.0])
+        
+        res = buf.array()
+        assert buf.array() is res
+        assert buf[-1] == 3.0
+        assert buf.array() is res
+        
+        buf.append(4.0)
+        assert buf.array() is not res
+        assert len(buf.array()) == 4
+        
+        filename = buf.filename
+        del buf
+        assert not os.path.exists(filename)
+        
+    @testattr(stddist = True)
+    def test_directory(self):
+        directory = tempfile.mkdtemp()
+        buf = ResultFile(directory=directory, delete=False)
+        buf.close()
+        
+        assert len(buf.array()) == 0
+        assert os.path.dirname(buf.filename) == directory
+        assert os.path.exists(buf.filename)
+        os.remove(buf.filename)
+        os.rmdir(directory)
+
+class Test_EventLocator:
+    
+    def setUp(self):
+        self.nevals = 0
+    
+    def g(self, t):
+        self.nevals += 1
+        return N.array([t - 0.3, 0.7 - t, 1.0])
+    
+    @testattr(stddist = True)
+    def test_no_event(self):
+        locator = EventLocator(3)
+        event_info = locator.locate(self.g, 0.0, 0.2, self.g(0.0), self.g(0.2))
+        
+        assert event_info is None
+        assert self.nevals == 2
+        assert locator.nevals == 0
+        assert N.all(locator.g_event == self.g(0.2))
+        
+    @testattr(stddist = True)
+    def test_first_event(self):
+        locator = EventLocator(3)
+        event_info = locator.locate(self.g, 0.0, 1.0, self.g(0.0), [0.99, -0.3, 1.0])
+        
+        assert list(event_info) == [1, 0, 0]
+        assert locator.nevals == self.nevals - 1
+        nose.tools.assert_almost_equal(locator.t_event, 0.3)
+        assert locator.t_event >= 0.3
+        
+    @testattr(stddist = True)
+    def test_wrong_size(self):
+        locator = EventLocator(2)
+        nose.tools.assert_raises(ValueError, locator.locate, self.g, 0.0, 1.0, self.g(0.0), self.g(1.0))
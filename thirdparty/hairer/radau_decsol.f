@@ -303,6 +303,13 @@ C    IWORK(9)  THE VALUE OF M1.  DEFAULT M1=0.
 C
 C    IWORK(10) THE VALUE OF M2.  DEFAULT M2=M1.
 C
+C    IWORK(11) IF IWORK(11).NE.0, THE JACOBIAN STORED IN WORK BY A
+C              PREVIOUS CALL (WITH THE SAME N, MLJAC, MUJAC AND ARRAYS
+C              WORK AND IWORK) IS USED FOR THE FIRST STEP INSTEAD OF
+C              BEING RECOMPUTED. IT IS RECOMPUTED AS USUAL IF THE NEWTON
+C              ITERATION FAILS. IGNORED IF IWORK(1).NE.0.
+C              DEFAULT IWORK(11)=0.
+C
 C ----------
 C
 C    WORK(1)   UROUND, THE ROUNDING UNIT, DEFAULT 1.D-16.
@@ -374,7 +381,7 @@ C *** *** *** *** *** *** *** *** *** *** *** *** ***
       IMPLICIT DOUBLE PRECISION (A-H,O-Z)
       DIMENSION Y(N),ATOL(*),RTOL(*),WORK(LWORK),IWORK(LIWORK)
       DIMENSION RPAR(*),IPAR(*)
-      LOGICAL IMPLCT,JBAND,ARRET,STARTN,PRED
+      LOGICAL IMPLCT,JBAND,ARRET,STARTN,PRED,JACREU
       EXTERNAL FCN,JAC,MAS,SOLOUT
 C *** *** *** *** *** *** ***
 C        SETTING THE PARAMETERS 
@@ -446,6 +453,8 @@ C -------- STARTN  SWITCH FOR STARTING VALUES OF NEWTON ITERATIONS
       ELSE
          STARTN=.TRUE.
       END IF
+C -------- JACREU  SWITCH FOR REUSING THE JACOBIAN OF THE PREVIOUS CALL
+      JACREU=IWORK(11).NE.0.AND.IWORK(1).EQ.0
 C -------- PARAMETER FOR DIFFERENTIAL-ALGEBRAIC COMPONENTS
       NIND1=IWORK(5)
       NIND2=IWORK(6)
@@ -631,7 +640,7 @@ C -------- CALL TO CORE INTEGRATOR ------------
       CALL RADCOR(N,FCN,X,Y,XEND,HMAX,H,RTOL,ATOL,ITOL,
      &   JAC,IJAC,MLJAC,MUJAC,MAS,MLMAS,MUMAS,SOLOUT,IOUT,IDID,
      &   NMAX,UROUND,SAFE,THET,FNEWT,QUOT1,QUOT2,NIT,IJOB,STARTN,
-     &   NIND1,NIND2,NIND3,PRED,FACL,FACR,M1,M2,NM1,
+     &   NIND1,NIND2,NIND3,PRED,FACL,FACR,M1,M2,NM1,JACREU,
      &   IMPLCT,JBAND,LDJAC,LDE1,LDMAS2,WORK(IEZ1),WORK(IEZ2),
      &   WORK(IEZ3),WORK(IEY0),WORK(IESCAL),WORK(IEF1),WORK(IEF2),
      &   WORK(IEF3),WORK(IEJAC),WORK(IEE1),WORK(IEE2R),WORK(IEE2I),
@@ -668,7 +677,7 @@ C
       SUBROUTINE RADCOR(N,FCN,X,Y,XEND,HMAX,H,RTOL,ATOL,ITOL,
      &   JAC,IJAC,MLJAC,MUJAC,MAS,MLMAS,MUMAS,SOLOUT,IOUT,IDID,
      &   NMAX,UROUND,SAFE,THET,FNEWT,QUOT1,QUOT2,NIT,IJOB,STARTN,
-     &   NIND1,NIND2,NIND3,PRED,FACL,FACR,M1,M2,NM1,
+     &   NIND1,NIND2,NIND3,PRED,FACL,FACR,M1,M2,NM1,JACREU,
      &   IMPLCT,BANDED,LDJAC,LDE1,LDMAS,Z1,Z2,Z3,
      &   Y0,SCAL,F1,F2,F3,FJAC,E1,E2R,E2I,FMAS,IP1,IP2,IPHES,
      &   CONT,NFCN,NJAC,NSTEP,NACCPT,NREJCT,NDEC,NSOL,RPAR,IPAR)
@@ -687,7 +696,7 @@ C ----------------------------------------------------------
       COMMON /CONRA5/NN,NN2,NN3,NN4,XSOL,HSOL,C2M1,C1M1
       COMMON/LINAL/MLE,MUE,MBJAC,MBB,MDIAG,MDIFF,MBDIAG
       LOGICAL REJECT,FIRST,IMPLCT,BANDED,CALJAC,STARTN,CALHES
-      LOGICAL INDEX1,INDEX2,INDEX3,LAST,PRED
+      LOGICAL INDEX1,INDEX2,INDEX3,LAST,PRED,JACREU
       EXTERNAL FCN
 C *** *** *** *** *** *** ***
 C  INITIALISATIONS
@@ -792,6 +801,12 @@ C ---------- CONSTANTS ---------
       HHFAC=H
       CALL FCN(N,X,Y,Y0,RPAR,IPAR)
       NFCN=NFCN+1
+C --- REUSE THE JACOBIAN OF THE PREVIOUS CALL
+      IF (JACREU) THEN
+         CALJAC=.FALSE.
+         CALHES=.TRUE.
+         GOTO 20
+      END IF
 C --- BASIC INTEGRATION STEP  
   10  CONTINUE
 C *** *** *** *** *** *** ***